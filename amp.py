@@ -13,11 +13,8 @@ import logging
 import argparse
 import sys
 
-from prompt_toolkit import prompt
-from prompt_toolkit.history import FileHistory
-from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
-
-from src import ampinterpreter, ampyacc, ampcompiler
+from src import ampbudget, ampinterpreter, amplex, ampmetrics, ampyacc, ampcompiler, ampoptimizer
+from src.amptemplate import Template
 
 # Constants
 APP_VERSION = "0.0.5"
@@ -139,9 +136,7 @@ def transpile_js_to_py(js_code):
     """
     import re
     
-    # Start with ampfunctions import since JS code will use it
-    py_code = "from src import ampfunctions\n"
-    py_code += js_code
+    py_code = js_code
 
     # Remove HTML script tags
     py_code = re.sub(r"<script[^>]*>", '', py_code, flags=re.IGNORECASE)
@@ -288,14 +283,14 @@ def transpile_js_to_py(js_code):
         # console.log/warn/error/info -> ampfunctions.Write
         converted = re.sub(
             r'\bconsole\.(log|warn|error|info)\s*\(',
-            r"getattr(ampfunctions,'Write')(",
+            r"amp_Write(",
             converted
         )
         
         # Direct Write() calls -> ampfunctions.Write
         converted = re.sub(
             r'\bWrite\s*\(',
-            r"getattr(ampfunctions,'Write')(",
+            r"amp_Write(",
             converted
         )
         
@@ -399,7 +394,9 @@ def transpile_js_to_py(js_code):
     # Now add proper Python indentation
     py_code = add_proper_indentation(py_code)
 
-    return py_code
+    # Import ampfunctions and resolve Write once. Added last so the property
+    # access rewrites above never see the attribute access.
+    return "from src import ampfunctions\namp_Write = ampfunctions.Write\n" + py_code
 
 
 def add_proper_indentation(code):
@@ -546,7 +543,9 @@ def add_proper_indentation(code):
     return '\n'.join(final_result)
 
 
-def compile_from_file(input_file, target_language):
+def compile_from_file(input_file, target_language, optimize=True, budget=None,
+                      source_map_file=None, standalone=False, report=False,
+                      minify=False):
     """
     Compile an AmpScript file to the target language.
 
@@ -557,6 +556,17 @@ def compile_from_file(input_file, target_language):
     Args:
         input_file: Path to the input AmpScript file.
         target_language: Target language ("py" or "js").
+        optimize: Run the AST optimizer before code generation.
+        budget: ampbudget.Budget enforced by generated Python (optional).
+        source_map_file: Path to write the source map of generated Python
+            (pure AmpScript input only).
+        standalone: Prepend a runtime holding only the library functions
+            the output calls instead of relying on src.ampfunctions (pure
+            AmpScript input only).
+        report: Write the size and operation counts of generated
+            JavaScript to stderr.
+        minify: Generate size-optimized JavaScript; with report, also
+            write its byte count before and after minifying.
 
     Returns:
         True if compilation was successful, False otherwise.
@@ -583,9 +593,14 @@ def compile_from_file(input_file, target_language):
 
     if has_javascript and is_embedded and target_language == "py":
         # JavaScript with embedded AmpScript - handle separately to avoid conflicts
+        if source_map_file:
+            logger.warning("Source maps are not written for JavaScript input")
+        if standalone:
+            logger.warning("Standalone runtimes are not built for JavaScript input")
         if isinstance(ampscript_code, str) and not ampscript_code.strip():
             # Pure JavaScript
-            py_code = transpile_js_to_py(data)
+            with ampmetrics.timer('stage_seconds', stage='transpile_js'):
+                py_code = transpile_js_to_py(data)
             print(py_code)
             return True
         
@@ -599,8 +614,10 @@ def compile_from_file(input_file, target_language):
             if not prog:
                 logger.error("Parsing AmpScript block failed")
                 return False
+            if optimize:
+                prog = ampoptimizer.optimize(prog)
             
-            compiler = ampcompiler.AmpCompilerToPy(prog)
+            compiler = ampcompiler.AmpCompilerToPy(prog, budget=budget)
             
             try:
                 import io
@@ -640,7 +657,8 @@ def compile_from_file(input_file, target_language):
             block_idx += 1
         
         # Transpile JavaScript to Python
-        py_wrapper = transpile_js_to_py(wrapper)
+        with ampmetrics.timer('stage_seconds', stage='transpile_js'):
+            py_wrapper = transpile_js_to_py(wrapper)
         
         # Replace each marker with its corresponding compiled block
         final_output = py_wrapper
@@ -655,8 +673,9 @@ def compile_from_file(input_file, target_language):
         # Parse the AmpScript code
         # ampscript_code might be a list or string depending on is_embedded
         if is_embedded:
-            # If embedded but no JavaScript, join the blocks
-            code_to_parse = '\n'.join(ampscript_code) if isinstance(ampscript_code, list) else ampscript_code
+            # If embedded but no JavaScript, join the blocks keeping their
+            # line numbers
+            code_to_parse = ampscript_source(data)
         else:
             # Not embedded, use original data
             code_to_parse = data
@@ -665,12 +684,18 @@ def compile_from_file(input_file, target_language):
         if not prog:
             logger.error("Parsing failed")
             return False
+        if optimize:
+            prog = ampoptimizer.optimize(prog)
 
         # Select compiler
         if target_language == "py":
-            compiler = ampcompiler.AmpCompilerToPy(prog)
+            compiler = ampcompiler.AmpCompilerToPy(
+                prog, budget=budget, source_map=source_map_file is not None,
+                standalone=standalone
+            )
         elif target_language == "js":
-            compiler = ampcompiler.AmpCompilerToJs(prog)
+            compiler = ampcompiler.AmpCompilerToJs(prog, standalone=standalone,
+                                                   minify=minify)
         else:
             logger.error(f"Unsupported language: {target_language}")
             return False
@@ -678,24 +703,126 @@ def compile_from_file(input_file, target_language):
         # Compile
         try:
             compiler.compile()
+            if report and minify and target_language == "js":
+                # Only compiled unminified when the comparison is asked for
+                before = len(ampcompiler.AmpCompilerToJs(
+                    prog, standalone=standalone).generate().encode("utf-8"))
+                after = len(compiler.output.encode("utf-8"))
+                sys.stderr.write(f"Minified JavaScript: {before} -> {after} bytes "
+                                 f"({round(100 * (before - after) / max(before, 1))}% smaller)\n")
+            if report and target_language == "js":
+                sys.stderr.write(ampcompiler.format_js_report(
+                    ampcompiler.js_report(compiler.output)))
+            if source_map_file and compiler.source_map is not None:
+                with open(source_map_file, "w", encoding="utf-8") as f:
+                    f.write(compiler.source_map.dumps())
             return True
         except RuntimeError as e:
             logger.error(f"Compilation error: {e}")
             return False
 
 
-def run_interactive_mode():
-    """Run the interactive REPL mode."""
-    interpreter = ampinterpreter.AmpInterpreter({})
+def ampscript_source(data):
+    """
+    Get the AmpScript program of a template file for rendering.
+
+    Embedded blocks are joined with the text between them replaced by
+    blank lines, so statement line numbers match the file.
+
+    Args:
+        data: Template file content.
+
+    Returns:
+        AmpScript source code.
+    """
+    blocks, is_embedded = extract_ampscript_blocks(data)
+    if not is_embedded:
+        return data
+    parts = []
+    rest = data
+    for block in blocks:
+        start = rest.find('%%[')
+        parts.append('\n' * rest.count('\n', 0, start) + block)
+        rest = rest[rest.find(']%%', start) + 3:]
+    return ''.join(parts)
+
+
+def profile_file(input_file, target_language=None, optimize=True, budget=None,
+                 stacks_file=None, mode="instrument"):
+    """
+    Render a template once with profiling enabled.
+
+    The rendered output goes to stdout and the profile report to stderr.
+
+    Args:
+        input_file: Path to the input AmpScript file.
+        target_language: "py" to profile the compiled Python render, None to
+            profile the interpreter.
+        optimize: Run the AST optimizer before rendering.
+        budget: ampbudget.Budget limiting the render (optional).
+        stacks_file: Path to write collapsed stacks for flamegraph tools.
+        mode: "instrument" to render instrumented code, "hook" to profile
+            plain compiled Python with sys.setprofile through its source map.
+
+    Returns:
+        True if the render succeeded, False otherwise.
+    """
+    try:
+        with open(input_file, encoding="utf-8") as f:
+            data = f.read()
+    except IOError as e:
+        logger.error(f"Error reading file: {e}")
+        return False
+
+    try:
+        template = Template(
+            ampscript_source(data), name=input_file,
+            compiled=target_language == "py", optimize=optimize
+        )
+    except RuntimeError as e:
+        logger.error(f"{e}")
+        return False
+
+    success = True
+    try:
+        profile = "hook" if mode == "hook" else True
+        sys.stdout.write(template.render(budget=budget, profile=profile))
+    except RuntimeError as e:
+        # Report what ran before the error or exhausted budget
+        logger.error(f"Runtime error: {e}")
+        success = False
+
+    sys.stderr.write(template.profiler.report())
+    if stacks_file:
+        with open(stacks_file, "w", encoding="utf-8") as f:
+            f.write(template.profiler.collapsed())
+    return success
+
+
+def run_interactive_mode(budget=None, debug_parse=False):
+    """
+    Run the interactive REPL mode.
+
+    Args:
+        budget: ampbudget.Budget applied to each input (optional).
+        debug_parse: Log PLY parser debug output for every input.
+    """
+    # prompt_toolkit is only needed by the REPL, keep it off the compile path
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.history import FileHistory
+    from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
+
+    interpreter = ampinterpreter.AmpInterpreter({}, budget=budget)
+    session = PromptSession(
+        history=FileHistory(HISTORY_FILE),
+        auto_suggest=AutoSuggestFromHistory()
+    )
+    parse_debug = logger if debug_parse else 0
     print(f"(o) Amp {APP_VERSION}")
 
     while True:
         try:
-            user_input = prompt(
-                PROMPT_TEXT,
-                history=FileHistory(HISTORY_FILE),
-                auto_suggest=AutoSuggestFromHistory()
-            )
+            user_input = session.prompt(PROMPT_TEXT)
         except EOFError:
             break
         except KeyboardInterrupt:
@@ -706,23 +833,67 @@ def run_interactive_mode():
 
         user_input += "\n"
 
-        prog = ampyacc.parse(user_input, debug=logger)
+        prog = ampyacc.parse(user_input, debug=parse_debug)
 
+        if not prog:
+            continue
+
+        # Keep declarations: later input may reference them
+        prog = ampoptimizer.optimize(prog, drop_unused_vars=False)
         if not prog:
             continue
 
         try:
             interpreter.add_statements(prog)
             interpreter.interpret()
+        except ampbudget.BudgetExceeded as e:
+            logger.error("Budget exceeded: %s", e.to_dict())
+            print(f"Aborted: {e}")
         except RuntimeError as e:
             logger.error(f"Runtime error: {e}")
 
 
+def budget_from_args(args):
+    """
+    Build the execution budget requested on the command line.
+
+    Args:
+        args: Parsed command line arguments.
+
+    Returns:
+        ampbudget.Budget, or None if no limit was given.
+    """
+    limits = {
+        "max_instructions": args.max_instructions,
+        "max_iterations": args.max_iterations,
+        "timeout": args.timeout,
+        "max_output_bytes": args.max_output_bytes,
+    }
+    if all(value is None for value in limits.values()):
+        return None
+    return ampbudget.Budget(**limits)
+
+
 def main():
     """Main entry point for the AmpScript compiler."""
     # Ensure redirected output is UTF-8 instead of UTF-16 on Windows.
     if hasattr(sys.stdout, "reconfigure"):
         sys.stdout.reconfigure(encoding="utf-8")
+
+    # Subcommands with their own options: amp.py bench [--scale S] ...
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        from benchmarks import runner
+        sys.exit(runner.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from src import ampserver
+        sys.exit(ampserver.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "lsp":
+        from src import amplsp
+        sys.exit(amplsp.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        from src import ampbuild
+        sys.exit(ampbuild.main(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(
         description="AmpScript compiler with support for Python and JavaScript targets"
     )
@@ -738,17 +909,166 @@ def main():
         type=str,
         help="Path to input AmpScript file"
     )
+    parser.add_argument(
+        "--no-optimize",
+        action="store_true",
+        help="Skip constant folding and dead-branch elimination"
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Wall-clock seconds allowed per render (checked at loop iterations)"
+    )
+    parser.add_argument(
+        "--max-instructions",
+        type=int,
+        help="Maximum statements executed per input in the interpreter"
+    )
+    parser.add_argument(
+        "--max-iterations",
+        type=int,
+        help="Maximum loop iterations per render"
+    )
+    parser.add_argument(
+        "--max-output-bytes",
+        type=int,
+        help="Maximum bytes of output per render"
+    )
+
+    parser.add_argument(
+        "--content",
+        type=str,
+        metavar="PATH",
+        help="Directory or SQLite file of content blocks for ContentBlockbyId/Key/Name"
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        metavar="PATH",
+        help="SQLite file of data extensions (one table each) for the Lookup functions"
+    )
+
+    parser.add_argument(
+        "--lexer",
+        choices=["ply", "scanner"],
+        default="ply",
+        help="Tokenizer: the PLY lexer, or the faster regex scanner producing "
+             "the same tokens"
+    )
+    parser.add_argument(
+        "--parser",
+        choices=["ply", "pratt"],
+        default="ply",
+        help="Parser: PLY's LALR tables, or the hand-written recursive-descent "
+             "parser building the same tree"
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        metavar="FILE",
+        help="Record stage timers and function call counts and write them on "
+             "exit (.json for JSON, otherwise Prometheus text format)"
+    )
+
+    parser.add_argument(
+        "--debug-parse",
+        action="store_true",
+        help="Log parser debug output for every REPL input"
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Render the input once and report time per line and function "
+             "(interpreted, or compiled with -l py)"
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=["instrument", "hook"],
+        default="instrument",
+        help="With --profile: instrument the render, or profile plain "
+             "compiled Python with sys.setprofile (hook, needs -l py)"
+    )
+    parser.add_argument(
+        "--source-map",
+        type=str,
+        metavar="FILE",
+        help="With -l py, write the generated line -> template line map as JSON"
+    )
+    parser.add_argument(
+        "--standalone",
+        action="store_true",
+        help="With -l py or -l js, include a runtime holding only the library "
+             "functions the template calls, so the output runs without src/"
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="With -l js, print the size and operation counts of the output "
+             "to stderr"
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="With -l js, strip whitespace, shorten local names and share "
+             "repeated strings; --report adds the byte counts before and after"
+    )
+    parser.add_argument(
+        "--profile-stacks",
+        type=str,
+        metavar="FILE",
+        help="With --profile, write collapsed stacks for flamegraph tools"
+    )
 
     args = parser.parse_args()
+    budget = budget_from_args(args)
+    amplex.select(args.lexer)
+    ampyacc.select(args.parser)
+    if args.metrics:
+        import atexit
+        ampmetrics.enable()
+        atexit.register(ampmetrics.write, args.metrics)
+    if args.content:
+        from src import ampcontentstore
+        ampcontentstore.configure(ampcontentstore.open_store(args.content))
+    if args.data:
+        from src import ampdatastore
+        ampdatastore.configure(ampdatastore.DataExtensionStore(args.data))
+
+    if args.profile:
+        if not args.input:
+            parser.error("--profile requires -i/--input")
+        if args.language == "js":
+            parser.error("--profile supports interpreted and py renders only")
+        if args.profile_mode == "hook" and args.language != "py":
+            parser.error("--profile-mode hook requires -l py")
+        success = profile_file(
+            args.input, args.language, optimize=not args.no_optimize,
+            budget=budget, stacks_file=args.profile_stacks,
+            mode=args.profile_mode
+        )
+        sys.exit(0 if success else 1)
 
     # If both arguments are provided, run compilation mode
     if args.language and args.input:
-        success = compile_from_file(args.input, args.language)
+        if args.source_map and args.language != "py":
+            parser.error("--source-map requires -l py")
+        if args.report and args.language != "js":
+            parser.error("--report requires -l js")
+        if args.minify and args.language != "js":
+            parser.error("--minify requires -l js")
+        success = compile_from_file(
+            args.input, args.language, optimize=not args.no_optimize,
+            budget=budget, source_map_file=args.source_map,
+            standalone=args.standalone, report=args.report,
+            minify=args.minify
+        )
         sys.exit(0 if success else 1)
     else:
         # Run interactive mode
         try:
-            run_interactive_mode()
+            run_interactive_mode(budget, debug_parse=args.debug_parse)
         except KeyboardInterrupt:
             print("\nExiting...")
             sys.exit(0)
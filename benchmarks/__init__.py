@@ -0,0 +1,14 @@
+# =============================================================================
+# benchmarks/__init__.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Benchmark suite for the AmpScript toolchain.
+# =============================================================================
+"""Benchmark suite: synthetic workloads, stage timings and regression
+comparison against a stored baseline. Run it with `python amp.py bench`."""
+
+from .runner import compare, main, run
+from .workloads import WORKLOADS, generate
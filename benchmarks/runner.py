@@ -0,0 +1,447 @@
+# =============================================================================
+# benchmarks/runner.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Benchmark runner, JSON results and baseline comparison.
+# =============================================================================
+"""Measure each pipeline stage on the synthetic workloads.
+
+Results are keyed "<stage>.<workload>" (or "function.<Name>" for library
+functions, "http.<Name>" for HTTP functions against a local stub server and
+"batch.<mode>" for rendering a chunk of subscribers per row or vectorized)
+and hold the best and median seconds per operation plus the
+derived throughput. They are written as JSON and can be compared against a
+stored baseline: a benchmark whose best time grew by more than the
+tolerance counts as a regression.
+"""
+
+import argparse
+import fnmatch
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import time
+
+from src import ampbudget, ampcompiler, ampfunctions, ampinterpreter
+from src import amplex, ampoptimizer, amppratt, amptemplate, ampvector, ampyacc
+from src.ampstubserver import Route, StubServer
+
+from . import workloads
+
+logger = logging.getLogger(__name__)
+
+# Default location of the stored baseline
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Subscribers per batch benchmark at scale 1.0
+BATCH_SUBSCRIBERS = 2000
+
+# Allowed slowdown before a benchmark counts as a regression
+DEFAULT_TOLERANCE = 0.15
+
+# Library function -> sample arguments for per-function throughput
+FUNCTION_SAMPLES = {
+    'Concat': ('subscriber', '-', 42),
+    'Length': ('subscriber',),
+    'Uppercase': ('subscriber',),
+    'Lowercase': ('SUBSCRIBER',),
+    'ProperCase': ('dear subscriber',),
+    'Substring': ('subscriber', 2, 5),
+    'Replace': ('a-b-c-d', '-', '+'),
+    'IndexOf': ('subscriber', 'scr'),
+    'Trim': ('  subscriber  ',),
+    'RegExMatch': ('order-1234', r'\d+'),
+    'Add': (1, 2),
+    'Multiply': (3, 4),
+    'Divide': (10, 4),
+    'Mod': (10, 3),
+    'FormatNumber': (1234.5, 2),
+    'FormatCurrency': (1234.5, 'en-US'),
+    'MD5': ('subscriber',),
+    'SHA256': ('subscriber',),
+    'Base64Encode': ('subscriber',),
+    'DateParse': ('2023-01-01',),
+    'DateDiff': ('01/01/2023', '02/01/2023', 'D'),
+    'URLEncode': ('https://example.com/?a=b c',),
+    'Empty': ('',),
+    'IsEmailAddress': ('subscriber@example.com',),
+    'Lookup': ('Subscribers', 'Email', 'Id', 1),
+}
+
+
+def measure(function, repeat=5, min_time=0.05):
+    """
+    Time a function.
+
+    The function is called in batches long enough to be timed reliably;
+    the first call also serves as a warm-up.
+
+    Args:
+        function: Callable taking no arguments
+        repeat: Number of timed batches
+        min_time: Minimum duration of a batch in seconds
+
+    Returns:
+        Tuple of (best, median) seconds per call
+    """
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    number = max(1, int(min_time / elapsed)) if elapsed > 0 else 1000
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return min(samples), statistics.median(samples)
+
+
+def tokenize(lexer, source):
+    """Run the lexer over a source and return the token count."""
+    lexer.lineno = 1
+    lexer.input(source)
+    count = 0
+    while lexer.token() is not None:
+        count += 1
+    return count
+
+
+def interpret(tree, functions):
+    """Render a parsed program with a fresh interpreter."""
+    interpreter = ampinterpreter.AmpInterpreter({}, functions=functions)
+    with ampbudget.capturing(io.StringIO()):
+        interpreter.add_statements(tree)
+        interpreter.interpret()
+
+
+def execute(code):
+    """Run compiled Python code with its output captured."""
+    with ampbudget.capturing(io.StringIO()):
+        exec(code, {'__name__': '__amp__'})
+
+
+def stage_benchmarks(name, scale):
+    """
+    Build the stage benchmarks of one workload.
+
+    Args:
+        name: Workload name
+        scale: Workload size multiplier
+
+    Returns:
+        List of (key, callable, units, unit) tuples; units is the amount
+        of work one call does, in unit
+    """
+    # amp.py holds the JS transpiler; imported here so that amp.py can
+    # import this module lazily for its bench command
+    import amp
+
+    text = workloads.generate(name, scale)
+    source = amp.ampscript_source(text)
+    tree = ampyacc.parse(source)
+    if not tree:
+        raise RuntimeError(f"Parsing failed: workload {name}")
+    optimized = ampoptimizer.optimize(tree)
+    code = compile(ampcompiler.AmpCompilerToPy(optimized).generate(), name, 'exec')
+    lexer = amplex.lexer.clone()
+    scanner = amplex.Scanner()
+    functions = ampfunctions.func()
+    size = len(source.encode('utf-8'))
+
+    benchmarks = [
+        (f"lexer.{name}", lambda: tokenize(lexer, source), size, 'bytes'),
+        (f"scanner.{name}", lambda: tokenize(scanner, source), size, 'bytes'),
+        (f"parser.{name}", lambda: ampyacc.parse(source), size, 'bytes'),
+        (f"pratt.{name}", lambda: amppratt.parse(source), size, 'bytes'),
+        (f"optimizer.{name}", lambda: ampoptimizer.optimize(tree), size, 'bytes'),
+        (f"compile_py.{name}",
+         lambda: ampcompiler.AmpCompilerToPy(optimized).generate(), size, 'bytes'),
+        (f"compile_js.{name}",
+         lambda: ampcompiler.AmpCompilerToJs(optimized).generate(), size, 'bytes'),
+        (f"interpreter.{name}", lambda: interpret(optimized, functions), 1, 'renders'),
+        (f"compiled_py.{name}", lambda: execute(code), 1, 'renders'),
+    ]
+    if amp.detect_javascript(text):
+        js_size = len(text.encode('utf-8'))
+        benchmarks.append(
+            (f"transpile_js.{name}", lambda: amp.transpile_js_to_py(text), js_size, 'bytes')
+        )
+    return benchmarks
+
+
+def function_benchmarks():
+    """
+    Build the per-function benchmarks.
+
+    Functions are called unmemoized, so the numbers reflect the
+    implementations themselves.
+
+    Returns:
+        List of (key, callable, units, unit) tuples
+    """
+    library = ampfunctions.func()
+    benchmarks = []
+    for name, args in FUNCTION_SAMPLES.items():
+        category = ampfunctions.FUNCTION_INDEX[name]
+        method = getattr(ampfunctions.load_category(category), name).__get__(library)
+        benchmarks.append(
+            (f"function.{name}", lambda method=method, args=args: method(*args), 1, 'calls')
+        )
+    return benchmarks
+
+
+def http_benchmarks(server):
+    """
+    Build the HTTP function benchmarks against a local stub server.
+
+    Args:
+        server: Running ampstubserver.StubServer
+
+    Returns:
+        List of (key, callable, units, unit) tuples
+    """
+    server.routes.update({
+        '/cached': Route('{"price": 42}', max_age=3600),
+        '/live': Route('{"price": 42}', headers={'Cache-Control': 'no-store'}),
+    })
+    library = ampfunctions.func()
+    cached, live, echo = server.url('/cached'), server.url('/live'), server.url('/echo')
+    return [
+        ("http.HTTPGet_cached", lambda: library.HTTPGet(cached), 1, 'calls'),
+        ("http.HTTPGet", lambda: library.HTTPGet(live), 1, 'calls'),
+        ("http.HTTPPost", lambda: library.HTTPPost(echo, 'text/plain', 'x'), 1, 'calls'),
+    ]
+
+
+def batch_benchmarks(scale):
+    """
+    Build the batch render benchmarks: the personalization workload for a
+    chunk of subscribers, rendered per row and vectorized (ampvector).
+
+    Args:
+        scale: Workload size multiplier
+
+    Returns:
+        List of (key, callable, units, unit) tuples
+    """
+    template = amptemplate.Template(workloads.PERSONALIZATION, name='personalization')
+    vector = ampvector.VectorTemplate(template)
+    subscribers = workloads.subscribers(max(1, int(BATCH_SUBSCRIBERS * scale)))
+
+    def per_row():
+        return [template.render(context=subscriber) for subscriber in subscribers]
+
+    count = len(subscribers)
+    return [
+        ("batch.per_row", per_row, count, 'renders'),
+        ("batch.vectorized", lambda: vector.render_chunk(subscribers), count, 'renders'),
+    ]
+
+
+def batch_speedup(results):
+    """Get the vectorized over per-row batch throughput ratio, or None."""
+    per_row = results['results'].get('batch.per_row')
+    vectorized = results['results'].get('batch.vectorized')
+    if not per_row or not vectorized or not vectorized['best']:
+        return None
+    return per_row['best'] / vectorized['best']
+
+
+def stage_speedup(results, reference, stage):
+    """
+    Get the time ratio of two stages on the largest workload both measured.
+
+    Args:
+        results: Output of run()
+        reference: Stage of the denominator, e.g. 'lexer'
+        stage: Stage compared with it, e.g. 'scanner'
+
+    Returns:
+        reference time / stage time, or None
+    """
+    pairs = []
+    for key, slow in results['results'].items():
+        if not key.startswith(reference + '.'):
+            continue
+        fast = results['results'].get(stage + key[len(reference):])
+        if fast and fast['best']:
+            size = (slow['throughput'] or 0) * slow['best']
+            pairs.append((size, slow['best'] / fast['best']))
+    return max(pairs)[1] if pairs else None
+
+
+def run(scale=1.0, repeat=5, only=None, min_time=0.05, progress=None):
+    """
+    Run the benchmark suite.
+
+    Args:
+        scale: Workload size multiplier
+        repeat: Timed batches per benchmark
+        only: fnmatch patterns selecting benchmark keys (optional)
+        min_time: Minimum duration of a timed batch in seconds
+        progress: Callable receiving each key and its result (optional)
+
+    Returns:
+        Results dictionary with "meta" and "results" entries
+    """
+    benchmarks = []
+    for name in workloads.WORKLOADS:
+        benchmarks.extend(stage_benchmarks(name, scale))
+    benchmarks.extend(function_benchmarks())
+    benchmarks.extend(batch_benchmarks(scale))
+
+    results = {}
+    with StubServer() as server:
+        benchmarks.extend(http_benchmarks(server))
+        for key, function, units, unit in benchmarks:
+            if only and not any(fnmatch.fnmatch(key, pattern) for pattern in only):
+                continue
+            best, median = measure(function, repeat, min_time)
+            results[key] = {
+                'best': best,
+                'median': median,
+                'throughput': units / best if best > 0 else None,
+                'unit': f"{unit}/s",
+            }
+            if progress is not None:
+                progress(key, results[key])
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': scale,
+            'repeat': repeat,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results against a baseline.
+
+    Args:
+        current: Results dictionary from run()
+        baseline: Results dictionary from an earlier run
+        tolerance: Allowed relative slowdown of the best time
+
+    Returns:
+        List of (key, baseline_best, current_best, ratio, status) tuples;
+        status is 'regression', 'faster', 'ok' or 'new'
+    """
+    old = baseline.get('results', {})
+    rows = []
+    for key, result in current['results'].items():
+        if key not in old:
+            rows.append((key, None, result['best'], None, 'new'))
+            continue
+        ratio = result['best'] / old[key]['best'] if old[key]['best'] else None
+        if ratio is None:
+            status = 'ok'
+        elif ratio > 1 + tolerance:
+            status = 'regression'
+        elif ratio < 1 / (1 + tolerance):
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((key, old[key]['best'], result['best'], ratio, status))
+    return rows
+
+
+def format_result(key, result):
+    """Format one result as a report line."""
+    throughput = result['throughput']
+    rate = f"{throughput:>14,.1f} {result['unit']}" if throughput else ""
+    return f"{key:<28} {result['best'] * 1e6:>12.2f} us {result['median'] * 1e6:>12.2f} us {rate}"
+
+
+def format_comparison(rows):
+    """Format compare() rows as a report."""
+    out = [f"{'benchmark':<28} {'baseline us':>14} {'current us':>14} {'ratio':>7}  status"]
+    for key, old, new, ratio, status in rows:
+        old_us = f"{old * 1e6:>14.2f}" if old is not None else f"{'-':>14}"
+        ratio_str = f"{ratio:>7.2f}" if ratio is not None else f"{'-':>7}"
+        out.append(f"{key:<28} {old_us} {new * 1e6:>14.2f} {ratio_str}  {status}")
+    return "\n".join(out)
+
+
+def main(argv=None):
+    """
+    Command line entry point of `amp.py bench`.
+
+    Args:
+        argv: Arguments after "bench" (defaults to sys.argv[1:])
+
+    Returns:
+        Exit status: 0, or 1 if a regression was found
+    """
+    parser = argparse.ArgumentParser(
+        prog="amp.py bench",
+        description="Benchmark the AmpScript lexer, parser, compilers and runtime"
+    )
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Workload size multiplier (default 1.0)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timed batches per benchmark (default 5)")
+    parser.add_argument("--only", action="append", metavar="PATTERN",
+                        help="Run benchmarks matching a pattern, e.g. 'parser.*' "
+                             "(repeatable)")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="Write JSON results to FILE")
+    parser.add_argument("--baseline", metavar="FILE", default=BASELINE_FILE,
+                        help="Baseline to compare against (default benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown (default 0.15)")
+    args = parser.parse_args(argv)
+
+    def progress(key, result):
+        print(format_result(key, result), flush=True)
+
+    print(f"{'benchmark':<28} {'best':>15} {'median':>15} {'throughput':>14}")
+    results = run(args.scale, args.repeat, args.only, progress=progress)
+    speedup = batch_speedup(results)
+    if speedup is not None:
+        print(f"\nVectorized batch renders: {speedup:.1f}x the per-row interpreter")
+    speedup = stage_speedup(results, 'lexer', 'scanner')
+    if speedup is not None:
+        print(f"Regex scanner: {speedup:.1f}x the PLY lexer")
+    speedup = stage_speedup(results, 'parser', 'pratt')
+    if speedup is not None:
+        print(f"Pratt parser: {speedup:.1f}x the PLY parser")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline['meta'].get('scale') != args.scale:
+        logger.warning("Baseline scale %s differs from %s", baseline['meta'].get('scale'), args.scale)
+    rows = compare(results, baseline, args.tolerance)
+    print()
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.tolerance:.0%} tolerance")
+        return 1
+    return 0
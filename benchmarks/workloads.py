@@ -0,0 +1,216 @@
+# =============================================================================
+# benchmarks/workloads.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Synthetic AmpScript workload generators.
+# =============================================================================
+"""Synthetic workloads exercising the lexer, parser, compilers and runtime.
+
+Every generator takes a size and returns source text, so the suite can be
+scaled down for quick runs and up for stable measurements.
+"""
+
+
+def statement_list(count):
+    """
+    Generate a long flat list of declarations, assignments and calls.
+
+    Args:
+        count: Number of SET statements
+
+    Returns:
+        AmpScript source
+    """
+    lines = ["%%[", "VAR @total, @name, @label"]
+    lines.append('SET @total = 0')
+    lines.append('SET @name = "subscriber"')
+    for i in range(count):
+        if i % 3 == 0:
+            lines.append(f"SET @total = @total + {i} * 2")
+        elif i % 3 == 1:
+            lines.append(f'SET @label = Concat(@name, "-{i}")')
+        else:
+            lines.append(f"SET @total = (@total - {i}) + Length(@label)")
+    lines.append("Output(Concat(@label, @total))")
+    lines.append("]%%")
+    return "\n".join(lines) + "\n"
+
+
+def nested_if(depth):
+    """
+    Generate IF/ELSEIF/ELSE blocks nested depth levels deep.
+
+    Args:
+        depth: Nesting depth
+
+    Returns:
+        AmpScript source
+    """
+    lines = ["%%[", "VAR @a, @b, @out", "SET @a = 5", "SET @b = 7"]
+    for level in range(depth):
+        lines.append(f"IF @a > {level} AND @b != {level} THEN")
+        lines.append(f"  SET @out = {level}")
+    for level in reversed(range(depth)):
+        lines.append(f"ELSEIF @a == {level + 100} THEN")
+        lines.append(f'  SET @out = "elseif {level}"')
+        lines.append("ELSE")
+        lines.append(f"  SET @out = @b - {level}")
+        lines.append("ENDIF")
+    lines.append("Output(@out)")
+    lines.append("]%%")
+    return "\n".join(lines) + "\n"
+
+
+def for_loop(iterations):
+    """
+    Generate a FOR loop doing arithmetic and string work per iteration.
+
+    Args:
+        iterations: Loop iteration count
+
+    Returns:
+        AmpScript source
+    """
+    return f"""%%[
+VAR @i, @sum, @text
+SET @sum = 0
+SET @text = ""
+FOR @i = 0 TO {iterations} DO
+  SET @sum = @sum + @i * 3
+  IF @i > 10 THEN
+    SET @text = Uppercase("row")
+  ENDIF
+NEXT @i
+Output(Concat(@text, @sum))
+]%%
+"""
+
+
+def de_loop(iterations):
+    """
+    Generate a loop issuing data extension lookups and writes.
+
+    Args:
+        iterations: Loop iteration count
+
+    Returns:
+        AmpScript source
+    """
+    return f"""%%[
+VAR @i, @email, @rows, @count
+SET @count = 0
+FOR @i = 0 TO {iterations} DO
+  SET @email = Lookup("Subscribers", "Email", "Id", @i)
+  SET @rows = LookupRows("Orders", "SubscriberId", @i)
+  SET @count = @count + RowCount(@rows)
+  UpsertData("Visits", 1, "Id", @i, "Email", @email)
+NEXT @i
+Output(@count)
+]%%
+"""
+
+
+def mixed_js(blocks):
+    """
+    Generate a server-side JavaScript file with embedded AmpScript blocks.
+
+    Args:
+        blocks: Number of JavaScript sections, each followed by an
+            AmpScript block
+
+    Returns:
+        File content
+    """
+    parts = ['<script runat="server" type="text/javascript">', "try {"]
+    for n in range(blocks):
+        parts.append(f"""
+  var label{n} = "block {n}";
+  var options{n} = {{ size: {n}, name: "opt" }};
+  // running total for block {n}
+  for (i{n} = 0; i{n} < 3; i{n}++) {{
+    if (i{n} === 1 && label{n}) {{
+      Write("odd " + label{n});
+    }} else {{
+      console.log(label{n}.length);
+    }}
+  }}
+  %%[
+  VAR @v{n}
+  SET @v{n} = {n} + 1
+  IF @v{n} > 2 THEN
+    V(Concat("v", @v{n}))
+  ENDIF
+  ]%%""")
+    parts.append("} catch (e) {")
+    parts.append("  Write(e);")
+    parts.append("}")
+    parts.append("</script>")
+    return "\n".join(parts) + "\n"
+
+
+# Template deriving personalization variables from subscriber attributes
+PERSONALIZATION = """%%[
+VAR @first, @name, @code, @length, @tier, @score
+SET @first = ProperCase(AttributeValue("FirstName"))
+SET @name = Concat(@first, " ", Uppercase(AttributeValue("LastName")))
+SET @code = Lowercase(Substring(Trim(AttributeValue("Email")), 0, 5))
+SET @length = Length(@name) * 2 + 1
+IF @length > 20 THEN
+  SET @tier = "long"
+ELSEIF @length > 15 THEN
+  SET @tier = "medium"
+ELSE
+  SET @tier = "short"
+ENDIF
+SET @score = @length / 3
+Output(Concat("Dear ", @name, " (", @tier, ", ", @score, ", ", @code, ")"))
+]%%
+"""
+
+
+def subscribers(count):
+    """
+    Generate subscriber attribute rows for PERSONALIZATION.
+
+    Args:
+        count: Number of subscribers
+
+    Returns:
+        List of attribute dictionaries
+    """
+    return [
+        {
+            'FirstName': 'ann' * (n % 5 + 1),
+            'LastName': f"lee{n}",
+            'Email': f"  S{n}@example.com ",
+        }
+        for n in range(count)
+    ]
+
+
+# Workload name -> (generator, size at scale 1.0)
+WORKLOADS = {
+    'statements': (statement_list, 2000),
+    'nested_if': (nested_if, 60),
+    'for_loop': (for_loop, 20000),
+    'de_loop': (de_loop, 500),
+    'mixed_js': (mixed_js, 100),
+}
+
+
+def generate(name, scale=1.0):
+    """
+    Generate a named workload.
+
+    Args:
+        name: Key of WORKLOADS
+        scale: Multiplier applied to the default size
+
+    Returns:
+        Source text
+    """
+    generator, size = WORKLOADS[name]
+    return generator(max(1, int(size * scale)))
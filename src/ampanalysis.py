@@ -0,0 +1,223 @@
+# =============================================================================
+# ampanalysis.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Static analysis of the data a template reads.
+# =============================================================================
+"""What a template reads, found without rendering it.
+
+analyze() walks a template tree once and collects the subscriber
+attributes it reads with AttributeValue, the data extension lookups it
+makes and the fields they match on, the content blocks it includes and the
+functions it calls. Names that are computed at render time cannot be
+known; the analysis records that they exist instead:
+
+    analysis = analyze(template.tree)
+    analysis.attribute_names()      # {'subscriberkey', ...} or None
+    analysis.data_extensions()      # {'orders': {('subscriberkey',)}}
+
+A lookup's match values are resolved to a constant or a subscriber
+attribute where possible, including through a variable that is set only
+once, e.g. SET @key = AttributeValue("SubscriberKey"). Such lookups can be
+fetched for many subscribers at once before rendering (see
+ampdatastore.Prefetcher).
+"""
+
+from . import ampfunctions
+from .ampast import walk
+
+# Lookup functions -> (position of the first match field, case-sensitive)
+LOOKUP_FUNCTIONS = {
+    'Lookup': (2, False),
+    'LookupRows': (1, False),
+    'LookupRowsCS': (1, True),
+    'LookupOrderedRows': (3, False),
+    'LookupOrderedRowsCS': (3, True),
+}
+
+# Content block functions -> lookup kind of their first argument
+CONTENT_FUNCTIONS = {
+    'ContentBlockbyId': 'id',
+    'ContentBlockbyKey': 'key',
+    'ContentBlockbyName': 'name',
+}
+
+
+class LookupCall:
+    """A data extension lookup of a template."""
+
+    def __init__(self, function, data_extension, fields, values, case_sensitive, lineno=None):
+        """
+        Initialize the call.
+
+        Args:
+            function: Canonical name of the lookup function
+            data_extension: Data extension name, or None if computed
+            fields: Tuple of match field names, or None if any is computed
+            values: Tuple of match value sources, one per field: ('constant',
+                value), ('attribute', lowercased name) or None if only known
+                at render time
+            case_sensitive: Values are matched case-sensitively
+            lineno: Template line of the call
+        """
+        self.function = function
+        self.data_extension = data_extension
+        self.fields = fields
+        self.values = values
+        self.case_sensitive = case_sensitive
+        self.lineno = lineno
+
+    def prefetchable(self):
+        """Whether the call's rows can be fetched before rendering."""
+        return (self.data_extension is not None and bool(self.fields)
+                and all(source is not None for source in self.values))
+
+    def __repr__(self):
+        return (f"LookupCall({self.function}, {self.data_extension!r}, "
+                f"{self.fields!r}, {self.values!r})")
+
+
+class Analysis:
+    """Attributes, data extensions, content blocks and functions of a template."""
+
+    def __init__(self):
+        self.attributes = set()           # lowercased AttributeValue names
+        self.dynamic_attributes = False   # an attribute name is computed
+        self.lookups = []                 # LookupCall per lookup in the template
+        self.content_blocks = set()       # (kind, ref) of included blocks
+        self.dynamic_content = False      # a block reference is computed
+        self.functions = set()            # canonical names of called functions
+
+    def attribute_names(self):
+        """
+        Get the attributes the template reads.
+
+        Returns:
+            Set of lowercased attribute names, or None if the template reads
+            attributes whose names are only known at render time (a computed
+            name, or a content block that may read any attribute)
+        """
+        if self.dynamic_attributes or self.content_blocks or self.dynamic_content:
+            return None
+        return set(self.attributes)
+
+    def data_extensions(self):
+        """
+        Get the data extensions the template looks up.
+
+        Returns:
+            Dictionary of lowercased data extension name -> set of tuples of
+            lowercased match fields; lookups with a computed data extension
+            name are left out
+        """
+        names = {}
+        for call in self.lookups:
+            if call.data_extension is None:
+                continue
+            fields = names.setdefault(call.data_extension.lower(), set())
+            if call.fields is not None:
+                fields.add(tuple(field.lower() for field in call.fields))
+        return names
+
+
+def literal(node):
+    """Get the value of a STR or INT node, or None."""
+    while node[0] == 'GROUP':
+        node = node[1]
+    if node[0] in ('STR', 'INT'):
+        return node[1]
+    return None
+
+
+def analyze(tree):
+    """
+    Analyze a template tree.
+
+    Args:
+        tree: Template AST
+
+    Returns:
+        Analysis
+    """
+    analysis = Analysis()
+    if tree is None:
+        return analysis
+    calls = []
+    assignments = {}              # lowercased variable -> list of value nodes
+    for node in walk(tree):
+        if not node:
+            continue
+        if node[0] == 'SET':
+            assignments.setdefault(node[1].lower(), []).append(node[2])
+        if node[0] != 'FUNC':
+            continue
+        # Unknown functions keep their spelling
+        name = ampfunctions.canonical_name(node[1]) or node[1]
+        args = node[2][1:]
+        analysis.functions.add(name)
+        if name == 'AttributeValue':
+            value = literal(args[0]) if args else None
+            if value is None:
+                analysis.dynamic_attributes = True
+            else:
+                analysis.attributes.add(str(value).lower())
+        elif name in CONTENT_FUNCTIONS:
+            ref = literal(args[0]) if args else None
+            if ref is None:
+                analysis.dynamic_content = True
+            else:
+                analysis.content_blocks.add((CONTENT_FUNCTIONS[name], str(ref)))
+        elif name in LOOKUP_FUNCTIONS:
+            calls.append((name, args, getattr(node, 'lineno', None)))
+
+    for name, args, lineno in calls:
+        start, case_sensitive = LOOKUP_FUNCTIONS[name]
+        data_extension = literal(args[0]) if args else None
+        pairs = args[start:]
+        fields = tuple(literal(field) for field in pairs[0::2])
+        if None in fields or not fields:
+            fields = None
+        else:
+            fields = tuple(str(field) for field in fields)
+        values = tuple(value_source(value, assignments) for value in pairs[1::2])
+        analysis.lookups.append(LookupCall(
+            name, None if data_extension is None else str(data_extension),
+            fields, values, case_sensitive, lineno
+        ))
+    return analysis
+
+
+def value_source(node, assignments):
+    """
+    Resolve a match value to a constant or a subscriber attribute.
+
+    Args:
+        node: Value expression
+        assignments: Lowercased variable -> value nodes SET in the template
+
+    Returns:
+        ('constant', value), ('attribute', lowercased name), or None if the
+        value is only known at render time
+    """
+    seen = set()
+    while True:
+        while node[0] == 'GROUP':
+            node = node[1]
+        if node[0] in ('STR', 'INT'):
+            return ('constant', node[1])
+        if (node[0] == 'FUNC' and len(node[2]) == 2
+                and ampfunctions.canonical_name(node[1]) == 'AttributeValue'):
+            name = literal(node[2][1])
+            return None if name is None else ('attribute', str(name).lower())
+        if node[0] != '@':
+            return None
+        variable = node[1].lower()
+        values = assignments.get(variable, [])
+        # Only a variable set exactly once holds the same value everywhere
+        if len(values) != 1 or variable in seen:
+            return None
+        seen.add(variable)
+        node = values[0]
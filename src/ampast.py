@@ -0,0 +1,167 @@
+# =============================================================================
+# ampast.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Helpers for walking and rewriting the AmpScript AST.
+# =============================================================================
+"""Helpers for walking and rewriting the tuple-based AmpScript AST.
+
+Nodes produced by ampyacc are plain tuples whose first item names the node
+type ('SET', 'FUNC', 'BINOP', ...). A sequence of statements is a nested
+pair of nodes, so its first item is itself a tuple. Statements, calls and
+variable references are Node instances that also record their template
+line and column; they compare equal to plain tuples.
+"""
+
+
+class Node(tuple):
+    """AST tuple remembering where in the template it was parsed."""
+
+    lineno = None
+    col = None
+
+
+def located(node, lineno, col=None):
+    """
+    Attach a source position to an AST node.
+
+    Args:
+        node: AST tuple
+        lineno: 1-based template line
+        col: 1-based column (optional)
+
+    Returns:
+        Node with the same items and the given position
+    """
+    node = Node(node)
+    node.lineno = lineno
+    node.col = col
+    return node
+
+
+def copy_position(node, source):
+    """
+    Give a rebuilt node the position of the node it replaces.
+
+    Args:
+        node: Replacement AST node
+        source: Original AST node
+
+    Returns:
+        node, positioned like source if it had a position and node has none
+    """
+    lineno = getattr(source, 'lineno', None)
+    if (lineno is None or not isinstance(node, tuple) or not node
+            or is_sequence(node) or getattr(node, 'lineno', None) is not None):
+        return node
+    return located(node, lineno, source.col)
+
+
+def is_sequence(node):
+    """Return True if node is a (head, tail) statement sequence."""
+    return isinstance(node, tuple) and bool(node) and isinstance(node[0], tuple)
+
+
+def walk(tree):
+    """
+    Yield every tuple node of the tree, parents before children.
+
+    Args:
+        tree: AST node (tuple or leaf)
+
+    Yields:
+        Tuple nodes in depth-first order
+    """
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, tuple):
+            continue
+        yield node
+        stack.extend(reversed(node))
+
+
+def statements(tree):
+    """
+    Flatten a statement sequence into a list of statements.
+
+    Args:
+        tree: Statement or nested statement sequence
+
+    Returns:
+        List of statement nodes in source order
+    """
+    result = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if is_sequence(node):
+            stack.extend(reversed(node))
+        elif node is not None:
+            result.append(node)
+    return result
+
+
+def sequence(nodes):
+    """
+    Build a nested statement sequence from a list of statements.
+
+    Args:
+        nodes: List of statement nodes
+
+    Returns:
+        Single statement, nested (head, tail) pairs, or None if empty
+    """
+    tree = None
+    for node in nodes:
+        tree = node if tree is None else (tree, node)
+    return tree
+
+
+def called_functions(tree):
+    """
+    Collect the names of all functions called in the tree.
+
+    Args:
+        tree: AST node
+
+    Returns:
+        List of function names in order of first appearance
+    """
+    names = []
+    for node in walk(tree):
+        if node and node[0] == 'FUNC' and node[1] not in names:
+            names.append(node[1])
+    return names
+
+
+def transform(tree, visit):
+    """
+    Rebuild the tree bottom-up, passing each rebuilt node to visit.
+
+    Args:
+        tree: AST node (tuple or leaf)
+        visit: Callable taking a node and returning its replacement
+
+    Returns:
+        Transformed tree
+    """
+    if not isinstance(tree, tuple):
+        return tree
+    if is_sequence(tree):
+        # Statement lists nest to the left, one level per statement: walk
+        # the spine iteratively so long templates do not exhaust the stack
+        spine = []
+        while is_sequence(tree):
+            spine.append(tree)
+            tree = tree[0]
+        result = transform(tree, visit)
+        for node in reversed(spine):
+            rebuilt = (result,) + tuple(transform(child, visit) for child in node[1:])
+            result = copy_position(visit(rebuilt), node)
+        return result
+    node = tuple(transform(child, visit) for child in tree)
+    return copy_position(visit(node), tree)
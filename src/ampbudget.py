@@ -0,0 +1,200 @@
+# =============================================================================
+# ampbudget.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Execution budgets for interpreted and compiled AmpScript.
+# =============================================================================
+"""Per-render execution budgets protecting workers from runaway templates.
+
+A Budget limits the statements executed, loop iterations, wall-clock time
+and output size of one render. The interpreter charges it directly; compiled
+Python calls tick() at every loop back-edge and library output functions
+charge the budget active on the current thread. Exceeding a limit raises
+BudgetExceeded, which callers rendering many subscribers can catch to skip
+one subscriber instead of stalling.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Active budget and output stream per thread, so concurrent renders are
+# limited and captured independently
+_state = threading.local()
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised when a render uses more than its budget allows."""
+
+    def __init__(self, kind, limit, used):
+        """
+        Initialize the error.
+
+        Args:
+            kind: Exhausted resource ('instructions', 'iterations', 'time'
+                or 'output_bytes')
+            limit: Configured limit
+            used: Amount used when the limit was hit
+        """
+        super().__init__(f"{kind} budget exceeded: used {used}, limit {limit}")
+        self.kind = kind
+        self.limit = limit
+        self.used = used
+
+    def to_dict(self):
+        """Return the error as a JSON-serializable dictionary."""
+        return {
+            'error': 'budget_exceeded',
+            'kind': self.kind,
+            'limit': self.limit,
+            'used': self.used,
+        }
+
+
+class Budget:
+    """Limits for a single render; None disables a limit."""
+
+    def __init__(self, max_instructions=None, max_iterations=None,
+                 timeout=None, max_output_bytes=None):
+        """
+        Initialize the budget.
+
+        Args:
+            max_instructions: Maximum statements executed by the interpreter
+            max_iterations: Maximum loop iterations
+            timeout: Wall-clock seconds allowed, checked at loop back-edges
+            max_output_bytes: Maximum bytes of output (UTF-8 encoded)
+        """
+        self.max_instructions = max_instructions
+        self.max_iterations = max_iterations
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.start()
+
+    def start(self):
+        """Reset the counters and start the clock for a new render."""
+        self.instructions = 0
+        self.iterations = 0
+        self.output_bytes = 0
+        self.started = time.monotonic()
+        self.deadline = None if self.timeout is None else self.started + self.timeout
+
+    def copy(self):
+        """Return a fresh budget with the same limits."""
+        return Budget(self.max_instructions, self.max_iterations,
+                      self.timeout, self.max_output_bytes)
+
+    def instruction(self):
+        """Charge one executed statement."""
+        self.instructions += 1
+        if self.max_instructions is not None and self.instructions > self.max_instructions:
+            raise BudgetExceeded('instructions', self.max_instructions, self.instructions)
+
+    def iteration(self):
+        """Charge one loop iteration and check the deadline."""
+        self.iterations += 1
+        if self.max_iterations is not None and self.iterations > self.max_iterations:
+            raise BudgetExceeded('iterations', self.max_iterations, self.iterations)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            elapsed = round(time.monotonic() - self.started, 3)
+            raise BudgetExceeded('time', self.timeout, elapsed)
+
+    def output(self, nbytes):
+        """
+        Charge output written by the render.
+
+        Args:
+            nbytes: Number of bytes written
+        """
+        self.output_bytes += nbytes
+        if self.max_output_bytes is not None and self.output_bytes > self.max_output_bytes:
+            raise BudgetExceeded('output_bytes', self.max_output_bytes, self.output_bytes)
+
+
+def current():
+    """Return the budget active on this thread, or None."""
+    return getattr(_state, 'budget', None)
+
+
+def activate(budget):
+    """
+    Start a budget and make it the active budget of this thread.
+
+    Activating the budget that is already active keeps its counters, so a
+    nested render (e.g. of a content block) is charged to the enclosing
+    render.
+
+    Args:
+        budget: Budget to activate, or None to remove limits
+
+    Returns:
+        The previously active budget
+    """
+    previous = current()
+    if budget is not None and budget is not previous:
+        budget.start()
+    _state.budget = budget
+    return previous
+
+
+@contextmanager
+def running(budget):
+    """
+    Activate a budget for the duration of a with block.
+
+    Args:
+        budget: Budget to activate, or None to run without limits
+
+    Yields:
+        The active budget
+    """
+    previous = activate(budget)
+    try:
+        yield budget
+    finally:
+        _state.budget = previous
+
+
+@contextmanager
+def capturing(stream):
+    """
+    Send output written by write() on this thread to a stream.
+
+    Args:
+        stream: File-like object receiving the render output
+
+    Yields:
+        The stream
+    """
+    previous = getattr(_state, 'stream', None)
+    _state.stream = stream
+    try:
+        yield stream
+    finally:
+        _state.stream = previous
+
+
+def tick():
+    """Charge one loop iteration to the active budget, if any."""
+    budget = getattr(_state, 'budget', None)
+    if budget is not None:
+        budget.iteration()
+
+
+def write(value, end='\n'):
+    """
+    Print a value, charging its size to the active budget.
+
+    Output goes to the stream set with capturing(), or sys.stdout.
+
+    Args:
+        value: Value to print
+        end: String appended after the value
+    """
+    budget = getattr(_state, 'budget', None)
+    if budget is not None:
+        budget.output(len((str(value) + end).encode('utf-8')))
+    print(value, end=end, file=getattr(_state, 'stream', None))
@@ -0,0 +1,540 @@
+# =============================================================================
+# ampbuild.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Incremental builds of template directories from a content dependency graph.
+# =============================================================================
+"""Compile a directory of templates, rebuilding only what changed.
+
+A build compiles every template of a source directory to Python or
+JavaScript in an output directory. Templates include content blocks with
+ContentBlockbyId, ContentBlockbyKey and ContentBlockbyName, and blocks
+include other blocks; the build records these edges, found by static
+analysis of the calls with literal arguments (see ampanalysis), as a
+dependency graph:
+
+    template -> content blocks -> nested blocks
+
+The graph and the SHA-1 digest of every file are kept in the output
+directory (MANIFEST_FILE). The next build compares the digests, follows
+the graph backwards from the changed files and recompiles only the
+templates that depend on them, directly or through other blocks:
+
+    report = Build('templates', 'build', content='content').run()
+    report.built        # ['templates/welcome.ampscript']
+
+A block reference is resolved through the content directory's index, so
+adding, renaming or re-keying a block rebuilds the files whose references
+now resolve differently. A file that includes a block by a computed name
+may include any block and is rebuilt whenever any block changes.
+
+Blocks of static text, including blocks whose only code includes other
+static blocks, are inlined at compile time where a template includes them
+by a literal reference, so the rebuilt output carries the new text.
+Blocks with code still render from the content store at render time; for
+them the rebuild only refreshes the output's dependencies.
+"""
+
+import argparse
+import collections
+import hashlib
+import json
+import logging
+import os
+
+from . import ampcompiler, ampfunctions, ampoptimizer, ampyacc
+from .ampanalysis import CONTENT_FUNCTIONS, analyze, literal
+from .ampast import statements, transform
+from .ampcontentstore import SEGMENT, DirectoryStore, parse_content
+
+logger = logging.getLogger(__name__)
+
+# Graph and digests of the last build, kept in the output directory
+MANIFEST_FILE = '.ampbuild.json'
+
+# Bumped when the manifest layout changes; older manifests rebuild all
+MANIFEST_VERSION = 2
+
+# Source files compiled as templates
+TEMPLATE_EXTENSIONS = ('.ampscript', '.amp')
+
+# Output file extension per target language
+OUTPUT_EXTENSIONS = {'py': '.py', 'js': '.js'}
+
+
+def digest(path):
+    """SHA-1 of a file's bytes."""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def parse_file(path, block=False):
+    """
+    Parse a template or content block file.
+
+    Blocks, and templates with %%[ ]%% or %%= =%% delimiters, are parsed
+    as content with the literal text written out; other templates as plain
+    AmpScript.
+
+    Args:
+        path: File path
+        block: The file is a content block
+
+    Returns:
+        AST of the file
+
+    Raises:
+        RuntimeError: If the file cannot be parsed
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if block or SEGMENT.search(text):
+        return parse_content(text, path)
+    tree = ampyacc.parse(text)
+    if not tree:
+        raise RuntimeError(f"Parsing failed: {path}")
+    return tree
+
+
+class Entry:
+    """A file of the graph and what it includes."""
+
+    def __init__(self, digest, refs=(), dynamic=False, depends=()):
+        """
+        Initialize the entry.
+
+        Args:
+            digest: SHA-1 of the file
+            refs: (kind, ref) of the content blocks the file includes
+            dynamic: The file includes a block by a computed reference
+            depends: Paths of the blocks the refs resolved to
+        """
+        self.digest = digest
+        self.refs = sorted(tuple(ref) for ref in refs)
+        self.dynamic = dynamic
+        self.depends = sorted(depends)
+
+    def to_json(self):
+        """Dictionary for the manifest."""
+        return {
+            'digest': self.digest,
+            'refs': [list(ref) for ref in self.refs],
+            'dynamic': self.dynamic,
+            'depends': self.depends,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """Entry from a manifest dictionary."""
+        return cls(data['digest'], data.get('refs', ()), data.get('dynamic', False),
+                   data.get('depends', ()))
+
+
+class BuildReport:
+    """What a build did."""
+
+    def __init__(self):
+        self.built = []           # templates compiled
+        self.skipped = []         # templates up to date
+        self.failed = []          # (template, error message)
+        self.removed = []         # outputs of deleted templates
+        self.changed = []         # files whose digest or references changed
+
+    @property
+    def ok(self):
+        """Whether every template compiled."""
+        return not self.failed
+
+    def summary(self):
+        """One line describing the build."""
+        return (f"{len(self.built)} built, {len(self.skipped)} up to date, "
+                f"{len(self.failed)} failed, {len(self.removed)} removed")
+
+
+class Build:
+    """An incremental build of a template directory."""
+
+    def __init__(self, source, output, content=None, language='py', optimize=True,
+                 extensions=TEMPLATE_EXTENSIONS):
+        """
+        Initialize the build.
+
+        Args:
+            source: Directory of templates, searched recursively
+            output: Directory of compiled templates and the manifest
+            content: Directory of content blocks (see
+                ampcontentstore.DirectoryStore), optional
+            language: Target language ("py" or "js")
+            optimize: Run the AST optimizer before code generation
+            extensions: File extensions of templates
+
+        Raises:
+            ValueError: If the language is not supported
+        """
+        if language not in OUTPUT_EXTENSIONS:
+            raise ValueError(f"Unsupported language: {language}")
+        self.source = os.path.normpath(source)
+        self.output = os.path.normpath(output)
+        self.content = os.path.normpath(content) if content else None
+        self.store = DirectoryStore(self.content) if self.content else None
+        self.language = language
+        self.optimize = optimize
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.graph = {}           # path -> Entry
+        self.outputs = {}         # template path -> output path
+        self.static = {}          # block path -> text, or None if it has code
+
+    @property
+    def manifest_path(self):
+        """Path of the manifest file."""
+        return os.path.join(self.output, MANIFEST_FILE)
+
+    def templates(self):
+        """
+        Find the templates of the source directory.
+
+        Returns:
+            Sorted list of template paths; hidden files and the output
+            directory are skipped
+        """
+        found = []
+        output = os.path.abspath(self.output)
+        for root, dirs, files in os.walk(self.source):
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.')
+                             and os.path.abspath(os.path.join(root, name)) != output)
+            for name in files:
+                if not name.startswith('.') and name.lower().endswith(self.extensions):
+                    found.append(os.path.normpath(os.path.join(root, name)))
+        return sorted(found)
+
+    def blocks(self):
+        """
+        Find the content block files.
+
+        Returns:
+            Sorted list of the block paths of the content index
+        """
+        if self.store is None:
+            return []
+        self.store.load_index()
+        return sorted({os.path.normpath(path) for path in self.store.index.values()})
+
+    def resolve(self, refs):
+        """
+        Resolve block references to files.
+
+        Args:
+            refs: (kind, ref) pairs
+
+        Returns:
+            Set of block paths; references without a block are left out
+        """
+        if self.store is None:
+            return set()
+        paths = set()
+        for kind, ref in refs:
+            path = self.store.find(kind, str(ref))
+            if path is None:
+                logger.warning(f"No content block with {kind} {ref!r}")
+            else:
+                paths.add(os.path.normpath(path))
+        return paths
+
+    def scan(self, path, file_digest, block=False):
+        """
+        Analyze the content blocks a file includes.
+
+        Args:
+            path: Template or block file
+            file_digest: SHA-1 of the file
+            block: The file is a content block
+
+        Returns:
+            Entry of the file
+
+        Raises:
+            RuntimeError: If the file cannot be parsed
+        """
+        analysis = analyze(parse_file(path, block))
+        return Entry(file_digest, analysis.content_blocks, analysis.dynamic_content,
+                     self.resolve(analysis.content_blocks))
+
+    def load(self):
+        """
+        Read the manifest of the last build.
+
+        Returns:
+            Tuple of (graph, outputs); both are empty if there is no usable
+            manifest or it was built with other options
+        """
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}, {}
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid build manifest {self.manifest_path}: {e}")
+            return {}, {}
+        if (data.get('version') != MANIFEST_VERSION or data.get('language') != self.language
+                or data.get('optimize') != self.optimize):
+            return {}, {}
+        graph = {path: Entry.from_json(entry) for path, entry in data.get('files', {}).items()}
+        return graph, dict(data.get('outputs', {}))
+
+    def save(self):
+        """Write the manifest of this build."""
+        data = {
+            'version': MANIFEST_VERSION,
+            'language': self.language,
+            'optimize': self.optimize,
+            'files': {path: entry.to_json() for path, entry in sorted(self.graph.items())},
+            'outputs': dict(sorted(self.outputs.items())),
+        }
+        os.makedirs(self.output, exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+
+    def dependents(self, changed):
+        """
+        Find the files that include changed files, directly or through
+        other blocks.
+
+        Args:
+            changed: Paths of changed files
+
+        Returns:
+            Set of the changed paths and all their dependents
+        """
+        included_by = collections.defaultdict(set)
+        dynamic = set()
+        for path, entry in self.graph.items():
+            for dependency in entry.depends:
+                included_by[dependency].add(path)
+            if entry.dynamic:
+                dynamic.add(path)
+        blocks = set(self.blocks())
+        affected = set()
+        pending = list(changed)
+        while pending:
+            path = pending.pop()
+            if path in affected:
+                continue
+            affected.add(path)
+            pending.extend(included_by[path])
+            if path in blocks or path not in self.graph:
+                # Computed references may name any block, including removed ones
+                pending.extend(dynamic)
+        return affected
+
+    def inline(self, tree, including=frozenset()):
+        """
+        Replace includes of static blocks by literal references with their text.
+
+        Args:
+            tree: Template or block AST
+            including: Blocks being inlined, whose includes are cycles left
+                to fail at render time
+
+        Returns:
+            Tree with the calls replaced by STR nodes
+        """
+        if self.store is None:
+            return tree
+
+        def visit(node):
+            if not node or node[0] != 'FUNC':
+                return node
+            kind = CONTENT_FUNCTIONS.get(ampfunctions.canonical_name(node[1]))
+            args = node[2][1:]
+            if kind is None or not args or literal(args[0]) is None:
+                return node
+            path = self.store.find(kind, str(literal(args[0])))
+            if path is None:
+                return node
+            text = self.static_text(os.path.normpath(path), including)
+            return node if text is None else ('STR', text)
+
+        return transform(tree, visit)
+
+    def static_text(self, path, including=frozenset()):
+        """
+        Get the text of a block without code, after inlining its includes.
+
+        Args:
+            path: Block path
+            including: Blocks being inlined
+
+        Returns:
+            Block text, or None if the block has code, cannot be parsed or
+            includes itself
+        """
+        if path in self.static:
+            return self.static[path]
+        if path in including:
+            return None
+        try:
+            tree = self.inline(parse_file(path, block=True), including | {path})
+        except RuntimeError:
+            text = None
+        else:
+            parts = []
+            for stmt in statements(tree):
+                if (stmt[0] != 'FUNC' or ampfunctions.canonical_name(stmt[1]) != 'Write'
+                        or len(stmt[2]) != 2 or stmt[2][1][0] != 'STR'):
+                    parts = None
+                    break
+                parts.append(stmt[2][1][1])
+            text = None if parts is None else ''.join(parts)
+        self.static[path] = text
+        return text
+
+    def output_path(self, template):
+        """Path of the compiled output of a template."""
+        relative = os.path.relpath(template, self.source)
+        return os.path.join(self.output, os.path.splitext(relative)[0]
+                            + OUTPUT_EXTENSIONS[self.language])
+
+    def compile(self, template):
+        """
+        Compile a template and write its output.
+
+        Args:
+            template: Template path
+
+        Returns:
+            Output path
+
+        Raises:
+            RuntimeError: If the template cannot be parsed or compiled
+        """
+        tree = self.inline(parse_file(template))
+        if self.optimize:
+            tree = ampoptimizer.optimize(tree)
+        if self.language == 'py':
+            code = ampcompiler.AmpCompilerToPy(tree).generate()
+        else:
+            code = ampcompiler.AmpCompilerToJs(tree).generate()
+        path = self.output_path(template)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        return path
+
+    def run(self, force=False):
+        """
+        Build the templates whose sources or included blocks changed.
+
+        Args:
+            force: Rebuild every template
+
+        Returns:
+            BuildReport
+        """
+        report = BuildReport()
+        self.static = {}
+        previous, outputs = ({}, {}) if force else self.load()
+        templates = self.templates()
+        template_set = set(templates)
+        files = templates + [path for path in self.blocks() if path not in template_set]
+
+        self.graph = {}
+        changed = set()
+        for path in files:
+            file_digest = digest(path)
+            entry = previous.get(path)
+            if entry is not None and entry.digest == file_digest:
+                # Unchanged file: only its references may resolve differently
+                depends = sorted(self.resolve(entry.refs))
+                if depends != entry.depends:
+                    changed.add(path)
+                entry.depends = depends
+                self.graph[path] = entry
+                continue
+            changed.add(path)
+            is_block = path not in template_set
+            try:
+                self.graph[path] = self.scan(path, file_digest, is_block)
+            except RuntimeError as e:
+                if not is_block:
+                    # Not recorded, so the next build scans it again
+                    report.failed.append((path, str(e)))
+                    continue
+                # Its includers still compile; it fails when rendered
+                logger.error(f"Content block {path}: {e}")
+                self.graph[path] = Entry(file_digest)
+        # Removed files change what includes them
+        changed |= set(previous) - set(self.graph)
+        report.changed = sorted(changed)
+
+        affected = self.dependents(changed)
+        failed = {path for path, _ in report.failed}
+        self.outputs = {}
+        for template in templates:
+            if template in failed:
+                continue
+            output = outputs.get(template)
+            if template not in affected and output is not None and os.path.exists(output):
+                self.outputs[template] = output
+                report.skipped.append(template)
+                continue
+            try:
+                self.outputs[template] = self.compile(template)
+                report.built.append(template)
+            except RuntimeError as e:
+                report.failed.append((template, str(e)))
+                self.graph.pop(template, None)
+
+        for template, output in outputs.items():
+            if template not in self.outputs and template not in failed and os.path.exists(output):
+                os.remove(output)
+                report.removed.append(output)
+        for template, _ in report.failed:
+            self.graph.pop(template, None)
+        self.save()
+        return report
+
+
+def main(argv=None):
+    """
+    Build a template directory: amp.py build SOURCE -o OUTPUT [options].
+
+    Args:
+        argv: Command line arguments after "build"
+
+    Returns:
+        Exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog="amp.py build",
+        description="Compile a directory of templates, rebuilding only templates "
+                    "whose sources or included content blocks changed"
+    )
+    parser.add_argument("source", help="Directory of templates")
+    parser.add_argument("-o", "--output", required=True, help="Output directory")
+    parser.add_argument("--content", metavar="DIR",
+                        help="Directory of content blocks the templates include")
+    parser.add_argument("-l", "--language", choices=sorted(OUTPUT_EXTENSIONS), default="py",
+                        help="Target language (default: py)")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="Skip the AST optimizer")
+    parser.add_argument("--force", action="store_true", help="Rebuild every template")
+    parser.add_argument("--graph", action="store_true",
+                        help="Print the dependency graph after building")
+    args = parser.parse_args(argv)
+
+    build = Build(args.source, args.output, content=args.content,
+                  language=args.language, optimize=not args.no_optimize)
+    report = build.run(force=args.force)
+    for template in report.built:
+        print(f"built {template}")
+    for template, error in report.failed:
+        print(f"failed {template}: {error}")
+    if args.graph:
+        for path, entry in sorted(build.graph.items()):
+            print(f"{path} -> {', '.join(entry.depends) or '-'}"
+                  + (" (computed references)" if entry.dynamic else ""))
+    print(report.summary())
+    return 0 if report.ok else 1
@@ -10,10 +10,135 @@
 """Compilers to translate AmpScript AST to JavaScript and Python."""
 
 import logging
-from . import ampyacc
+import re
+from . import ampyacc, ampfunctions, ampmetrics, ampruntime, ampsourcemap
+from .ampast import statements
 
 logger = logging.getLogger(__name__)
 
+# Module of the budget functions compiled Python calls
+BUDGET_MODULE = f"{__package__}.ampbudget"
+
+# Characters escaped in JavaScript string literals
+JS_ESCAPES = {'\\': '\\\\', "'": "\\'", '\n': '\\n', '\r': '\\r', '\u2028': '\\u2028', '\u2029': '\\u2029'}
+
+
+def js_string(text):
+    """
+    Quote text as a single-quoted JavaScript string literal.
+
+    Args:
+        text: String value
+
+    Returns:
+        JavaScript source of the literal
+    """
+    return "'" + ''.join(JS_ESCAPES.get(char, char) for char in text) + "'"
+
+
+# What js_report() counts, outside string literals
+JS_STRING = re.compile(r"'(?:[^'\\\n]|\\.)*'|\"(?:[^\"\\\n]|\\.)*\"")
+JS_CALL = re.compile(r"(?<![\w$])(?!(?:if|for|while|function|switch|catch|return|typeof)\b)"
+                     r"[A-Za-z_$][\w$]*\s*\(|[\])]\s*\(")
+JS_LOOKUP = re.compile(r"(?<=[\w$\])])\s*(?:\.\s*[A-Za-z_$]|\[)")
+JS_LOOP = re.compile(r"\b(?:for|while)\s*\(")
+JS_DECLARATION = re.compile(r"\bvar\b")
+
+
+def js_report(code):
+    """
+    Measure generated JavaScript: its size and the operations in its text.
+
+    The counts are static, per occurrence in the source, so they compare
+    the code generators rather than time a run.
+
+    Args:
+        code: JavaScript source
+
+    Returns:
+        Dictionary of bytes, lines, var statements, calls, property
+        lookups and loops
+    """
+    text = JS_STRING.sub("''", code)
+    return {
+        'bytes': len(code.encode('utf-8')),
+        'lines': len(code.splitlines()),
+        'declarations': len(JS_DECLARATION.findall(text)),
+        'calls': len(JS_CALL.findall(text)),
+        'lookups': len(JS_LOOKUP.findall(text)),
+        'loops': len(JS_LOOP.findall(text)),
+    }
+
+
+# Words JavaScript reserves, including ES3's, which shortened names skip
+JS_RESERVED = frozenset((
+    'abstract', 'boolean', 'break', 'byte', 'case', 'catch', 'char', 'class', 'const',
+    'continue', 'debugger', 'default', 'delete', 'do', 'double', 'else', 'enum', 'export',
+    'extends', 'false', 'final', 'finally', 'float', 'for', 'function', 'goto', 'if',
+    'implements', 'import', 'in', 'instanceof', 'int', 'interface', 'let', 'long', 'native',
+    'new', 'null', 'package', 'private', 'protected', 'public', 'return', 'short', 'static',
+    'super', 'switch', 'synchronized', 'this', 'throw', 'throws', 'transient', 'true', 'try',
+    'typeof', 'var', 'void', 'volatile', 'while', 'with', 'yield',
+))
+JS_NAME_START = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+JS_NAME_PART = JS_NAME_START + '0123456789'
+# Whitespace runs and the string literals to leave alone, for js_strip()
+JS_SPACE = re.compile(JS_STRING.pattern + r"|\s+")
+JS_WORD = re.compile(r"[\w$]")
+
+
+def js_names():
+    """
+    Generate short JavaScript identifiers: a to Z, then aa, ab, ...
+
+    Yields:
+        Identifiers in order of length, skipping reserved words
+    """
+    names = list(JS_NAME_START)
+    while True:
+        for name in names:
+            if name not in JS_RESERVED:
+                yield name
+        names = [name + part for name in names for part in JS_NAME_PART]
+
+
+def js_strip(code):
+    """
+    Remove the whitespace JavaScript does not need.
+
+    A space stays between two identifier characters and between repeated
+    + or - signs (a - -b); string literals are unchanged. The code must end
+    its statements with semicolons and hold no comments.
+
+    Args:
+        code: JavaScript source
+
+    Returns:
+        JavaScript source without the other whitespace
+    """
+    def replace(match):
+        text = match.group()
+        if not text.isspace():
+            return text
+        before = code[match.start() - 1:match.start()]
+        after = code[match.end():match.end() + 1]
+        if not before or not after:
+            return ''
+        if JS_WORD.match(before) and JS_WORD.match(after):
+            return ' '
+        if before == after and before in '+-':
+            return ' '
+        return ''
+
+    return JS_SPACE.sub(replace, code)
+
+
+def format_js_report(report):
+    """Format a js_report() result as one line."""
+    return (f"JavaScript: {report['bytes']} bytes, {report['lines']} lines, "
+            f"{report['declarations']} var statements, {report['calls']} calls, "
+            f"{report['lookups']} property lookups, {report['loops']} loops\n")
+
 
 class AmpCompiler:
     """Base class for AmpScript compilers."""
@@ -36,10 +161,11 @@ class AmpCompiler:
             tree: AST node (tuple or leaf)
         """
         if isinstance(tree, tuple):
-            if isinstance(tree[0], tuple):
-                self.walk_tree(tree[0])  # Process head
-                self.walk_tree(tree[1])  # Process tail
-            self.eval(tree)
+            # Sequences are flattened iteratively: long statement lists
+            # nest too deeply to recurse
+            for statement in statements(tree):
+                if isinstance(statement, tuple):
+                    self.eval(statement)
 
     def flatten_list(self, nested_list, flattened=None):
         """
@@ -61,6 +187,23 @@ class AmpCompiler:
                 flattened.append(item)
         return flattened
 
+    def call_target(self, element):
+        """
+        Resolve a FUNC node to its canonical name and argument nodes.
+
+        Args:
+            element: ('FUNC', name, ('ARGS', arg, ...)) node
+
+        Returns:
+            Tuple of (canonical_name, argument_nodes)
+
+        Raises:
+            RuntimeError: If the function is unknown or the argument count
+                does not match its arity
+        """
+        args = element[2][1:]
+        return ampfunctions.check_call(element[1], len(args)), args
+
     def convert_value_to_string(self, value_tuple):
         """
         Convert an AST value tuple to a string representation.
@@ -89,17 +232,124 @@ class AmpCompiler:
 class AmpCompilerToPy(AmpCompiler):
     """Compiler to translate AmpScript AST to Python code."""
 
-    def __init__(self, tree):
-        """Initialize Python compiler with AST."""
+    def __init__(self, tree, budget=None, profile=False, source_map=False, standalone=False):
+        """
+        Initialize Python compiler with AST.
+
+        Args:
+            tree: Parsed AST from ampyacc.parse()
+            budget: ampbudget.Budget whose limits the generated script
+                enforces (optional). Loops always check the budget active
+                when the script runs.
+            profile: Instrument statements and library calls for the
+                profiler active when the script runs (ampprofiler)
+            source_map: Mark each statement with a "# line L:C" comment
+                and build self.source_map from the marks
+            standalone: Prepend a runtime holding only the library
+                functions the script calls (ampruntime) instead of
+                importing the src package
+
+        Raises:
+            ValueError: If standalone is combined with profile
+        """
+        if standalone and profile:
+            raise ValueError("Profiled scripts need the src package; they cannot be standalone")
         super().__init__(tree)
         self.indent_level = 0
         self.indent_str = "    "  # 4 spaces
+        self.budget = budget
+        self.profile = profile
+        self.loops = 0
+        self.source_map = None
+        self.emit_source_map = source_map
+        self.standalone = standalone
 
     def compile(self):
         """Compile the AST to Python code and print output."""
-        self.output += "from src import ampfunctions\n"
-        self.walk_tree(self.tree)
-        print(self.output)
+        print(self.generate())
+
+    def generate(self):
+        """
+        Compile the AST to Python code.
+
+        Returns:
+            Python source of the compiled script
+        """
+        with ampmetrics.timer('stage_seconds', stage='compile_py'):
+            self.output = ""
+            self.functions = []
+            self.walk_tree(self.tree)
+            # Resolve each called function once, then call through local aliases
+            if self.standalone:
+                names = [(BUDGET_MODULE, 'tick')] if self.loops else []
+                if self.budget is not None:
+                    names += [(BUDGET_MODULE, 'activate'), (BUDGET_MODULE, 'Budget')]
+                header = ampruntime.python_runtime(self.functions, names)
+            else:
+                header = "from src import ampfunctions\n"
+            if self.profile:
+                header += "from src import ampprofiler\n"
+                header += "amp_line = ampprofiler.line\n"
+            for name in self.functions:
+                if self.profile:
+                    header += f"{self.alias(name)} = ampprofiler.wrap('{name}', ampfunctions.{name})\n"
+                else:
+                    header += f"{self.alias(name)} = ampfunctions.{name}\n"
+            if (self.loops or self.budget is not None) and not self.standalone:
+                header += "from src import ampbudget\n"
+            if self.budget is not None:
+                header += (
+                    f"{self.budget_ref('activate')}({self.budget_ref('Budget')}("
+                    f"max_instructions={self.budget.max_instructions!r}, "
+                    f"max_iterations={self.budget.max_iterations!r}, "
+                    f"timeout={self.budget.timeout!r}, "
+                    f"max_output_bytes={self.budget.max_output_bytes!r}))\n"
+                )
+            if self.loops:
+                header += f"amp_tick = {self.budget_ref('tick')}\n"
+            self.output = header + self.output
+            if self.emit_source_map:
+                self.source_map = ampsourcemap.SourceMap.from_code(self.output)
+            return self.output
+
+    def line_mark(self, element):
+        """
+        Get the marks emitted before a statement.
+
+        Args:
+            element: Statement node
+
+        Returns:
+            Source map comment and/or amp_line() call lines, or "" when
+            neither is enabled or the statement has no template position
+        """
+        lineno = getattr(element, 'lineno', None)
+        if lineno is None:
+            return ""
+        mark = ""
+        if self.emit_source_map:
+            mark += ampsourcemap.marker(lineno, element.col) + "\n"
+        if self.profile:
+            mark += f"amp_line({lineno}, {self.indent_level})\n"
+        return mark
+
+    def alias(self, name):
+        """Get the local alias a compiled script uses for a function."""
+        return f"amp_{name}"
+
+    def budget_ref(self, name):
+        """Get the expression a compiled script uses for an ampbudget function."""
+        if self.standalone:
+            return ampruntime.hoisted_name(BUDGET_MODULE, name)
+        return f"ampbudget.{name}"
+
+    def call_str(self, element):
+        """Convert a FUNC node to a direct call through its alias."""
+        name, args = self.call_target(element)
+        if name not in self.functions:
+            self.functions.append(name)
+        arg_str = ", ".join(self.convert_value_to_string(arg) for arg in args)
+        return f"{self.alias(name)}({arg_str})"
 
     def get_indent(self):
         """Get current indentation string."""
@@ -110,11 +360,15 @@ class AmpCompilerToPy(AmpCompiler):
         if value_tuple[0] == 'INT':
             return f"{value_tuple[1]}"
         elif value_tuple[0] == 'STR':
-            return f"'{value_tuple[1]}'"
+            return repr(value_tuple[1])
         elif value_tuple[0] == '@':
             return f"{value_tuple[1]}_amp"
+        elif value_tuple[0] == 'BOOL':
+            return str(bool(value_tuple[1]))
         elif value_tuple[0] in ('BINOP', 'RELOP', 'UNARY', 'GROUP'):
             return self.releval(value_tuple)
+        elif value_tuple[0] == 'FUNC':
+            return self.call_str(value_tuple)
         return ""
 
     def releval(self, element):
@@ -151,23 +405,35 @@ class AmpCompilerToPy(AmpCompiler):
             elif op == 'INT':
                 return str(element[1])
             elif op == 'STR':
-                return f"'{element[1]}'"
+                return repr(element[1])
+            elif op in ('FUNC', 'BOOL'):
+                return self.convert_value_to_string(element)
         return ""
 
     def loop(self, element, output_str=""):
         """Process loop body statements for Python."""
+        if element is None:
+            # Body emptied by the optimizer
+            return f"{self.get_indent()}pass\n"
         if isinstance(element[0], tuple):
-            output_str += self.loop(element[0])
-            output_str += self.loop(element[1])
+            # Iterate: long statement lists nest too deeply to recurse
+            for statement in statements(element):
+                output_str += self.loop(statement)
         else:
             op = element[0]
             if op == 'ELSEIF':
+                if len(element) == 4:
+                    # Chained: ('ELSEIF', previous_chain, condition, statements)
+                    output_str += self.loop(element[1])
+                    element = element[1:]
                 output_str += f"{self.get_indent()}elif {self.releval(element[1])}: \n"
                 self.indent_level += 1
                 output_str += self.loop(element[2])
                 self.indent_level -= 1
             elif op == 'FUNC':
-                output_str = f"{self.get_indent()}getattr(ampfunctions,'{element[1]}')({self.convert_value_to_string(element[2])})\n"
+                for mark in self.line_mark(element).splitlines():
+                    output_str += f"{self.get_indent()}{mark}\n"
+                output_str += f"{self.get_indent()}{self.call_str(element)}\n"
             else:
                 # Handle any other statement type (IF, SET, VAR, FOR, etc.)
                 saved_output = self.output
@@ -189,6 +455,7 @@ class AmpCompilerToPy(AmpCompiler):
     def eval(self, element):
         """Evaluate an AST element to Python code."""
         op = element[0]
+        self.output += self.line_mark(element)
 
         if op == 'JSBLOCK':
             # JavaScript block wrapper
@@ -299,41 +566,235 @@ class AmpCompilerToPy(AmpCompiler):
             stepval = element[5]
             direction = element[3]
 
+            self.loops += 1
             self.output += f"{loopvar}_amp = {self.convert_value_to_string(initval)}\n"
             self.output += f"while {loopvar}_amp < {self.convert_value_to_string(finval)}: \n"
             self.indent_level += 1
             self.output += f"{self.loop(stepval)}"
+            if self.emit_source_map and getattr(element, 'lineno', None) is not None:
+                # The increment belongs to the FOR, not the last body statement
+                self.output += f"{self.get_indent()}{ampsourcemap.marker(element.lineno, element.col)}\n"
             self.output += f"{self.get_indent()}{loopvar}_amp += 1\n" if direction == 'TO' else f"{self.get_indent()}{loopvar}_amp -= 1\n"
+            # Back-edge: charge the iteration and check the deadline
+            self.output += f"{self.get_indent()}amp_tick()\n"
             self.indent_level -= 1
         elif op == '@':
             self.output += f"{element[1]}_amp = None\n"
         elif op == 'FUNC':
-            func_call = f"getattr(ampfunctions,'{element[1]}')({self.convert_value_to_string(element[2])})\n"
-            self.output += func_call
+            self.output += f"{self.call_str(element)}\n"
 
 
 class AmpCompilerToJs(AmpCompiler):
-    """Compiler to translate AmpScript AST to JavaScript code."""
+    """Compiler to translate AmpScript AST to JavaScript code.
 
-    def __init__(self, tree):
-        """Initialize JavaScript compiler with AST."""
+    The script runs in a function, so its variables are locals. They are
+    declared in one var statement together with an alias per called library
+    function, which saves a property lookup per call. FOR loops become
+    native for loops whose bound is evaluated once. Output statements push
+    onto an array that is written with one Write call at the end, unless an
+    output function's value is used in an expression.
+
+    With minify, the locals get the shortest free names, string constants
+    used often enough to pay for it and ampfunctions itself are declared
+    once in the var statement, and the whitespace is stripped.
+    """
+
+    # Library functions whose statements are buffered -> text they write
+    # after their argument, as ampruntime.JS_FUNCTIONS does
+    OUTPUT_FUNCTIONS = {'Output': '\n', 'OutputLine': '\n', 'V': '\n', 'Write': ''}
+
+    def __init__(self, tree, standalone=False, minify=False):
+        """
+        Initialize JavaScript compiler with AST.
+
+        Args:
+            tree: Parsed AST from ampyacc.parse()
+            standalone: Prepend a bundle defining ampfunctions with only the
+                library functions the script calls (ampruntime)
+            minify: Generate size-optimized code
+        """
         super().__init__(tree)
+        self.standalone = standalone
+        self.minify = minify
+        self.functions = []
+        self.variables = []
+        self.names = {}           # local -> shortened name
+        self.name_source = None
+        self.strings = {}         # string constant -> uses
+        self.shared = []          # string constants declared once
+        self.string_names = {}
+        self.indent_level = 1
+        self.bounds = 0
+        self.buffered = True
+        self.direct_output = False
 
     def compile(self):
         """Compile the AST to JavaScript code and print output."""
+        print(self.generate())
+
+    def generate(self):
+        """
+        Compile the AST to JavaScript code.
+
+        Returns:
+            JavaScript source of the compiled script
+        """
+        with ampmetrics.timer('stage_seconds', stage='compile_js'):
+            self.buffered = True
+            self.direct_output = False
+            self.shared = []
+            body = self.body()
+            if self.direct_output:
+                # Buffered text would be written after the direct output
+                self.buffered = False
+                body = self.body()
+            if self.minify:
+                self.shared = self.shared_strings()
+                if self.shared:
+                    body = self.body()
+            buffer = self.buffered and 'Write' in self.functions
+            declarations = [f"{self.alias(name)} = {self.library()}.{name}"
+                            for name in self.functions]
+            if self.minify and self.functions:
+                declarations.insert(0, f"{self.library()} = ampfunctions")
+            if buffer:
+                declarations.append(f"{self.local('amp_out')} = []")
+            declarations.extend(f"{self.string_names[text]} = {js_string(text)}"
+                                for text in self.shared)
+            declarations.extend(self.local(name) for name in self.variables)
+            self.output = "(function () {\n"
+            if declarations:
+                self.output += f"\tvar {', '.join(declarations)};\n"
+            self.output += body
+            if buffer:
+                self.output += (f"\t{self.alias('Write')}({self.library()}, "
+                                f"{self.local('amp_out')}.join(''));\n")
+            self.output += "})();\n"
+            if self.standalone:
+                self.output = ampruntime.js_runtime(self.functions) + self.output
+            if self.minify:
+                self.output = js_strip(self.output)
+            return self.output
+
+    def body(self):
+        """Compile the statements of the script, collecting names to declare."""
+        self.output = ""
+        self.functions = []
+        self.variables = []
+        self.indent_level = 1
+        self.bounds = 0
+        self.names = {}
+        self.name_source = js_names()
+        self.strings = {}
+        # Shared strings take the first, shortest names
+        self.string_names = {text: next(self.name_source) for text in self.shared}
         self.walk_tree(self.tree)
-        print(self.output)
+        return self.output
+
+    def shared_strings(self):
+        """
+        Choose the string constants to declare once, by the bytes saved.
+
+        Returns:
+            String constants of the last pass worth a name, most used first
+        """
+        names = js_names()
+        name = len(next(names))
+        shared = []
+        for text, uses in sorted(self.strings.items(), key=lambda item: -item[1]):
+            literal = len(js_string(text))
+            # Each use saves the literal less the name; the declaration
+            # costs ",name=literal"
+            if uses * (literal - name) > name + literal + 2:
+                shared.append(text)
+                name = len(next(names))
+        return shared
+
+    def get_indent(self):
+        """Get the indentation of the current block."""
+        return "\t" * self.indent_level
+
+    def declare(self, name):
+        """
+        Record a variable for the var statement.
+
+        Returns:
+            JavaScript name of the variable
+        """
+        if name not in self.variables:
+            self.variables.append(name)
+        return self.local(name)
+
+    def local(self, name):
+        """Get the JavaScript name of a local: itself, or a short one when minifying."""
+        if not self.minify:
+            return name
+        short = self.names.get(name)
+        if short is None:
+            short = self.names[name] = next(self.name_source)
+        return short
+
+    def literal(self, text):
+        """Get the JavaScript expression of a string constant."""
+        self.strings[text] = self.strings.get(text, 0) + 1
+        name = self.string_names.get(text)
+        return name if name is not None else js_string(text)
+
+    def use(self, name):
+        """Record a called library function for the aliases and the bundle."""
+        if name not in self.functions:
+            self.functions.append(name)
+
+    def library(self):
+        """Name of the library object: ampfunctions, or a short local alias of it."""
+        return self.local('ampfunctions')
+
+    def alias(self, name):
+        """Name of the local alias of a library function."""
+        return self.local(f"amp_{name}")
 
     def convert_value_to_string(self, value_tuple):
         """Convert value tuple to JavaScript expression string."""
         if value_tuple[0] == 'INT':
             return f"{value_tuple[1]}"
         elif value_tuple[0] == 'STR':
-            return f"'{value_tuple[1]}'"
+            return self.literal(value_tuple[1])
         elif value_tuple[0] == '@':
-            return f"{value_tuple[1]}"
+            return self.declare(value_tuple[1])
+        elif value_tuple[0] == 'BOOL':
+            return 'true' if value_tuple[1] else 'false'
+        elif value_tuple[0] in ('BINOP', 'RELOP', 'UNARY', 'GROUP'):
+            return self.releval(value_tuple)
+        elif value_tuple[0] == 'FUNC':
+            return self.call_str(value_tuple)
         return ""
 
+    def call_str(self, element):
+        """Convert a FUNC node to a call of its library function alias."""
+        name, args = self.call_target(element)
+        if name in self.OUTPUT_FUNCTIONS:
+            self.direct_output = True
+        self.use(name)
+        arg_str = "".join(f", {self.convert_value_to_string(arg)}" for arg in args)
+        return f"{self.alias(name)}({self.library()}{arg_str})"
+
+    def call_statement(self, element):
+        """Convert a FUNC statement, buffering what output functions write."""
+        name, args = self.call_target(element)
+        if not self.buffered or name not in self.OUTPUT_FUNCTIONS:
+            return f"{self.call_str(element)};"
+        self.use('Write')
+        arg, suffix = args[0], self.OUTPUT_FUNCTIONS[name]
+        if arg[0] == 'STR':
+            value = self.literal(arg[1] + suffix)
+        elif not suffix:
+            value = f"String({self.convert_value_to_string(arg)})"
+        elif arg[0] in ('INT', '@', 'FUNC', 'GROUP'):
+            value = f"{self.convert_value_to_string(arg)} + {self.literal(suffix)}"
+        else:
+            value = f"({self.convert_value_to_string(arg)}) + {self.literal(suffix)}"
+        return f"{self.local('amp_out')}.push({value});"
+
     def releval(self, element):
         """Evaluate relational expression to JavaScript code."""
         if isinstance(element[0], tuple):
@@ -352,88 +813,91 @@ class AmpCompilerToJs(AmpCompiler):
                 else:
                     sign = element[1].lower()
                 return f"{self.releval(element[2])} {sign} {self.releval(element[3])}"
+            elif op == 'UNARY':
+                return f"{element[1]}{self.releval(element[2])}"
             elif op == '@':
-                return f"{element[1]}"
+                return self.declare(element[1])
+            elif op in ('INT', 'STR', 'BOOL', 'FUNC'):
+                return self.convert_value_to_string(element)
         return ""
 
     def loop(self, element, output_str=""):
-        """Process loop body statements for JavaScript."""
-        if isinstance(element[0], tuple):
-            output_str += self.loop(element[0], output_str)
-            output_str += self.loop(element[1], output_str)
-        else:
-            op = element[0]
-            if op == 'ELSEIF':
-                output_str += f"else if ({self.releval(element[1])}) {{ \n"
-                output_str += f"\t{self.eval(element[2])} \n"
-                output_str += f"}} \n"
-            elif op == 'FUNC':
-                output_str = f"ampfunctions['{element[1]}'](ampfunctions,{self.convert_value_to_string(element[2])});\n"
+        """Compile the statements of a block, one indentation level deeper."""
+        if element is None:
+            # Body emptied by the optimizer
+            return output_str
+        saved_output = self.output
+        self.output = ""
+        self.indent_level += 1
+        # Iterate: long statement lists nest too deeply to recurse
+        for statement in statements(element):
+            if isinstance(statement, tuple):
+                self.eval(statement)
+        self.indent_level -= 1
+        output_str += self.output
+        self.output = saved_output
         return output_str
 
+    def elseifs(self, chain):
+        """Flatten an ELSEIF chain to (condition, statements) pairs in order."""
+        branches = []
+        while len(chain) == 4:
+            # Chained: ('ELSEIF', previous_chain, condition, statements)
+            branches.append((chain[2], chain[3]))
+            chain = chain[1]
+        branches.append((chain[1], chain[2]))
+        return branches[::-1]
+
     def eval(self, element):
         """Evaluate an AST element to JavaScript code."""
         op = element[0]
+        indent = self.get_indent()
 
         if op == 'VAR':
-            if isinstance(element[1], tuple):
-                flattened = self.flatten_list(element[1])
-                for var in flattened:
-                    if var != '@':
-                        self.output += f"var {var};\n"
-            else:
-                self.output += f"var {element[2]};\n"
+            # Declared in the var statement at the top of the script
+            for var in self.flatten_list(element[1]):
+                if var != '@':
+                    self.declare(var)
         elif op == 'SET':
-            self.output += f"{element[1]} = {self.convert_value_to_string(element[2])};\n"
-        elif op == 'IF':
-            self.output += f"if ({self.releval(element[1])}) {{ \n"
-            self.output += f"{self.loop(element[2])} \n"
-            self.output += f"}} \n"
-        elif op == 'IFELSE':
-            self.output += f"if ({self.releval(element[1])}) {{ \n"
-            self.output += f"{self.loop(element[2])} \n"
-            self.output += f"}} \n"
-            # Check if element[3] is an ELSEIFCHAIN or just statements
-            if isinstance(element[3], tuple) and element[3][0] == 'ELSEIFCHAIN':
-                self.output += f"{self.loop(element[3][1])}"  # Process elseif chain
-                self.output += f"else {{ \n"
-                self.output += f"{self.loop(element[3][2])} \n"  # Final else block
-                self.output += f"}}\n"
-            else:
-                self.output += f"else {{ \n"
-                self.output += f"{self.loop(element[3])} \n"
-                self.output += f"}}\n"
-        elif op == 'ELSEIF':
-            # Handle chained ELSEIFs
-            if len(element) == 3:
-                # Single ELSEIF: ('ELSEIF', condition, statements)
-                self.output += f"else if ({self.releval(element[1])}) {{ \n"
-                self.output += f"{self.loop(element[2])} \n"
-                self.output += f"}} \n"
-            else:
-                # Chained: ('ELSEIF', previous_chain, condition, statements)
-                self.output += f"{self.loop(element[1])}"  # Process previous chain
-                self.output += f"else if ({self.releval(element[2])}) {{ \n"
-                self.output += f"{self.loop(element[3])} \n"
-                self.output += f"}} \n"
+            name = self.declare(element[1])
+            self.output += f"{indent}{name} = {self.convert_value_to_string(element[2])};\n"
+        elif op in ('IF', 'IFELSE'):
+            self.output += f"{indent}if ({self.releval(element[1])}) {{\n"
+            self.output += self.loop(element[2])
+            if op == 'IFELSE':
+                other = element[3]
+                if isinstance(other, tuple) and other[0] == 'ELSEIFCHAIN':
+                    for condition, body in self.elseifs(other[1]):
+                        self.output += f"{indent}}} else if ({self.releval(condition)}) {{\n"
+                        self.output += self.loop(body)
+                    other = other[2]
+                self.output += f"{indent}}} else {{\n"
+                self.output += self.loop(other)
+            self.output += f"{indent}}}\n"
         elif op == 'FOR':
-            loopvar = element[1]
+            loopvar = self.declare(element[1])
             initval = element[2]
             finval = element[4]
             stepval = element[5]
             direction = element[3]
 
-            self.output += f"{loopvar} = {self.convert_value_to_string(initval)}\n"
-            self.output += f"while ({loopvar} < {self.convert_value_to_string(finval)}) {{ \n"
-            self.output += f"\t{self.loop(stepval)}"
-
-            if direction == 'TO':
-                self.output += f"\t{loopvar} += 1; \n"
-            elif direction == 'DOWNTO':
-                self.output += f"\t{loopvar} -= 1; \n"
-            self.output += f"}} \n"
+            # The bound is evaluated once, as the interpreter does
+            start = f"{loopvar} = {self.convert_value_to_string(initval)}"
+            if finval[0] == 'INT':
+                bound = self.convert_value_to_string(finval)
+            else:
+                self.bounds += 1
+                bound = self.declare(f"amp_end{self.bounds}")
+                start += f", {bound} = {self.convert_value_to_string(finval)}"
+            if direction == 'DOWNTO':
+                test, step = f"{loopvar} > {bound}", f"{loopvar}--"
+            else:
+                test, step = f"{loopvar} < {bound}", f"{loopvar}++"
+            self.output += f"{indent}for ({start}; {test}; {step}) {{\n"
+            self.output += self.loop(stepval)
+            self.output += f"{indent}}}\n"
         elif op == '@':
-            self.output += f"{element[1]} = '';\n"
+            name = self.declare(element[1])
+            self.output += f"{indent}{name} = '';\n"
         elif op == 'FUNC':
-            func_call = f"ampfunctions['{element[1]}'](ampfunctions,{self.convert_value_to_string(element[2])});\n"
-            self.output += func_call
+            self.output += f"{indent}{self.call_statement(element)}\n"
@@ -0,0 +1,438 @@
+# =============================================================================
+# ampcontentstore.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Local content block stores behind the ContentBlockby* functions.
+# =============================================================================
+"""Content blocks from a directory or an SQLite database.
+
+A content block is text with embedded AmpScript: code blocks %%[ ... ]%%
+and inline expressions %%= ... =%%; everything else is output verbatim.
+Blocks are looked up by id, key or name (keys and names ignore letter
+case), parsed and compiled once, and kept in a fragment cache until their
+source changes. ContentBlockbyId, ContentBlockbyKey and ContentBlockbyName
+render blocks inline with the subscriber context and budget of the calling
+render; a block has its own variables. A block that includes itself,
+directly or through other blocks, raises a RuntimeError.
+
+    ampcontentstore.configure(DirectoryStore('content'))
+    Template('%%[ Output(ContentBlockbyKey("header")) ]%%').render()
+
+A DirectoryStore serves the files of one directory: the key and name of a
+block default to its file name without extension, and an optional
+index.json overrides them and assigns ids:
+
+    {"header.html": {"id": 101, "key": "hdr", "name": "Header"}}
+
+An SQLiteStore reads the content_blocks table (see SCHEMA).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from . import ampbudget, ampcontext, ampfunctions, ampyacc
+from .ampast import located, sequence, statements
+from .amptemplate import Template
+
+logger = logging.getLogger(__name__)
+
+# Lookup kinds of the ContentBlockby* functions
+KINDS = ('id', 'key', 'name')
+
+INDEX_FILE = 'index.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content_blocks (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE COLLATE NOCASE,
+    name TEXT COLLATE NOCASE,
+    content TEXT NOT NULL DEFAULT ''
+)
+"""
+
+# Code blocks and inline expressions of a content block
+SEGMENT = re.compile(r'%%\[(.*?)\]%%|%%=(.*?)=%%', re.DOTALL)
+
+# Blocks being rendered on this thread, outermost first, for cycle detection
+_state = threading.local()
+
+
+def parse_content(text, name='<content>'):
+    """
+    Parse a content block into one AmpScript tree.
+
+    Literal text becomes Write() calls, inline expressions Write() calls
+    of the expression; code blocks are parsed in place. Line numbers refer
+    to the block text.
+
+    Args:
+        text: Content block text
+        name: Block name for error messages
+
+    Returns:
+        AST of the block
+
+    Raises:
+        RuntimeError: If a code block or expression cannot be parsed
+    """
+    nodes = []
+    lineno = 1
+    end = 0
+    for match in SEGMENT.finditer(text):
+        if match.start() > end:
+            nodes.append(write(('STR', text[end:match.start()]), lineno))
+        lineno += text.count('\n', end, match.start())
+        # Leading newlines keep the parser's line numbers in the block
+        padding = '\n' * (lineno - 1)
+        if match.group(1) is not None:
+            tree = ampyacc.parse(padding + '%%[' + match.group(1) + ']%%')
+        else:
+            tree = ampyacc.parse(padding + '%%=' + match.group(2) + '=%%')
+            if (tree and tree[0] == 'FUNC' and len(tree[2]) == 2
+                    and ampfunctions.canonical_name(tree[1]) == 'V'):
+                # %%=v(@x)=%% outputs @x in place; V() itself prints a line
+                tree = tree[2][1]
+            tree = tree and write(tree, lineno)
+        if not tree:
+            raise RuntimeError(f"Parsing failed: {name} line {lineno}")
+        nodes.extend(statements(tree))
+        lineno += match.group(0).count('\n')
+        end = match.end()
+    if end < len(text) or not nodes:
+        nodes.append(write(('STR', text[end:]), lineno))
+    return sequence(nodes)
+
+
+def write(value, lineno):
+    """Build a positioned Write() statement of an expression node."""
+    return located(('FUNC', 'Write', ('ARGS', value)), lineno)
+
+
+class CachedBlock:
+    """Compiled template of a block and the source version it came from."""
+
+    def __init__(self, stamp, digest, template):
+        """
+        Initialize the entry.
+
+        Args:
+            stamp: Cheap version of the source, e.g. (mtime, size)
+            digest: SHA-1 of the source text
+            template: Template compiled from the source
+        """
+        self.stamp = stamp
+        self.digest = digest
+        self.template = template
+
+
+class ContentStore:
+    """Content store with a compiled-fragment cache; subclasses implement
+    find(), stamp() and read()."""
+
+    def __init__(self, compiled=False):
+        """
+        Initialize the store.
+
+        Args:
+            compiled: Render blocks as compiled Python instead of with the
+                interpreter
+        """
+        self.compiled = compiled
+        self.cache = {}           # block identity -> CachedBlock
+        self.lock = threading.Lock()
+        self.compilations = 0
+
+    def find(self, kind, ref):
+        """
+        Find a block.
+
+        Args:
+            kind: 'id', 'key' or 'name'
+            ref: Id, key or name of the block
+
+        Returns:
+            Hashable identity of the block, or None if there is none
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def stamp(self, identity):
+        """
+        Get a cheap version of a block's source.
+
+        Returns:
+            Value that changes whenever the source may have changed, or
+            None to compare content digests on every lookup
+        """
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def read(self, identity):
+        """Get the text of a block."""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def template(self, kind, ref):
+        """
+        Get the compiled template of a block.
+
+        The cached template is reused while the block's stamp, or failing
+        that its content digest, is unchanged.
+
+        Args:
+            kind: 'id', 'key' or 'name'
+            ref: Id, key or name of the block
+
+        Returns:
+            Template, or None if there is no such block
+
+        Raises:
+            RuntimeError: If the block cannot be parsed
+        """
+        identity = self.find(kind, str(ref))
+        if identity is None:
+            return None
+        try:
+            stamp = self.stamp(identity)
+            entry = self.cache.get(identity)
+            if entry is not None and stamp is not None and entry.stamp == stamp:
+                return entry.template
+            text = self.read(identity)
+        except (OSError, KeyError):
+            # Removed since the lookup
+            return None
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        if entry is None or entry.digest != digest:
+            name = f"{kind}:{ref}"
+            template = Template(text, name=name, compiled=self.compiled,
+                                tree=parse_content(text, name))
+            entry = CachedBlock(stamp, digest, template)
+            self.compilations += 1
+        else:
+            entry = CachedBlock(stamp, digest, entry.template)
+        with self.lock:
+            self.cache[identity] = entry
+        return entry.template
+
+    def render(self, kind, ref):
+        """
+        Render a block inside the current render.
+
+        The block sees the caller's subscriber context and is charged to
+        its budget.
+
+        Args:
+            kind: 'id', 'key' or 'name'
+            ref: Id, key or name of the block
+
+        Returns:
+            Rendered block, or None if there is no such block
+
+        Raises:
+            RuntimeError: If the block includes itself or fails to render
+        """
+        template = self.template(kind, ref)
+        if template is None:
+            return None
+        stack = getattr(_state, 'stack', None)
+        if stack is None:
+            stack = _state.stack = []
+        if template in stack:
+            names = [t.name for t in stack[stack.index(template):]] + [template.name]
+            raise RuntimeError(f"Content block cycle: {' -> '.join(names)}")
+        stack.append(template)
+        try:
+            return template.render(budget=ampbudget.current(), context=ampcontext.current())
+        finally:
+            stack.pop()
+
+    def clear(self):
+        """Forget all compiled blocks."""
+        with self.lock:
+            self.cache.clear()
+
+
+class DirectoryStore(ContentStore):
+    """Content blocks stored as the files of a directory."""
+
+    def __init__(self, root, compiled=False):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding the blocks and an optional index.json
+            compiled: Render blocks as compiled Python
+        """
+        super().__init__(compiled)
+        self.root = root
+        self.index = {}
+        self.index_stamp = None
+
+    def directory_stamp(self):
+        """Version of the directory listing and of its index file."""
+        index = os.path.join(self.root, INDEX_FILE)
+        return (
+            os.stat(self.root).st_mtime_ns,
+            os.stat(index).st_mtime_ns if os.path.exists(index) else None,
+        )
+
+    def load_index(self):
+        """
+        Rebuild the (kind, lowercased ref) -> path index if files changed.
+
+        Raises:
+            RuntimeError: If index.json is not valid JSON
+        """
+        stamp = self.directory_stamp()
+        if stamp == self.index_stamp:
+            return
+        entries = {}
+        index_path = os.path.join(self.root, INDEX_FILE)
+        if stamp[1] is not None:
+            try:
+                with open(index_path, encoding='utf-8') as f:
+                    entries = json.load(f)
+            except ValueError as e:
+                raise RuntimeError(f"Invalid content index {index_path}: {e}") from e
+        index = {}
+        for filename in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, filename)
+            if filename == INDEX_FILE or filename.startswith('.') or not os.path.isfile(path):
+                continue
+            stem = os.path.splitext(filename)[0]
+            entry = entries.get(filename, {})
+            for kind, default in (('id', None), ('key', stem), ('name', stem)):
+                ref = entry.get(kind, default)
+                if ref is not None:
+                    index[(kind, str(ref).lower())] = path
+        self.index = index
+        self.index_stamp = stamp
+
+    def find(self, kind, ref):
+        """Find the file of a block."""
+        self.load_index()
+        return self.index.get((kind, ref.lower()))
+
+    def stamp(self, identity):
+        """Modification time and size of a block file."""
+        stat = os.stat(identity)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def read(self, identity):
+        """Read a block file."""
+        with open(identity, encoding='utf-8') as f:
+            return f.read()
+
+
+class SQLiteStore(ContentStore):
+    """Content blocks stored in the content_blocks table of an SQLite file."""
+
+    def __init__(self, path, compiled=False):
+        """
+        Initialize the store, creating the table if needed.
+
+        Args:
+            path: SQLite database file
+            compiled: Render blocks as compiled Python
+        """
+        super().__init__(compiled)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(SCHEMA)
+        self.db_lock = threading.Lock()
+
+    def query(self, sql, parameters):
+        """Run a query and return the first row, or None."""
+        with self.db_lock:
+            return self.connection.execute(sql, parameters).fetchone()
+
+    def add(self, key, content, name=None, id=None):
+        """
+        Insert or replace a block.
+
+        Args:
+            key: Block key
+            content: Block text
+            name: Block name (defaults to the key)
+            id: Block id (optional, assigned by SQLite)
+
+        Returns:
+            Id of the block
+        """
+        with self.db_lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT OR REPLACE INTO content_blocks (id, key, name, content) "
+                "VALUES (?, ?, ?, ?)",
+                (id, key, name if name is not None else key, content),
+            )
+        return cursor.lastrowid
+
+    def find(self, kind, ref):
+        """Find the row id of a block."""
+        if kind == 'id':
+            if not ref.isdigit():
+                return None
+            row = self.query("SELECT id FROM content_blocks WHERE id = ?", (int(ref),))
+        else:
+            row = self.query(f"SELECT id FROM content_blocks WHERE {kind} = ?", (ref,))
+        return row[0] if row else None
+
+    def stamp(self, identity):
+        """Rows carry no modification time; compare digests instead."""
+        return None
+
+    def read(self, identity):
+        """Read the text of a block."""
+        row = self.query("SELECT content FROM content_blocks WHERE id = ?", (identity,))
+        if row is None:
+            raise KeyError(identity)
+        return row[0]
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+
+# Store used by the ContentBlockby* functions; None until configured
+_store = None
+
+
+def store():
+    """Return the configured store, or None."""
+    return _store
+
+
+def configure(content_store):
+    """
+    Set the store used by the ContentBlockby* functions.
+
+    Args:
+        content_store: ContentStore, or None to disable content blocks
+
+    Returns:
+        The store
+    """
+    global _store
+    _store = content_store
+    return _store
+
+
+def open_store(path, compiled=False):
+    """
+    Open a directory or SQLite store by path.
+
+    Args:
+        path: Directory, or SQLite database file
+        compiled: Render blocks as compiled Python
+
+    Returns:
+        DirectoryStore or SQLiteStore
+    """
+    if os.path.isdir(path):
+        return DirectoryStore(path, compiled)
+    return SQLiteStore(path, compiled)
@@ -0,0 +1,187 @@
+# =============================================================================
+# ampcontext.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Per-render subscriber and request context for AmpScript library functions.
+# =============================================================================
+"""Subscriber attributes and HTTP request of the render on the current thread.
+
+Template.render() activates the context passed by the caller; library
+functions such as AttributeValue read it with attribute(). A page server
+binds the request being answered with handling(), for QueryParameter,
+RequestParameter and Redirect. Like budgets, both are kept per thread, so
+renders running concurrently on worker threads each see their own
+subscriber and request.
+"""
+
+import threading
+import urllib.parse
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+_state = threading.local()
+
+
+def current():
+    """Return the attribute mapping active on this thread, or None."""
+    return getattr(_state, 'attributes', None)
+
+
+@contextmanager
+def rendering(attributes):
+    """
+    Activate subscriber attributes for the duration of a with block.
+
+    Args:
+        attributes: Mapping of attribute name -> value, or None
+
+    Yields:
+        The active attributes
+    """
+    previous = current()
+    _state.attributes = attributes
+    try:
+        yield attributes
+    finally:
+        _state.attributes = previous
+
+
+def attribute(name, default=None):
+    """
+    Look up an attribute of the current subscriber.
+
+    Attribute names are case-insensitive, as in AmpScript; an exact match
+    is tried first.
+
+    Args:
+        name: Attribute name
+        default: Value returned if there is no such attribute
+
+    Returns:
+        Attribute value or default
+    """
+    return lookup(current(), name, default)
+
+
+def lookup(attributes, name, default=None):
+    """
+    Look up an attribute in a mapping of subscriber attributes.
+
+    Args:
+        attributes: Attribute mapping, or None
+        name: Attribute name in any letter case
+        default: Value returned if there is no such attribute
+
+    Returns:
+        Attribute value or default
+    """
+    if not attributes:
+        return default
+    if isinstance(attributes, AttributeView):
+        return attributes.get(name, default)
+    try:
+        return attributes[name]
+    except KeyError:
+        pass
+    lowered = name.lower()
+    for key, value in attributes.items():
+        if key.lower() == lowered:
+            return value
+    return default
+
+
+class AttributeView(Mapping):
+    """Read-only subscriber attributes with case-insensitive names.
+
+    Subclasses set self.columns (attribute names in order) and self.names
+    (lowercased name -> position) and implement decode(), which is only
+    called for attributes that are read.
+    """
+
+    __slots__ = ()
+
+    def decode(self, position):
+        """Get the value of the attribute at a position."""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    def __getitem__(self, name):
+        """Get an attribute value, ignoring the letter case of the name."""
+        position = self.names.get(name.lower())
+        if position is None:
+            raise KeyError(name)
+        return self.decode(position)
+
+    def __iter__(self):
+        """Iterate over the attribute names."""
+        return iter(self.columns)
+
+    def __len__(self):
+        """Get the number of attributes."""
+        return len(self.columns)
+
+
+class Request:
+    """HTTP request a page is rendered for, and the redirect it asked for."""
+
+    def __init__(self, method='GET', path='/', query='', form='', headers=None):
+        """
+        Initialize the request.
+
+        Args:
+            method: HTTP method
+            path: Request path without the query string
+            query: Raw query string
+            form: Raw application/x-www-form-urlencoded body
+            headers: Mapping of request headers (optional)
+        """
+        self.method = method
+        self.path = path
+        self.query = lowercase_keys(urllib.parse.parse_qs(query, keep_blank_values=True))
+        self.form = lowercase_keys(urllib.parse.parse_qs(form, keep_blank_values=True))
+        self.headers = headers or {}
+        self.redirect = None      # (url, status) once the page redirects
+
+    def query_parameter(self, name, default=''):
+        """Get the first value of a query string parameter, ignoring case."""
+        values = self.query.get(name.lower())
+        return values[0] if values else default
+
+    def parameter(self, name, default=''):
+        """Get a query string or form parameter, ignoring case."""
+        values = self.query.get(name.lower()) or self.form.get(name.lower())
+        return values[0] if values else default
+
+
+def lowercase_keys(parameters):
+    """Merge parsed parameters under lowercased names, keeping value order."""
+    merged = {}
+    for name, values in parameters.items():
+        merged.setdefault(name.lower(), []).extend(values)
+    return merged
+
+
+def current_request():
+    """Return the request bound to this thread, or None."""
+    return getattr(_state, 'request', None)
+
+
+@contextmanager
+def handling(request):
+    """
+    Bind a request to this thread for the duration of a with block.
+
+    Args:
+        request: Request being answered, or None
+
+    Yields:
+        The request
+    """
+    previous = current_request()
+    _state.request = request
+    try:
+        yield request
+    finally:
+        _state.request = previous
@@ -0,0 +1,429 @@
+# =============================================================================
+# ampdatastore.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Local data extension store and batch prefetching for the Lookup functions.
+# =============================================================================
+"""Data extensions from an SQLite database, with batch prefetching.
+
+Each data extension is a table of the database; table and field names
+ignore letter case. Lookup, LookupRows, LookupOrderedRows and their
+case-sensitive variants query the configured store:
+
+    ampdatastore.configure(DataExtensionStore('data.db'))
+
+Rendering a template for many subscribers makes one query per lookup per
+subscriber. A Prefetcher plans the lookups whose data extension, match
+fields and match values are known before rendering (see ampanalysis) and,
+for each chunk of subscribers, fetches the rows of all of them with one
+query per lookup. Lookups during the renders then find their rows in the
+store's prefetch cache; a lookup the plan did not cover still queries:
+
+    prefetcher = Prefetcher(template.tree, chunk_size=500)
+    outputs = await render_batch(template, prefetcher.rows(source.rows()))
+
+Prefetched rows are kept for the current and the previous chunk, so
+chunk_size should be at least the render concurrency, and are dropped
+when the subscribers run out; renders still in flight then query. Adding
+rows to a data extension drops its prefetched rows.
+"""
+
+import collections
+import itertools
+import logging
+import sqlite3
+import threading
+
+from . import ampanalysis, ampcontext
+
+logger = logging.getLogger(__name__)
+
+# Subscribers whose lookups are prefetched together
+DEFAULT_CHUNK_SIZE = 500
+
+# Bound parameters per query; SQLite allows 999 in older releases
+MAX_PARAMETERS = 900
+
+# Translates ASCII capitals only, as COLLATE NOCASE does
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def quote_identifier(name):
+    """Quote an SQLite table or column name."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def fold(value, case_sensitive):
+    """Normalize a match value for comparison; None matches empty fields."""
+    value = '' if value is None else str(value)
+    return value if case_sensitive else value.translate(ASCII_LOWER)
+
+
+def ordered(rows, order_by, count=0):
+    """
+    Sort rows by an order clause and keep the first rows.
+
+    Args:
+        rows: List of row dictionaries
+        order_by: Comma-separated fields, each optionally followed by ASC or
+            DESC, e.g. "Total DESC, Name"
+        count: Number of rows to keep; 0 keeps all
+
+    Returns:
+        Sorted list of rows
+    """
+    rows = list(rows)
+    keys = [term.split() for term in str(order_by or '').split(',') if term.strip()]
+    # Stable sorts from the last key to the first give a multi-key order
+    for words in reversed(keys):
+        field = words[0]
+        descending = len(words) > 1 and words[1].lower() == 'desc'
+        rows.sort(key=lambda row: sort_key(field_value(row, field)), reverse=descending)
+    count = int(count or 0)
+    return rows[:count] if count > 0 else rows
+
+
+def sort_key(value):
+    """Order numbers numerically, before text."""
+    try:
+        return (0, float(value), '')
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value).lower())
+
+
+def field_value(row, name, default=''):
+    """Get a field of a row dictionary, ignoring the letter case of the name."""
+    if name in row:
+        return row[name]
+    lowered = name.lower()
+    for key, value in row.items():
+        if key.lower() == lowered:
+            return value
+    return default
+
+
+class DataExtensionStore:
+    """Data extensions stored as the tables of an SQLite file."""
+
+    def __init__(self, path):
+        """
+        Open the database.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.db_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.tables = {}          # lowercased name -> (table, columns)
+        self.prefetched = {}      # lookup key -> list of rows
+        self.queries = 0
+        self.hits = 0
+
+    def execute(self, sql, parameters=()):
+        """Run a query and return all rows, counting it."""
+        with self.db_lock:
+            self.queries += 1
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def table(self, name):
+        """
+        Resolve a data extension to its table.
+
+        Args:
+            name: Data extension name in any letter case
+
+        Returns:
+            Tuple of (table name, list of column names)
+
+        Raises:
+            RuntimeError: If there is no such data extension
+        """
+        entry = self.tables.get(name.lower())
+        if entry is not None:
+            return entry
+        with self.db_lock:
+            found = self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE",
+                (name,)
+            ).fetchone()
+            if found is None:
+                raise RuntimeError(f"No data extension {name}")
+            columns = [row[0] for row in self.connection.execute(
+                "SELECT name FROM pragma_table_info(?)", (found[0],)
+            )]
+        entry = self.tables[name.lower()] = (found[0], columns)
+        return entry
+
+    def insert(self, name, rows):
+        """
+        Add rows to a data extension, creating it from the fields of the
+        first row if needed.
+
+        Args:
+            name: Data extension name
+            rows: List of dictionaries of field -> value
+
+        Returns:
+            Number of rows added
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        with self.db_lock, self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote_identifier(name)} ("
+                + ', '.join(f"{quote_identifier(field)} TEXT" for field in rows[0]) + ")"
+            )
+            for row in rows:
+                fields = list(row)
+                self.connection.execute(
+                    f"INSERT INTO {quote_identifier(name)} "
+                    f"({', '.join(quote_identifier(field) for field in fields)}) "
+                    f"VALUES ({', '.join('?' * len(fields))})",
+                    [row[field] for field in fields]
+                )
+        self.tables.pop(name.lower(), None)
+        # Prefetched rows of the data extension no longer match the table
+        with self.lock:
+            self.prefetched = {key: cached for key, cached in self.prefetched.items()
+                               if key[0] != name.lower()}
+        return len(rows)
+
+    def select(self, name, conditions, parameters, case_sensitive):
+        """Select rows of a data extension as dictionaries; NULL becomes ''."""
+        table, columns = self.table(name)
+        collation = '' if case_sensitive else ' COLLATE NOCASE'
+        where = ' AND '.join(f"{quote_identifier(self.column(name, field))}{collation}{test}"
+                             for field, test in conditions)
+        result = self.execute(
+            f"SELECT * FROM {quote_identifier(table)} WHERE {where} ORDER BY rowid",
+            parameters
+        )
+        return [dict(zip(columns, ('' if value is None else value for value in row)))
+                for row in result]
+
+    def column(self, name, field):
+        """
+        Resolve a field of a data extension to its column name.
+
+        Raises:
+            RuntimeError: If the data extension has no such field
+        """
+        lowered = str(field).lower()
+        for column in self.table(name)[1]:
+            if column.lower() == lowered:
+                return column
+        raise RuntimeError(f"No field {field} in data extension {name}")
+
+    def lookup(self, name, fields, values, case_sensitive=False):
+        """
+        Get the rows of a data extension matching all fields.
+
+        Rows prefetched for the same match values are returned without a
+        query.
+
+        Args:
+            name: Data extension name
+            fields: Match field names
+            values: Match values, one per field
+            case_sensitive: Match values case-sensitively
+
+        Returns:
+            List of row dictionaries, in table order
+
+        Raises:
+            RuntimeError: If the data extension or a field does not exist
+        """
+        key = lookup_key(name, fields, values, case_sensitive)
+        rows = self.prefetched.get(key)
+        if rows is not None:
+            with self.lock:
+                self.hits += 1
+            return list(rows)
+        return self.select(name, [(field, ' = ?') for field in fields],
+                           ['' if value is None else str(value) for value in values],
+                           case_sensitive)
+
+    def prefetch(self, name, fields, value_sets, case_sensitive=False):
+        """
+        Fetch the rows of many lookups on the same fields at once.
+
+        Each query joins the data extension with the requested match value
+        tuples, so SQLite compares values exactly as in lookup(), including
+        the type affinity of numeric columns. Rows are grouped by the tuple
+        they matched and cached per lookup, including lookups without rows.
+
+        Args:
+            name: Data extension name
+            fields: Match field names
+            value_sets: Iterable of match value tuples, one value per field
+            case_sensitive: Match values case-sensitively
+
+        Returns:
+            Set of the cache keys filled
+        """
+        value_sets = sorted({tuple(fold(value, True) for value in values)
+                             for values in value_sets})
+        if not value_sets:
+            return set()
+        table, columns = self.table(name)
+        collation = '' if case_sensitive else ' COLLATE NOCASE'
+        on = ' AND '.join(
+            f"t.{quote_identifier(self.column(name, field))}{collation} = v.column{position}"
+            for position, field in enumerate(fields, 1)
+        )
+        width = len(fields)
+        per_query = max(1, MAX_PARAMETERS // width)
+        groups = collections.defaultdict(list)
+        for start in range(0, len(value_sets), per_query):
+            batch = value_sets[start:start + per_query]
+            requested = ', '.join(f"({', '.join('?' * width)})" for _ in batch)
+            result = self.execute(
+                f"SELECT v.*, t.* FROM (VALUES {requested}) AS v "
+                f"JOIN {quote_identifier(table)} AS t ON {on} ORDER BY t.rowid",
+                [value for values in batch for value in values]
+            )
+            for row in result:
+                groups[tuple(row[:width])].append(
+                    dict(zip(columns, ('' if value is None else value for value in row[width:])))
+                )
+        filled = {lookup_key(name, fields, values, case_sensitive): groups.get(values, [])
+                  for values in value_sets}
+        with self.lock:
+            self.prefetched.update(filled)
+        return set(filled)
+
+    def evict(self, keys):
+        """Drop prefetched rows."""
+        with self.lock:
+            for key in keys:
+                self.prefetched.pop(key, None)
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+
+def lookup_key(name, fields, values, case_sensitive):
+    """Build the prefetch cache key of a lookup."""
+    return (
+        name.lower(),
+        tuple(str(field).lower() for field in fields),
+        tuple(fold(value, case_sensitive) for value in values),
+        case_sensitive,
+    )
+
+
+class Prefetcher:
+    """Fetches the data extension rows of chunks of subscribers before they
+    are rendered."""
+
+    def __init__(self, tree, data_store=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Plan the lookups of a template.
+
+        Args:
+            tree: Template AST
+            data_store: DataExtensionStore (defaults to the configured store)
+            chunk_size: Subscribers prefetched per query
+
+        Raises:
+            ValueError: If chunk_size is less than 1
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        self.store = data_store if data_store is not None else store()
+        self.chunk_size = chunk_size
+        self.plans = {}           # (name, fields, case_sensitive) -> list of value sources
+        for call in ampanalysis.analyze(tree).lookups:
+            if not call.prefetchable():
+                logger.debug(f"{call.function} line {call.lineno} is not prefetchable")
+                continue
+            plan = (call.data_extension, call.fields, call.case_sensitive)
+            sources = self.plans.setdefault(plan, [])
+            if call.values not in sources:
+                sources.append(call.values)
+        self.kept = collections.deque(maxlen=2)    # cache keys of recent chunks
+
+    def prefetch(self, subscribers):
+        """
+        Prefetch the rows of one chunk of subscribers.
+
+        Args:
+            subscribers: List of subscriber attribute mappings
+        """
+        if self.store is None or not self.plans:
+            return
+        filled = set()
+        for (name, fields, case_sensitive), sources in self.plans.items():
+            value_sets = {
+                tuple(resolve(source, attributes) for source in values)
+                for values in sources for attributes in subscribers
+            }
+            filled |= self.store.prefetch(name, fields, value_sets, case_sensitive)
+        if len(self.kept) == self.kept.maxlen:
+            stale = self.kept[0] - self.kept[1] - filled
+            self.store.evict(stale)
+        self.kept.append(filled)
+
+    def rows(self, subscribers):
+        """
+        Pass subscribers through, prefetching each chunk as it is reached.
+
+        The prefetched rows are dropped once the subscribers run out.
+
+        Args:
+            subscribers: Iterable of subscriber attribute mappings
+
+        Yields:
+            The subscribers, in order
+        """
+        iterator = iter(subscribers)
+        try:
+            while True:
+                chunk = list(itertools.islice(iterator, self.chunk_size))
+                if not chunk:
+                    return
+                self.prefetch(chunk)
+                yield from chunk
+        finally:
+            # A long-lived store must not keep serving the last chunks
+            while self.kept:
+                self.store.evict(self.kept.popleft())
+
+
+def resolve(source, attributes):
+    """Get the value of a ('constant', value) or ('attribute', name) source."""
+    kind, value = source
+    if kind == 'constant':
+        return value
+    return ampcontext.lookup(attributes, value)
+
+
+# Store used by the Lookup functions; None until configured
+_store = None
+
+
+def store():
+    """Return the configured store, or None."""
+    return _store
+
+
+def configure(data_store):
+    """
+    Set the store used by the Lookup functions.
+
+    Args:
+        data_store: DataExtensionStore, or None to disable lookups
+
+    Returns:
+        The store
+    """
+    global _store
+    _store = data_store
+    return _store
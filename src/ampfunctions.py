@@ -1,1654 +0,0 @@
-# =============================================================================
-# ampfunctions.py
-#
-# Copyright (C) 2023 B. Wang
-# All rights reserved.
-# Licensed under the BSD open source license agreement
-#
-# AmpScript function library implementation.
-# Reference: https://ampscript.guide/
-# =============================================================================
-"""AmpScript function library with implementations for common operations."""
-
-import re
-import json
-import random
-import urllib.parse
-import uuid
-import logging
-from time import gmtime, strftime
-from datetime import datetime, timedelta
-from base64 import b64encode, b64decode
-
-from cryptography.hazmat.primitives import hashes, padding
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-
-from lib import utils
-
-logger = logging.getLogger(__name__)
-
-
-class func:
-    """AmpScript function library."""
-
-    def __init__(self):
-        """Initialize function library with locale and timezone settings."""
-        self.locale = 'en_US'
-        self.timezone = 'Pacific/Auckland'
-        self.systemtimezone = 'America/Indianapolis'
-
-    # =========================================================================
-    # Object and Invoke Functions
-    # =========================================================================
-
-    def AddObjectArrayItem(self, obj, array_name, item):
-        """
-        Add item to object array property.
-        
-        Args:
-            obj: Object dictionary
-            array_name: Array property name
-            item: Item to add
-        """
-        if isinstance(obj, dict):
-            if array_name not in obj:
-                obj[array_name] = []
-            if isinstance(obj[array_name], list):
-                obj[array_name].append(item)
-
-    def CreateObject(self, object_type):
-        """
-        Create a new API object.
-        
-        Args:
-            object_type: Type of object to create (e.g., 'Email', 'Subscriber')
-            
-        Returns:
-            Empty dictionary representing the object
-        """
-        return {'ObjectType': object_type}
-
-    def InvokeCreate(self):
-        """Invoke create operation."""
-        pass
-
-    def InvokeDelete(self):
-        """Invoke delete operation."""
-        pass
-
-    def InvokeExecute(self):
-        """Invoke execute operation."""
-        pass
-
-    def InvokePerform(self):
-        """Invoke perform operation."""
-        pass
-
-    def InvokeRetrieve(self):
-        """Invoke retrieve operation."""
-        pass
-
-    def InvokeUpdate(self):
-        """Invoke update operation."""
-        pass
-
-    def RaiseError(self, error_msg):
-        """
-        Raise an error with a message.
-
-        Args:
-            error_msg: Error message string
-
-        Raises:
-            RuntimeError: Always raises with provided message
-        """
-        raise RuntimeError(error_msg)
-
-    def SetObjectProperty(self, obj, property_name, property_value):
-        """
-        Set object property.
-        
-        Args:
-            obj: Object dictionary
-            property_name: Property name
-            property_value: Property value
-        """
-        if isinstance(obj, dict):
-            obj[property_name] = property_value
-
-    # =========================================================================
-    # Content Functions
-    # =========================================================================
-
-    def Contacts(self):
-        """Access contacts."""
-        pass
-
-    def UpsertContact(self):
-        """Upsert contact."""
-        pass
-
-    def Content(self):
-        """Access content."""
-        pass
-
-    def AttachFile(self):
-        """Attach file."""
-        pass
-
-    def BarCodeURL(self, barcode_value, barcode_type='Code128'):
-        """
-        Generate barcode URL.
-        
-        Args:
-            barcode_value: Barcode value
-            barcode_type: Barcode type (default: Code128)
-            
-        Returns:
-            URL to barcode image
-        """
-        encoded = urllib.parse.quote_plus(str(barcode_value))
-        return f"https://example.com/barcode?type={barcode_type}&value={encoded}"
-
-    def BeginImpressionRegion(self):
-        """Begin impression region."""
-        pass
-
-    def BuildOptionList(self):
-        """Build option list."""
-        pass
-
-    def BuildRowSetFromString(self, rows_string, delimiter):
-        """
-        Build row set from delimited string.
-        
-        Args:
-            rows_string: String with delimited rows
-            delimiter: Row delimiter
-            
-        Returns:
-            List of row strings
-        """
-        return rows_string.split(delimiter)
-
-    def BuildRowSetFromXML(self):
-        """Build row set from XML."""
-        pass
-
-    def ContentArea(self):
-        """Access content area."""
-        pass
-
-    def ContentAreaByName(self):
-        """Get content area by name."""
-        pass
-
-    def ContentBlockbyId(self, content_id):
-        """
-        Get content block by ID.
-        
-        Args:
-            content_id: Content block ID
-            
-        Returns:
-            Content block or empty string
-        """
-        logger.warning(f"ContentBlockbyId {content_id} called but not implemented")
-        return ''
-
-    def ContentBlockbyKey(self, content_key):
-        """
-        Get content block by key.
-        
-        Args:
-            content_key: Content block key
-            
-        Returns:
-            Content block or empty string
-        """
-        logger.warning(f"ContentBlockbyKey {content_key} called but not implemented")
-        return ''
-
-    def ContentBlockbyName(self, content_name):
-        """
-        Get content block by name.
-        
-        Args:
-            content_name: Content block name
-            
-        Returns:
-            Content block or empty string
-        """
-        logger.warning(f"ContentBlockbyName {content_name} called but not implemented")
-        return ''
-
-    def ContentImagebyID(self):
-        """Get content image by ID."""
-        pass
-
-    def ContentImagebyKey(self):
-        """Get content image by key."""
-        pass
-
-    def CreateSmsConversation(self):
-        """Create SMS conversation."""
-        pass
-
-    def EndImpressionRegion(self):
-        """End impression region."""
-        pass
-
-    def EndSmsConversation(self):
-        """End SMS conversation."""
-        pass
-
-    def GetPortfolioItem(self):
-        """Get portfolio item."""
-        pass
-
-    def _messageContext(self):
-        """Access message context (internal)."""
-        pass
-
-    def SetSmsConversationNextKeyword(self):
-        """Set SMS conversation next keyword."""
-        pass
-
-    def TransformXML(self):
-        """Transform XML."""
-        pass
-
-    def TreatAsContent(self, content_value):
-        """
-        Treat string value as content (suppress HTML encoding).
-        
-        Args:
-            content_value: Content to treat as raw
-            
-        Returns:
-            Content value unchanged
-        """
-        return content_value
-
-    def TreatAsContentArea(self):
-        """Treat as content area."""
-        pass
-
-    def WAT(self):
-        """Web analytics tracking."""
-        pass
-
-    def WATP(self):
-        """Web analytics tracking (path)."""
-        pass
-
-    # =========================================================================
-    # Data Extension Functions
-    # =========================================================================
-
-    def ClaimRow(self):
-        """Claim a row from data extension."""
-        pass
-
-    def ClaimRowValue(self):
-        """Claim row value."""
-        pass
-
-    def DataExtensionRowCount(self, data_extension):
-        """
-        Get data extension row count.
-        
-        Args:
-            data_extension: Name of data extension
-            
-        Returns:
-            Number of rows in data extension
-        """
-        logger.warning(f"DataExtensionRowCount on {data_extension} called but not implemented")
-        return 0
-
-    def DeleteData(self, data_extension, *match_field_value_pairs):
-        """
-        Delete data from data extension.
-        
-        Args:
-            data_extension: Name of data extension
-            *match_field_value_pairs: Alternating field names and values to match
-            
-        Returns:
-            Number of rows deleted
-        """
-        logger.warning(f"DeleteData from {data_extension} called but not implemented")
-        return 0
-
-    def DeleteDE(self, data_extension, *match_field_value_pairs):
-        """
-        Delete from data extension (alias for DeleteData).
-        
-        Args:
-            data_extension: Name of data extension
-            *match_field_value_pairs: Alternating field names and values to match
-            
-        Returns:
-            Number of rows deleted
-        """
-        return self.DeleteData(data_extension, *match_field_value_pairs)
-
-    def ExecuteFilter(self):
-        """Execute filter."""
-        pass
-
-    def ExecuteFilterOrderedRows(self):
-        """Execute filter with ordered rows."""
-        pass
-
-    def Field(self, row, field_name, default=''):
-        """
-        Get field value from row.
-        
-        Args:
-            row: Dictionary representing a row
-            field_name: Name of field
-            default: Default value if field not found
-            
-        Returns:
-            Field value or default
-        """
-        if isinstance(row, dict):
-            return row.get(field_name, default)
-        return default
-
-    def InsertData(self, data_extension, *field_value_pairs):
-        """
-        Insert data into data extension.
-        
-        Args:
-            data_extension: Name of data extension
-            *field_value_pairs: Alternating field names and values
-            
-        Returns:
-            Number of rows inserted (1 on success, 0 on failure)
-        """
-        logger.warning(f"InsertData to {data_extension} called but not implemented")
-        return 0
-
-    def InsertDE(self, data_extension, *field_value_pairs):
-        """
-        Insert into data extension (alias for InsertData).
-        
-        Args:
-            data_extension: Name of data extension
-            *field_value_pairs: Alternating field names and values
-            
-        Returns:
-            Number of rows inserted
-        """
-        return self.InsertData(data_extension, *field_value_pairs)
-
-    def Lookup(self, data_extension, return_field, match_field, match_value):
-        """
-        Lookup single value from data extension.
-        
-        Args:
-            data_extension: Name of data extension
-            return_field: Field to return
-            match_field: Field to match
-            match_value: Value to match
-            
-        Returns:
-            Value from return_field or None if not found
-        """
-        # Stub implementation - would need actual DE connection
-        logger.warning(f"Lookup called on {data_extension} but not implemented")
-        return None
-
-    def LookupOrderedRows(self, data_extension, order_count, *args):
-        """
-        Lookup rows with ordering.
-        
-        Args:
-            data_extension: Name of data extension
-            order_count: Number of order-by fields
-            *args: Order fields and directions, followed by match field-value pairs
-            
-        Returns:
-            List of matching rows as dictionaries
-        """
-        logger.warning(f"LookupOrderedRows on {data_extension} called but not implemented")
-        return []
-
-    def LookupOrderedRowsCS(self, data_extension, order_count, *args):
-        """
-        Lookup rows with ordering (case-sensitive).
-        
-        Args:
-            data_extension: Name of data extension
-            order_count: Number of order-by fields
-            *args: Order fields and directions, followed by match field-value pairs
-            
-        Returns:
-            List of matching rows as dictionaries
-        """
-        logger.warning(f"LookupOrderedRowsCS on {data_extension} called but not implemented")
-        return []
-
-    def LookupRows(self, data_extension, *match_pairs):
-        """
-        Lookup multiple rows from data extension.
-        
-        Args:
-            data_extension: Name of data extension
-            *match_pairs: Alternating field names and values (field1, value1, field2, value2, ...)
-            
-        Returns:
-            List of matching rows as dictionaries
-        """
-        # Stub implementation
-        logger.warning(f"LookupRows called on {data_extension} but not implemented")
-        return []
-
-    def LookupRowsCS(self, data_extension, *match_pairs):
-        """
-        Lookup multiple rows from data extension (case-sensitive).
-        
-        Args:
-            data_extension: Name of data extension
-            *match_pairs: Alternating field names and values (field1, value1, field2, value2, ...)
-            
-        Returns:
-            List of matching rows as dictionaries
-        """
-        # Stub implementation
-        logger.warning(f"LookupRowsCS called on {data_extension} but not implemented")
-        return []
-
-    def Row(self, rowset, row_number):
-        """
-        Get specific row from rowset.
-        
-        Args:
-            rowset: Rowset from LookupRows or similar
-            row_number: Row index (1-based)
-            
-        Returns:
-            Dictionary representing the row or None
-        """
-        if isinstance(rowset, list) and 0 < row_number <= len(rowset):
-            return rowset[row_number - 1]
-        return None
-
-    def RowCount(self, rowset):
-        """
-        Get row count from rowset.
-        
-        Args:
-            rowset: Rowset from LookupRows or similar
-            
-        Returns:
-            Number of rows
-        """
-        if isinstance(rowset, list):
-            return len(rowset)
-        return 0
-
-    def UpdateData(self, data_extension, match_count, *field_value_pairs):
-        """
-        Update data in data extension.
-        
-        Args:
-            data_extension: Name of data extension
-            match_count: Number of match fields
-            *field_value_pairs: Alternating field names and values (first match_count pairs are match fields)
-            
-        Returns:
-            Number of rows updated
-        """
-        logger.warning(f"UpdateData on {data_extension} called but not implemented")
-        return 0
-
-    def UpdateDE(self, data_extension, match_count, *field_value_pairs):
-        """
-        Update data extension (alias for UpdateData).
-        
-        Args:
-            data_extension: Name of data extension
-            match_count: Number of match fields
-            *field_value_pairs: Alternating field names and values
-            
-        Returns:
-            Number of rows updated
-        """
-        return self.UpdateData(data_extension, match_count, *field_value_pairs)
-
-    def UpsertData(self, data_extension, match_count, *field_value_pairs):
-        """
-        Upsert (insert or update) data in data extension.
-        
-        Args:
-            data_extension: Name of data extension
-            match_count: Number of match fields
-            *field_value_pairs: Alternating field names and values
-            
-        Returns:
-            Number of rows affected
-        """
-        logger.warning(f"UpsertData on {data_extension} called but not implemented")
-        return 0
-
-    def UpsertDE(self, data_extension, match_count, *field_value_pairs):
-        """
-        Upsert into data extension (alias for UpsertData).
-        
-        Args:
-            data_extension: Name of data extension
-            match_count: Number of match fields
-            *field_value_pairs: Alternating field names and values
-            
-        Returns:
-            Number of rows affected
-        """
-        return self.UpsertData(data_extension, match_count, *field_value_pairs)
-
-    # =========================================================================
-    # Date/Time Functions
-    # =========================================================================
-
-    def DateAdd(self, date_str, add_value, interval):
-        """
-        Add time interval to a date.
-
-        Args:
-            date_str: Date string
-            add_value: Amount to add
-            interval: Time interval ('Y', 'M', 'D', 'H', 'MI')
-
-        Returns:
-            New datetime after addition
-        """
-        date = datetime.strptime(date_str, '%m/%d/%y H:MI')
-
-        if interval == 'Y':
-            delta = timedelta(days=365 * add_value)
-        elif interval == 'M':
-            delta = timedelta(days=30 * add_value)
-        elif interval == 'D':
-            delta = timedelta(days=add_value)
-        elif interval == 'H':
-            delta = timedelta(hours=add_value)
-        elif interval == 'MI':
-            delta = timedelta(minutes=add_value)
-        else:
-            delta = timedelta(0)
-
-        return date + delta
-
-    def DateDiff(self, date1, date2, interval='D'):
-        """
-        Calculate difference between dates.
-        
-        Args:
-            date1: First date (string or datetime)
-            date2: Second date (string or datetime)
-            interval: Time interval ('Y', 'M', 'D', 'H', 'MI', 'S')
-            
-        Returns:
-            Integer difference in specified interval
-        """
-        if isinstance(date1, str):
-            date1 = datetime.strptime(date1, '%m/%d/%Y')
-        if isinstance(date2, str):
-            date2 = datetime.strptime(date2, '%m/%d/%Y')
-        
-        delta = date1 - date2
-        
-        if interval == 'Y':
-            return delta.days // 365
-        elif interval == 'M':
-            return delta.days // 30
-        elif interval == 'D':
-            return delta.days
-        elif interval == 'H':
-            return int(delta.total_seconds() / 3600)
-        elif interval == 'MI':
-            return int(delta.total_seconds() / 60)
-        elif interval == 'S':
-            return int(delta.total_seconds())
-        return delta.days
-
-    def DateParse(self, date_str, format_str=None):
-        """
-        Parse date string to datetime.
-        
-        Args:
-            date_str: Date string to parse
-            format_str: Optional format string
-            
-        Returns:
-            Datetime object
-        """
-        if format_str:
-            return datetime.strptime(date_str, format_str)
-        # Try common formats
-        for fmt in ['%m/%d/%Y', '%Y-%m-%d', '%m-%d-%Y', '%Y/%m/%d']:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                continue
-        return None
-
-    def DatePart(self, date, part='D'):
-        """
-        Extract date part.
-        
-        Args:
-            date: Date (string or datetime)
-            part: Part to extract ('Y', 'M', 'D', 'H', 'MI', 'S', 'DW', 'DOY')
-            
-        Returns:
-            Integer date part
-        """
-        if isinstance(date, str):
-            date = self.DateParse(date)
-        
-        if part == 'Y':
-            return date.year
-        elif part == 'M':
-            return date.month
-        elif part == 'D':
-            return date.day
-        elif part == 'H':
-            return date.hour
-        elif part == 'MI':
-            return date.minute
-        elif part == 'S':
-            return date.second
-        elif part == 'DW':  # Day of week (1=Monday, 7=Sunday)
-            return date.isoweekday()
-        elif part == 'DOY':  # Day of year
-            return date.timetuple().tm_yday
-        return None
-
-    def GetSendTime(self):
-        """
-        Get current send time.
-        
-        Returns:
-            Current datetime
-        """
-        return datetime.now()
-
-    def LocalDateToSystemDate(self, date_local):
-        """
-        Convert local datetime to system timezone.
-
-        Args:
-            date_local: Datetime in local timezone
-
-        Returns:
-            Datetime in system timezone
-        """
-        return date_local.astimezone(self.systemtimezone)
-
-    def Now(self):
-        """
-        Get current datetime.
-
-        Returns:
-            Current datetime
-        """
-        return datetime.now()
-
-    def SystemDateToLocalDate(self, date_system):
-        """
-        Convert system timezone datetime to local timezone.
-
-        Args:
-            date_system: Datetime in system timezone
-
-        Returns:
-            Datetime in local timezone
-        """
-        return date_system.astimezone(self.timezone)
-
-    # =========================================================================
-    # Cryptography Functions
-    # =========================================================================
-
-    def Base64Decode(self, ciphertext):
-        """
-        Decode base64 encoded string.
-
-        Args:
-            ciphertext: Base64 encoded string
-
-        Returns:
-            Decoded string
-        """
-        return b64decode(ciphertext).decode('utf-8')
-
-    def Base64Encode(self, text):
-        """
-        Encode string to base64.
-
-        Args:
-            text: String to encode
-
-        Returns:
-            Base64 encoded string
-        """
-        return b64encode(text.encode()).decode('utf-8')
-
-    def DecryptSymmetric(self, data, padding_type, extkey, password,
-                        saltkey, saltval, vectorkey, vectorval):
-        """
-        Decrypt symmetric encrypted data.
-
-        Args:
-            data: Encrypted data
-            padding_type: Padding type
-            extkey: Encryption key
-            password: Password
-            saltkey: Salt key
-            saltval: Salt value
-            vectorkey: Vector key
-            vectorval: Vector value
-
-        Returns:
-            Decrypted data
-        """
-        backend = default_backend()
-        iv = b'\x00' * 16  # Should be random in production
-        cipher = Cipher(
-            algorithms.AES(saltval),
-            modes.CFB(iv),
-            backend=backend
-        )
-        decryptor = cipher.decryptor()
-        unpadder = padding.PKCS7(128).unpadder()
-
-        ciphertext = b64decode(data)
-        decrypted_data = decryptor.update(ciphertext) + decryptor.finalize()
-        unpadded_data = unpadder.update(decrypted_data) + unpadder.finalize()
-
-        return unpadded_data
-
-    def EncryptSymmetric(self, data, padding_type, extkey, password,
-                        saltkey, saltval, vectorkey, vectorval):
-        """
-        Encrypt data with symmetric encryption.
-
-        Args:
-            data: Data to encrypt
-            padding_type: Padding type ('des' or 'aes')
-            extkey: Encryption key
-            password: Password
-            saltkey: Salt key
-            saltval: Salt value
-            vectorkey: Vector key
-            vectorval: Vector value
-
-        Returns:
-            Base64 encoded encrypted data
-        """
-        backend = default_backend()
-
-        block_size = 16 if 'des' in padding_type else 8
-        iv = b'\x00' * 16
-        t = block_size * 8
-
-        cipher = Cipher(
-            algorithms.AES(saltval),
-            modes.CFB(iv),
-            backend=backend
-        )
-        encryptor = cipher.encryptor()
-        padder = padding.PKCS7(t).padder()
-
-        padded_data = padder.update(data.encode()) + padder.finalize()
-        ciphertext = encryptor.update(padded_data) + encryptor.finalize()
-
-        return b64encode(ciphertext).decode('utf-8')
-
-    def GUID(self):
-        """
-        Generate a GUID.
-
-        Returns:
-            UUID string
-        """
-        return str(uuid.uuid4())
-
-    def MD5(self, text):
-        """
-        Hash text using MD5.
-
-        Args:
-            text: Text to hash
-
-        Returns:
-            MD5 hash hex string
-        """
-        return utils.hash_string('md5', text)
-
-    def SHA1(self, text):
-        """
-        Hash text using SHA1.
-
-        Args:
-            text: Text to hash
-
-        Returns:
-            SHA1 hash hex string
-        """
-        return utils.hash_string('sha1', text)
-
-    def SHA256(self, text):
-        """
-        Hash text using SHA256.
-
-        Args:
-            text: Text to hash
-
-        Returns:
-            SHA256 hash hex string
-        """
-        return utils.hash_string('sha256', text)
-
-    # =========================================================================
-    # HTTP Functions
-    # =========================================================================
-
-    def HTTP(self):
-        """HTTP request (generic)."""
-        pass
-
-    def HTTPGet(self, url, set_output=True, set_status_code=True, set_headers=True):
-        """
-        Perform HTTP GET request.
-        
-        Args:
-            url: URL to request
-            set_output: Set output variable
-            set_status_code: Set status code variable
-            set_headers: Set headers variable
-            
-        Returns:
-            Response content
-        """
-        # Stub - would need requests library
-        logger.warning(f"HTTPGet to '{url}' called but not implemented")
-        return ''
-
-    def HTTPPost(self, url, content_type='', payload='', set_output=True, set_status_code=True):
-        """
-        Perform HTTP POST request.
-        
-        Args:
-            url: URL to request
-            content_type: Content-Type header
-            payload: Request body
-            set_output: Set output variable
-            set_status_code: Set status code variable
-            
-        Returns:
-            Response content
-        """
-        # Stub - would need requests library
-        logger.warning(f"HTTPPost to '{url}' called but not implemented")
-        return ''
-
-    def HTTPPost2(self, url, content_type='', payload='', set_output=True, set_status_code=True, set_headers=True):
-        """
-        Perform HTTP POST request (v2 with headers).
-        
-        Args:
-            url: URL to request
-            content_type: Content-Type header
-            payload: Request body
-            set_output: Set output variable
-            set_status_code: Set status code variable
-            set_headers: Set headers variable
-            
-        Returns:
-            Response content
-        """
-        # Stub - would need requests library
-        logger.warning(f"HTTPPost2 to '{url}' called but not implemented")
-        return ''
-
-    def HTTPRequestHeader(self):
-        """Set HTTP request header."""
-        pass
-
-    def IsCHTMLBrowser(self):
-        """Check if CHTML browser."""
-        pass
-
-    def RedirectTo(self, url):
-        """
-        Redirect to URL.
-        
-        Args:
-            url: URL to redirect to
-        """
-        logger.warning(f"RedirectTo '{url}' called but not implemented")
-        pass
-
-    def URLEncode(self, text, space_char='', prefix=''):
-        """
-        URL encode a string.
-
-        Args:
-            text: Text to encode
-            space_char: Character for spaces (default: '+')
-            prefix: URL prefix
-
-        Returns:
-            URL encoded string
-        """
-        return urllib.parse.quote_plus(text)
-
-    def WrapLongURL(self, url, max_length=80, wrap_char='\n'):
-        """
-        Wrap long URL with line breaks.
-        
-        Args:
-            url: URL to wrap
-            max_length: Maximum line length
-            wrap_char: Character to use for wrapping
-            
-        Returns:
-            Wrapped URL
-        """
-        if len(url) <= max_length:
-            return url
-        
-        result = []
-        while len(url) > max_length:
-            result.append(url[:max_length])
-            url = url[max_length:]
-        if url:
-            result.append(url)
-        return wrap_char.join(result)
-
-    # =========================================================================
-    # Math Functions
-    # =========================================================================
-
-    def Add(self, a, b):
-        """Add two numbers."""
-        return a + b
-
-    def Divide(self, a, b):
-        """Divide two numbers."""
-        return a / b
-
-    def FormatCurrency(self, num, iso='en_US', decimals=2, symbol=''):
-        """
-        Format number as currency.
-
-        Args:
-            num: Number to format
-            iso: ISO locale code
-            decimals: Number of decimal places
-            symbol: Currency symbol
-
-        Returns:
-            Formatted currency string
-        """
-        country_code = iso.split('_')[1] if '_' in iso else 'US'
-
-        try:
-            with open('../lib/locale.json', encoding='utf-8') as f:
-                currencies = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            currencies = []
-
-        format_str = f"{{:,.{decimals}f}}" if decimals else "{:,.0f}"
-
-        if symbol:
-            format_str = symbol + format_str
-        else:
-            for currency in currencies:
-                if currency.get('country') == country_code:
-                    format_str = currency.get('symbol', '') + format_str
-                    break
-
-        return format_str.format(num)
-
-    def FormatNumber(self, num, decimals=0, decimal_sep='.', thousands_sep=','):
-        """
-        Format number with thousands separator and decimals.
-        
-        Args:
-            num: Number to format
-            decimals: Number of decimal places
-            decimal_sep: Decimal separator
-            thousands_sep: Thousands separator
-            
-        Returns:
-            Formatted number string
-        """
-        format_str = f"{{:,.{decimals}f}}"
-        result = format_str.format(float(num))
-        if decimal_sep != '.' or thousands_sep != ',':
-            result = result.replace(',', '|TEMP|')
-            result = result.replace('.', decimal_sep)
-            result = result.replace('|TEMP|', thousands_sep)
-        return result
-
-    def Mod(self, a, b):
-        """Modulo operation."""
-        return a % b
-
-    def Multiply(self, a, b):
-        """Multiply two numbers."""
-        return a * b
-
-    def Random(self, min_val, max_val):
-        """
-        Generate random integer.
-
-        Args:
-            min_val: Minimum value (inclusive)
-            max_val: Maximum value (inclusive)
-
-        Returns:
-            Random integer
-        """
-        return random.randint(min_val, max_val)
-
-    def Subtract(self, a, b):
-        """Subtract two numbers."""
-        return a - b
-
-    # =========================================================================
-    # Microsoft CRM Functions
-    # =========================================================================
-
-    def AddMscrmListMember(self, name, num, attrname, attrvalue,
-                          addattrname, addattrvalue):
-        """Add member to MSCRM list."""
-        pass
-
-    def CreateMscrmRecord(self):
-        """Create MSCRM record."""
-        pass
-
-    def DescribeMscrmEntities(self):
-        """Describe MSCRM entities."""
-        pass
-
-    def DescribeMscrmEntityAttributes(self):
-        """Describe MSCRM entity attributes."""
-        pass
-
-    def RetrieveMscrmRecords(self):
-        """Retrieve MSCRM records."""
-        pass
-
-    def RetrieveMscrmRecordsFetchXML(self):
-        """Retrieve MSCRM records with FetchXML."""
-        pass
-
-    def SetStateMscrmRecord(self):
-        """Set state of MSCRM record."""
-        pass
-
-    def UpdateMscrmRecords(self):
-        """Update MSCRM records."""
-        pass
-
-    def UpsertMscrmRecord(self):
-        """Upsert MSCRM record."""
-        pass
-
-    # =========================================================================
-    # Salesforce Functions
-    # =========================================================================
-
-    def CreateSalesforceObject(self):
-        """Create Salesforce object."""
-        pass
-
-    def LongSFID(self, salesforce_id):
-        """
-        Convert Salesforce 15-character ID to 18-character ID.
-
-        Args:
-            salesforce_id: 15-character Salesforce ID
-
-        Returns:
-            18-character Salesforce ID
-        """
-        return utils.convert_salesforce_15_to_18(salesforce_id)
-
-    def RetrieveSalesforceJobSources(self):
-        """Retrieve Salesforce job sources."""
-        pass
-
-    def RetrieveSalesforceObjects(self):
-        """Retrieve Salesforce objects."""
-        pass
-
-    def UpdateSingleSalesforceObject(self):
-        """Update single Salesforce object."""
-        pass
-
-    # =========================================================================
-    # User/Personalization Functions
-    # =========================================================================
-
-    def AuthenticatedEmployeeID(self):
-        """Get authenticated employee ID."""
-        pass
-
-    def AuthenticatedEmployeeNotificationAddress(self):
-        """Get authenticated employee notification address."""
-        pass
-
-    def AuthenticatedEmployeeUserName(self):
-        """Get authenticated employee username."""
-        pass
-
-    def AuthenticatedEnterpriseID(self):
-        """Get authenticated enterprise ID."""
-        pass
-
-    def AuthenticatedMemberID(self):
-        """Get authenticated member ID."""
-        pass
-
-    def AuthenticatedMemberName(self):
-        """Get authenticated member name."""
-        pass
-
-    def CloudPagesURL(self, page_id, *query_params):
-        """
-        Get Cloud Pages URL.
-        
-        Args:
-            page_id: Page ID or key
-            *query_params: Query string parameters (key, value pairs)
-            
-        Returns:
-            Cloud Pages URL
-        """
-        url = f"https://example.cloudpagesurl.com/page/{page_id}"
-        if query_params:
-            params = []
-            for i in range(0, len(query_params), 2):
-                if i + 1 < len(query_params):
-                    params.append(f"{query_params[i]}={urllib.parse.quote_plus(str(query_params[i+1]))}")
-            if params:
-                url += '?' + '&'.join(params)
-        return url
-
-    def IIf(self, condition, true_value, false_value):
-        """
-        Inline if (ternary operator).
-        
-        Args:
-            condition: Condition to evaluate
-            true_value: Value if true
-            false_value: Value if false
-            
-        Returns:
-            true_value if condition else false_value
-        """
-        return true_value if condition else false_value
-
-    def IsNullDefault(self, value, default_value):
-        """
-        Return default if value is null.
-        
-        Args:
-            value: Value to check
-            default_value: Default value if null
-            
-        Returns:
-            value if not None, else default_value
-        """
-        return default_value if value is None else value
-
-    def LiveContentMicrositeURL(self):
-        """Get live content microsite URL."""
-        pass
-
-    def MicrositeURL(self, page_name):
-        """
-        Get microsite URL.
-        
-        Args:
-            page_name: Page name
-            
-        Returns:
-            Microsite URL
-        """
-        return f"https://example.microsite.com/{page_name}"
-
-    def QueryParameter(self, param_name, default=''):
-        """
-        Get query string parameter.
-        
-        Args:
-            param_name: Parameter name
-            default: Default value if not found
-            
-        Returns:
-            Parameter value or default
-        """
-        # Stub - would need request context
-        logger.warning(f"QueryParameter '{param_name}' called but not implemented")
-        return default
-
-    def Redirect(self, url, use_301=False):
-        """
-        Redirect to URL.
-        
-        Args:
-            url: URL to redirect to
-            use_301: Use 301 permanent redirect if True
-        """
-        # Stub - would need HTTP context
-        logger.warning(f"Redirect to '{url}' called but not implemented")
-        pass
-
-    def RequestParameter(self, param_name, default=''):
-        """
-        Get request parameter (POST or GET).
-        
-        Args:
-            param_name: Parameter name
-            default: Default value if not found
-            
-        Returns:
-            Parameter value or default
-        """
-        # Stub - would need request context
-        logger.warning(f"RequestParameter '{param_name}' called but not implemented")
-        return default
-
-    # =========================================================================
-    # Social Functions
-    # =========================================================================
-
-    def Social(self):
-        """Social functionality."""
-        pass
-
-    def GetPublishedSocialContent(self):
-        """Get published social content."""
-        pass
-
-    def GetSocialPublishURL(self):
-        """Get social publish URL."""
-        pass
-
-    def GetSocialPublishURLByName(self):
-        """Get social publish URL by name."""
-        pass
-
-    # =========================================================================
-    # String Functions
-    # =========================================================================
-
-    def String(self, value):
-        """
-        Convert value to string.
-
-        Args:
-            value: Value to convert
-
-        Returns:
-            String representation
-        """
-        return str(value)
-
-    def Char(self, char_code, count=1):
-        """
-        Get character(s) from character code.
-
-        Args:
-            char_code: Character code
-            count: Number of repetitions
-
-        Returns:
-            Character string repeated count times
-        """
-        return chr(char_code) * count
-
-    def Concat(self, *args):
-        """
-        Concatenate strings.
-
-        Args:
-            *args: Variable number of strings
-
-        Returns:
-            Concatenated string
-        """
-        return ''.join(str(arg) for arg in args)
-
-    def Format(self, text, format_str, identifier='Date', iso=''):
-        """
-        Format string.
-
-        Args:
-            text: Text to format
-            format_str: Format string
-            identifier: Format type ('Date' or other)
-            iso: ISO code
-
-        Returns:
-            Formatted string
-        """
-        if identifier == 'Date':
-            return datetime.strptime(
-                text,
-                utils.convert_csharp_date_format(format_str)
-            )
-        else:
-            return text.format(format_str)
-
-    def IndexOf(self, text, search_str):
-        """
-        Find index of substring.
-
-        Args:
-            text: Text to search
-            search_str: Substring to find
-
-        Returns:
-            Index of substring (-1 if not found)
-        """
-        return text.find(search_str)
-
-    def Length(self, text):
-        """
-        Get string length.
-
-        Args:
-            text: String
-
-        Returns:
-            Length of string
-        """
-        return len(text)
-
-    def Lowercase(self, text):
-        """
-        Convert to lowercase.
-
-        Args:
-            text: Text to convert
-
-        Returns:
-            Lowercase text
-        """
-        return text.lower()
-
-    def ProperCase(self, text):
-        """
-        Convert to title case.
-
-        Args:
-            text: Text to convert
-
-        Returns:
-            Title case text
-        """
-        return text.title()
-
-    def RegExMatch(self, text, regex):
-        """
-        Match text against regex.
-
-        Args:
-            text: Text to match
-            regex: Regular expression
-
-        Returns:
-            Match object or None
-        """
-        return re.search(regex, text)
-
-    def Replace(self, text, target, replacement):
-        """
-        Replace substring.
-
-        Args:
-            text: Original text
-            target: Substring to replace
-            replacement: Replacement text
-
-        Returns:
-            Text with replacement made
-        """
-        return text.replace(target, replacement)
-
-    def ReplaceList(self, text, replacement, *targets):
-        """
-        Replace multiple substrings.
-
-        Args:
-            text: Original text
-            replacement: Replacement text
-            *targets: Substrings to replace
-
-        Returns:
-            Text with replacements made
-        """
-        result = text
-        for target in targets:
-            result = result.replace(target, replacement)
-        return result
-
-    def StringToDate(self, date_str, format_str='M/d/yyyy'):
-        """
-        Convert string to datetime.
-        
-        Args:
-            date_str: Date string
-            format_str: Format string (C# style)
-            
-        Returns:
-            Datetime object
-        """
-        # Convert C# format to Python format
-        py_format = format_str.replace('yyyy', '%Y').replace('yy', '%y')
-        py_format = py_format.replace('MM', '%m').replace('M', '%-m')
-        py_format = py_format.replace('dd', '%d').replace('d', '%-d')
-        py_format = py_format.replace('HH', '%H').replace('H', '%-H')
-        py_format = py_format.replace('mm', '%M').replace('m', '%-M')
-        py_format = py_format.replace('ss', '%S').replace('s', '%-S')
-        try:
-            return datetime.strptime(date_str, py_format)
-        except ValueError:
-            return self.DateParse(date_str)
-
-    def StringToHex(self, value):
-        """
-        Convert string to hex.
-
-        Args:
-            value: Value to convert
-
-        Returns:
-            Tuple of (hex_string, int_value)
-        """
-        convert_string = int(value, base=16)
-        convert_hex = hex(convert_string)
-        return convert_hex, convert_string
-
-    def Substring(self, text, pos, length):
-        """
-        Extract substring.
-
-        Args:
-            text: Original text
-            pos: Starting position
-            length: Length of substring
-
-        Returns:
-            Substring
-        """
-        return text[pos:pos + length]
-
-    def Trim(self, text):
-        """
-        Trim whitespace.
-
-        Args:
-            text: Text to trim
-
-        Returns:
-            Text with leading/trailing whitespace removed
-        """
-        return text.strip()
-
-    def Uppercase(self, text):
-        """
-        Convert to uppercase.
-
-        Args:
-            text: Text to convert
-
-        Returns:
-            Uppercase text
-        """
-        return text.upper()
-
-    # =========================================================================
-    # Validation Functions
-    # =========================================================================
-
-    def AttributeValue(self, attribute_name):
-        """
-        Get attribute value from subscriber.
-        
-        Args:
-            attribute_name: Attribute name
-            
-        Returns:
-            Attribute value or None
-        """
-        # Stub - would need subscriber context
-        logger.warning(f"AttributeValue '{attribute_name}' called but not implemented")
-        return None
-
-    def Domain(self, email_address):
-        """
-        Extract domain from email address.
-        
-        Args:
-            email_address: Email address
-            
-        Returns:
-            Domain portion of email
-        """
-        if '@' in email_address:
-            return email_address.split('@')[1]
-        return ''
-
-    def Empty(self, text):
-        """
-        Check if string is empty.
-
-        Args:
-            text: Text to check
-
-        Returns:
-            True if empty, False otherwise
-        """
-        return len(text) == 0
-
-    def IsEmailAddress(self, text):
-        """
-        Validate email address.
-
-        Args:
-            text: Email address to validate
-
-        Returns:
-            True if valid email, False otherwise
-        """
-        pattern = r'^[\w\-\.]+@([\w\-]+\.)+[\w\-]{2,4}$'
-        return bool(re.search(pattern, text))
-
-    def IsNull(self, value):
-        """
-        Check if value is null.
-
-        Args:
-            value: Value to check
-
-        Returns:
-            True if None, False otherwise
-        """
-        return value is None
-
-    def IsPhoneNumber(self, text):
-        """
-        Validate phone number.
-
-        Args:
-            text: Phone number to validate
-
-        Returns:
-            True if valid phone, False otherwise
-        """
-        pattern = r'^[\+]?[(]?[0-9]{3}[)]?[-\s\.]?[0-9]{3}[-\s\.]?[0-9]{4,6}$'
-        return bool(re.search(pattern, text))
-
-    def Output(self, text):
-        """
-        Output text (print).
-
-        Args:
-            text: Text to output
-        """
-        print(text)
-
-    def OutputLine(self, text):
-        """
-        Output text with newline.
-
-        Args:
-            text: Text to output
-        """
-        print(text)
-
-    def V(self, text):
-        """
-        Output value (print).
-
-        Args:
-            text: Value to output
-        """
-        print(text)
-
-    def Write(self, text):
-        """
-        Write text to output (JavaScript Write function).
-        Converts any type to string for output, matching JavaScript behavior.
-
-        Args:
-            text: Value to write (will be converted to string)
-        """
-        print(str(text), end='')
-
-
-# =============================================================================
-# Module-level instance for function access via getattr()
-# =============================================================================
-
-# Create module-level instance so transpiled code can call getattr(ampfunctions, 'FunctionName')
-_ampfunctions = func()
-
-# Override module-level getattr to delegate to the func instance
-def __getattr__(name):
-    """Delegate attribute access to the func instance."""
-    return getattr(_ampfunctions, name)
@@ -0,0 +1,407 @@
+# =============================================================================
+# ampfunctions/__init__.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript function library implementation.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""AmpScript function library with implementations for common operations.
+
+The library is split into category modules (strings, dates, crypto, ...)
+that are only imported when one of their functions is first looked up, so
+importing this package stays cheap for generated scripts that call a
+handful of functions.
+"""
+
+import importlib
+
+from .. import ampmetrics
+from .annotations import CHEAP, MODERATE
+
+# Category module -> (implementation class, function names). Kept static so
+# that resolving a name never has to import every category.
+CATEGORIES = {
+    'objects': ('ObjectFunctions', (
+        'AddObjectArrayItem', 'CreateObject', 'InvokeCreate', 'InvokeDelete',
+        'InvokeExecute', 'InvokePerform', 'InvokeRetrieve', 'InvokeUpdate',
+        'RaiseError', 'SetObjectProperty',
+    )),
+    'content': ('ContentFunctions', (
+        'Contacts', 'UpsertContact', 'Content', 'AttachFile', 'BarCodeURL',
+        'BeginImpressionRegion', 'BuildOptionList', 'BuildRowSetFromString',
+        'BuildRowSetFromXML', 'ContentArea', 'ContentAreaByName',
+        'ContentBlockbyId', 'ContentBlockbyKey', 'ContentBlockbyName',
+        'ContentImagebyID', 'ContentImagebyKey', 'CreateSmsConversation',
+        'EndImpressionRegion', 'EndSmsConversation', 'GetPortfolioItem',
+        '_messageContext', 'SetSmsConversationNextKeyword', 'TransformXML',
+        'TreatAsContent', 'TreatAsContentArea', 'WAT', 'WATP',
+    )),
+    'dataext': ('DataExtensionFunctions', (
+        'ClaimRow', 'ClaimRowValue', 'DataExtensionRowCount', 'DeleteData',
+        'DeleteDE', 'ExecuteFilter', 'ExecuteFilterOrderedRows', 'Field',
+        'InsertData', 'InsertDE', 'Lookup', 'LookupOrderedRows',
+        'LookupOrderedRowsCS', 'LookupRows', 'LookupRowsCS', 'Row', 'RowCount',
+        'UpdateData', 'UpdateDE', 'UpsertData', 'UpsertDE',
+    )),
+    'dates': ('DateFunctions', (
+        'DateAdd', 'DateDiff', 'DateParse', 'DatePart', 'GetSendTime',
+        'LocalDateToSystemDate', 'Now', 'SystemDateToLocalDate',
+    )),
+    'crypto': ('CryptoFunctions', (
+        'Base64Decode', 'Base64Encode', 'DecryptSymmetric', 'EncryptSymmetric',
+        'GUID', 'MD5', 'SHA1', 'SHA256',
+    )),
+    'http': ('HttpFunctions', (
+        'HTTP', 'HTTPGet', 'HTTPPost', 'HTTPPost2', 'HTTPRequestHeader',
+        'IsCHTMLBrowser', 'RedirectTo', 'URLEncode', 'WrapLongURL',
+    )),
+    'maths': ('MathFunctions', (
+        'Add', 'Divide', 'FormatCurrency', 'FormatNumber', 'Mod', 'Multiply',
+        'Random', 'Subtract',
+    )),
+    'mscrm': ('MscrmFunctions', (
+        'AddMscrmListMember', 'CreateMscrmRecord', 'DescribeMscrmEntities',
+        'DescribeMscrmEntityAttributes', 'RetrieveMscrmRecords',
+        'RetrieveMscrmRecordsFetchXML', 'SetStateMscrmRecord',
+        'UpdateMscrmRecords', 'UpsertMscrmRecord',
+    )),
+    'salesforce': ('SalesforceFunctions', (
+        'CreateSalesforceObject', 'LongSFID', 'RetrieveSalesforceJobSources',
+        'RetrieveSalesforceObjects', 'UpdateSingleSalesforceObject',
+    )),
+    'sites': ('SiteFunctions', (
+        'AuthenticatedEmployeeID', 'AuthenticatedEmployeeNotificationAddress',
+        'AuthenticatedEmployeeUserName', 'AuthenticatedEnterpriseID',
+        'AuthenticatedMemberID', 'AuthenticatedMemberName', 'CloudPagesURL',
+        'IIf', 'IsNullDefault', 'LiveContentMicrositeURL', 'MicrositeURL',
+        'QueryParameter', 'Redirect', 'RequestParameter',
+    )),
+    'social': ('SocialFunctions', (
+        'Social', 'GetPublishedSocialContent', 'GetSocialPublishURL',
+        'GetSocialPublishURLByName',
+    )),
+    'strings': ('StringFunctions', (
+        'String', 'Char', 'Concat', 'Format', 'IndexOf', 'Length', 'Lowercase',
+        'ProperCase', 'RegExMatch', 'Replace', 'ReplaceList', 'StringToDate',
+        'StringToHex', 'Substring', 'Trim', 'Uppercase',
+    )),
+    'validation': ('ValidationFunctions', (
+        'AttributeValue', 'Domain', 'Empty', 'IsEmailAddress', 'IsNull',
+        'IsPhoneNumber', 'Output', 'OutputLine', 'V', 'Write',
+    )),
+}
+
+# Function name -> category module
+FUNCTION_INDEX = {
+    name: category
+    for category, (_, names) in CATEGORIES.items()
+    for name in names
+}
+
+
+# Lowercased function name -> canonical name. AmpScript function names are
+# case-insensitive, so templates may call v(), V() or Lookup() alike.
+_CANONICAL_NAMES = {name.lower(): name for name in FUNCTION_INDEX}
+
+# Canonical name -> (min_args, max_args); max_args is None for varargs
+_ARITY_CACHE = {}
+
+# Canonical name -> (is_pure, cost, literal argument positions) from the
+# annotations module
+_TRAITS_CACHE = {}
+
+# AST nodes of literal arguments
+LITERAL_NODES = ('STR', 'INT', 'BOOL')
+
+# Pure functions at least this costly have their results memoized
+MEMOIZE_COST = MODERATE
+
+# Memoized results kept per library instance before the cache is reset
+MEMO_LIMIT = 4096
+
+
+def load_category(category):
+    """
+    Import a category module and return its implementation class.
+
+    Args:
+        category: Category module name (key of CATEGORIES)
+
+    Returns:
+        Class holding the category's function implementations
+    """
+    class_name = CATEGORIES[category][0]
+    module = importlib.import_module(f"{__name__}.{category}")
+    return getattr(module, class_name)
+
+
+def canonical_name(name):
+    """
+    Look up the canonical spelling of a function name.
+
+    Args:
+        name: Function name in any letter case
+
+    Returns:
+        Canonical function name, or None if no such function exists
+    """
+    return _CANONICAL_NAMES.get(name.lower())
+
+
+def arity(name):
+    """
+    Get the accepted argument count range of a function.
+
+    Args:
+        name: Function name in any letter case
+
+    Returns:
+        Tuple of (min_args, max_args); max_args is None for varargs
+
+    Raises:
+        KeyError: If no such function exists
+    """
+    canonical = canonical_name(name)
+    if canonical is None:
+        raise KeyError(name)
+    if canonical not in _ARITY_CACHE:
+        import inspect
+
+        impl = getattr(load_category(FUNCTION_INDEX[canonical]), canonical)
+        params = list(inspect.signature(impl).parameters.values())[1:]
+        required = sum(
+            1 for p in params
+            if p.default is p.empty and p.kind == p.POSITIONAL_OR_KEYWORD
+        )
+        if any(p.kind == p.VAR_POSITIONAL for p in params):
+            maximum = None
+        else:
+            maximum = len(params)
+        _ARITY_CACHE[canonical] = (required, maximum)
+    return _ARITY_CACHE[canonical]
+
+
+def traits(name):
+    """
+    Get the purity and cost annotations of a function.
+
+    Args:
+        name: Function name in any letter case
+
+    Returns:
+        Tuple of (is_pure, cost); unannotated functions are impure and CHEAP
+
+    Raises:
+        KeyError: If no such function exists
+    """
+    return annotations(name)[:2]
+
+
+def annotations(name):
+    """
+    Get the purity, cost and literal argument annotations of a function.
+
+    Args:
+        name: Function name in any letter case
+
+    Returns:
+        Tuple of (is_pure, cost, literal argument positions)
+
+    Raises:
+        KeyError: If no such function exists
+    """
+    canonical = canonical_name(name)
+    if canonical is None:
+        raise KeyError(name)
+    if canonical not in _TRAITS_CACHE:
+        impl = getattr(load_category(FUNCTION_INDEX[canonical]), canonical)
+        _TRAITS_CACHE[canonical] = (
+            getattr(impl, 'amp_pure', False),
+            getattr(impl, 'amp_cost', CHEAP),
+            getattr(impl, 'amp_literal', ()),
+        )
+    return _TRAITS_CACHE[canonical]
+
+
+def is_pure(name):
+    """
+    Check whether every call to a function may be memoized or reordered.
+
+    Args:
+        name: Function name in any letter case
+
+    Returns:
+        True if the function is annotated pure without literal arguments,
+        False otherwise or if unknown
+    """
+    if canonical_name(name) is None:
+        return False
+    pure, _, literal = annotations(name)
+    return pure and not literal
+
+
+def is_pure_call(name, args):
+    """
+    Check whether a call site may be reordered or evaluated once.
+
+    Args:
+        name: Function name in any letter case
+        args: Argument nodes of the call
+
+    Returns:
+        True if the function is pure and each argument that must be a
+        literal for that is one
+    """
+    if canonical_name(name) is None:
+        return False
+    pure, _, literal = annotations(name)
+    return pure and all(position >= len(args) or args[position][0] in LITERAL_NODES
+                        for position in literal)
+
+
+def check_call(name, argc):
+    """
+    Validate a call site and return the canonical function name.
+
+    Args:
+        name: Function name as written in the template
+        argc: Number of arguments passed
+
+    Returns:
+        Canonical function name
+
+    Raises:
+        RuntimeError: If the function is unknown or argc is out of range
+    """
+    canonical = canonical_name(name)
+    if canonical is None:
+        raise RuntimeError(f"Undefined function: {name}")
+    minimum, maximum = arity(canonical)
+    if argc < minimum or (maximum is not None and argc > maximum):
+        expected = f"{minimum}+" if maximum is None else (
+            f"{minimum}" if minimum == maximum else f"{minimum}-{maximum}"
+        )
+        raise RuntimeError(
+            f"{canonical} expects {expected} argument(s), got {argc}"
+        )
+    return canonical
+
+
+class func:
+    """AmpScript function library."""
+
+    def __init__(self):
+        """Initialize function library with locale and timezone settings."""
+        self.locale = 'en_US'
+        self.timezone = 'Pacific/Auckland'
+        self.systemtimezone = 'America/Indianapolis'
+        self._memo = {}
+
+    def __getattr__(self, name):
+        """
+        Resolve a library function on first access.
+
+        The owning category module is imported, the implementation bound to
+        this instance and cached, so later lookups are plain attribute hits.
+        Costly pure functions are wrapped to memoize their results, and
+        functions resolved while metrics are on to count and time their
+        calls per category.
+
+        Args:
+            name: AmpScript function name
+
+        Returns:
+            Bound function implementation
+
+        Raises:
+            AttributeError: If name is not a library function
+        """
+        category = FUNCTION_INDEX.get(name)
+        if category is None:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        method = getattr(load_category(category), name).__get__(self)
+        pure, cost, literal = annotations(name)
+        if pure and not literal and cost >= MEMOIZE_COST:
+            method = self.memoized(name, method)
+        if ampmetrics.enabled:
+            method = ampmetrics.timed('function', method, category=category)
+        self.__dict__[name] = method
+        return method
+
+    def __dir__(self):
+        """List instance attributes together with all library functions."""
+        return sorted(set(super().__dir__()) | set(FUNCTION_INDEX))
+
+    def memoized(self, name, method):
+        """
+        Wrap a pure function so repeated calls reuse earlier results.
+
+        Args:
+            name: Canonical function name, part of the cache key
+            method: Bound function implementation
+
+        Returns:
+            Memoizing wrapper around method
+        """
+        memo = self._memo
+
+        def call(*args):
+            key = (name, args)
+            try:
+                return memo[key]
+            except KeyError:
+                if len(memo) >= MEMO_LIMIT:
+                    memo.clear()
+                result = memo[key] = method(*args)
+                return result
+            except TypeError:
+                # Unhashable arguments (rowsets, dicts) are not cached
+                return method(*args)
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        return call
+
+    def clear_memo(self):
+        """Forget memoized results, e.g. between batches of subscribers."""
+        self._memo.clear()
+
+    def resolve(self, name, argc=None):
+        """
+        Resolve a call site to a bound function, ignoring letter case.
+
+        Args:
+            name: Function name as written in the template
+            argc: Number of arguments to validate against the arity (optional)
+
+        Returns:
+            Bound function implementation
+
+        Raises:
+            RuntimeError: If the function is unknown or argc is out of range
+        """
+        if argc is None:
+            canonical = canonical_name(name)
+            if canonical is None:
+                raise RuntimeError(f"Undefined function: {name}")
+        else:
+            canonical = check_call(name, argc)
+        return getattr(self, canonical)
+
+
+# =============================================================================
+# Module-level instance for function access via getattr()
+# =============================================================================
+
+# Create module-level instance so transpiled code can call getattr(ampfunctions, 'FunctionName')
+_ampfunctions = func()
+
+# Override module-level getattr to delegate to the func instance
+def __getattr__(name):
+    """Delegate attribute access to the func instance."""
+    return getattr(_ampfunctions, name)
@@ -0,0 +1,61 @@
+# =============================================================================
+# ampfunctions/annotations.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Purity and cost annotations for library functions.
+# =============================================================================
+"""Decorators recording purity and relative cost of library functions.
+
+A pure function returns the same result for the same arguments (on the same
+library instance) and has no side effects, so its calls may be memoized or
+moved out of loops. Cost is a rough relative weight used to decide whether
+caching a result is worth hashing the arguments.
+
+Some functions are pure only when certain arguments are written as literals
+in the template, e.g. Format's format string; pure(literal=...) records
+their positions, and only such call sites are treated as pure.
+"""
+
+# Relative call costs
+CHEAP = 1
+MODERATE = 10
+EXPENSIVE = 100
+
+
+def pure(cost=CHEAP, literal=()):
+    """
+    Mark a library function as pure.
+
+    Args:
+        cost: Relative cost of one call (CHEAP, MODERATE or EXPENSIVE)
+        literal: Positions of the arguments that must be literals for a
+            call to be pure; calls are never memoized if there are any
+
+    Returns:
+        Decorator setting the annotations on the function
+    """
+    def decorate(function):
+        function.amp_pure = True
+        function.amp_cost = cost
+        function.amp_literal = tuple(literal)
+        return function
+    return decorate
+
+
+def cost(value):
+    """
+    Record the relative cost of an impure library function.
+
+    Args:
+        value: Relative cost of one call (CHEAP, MODERATE or EXPENSIVE)
+
+    Returns:
+        Decorator setting the annotation on the function
+    """
+    def decorate(function):
+        function.amp_cost = value
+        return function
+    return decorate
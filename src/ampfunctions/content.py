@@ -0,0 +1,234 @@
+# =============================================================================
+# ampfunctions/content.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript content function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Content, content block and SMS functions."""
+
+import urllib.parse
+import logging
+
+from .. import ampcontentstore
+
+logger = logging.getLogger(__name__)
+
+
+def content_block(name, kind, ref, error_on_missing, default_content):
+    """
+    Render a block of the configured content store.
+
+    Args:
+        name: Calling library function, for messages
+        kind: 'id', 'key' or 'name'
+        ref: Id, key or name of the block
+        error_on_missing: Raise if the block does not exist
+        default_content: Content returned for a missing block
+
+    Returns:
+        Rendered block or default_content
+    """
+    store = ampcontentstore.store()
+    if store is None:
+        logger.warning(f"{name} {ref} called without a content store")
+        return default_content
+    content = store.render(kind, ref)
+    if content is None:
+        if error_on_missing and str(error_on_missing).lower() != 'false':
+            raise RuntimeError(f"{name}: no content block with {kind} {ref}")
+        return default_content
+    return content
+
+
+class ContentFunctions:
+    """Content, content block and SMS functions of the AmpScript library."""
+
+    def Contacts(self):
+        """Access contacts."""
+        pass
+
+    def UpsertContact(self):
+        """Upsert contact."""
+        pass
+
+    def Content(self):
+        """Access content."""
+        pass
+
+    def AttachFile(self):
+        """Attach file."""
+        pass
+
+    def BarCodeURL(self, barcode_value, barcode_type='Code128'):
+        """
+        Generate barcode URL.
+        
+        Args:
+            barcode_value: Barcode value
+            barcode_type: Barcode type (default: Code128)
+            
+        Returns:
+            URL to barcode image
+        """
+        encoded = urllib.parse.quote_plus(str(barcode_value))
+        return f"https://example.com/barcode?type={barcode_type}&value={encoded}"
+
+    def BeginImpressionRegion(self):
+        """Begin impression region."""
+        pass
+
+    def BuildOptionList(self):
+        """Build option list."""
+        pass
+
+    def BuildRowSetFromString(self, rows_string, delimiter):
+        """
+        Build row set from delimited string.
+        
+        Args:
+            rows_string: String with delimited rows
+            delimiter: Row delimiter
+            
+        Returns:
+            List of row strings
+        """
+        return rows_string.split(delimiter)
+
+    def BuildRowSetFromXML(self):
+        """Build row set from XML."""
+        pass
+
+    def ContentArea(self):
+        """Access content area."""
+        pass
+
+    def ContentAreaByName(self):
+        """Get content area by name."""
+        pass
+
+    def ContentBlockbyId(self, content_id, impression_region='', error_on_missing=True,
+                           default_content=''):
+        """
+        Get content block by ID, rendered inline.
+        
+        Args:
+            content_id: Content block ID
+            impression_region: Impression region name (ignored)
+            error_on_missing: Raise if the block does not exist
+            default_content: Content returned for a missing block
+            
+        Returns:
+            Rendered content block
+
+        Raises:
+            RuntimeError: If the block is missing and error_on_missing is
+                true, fails to render or includes itself
+        """
+        return content_block('ContentBlockbyId', 'id', content_id,
+                             error_on_missing, default_content)
+
+    def ContentBlockbyKey(self, content_key, impression_region='', error_on_missing=True,
+                           default_content=''):
+        """
+        Get content block by key, rendered inline.
+        
+        Args:
+            content_key: Content block key
+            impression_region: Impression region name (ignored)
+            error_on_missing: Raise if the block does not exist
+            default_content: Content returned for a missing block
+            
+        Returns:
+            Rendered content block
+
+        Raises:
+            RuntimeError: If the block is missing and error_on_missing is
+                true, fails to render or includes itself
+        """
+        return content_block('ContentBlockbyKey', 'key', content_key,
+                             error_on_missing, default_content)
+
+    def ContentBlockbyName(self, content_name, impression_region='', error_on_missing=True,
+                           default_content=''):
+        """
+        Get content block by name, rendered inline.
+        
+        Args:
+            content_name: Content block name
+            impression_region: Impression region name (ignored)
+            error_on_missing: Raise if the block does not exist
+            default_content: Content returned for a missing block
+            
+        Returns:
+            Rendered content block
+
+        Raises:
+            RuntimeError: If the block is missing and error_on_missing is
+                true, fails to render or includes itself
+        """
+        return content_block('ContentBlockbyName', 'name', content_name,
+                             error_on_missing, default_content)
+
+    def ContentImagebyID(self):
+        """Get content image by ID."""
+        pass
+
+    def ContentImagebyKey(self):
+        """Get content image by key."""
+        pass
+
+    def CreateSmsConversation(self):
+        """Create SMS conversation."""
+        pass
+
+    def EndImpressionRegion(self):
+        """End impression region."""
+        pass
+
+    def EndSmsConversation(self):
+        """End SMS conversation."""
+        pass
+
+    def GetPortfolioItem(self):
+        """Get portfolio item."""
+        pass
+
+    def _messageContext(self):
+        """Access message context (internal)."""
+        pass
+
+    def SetSmsConversationNextKeyword(self):
+        """Set SMS conversation next keyword."""
+        pass
+
+    def TransformXML(self):
+        """Transform XML."""
+        pass
+
+    def TreatAsContent(self, content_value):
+        """
+        Treat string value as content (suppress HTML encoding).
+        
+        Args:
+            content_value: Content to treat as raw
+            
+        Returns:
+            Content value unchanged
+        """
+        return content_value
+
+    def TreatAsContentArea(self):
+        """Treat as content area."""
+        pass
+
+    def WAT(self):
+        """Web analytics tracking."""
+        pass
+
+    def WATP(self):
+        """Web analytics tracking (path)."""
+        pass
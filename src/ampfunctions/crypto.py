@@ -0,0 +1,179 @@
+# =============================================================================
+# ampfunctions/crypto.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript cryptography function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Encoding, encryption and hashing functions."""
+
+from base64 import b64encode, b64decode
+
+from lib import utils
+from .annotations import cost, pure, EXPENSIVE, MODERATE
+
+
+class CryptoFunctions:
+    """Encoding, encryption and hashing functions of the AmpScript library."""
+
+    @pure()
+    def Base64Decode(self, ciphertext):
+        """
+        Decode base64 encoded string.
+
+        Args:
+            ciphertext: Base64 encoded string
+
+        Returns:
+            Decoded string
+        """
+        return b64decode(ciphertext).decode('utf-8')
+
+    @pure()
+    def Base64Encode(self, text):
+        """
+        Encode string to base64.
+
+        Args:
+            text: String to encode
+
+        Returns:
+            Base64 encoded string
+        """
+        return b64encode(text.encode()).decode('utf-8')
+
+    @cost(EXPENSIVE)
+    def DecryptSymmetric(self, data, padding_type, extkey, password,
+                        saltkey, saltval, vectorkey, vectorval):
+        """
+        Decrypt symmetric encrypted data.
+
+        Args:
+            data: Encrypted data
+            padding_type: Padding type
+            extkey: Encryption key
+            password: Password
+            saltkey: Salt key
+            saltval: Salt value
+            vectorkey: Vector key
+            vectorval: Vector value
+
+        Returns:
+            Decrypted data
+        """
+        # cryptography is slow to import; only pay for it when used
+        from cryptography.hazmat.primitives import padding
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        from cryptography.hazmat.backends import default_backend
+
+        backend = default_backend()
+        iv = b'\x00' * 16  # Should be random in production
+        cipher = Cipher(
+            algorithms.AES(saltval),
+            modes.CFB(iv),
+            backend=backend
+        )
+        decryptor = cipher.decryptor()
+        unpadder = padding.PKCS7(128).unpadder()
+
+        ciphertext = b64decode(data)
+        decrypted_data = decryptor.update(ciphertext) + decryptor.finalize()
+        unpadded_data = unpadder.update(decrypted_data) + unpadder.finalize()
+
+        return unpadded_data
+
+    @cost(EXPENSIVE)
+    def EncryptSymmetric(self, data, padding_type, extkey, password,
+                        saltkey, saltval, vectorkey, vectorval):
+        """
+        Encrypt data with symmetric encryption.
+
+        Args:
+            data: Data to encrypt
+            padding_type: Padding type ('des' or 'aes')
+            extkey: Encryption key
+            password: Password
+            saltkey: Salt key
+            saltval: Salt value
+            vectorkey: Vector key
+            vectorval: Vector value
+
+        Returns:
+            Base64 encoded encrypted data
+        """
+        # cryptography is slow to import; only pay for it when used
+        from cryptography.hazmat.primitives import padding
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        from cryptography.hazmat.backends import default_backend
+
+        backend = default_backend()
+
+        block_size = 16 if 'des' in padding_type else 8
+        iv = b'\x00' * 16
+        t = block_size * 8
+
+        cipher = Cipher(
+            algorithms.AES(saltval),
+            modes.CFB(iv),
+            backend=backend
+        )
+        encryptor = cipher.encryptor()
+        padder = padding.PKCS7(t).padder()
+
+        padded_data = padder.update(data.encode()) + padder.finalize()
+        ciphertext = encryptor.update(padded_data) + encryptor.finalize()
+
+        return b64encode(ciphertext).decode('utf-8')
+
+    def GUID(self):
+        """
+        Generate a GUID.
+
+        Returns:
+            UUID string
+        """
+        import uuid
+
+        return str(uuid.uuid4())
+
+    @pure(MODERATE)
+    def MD5(self, text):
+        """
+        Hash text using MD5.
+
+        Args:
+            text: Text to hash
+
+        Returns:
+            MD5 hash hex string
+        """
+        return utils.hash_string('md5', text)
+
+    @pure(MODERATE)
+    def SHA1(self, text):
+        """
+        Hash text using SHA1.
+
+        Args:
+            text: Text to hash
+
+        Returns:
+            SHA1 hash hex string
+        """
+        return utils.hash_string('sha1', text)
+
+    @pure(MODERATE)
+    def SHA256(self, text):
+        """
+        Hash text using SHA256.
+
+        Args:
+            text: Text to hash
+
+        Returns:
+            SHA256 hash hex string
+        """
+        return utils.hash_string('sha256', text)
@@ -0,0 +1,325 @@
+# =============================================================================
+# ampfunctions/dataext.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript data extension function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Data extension functions."""
+
+import logging
+
+from .annotations import cost, EXPENSIVE
+from .. import ampdatastore
+
+logger = logging.getLogger(__name__)
+
+
+def lookup_rows(name, data_extension, match_pairs, case_sensitive=False):
+    """
+    Look up rows in the configured data extension store.
+
+    Args:
+        name: Calling library function, for messages
+        data_extension: Name of data extension
+        match_pairs: Alternating field names and values
+        case_sensitive: Match values case-sensitively
+
+    Returns:
+        List of matching rows as dictionaries
+
+    Raises:
+        RuntimeError: If the match fields and values do not pair up
+    """
+    if not match_pairs or len(match_pairs) % 2:
+        raise RuntimeError(f"{name}: expected match field and value pairs")
+    store = ampdatastore.store()
+    if store is None:
+        logger.warning(f"{name} on {data_extension} called without a data extension store")
+        return []
+    return store.lookup(data_extension, match_pairs[0::2], match_pairs[1::2], case_sensitive)
+
+
+class DataExtensionFunctions:
+    """Data extension functions of the AmpScript library."""
+
+    def ClaimRow(self):
+        """Claim a row from data extension."""
+        pass
+
+    def ClaimRowValue(self):
+        """Claim row value."""
+        pass
+
+    @cost(EXPENSIVE)
+    def DataExtensionRowCount(self, data_extension):
+        """
+        Get data extension row count.
+        
+        Args:
+            data_extension: Name of data extension
+            
+        Returns:
+            Number of rows in data extension
+        """
+        logger.warning(f"DataExtensionRowCount on {data_extension} called but not implemented")
+        return 0
+
+    @cost(EXPENSIVE)
+    def DeleteData(self, data_extension, *match_field_value_pairs):
+        """
+        Delete data from data extension.
+        
+        Args:
+            data_extension: Name of data extension
+            *match_field_value_pairs: Alternating field names and values to match
+            
+        Returns:
+            Number of rows deleted
+        """
+        logger.warning(f"DeleteData from {data_extension} called but not implemented")
+        return 0
+
+    @cost(EXPENSIVE)
+    def DeleteDE(self, data_extension, *match_field_value_pairs):
+        """
+        Delete from data extension (alias for DeleteData).
+        
+        Args:
+            data_extension: Name of data extension
+            *match_field_value_pairs: Alternating field names and values to match
+            
+        Returns:
+            Number of rows deleted
+        """
+        return self.DeleteData(data_extension, *match_field_value_pairs)
+
+    def ExecuteFilter(self):
+        """Execute filter."""
+        pass
+
+    def ExecuteFilterOrderedRows(self):
+        """Execute filter with ordered rows."""
+        pass
+
+    def Field(self, row, field_name, default=''):
+        """
+        Get field value from row.
+        
+        Args:
+            row: Dictionary representing a row
+            field_name: Name of field
+            default: Default value if field not found
+            
+        Returns:
+            Field value or default
+        """
+        if isinstance(row, dict):
+            return ampdatastore.field_value(row, field_name, default)
+        return default
+
+    @cost(EXPENSIVE)
+    def InsertData(self, data_extension, *field_value_pairs):
+        """
+        Insert data into data extension.
+        
+        Args:
+            data_extension: Name of data extension
+            *field_value_pairs: Alternating field names and values
+            
+        Returns:
+            Number of rows inserted (1 on success, 0 on failure)
+        """
+        logger.warning(f"InsertData to {data_extension} called but not implemented")
+        return 0
+
+    @cost(EXPENSIVE)
+    def InsertDE(self, data_extension, *field_value_pairs):
+        """
+        Insert into data extension (alias for InsertData).
+        
+        Args:
+            data_extension: Name of data extension
+            *field_value_pairs: Alternating field names and values
+            
+        Returns:
+            Number of rows inserted
+        """
+        return self.InsertData(data_extension, *field_value_pairs)
+
+    @cost(EXPENSIVE)
+    def Lookup(self, data_extension, return_field, match_field, match_value):
+        """
+        Lookup single value from data extension.
+        
+        Args:
+            data_extension: Name of data extension
+            return_field: Field to return
+            match_field: Field to match
+            match_value: Value to match
+            
+        Returns:
+            Value from return_field of the first matching row, or None if
+            no row matches
+        """
+        rows = lookup_rows('Lookup', data_extension, (match_field, match_value))
+        if not rows:
+            return None
+        return ampdatastore.field_value(rows[0], return_field, None)
+
+    @cost(EXPENSIVE)
+    def LookupOrderedRows(self, data_extension, row_count, order_by, *match_pairs):
+        """
+        Lookup rows with ordering.
+        
+        Args:
+            data_extension: Name of data extension
+            row_count: Number of rows to return; 0 returns all
+            order_by: Sort fields, each optionally followed by ASC or DESC
+                (e.g. "Total DESC, Name")
+            *match_pairs: Alternating field names and values
+            
+        Returns:
+            List of matching rows as dictionaries
+        """
+        rows = lookup_rows('LookupOrderedRows', data_extension, match_pairs)
+        return ampdatastore.ordered(rows, order_by, row_count)
+
+    @cost(EXPENSIVE)
+    def LookupOrderedRowsCS(self, data_extension, row_count, order_by, *match_pairs):
+        """
+        Lookup rows with ordering (case-sensitive).
+        
+        Args:
+            data_extension: Name of data extension
+            row_count: Number of rows to return; 0 returns all
+            order_by: Sort fields, each optionally followed by ASC or DESC
+            *match_pairs: Alternating field names and values
+            
+        Returns:
+            List of matching rows as dictionaries
+        """
+        rows = lookup_rows('LookupOrderedRowsCS', data_extension, match_pairs, case_sensitive=True)
+        return ampdatastore.ordered(rows, order_by, row_count)
+
+    @cost(EXPENSIVE)
+    def LookupRows(self, data_extension, *match_pairs):
+        """
+        Lookup multiple rows from data extension.
+        
+        Args:
+            data_extension: Name of data extension
+            *match_pairs: Alternating field names and values (field1, value1, field2, value2, ...)
+            
+        Returns:
+            List of matching rows as dictionaries
+        """
+        return lookup_rows('LookupRows', data_extension, match_pairs)
+
+    @cost(EXPENSIVE)
+    def LookupRowsCS(self, data_extension, *match_pairs):
+        """
+        Lookup multiple rows from data extension (case-sensitive).
+        
+        Args:
+            data_extension: Name of data extension
+            *match_pairs: Alternating field names and values (field1, value1, field2, value2, ...)
+            
+        Returns:
+            List of matching rows as dictionaries
+        """
+        return lookup_rows('LookupRowsCS', data_extension, match_pairs, case_sensitive=True)
+
+    def Row(self, rowset, row_number):
+        """
+        Get specific row from rowset.
+        
+        Args:
+            rowset: Rowset from LookupRows or similar
+            row_number: Row index (1-based)
+            
+        Returns:
+            Dictionary representing the row or None
+        """
+        if isinstance(rowset, list) and 0 < row_number <= len(rowset):
+            return rowset[row_number - 1]
+        return None
+
+    def RowCount(self, rowset):
+        """
+        Get row count from rowset.
+        
+        Args:
+            rowset: Rowset from LookupRows or similar
+            
+        Returns:
+            Number of rows
+        """
+        if isinstance(rowset, list):
+            return len(rowset)
+        return 0
+
+    @cost(EXPENSIVE)
+    def UpdateData(self, data_extension, match_count, *field_value_pairs):
+        """
+        Update data in data extension.
+        
+        Args:
+            data_extension: Name of data extension
+            match_count: Number of match fields
+            *field_value_pairs: Alternating field names and values (first match_count pairs are match fields)
+            
+        Returns:
+            Number of rows updated
+        """
+        logger.warning(f"UpdateData on {data_extension} called but not implemented")
+        return 0
+
+    @cost(EXPENSIVE)
+    def UpdateDE(self, data_extension, match_count, *field_value_pairs):
+        """
+        Update data extension (alias for UpdateData).
+        
+        Args:
+            data_extension: Name of data extension
+            match_count: Number of match fields
+            *field_value_pairs: Alternating field names and values
+            
+        Returns:
+            Number of rows updated
+        """
+        return self.UpdateData(data_extension, match_count, *field_value_pairs)
+
+    @cost(EXPENSIVE)
+    def UpsertData(self, data_extension, match_count, *field_value_pairs):
+        """
+        Upsert (insert or update) data in data extension.
+        
+        Args:
+            data_extension: Name of data extension
+            match_count: Number of match fields
+            *field_value_pairs: Alternating field names and values
+            
+        Returns:
+            Number of rows affected
+        """
+        logger.warning(f"UpsertData on {data_extension} called but not implemented")
+        return 0
+
+    @cost(EXPENSIVE)
+    def UpsertDE(self, data_extension, match_count, *field_value_pairs):
+        """
+        Upsert into data extension (alias for UpsertData).
+        
+        Args:
+            data_extension: Name of data extension
+            match_count: Number of match fields
+            *field_value_pairs: Alternating field names and values
+            
+        Returns:
+            Number of rows affected
+        """
+        return self.UpsertData(data_extension, match_count, *field_value_pairs)
@@ -0,0 +1,180 @@
+# =============================================================================
+# ampfunctions/dates.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript date/time function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Date and time functions."""
+
+from datetime import datetime, timedelta
+
+from .annotations import pure, MODERATE
+
+
+class DateFunctions:
+    """Date and time functions of the AmpScript library."""
+
+    @pure(MODERATE)
+    def DateAdd(self, date_str, add_value, interval):
+        """
+        Add time interval to a date.
+
+        Args:
+            date_str: Date string
+            add_value: Amount to add
+            interval: Time interval ('Y', 'M', 'D', 'H', 'MI')
+
+        Returns:
+            New datetime after addition
+        """
+        date = datetime.strptime(date_str, '%m/%d/%y H:MI')
+
+        if interval == 'Y':
+            delta = timedelta(days=365 * add_value)
+        elif interval == 'M':
+            delta = timedelta(days=30 * add_value)
+        elif interval == 'D':
+            delta = timedelta(days=add_value)
+        elif interval == 'H':
+            delta = timedelta(hours=add_value)
+        elif interval == 'MI':
+            delta = timedelta(minutes=add_value)
+        else:
+            delta = timedelta(0)
+
+        return date + delta
+
+    @pure(MODERATE)
+    def DateDiff(self, date1, date2, interval='D'):
+        """
+        Calculate difference between dates.
+        
+        Args:
+            date1: First date (string or datetime)
+            date2: Second date (string or datetime)
+            interval: Time interval ('Y', 'M', 'D', 'H', 'MI', 'S')
+            
+        Returns:
+            Integer difference in specified interval
+        """
+        if isinstance(date1, str):
+            date1 = datetime.strptime(date1, '%m/%d/%Y')
+        if isinstance(date2, str):
+            date2 = datetime.strptime(date2, '%m/%d/%Y')
+        
+        delta = date1 - date2
+        
+        if interval == 'Y':
+            return delta.days // 365
+        elif interval == 'M':
+            return delta.days // 30
+        elif interval == 'D':
+            return delta.days
+        elif interval == 'H':
+            return int(delta.total_seconds() / 3600)
+        elif interval == 'MI':
+            return int(delta.total_seconds() / 60)
+        elif interval == 'S':
+            return int(delta.total_seconds())
+        return delta.days
+
+    @pure(MODERATE)
+    def DateParse(self, date_str, format_str=None):
+        """
+        Parse date string to datetime.
+        
+        Args:
+            date_str: Date string to parse
+            format_str: Optional format string
+            
+        Returns:
+            Datetime object
+        """
+        if format_str:
+            return datetime.strptime(date_str, format_str)
+        # Try common formats
+        for fmt in ['%m/%d/%Y', '%Y-%m-%d', '%m-%d-%Y', '%Y/%m/%d']:
+            try:
+                return datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
+        return None
+
+    @pure(MODERATE)
+    def DatePart(self, date, part='D'):
+        """
+        Extract date part.
+        
+        Args:
+            date: Date (string or datetime)
+            part: Part to extract ('Y', 'M', 'D', 'H', 'MI', 'S', 'DW', 'DOY')
+            
+        Returns:
+            Integer date part
+        """
+        if isinstance(date, str):
+            date = self.DateParse(date)
+        
+        if part == 'Y':
+            return date.year
+        elif part == 'M':
+            return date.month
+        elif part == 'D':
+            return date.day
+        elif part == 'H':
+            return date.hour
+        elif part == 'MI':
+            return date.minute
+        elif part == 'S':
+            return date.second
+        elif part == 'DW':  # Day of week (1=Monday, 7=Sunday)
+            return date.isoweekday()
+        elif part == 'DOY':  # Day of year
+            return date.timetuple().tm_yday
+        return None
+
+    def GetSendTime(self):
+        """
+        Get current send time.
+        
+        Returns:
+            Current datetime
+        """
+        return datetime.now()
+
+    def LocalDateToSystemDate(self, date_local):
+        """
+        Convert local datetime to system timezone.
+
+        Args:
+            date_local: Datetime in local timezone
+
+        Returns:
+            Datetime in system timezone
+        """
+        return date_local.astimezone(self.systemtimezone)
+
+    def Now(self):
+        """
+        Get current datetime.
+
+        Returns:
+            Current datetime
+        """
+        return datetime.now()
+
+    def SystemDateToLocalDate(self, date_system):
+        """
+        Convert system timezone datetime to local timezone.
+
+        Args:
+            date_system: Datetime in system timezone
+
+        Returns:
+            Datetime in local timezone
+        """
+        return date_system.astimezone(self.timezone)
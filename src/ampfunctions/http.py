@@ -0,0 +1,169 @@
+# =============================================================================
+# ampfunctions/http.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript HTTP function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""HTTP and URL functions."""
+
+import urllib.parse
+import logging
+
+from . import httpclient
+from .annotations import cost, pure, EXPENSIVE
+
+logger = logging.getLogger(__name__)
+
+
+def post(name, url, content_type, payload):
+    """
+    Send a POST request through the shared client.
+
+    Args:
+        name: Calling library function, for log messages
+        url: URL to request
+        content_type: Content-Type header (optional)
+        payload: Request body
+
+    Returns:
+        Response content
+    """
+    headers = {'Content-Type': content_type} if content_type else {}
+    response = httpclient.client().request('POST', url, str(payload), headers)
+    if response.status >= 400:
+        logger.warning(f"{name} to '{url}' returned status {response.status}")
+    return response.body
+
+
+class HttpFunctions:
+    """HTTP and URL functions of the AmpScript library."""
+
+    def HTTP(self):
+        """HTTP request (generic)."""
+        pass
+
+    @cost(EXPENSIVE)
+    def HTTPGet(self, url, set_output=True, set_status_code=True, set_headers=True):
+        """
+        Perform HTTP GET request.
+        
+        Args:
+            url: URL to request
+            set_output: Set output variable
+            set_status_code: Set status code variable
+            set_headers: Set headers variable
+            
+        Returns:
+            Response content
+
+        Raises:
+            RuntimeError: If the request fails
+        """
+        response = httpclient.client().request('GET', url)
+        if response.status >= 400:
+            logger.warning(f"HTTPGet to '{url}' returned status {response.status}")
+        return response.body
+
+    @cost(EXPENSIVE)
+    def HTTPPost(self, url, content_type='', payload='', set_output=True, set_status_code=True):
+        """
+        Perform HTTP POST request.
+        
+        Args:
+            url: URL to request
+            content_type: Content-Type header
+            payload: Request body
+            set_output: Set output variable
+            set_status_code: Set status code variable
+            
+        Returns:
+            Response content
+
+        Raises:
+            RuntimeError: If the request fails
+        """
+        return post('HTTPPost', url, content_type, payload)
+
+    @cost(EXPENSIVE)
+    def HTTPPost2(self, url, content_type='', payload='', set_output=True, set_status_code=True, set_headers=True):
+        """
+        Perform HTTP POST request (v2 with headers).
+        
+        Args:
+            url: URL to request
+            content_type: Content-Type header
+            payload: Request body
+            set_output: Set output variable
+            set_status_code: Set status code variable
+            set_headers: Set headers variable
+            
+        Returns:
+            Response content
+
+        Raises:
+            RuntimeError: If the request fails
+        """
+        return post('HTTPPost2', url, content_type, payload)
+
+    def HTTPRequestHeader(self):
+        """Set HTTP request header."""
+        pass
+
+    def IsCHTMLBrowser(self):
+        """Check if CHTML browser."""
+        pass
+
+    def RedirectTo(self, url):
+        """
+        Mark a link URL held in a variable, as in href="%%=RedirectTo(@url)=%%".
+
+        Args:
+            url: Link URL
+
+        Returns:
+            The URL, for the page to link to
+        """
+        return url
+
+    @pure()
+    def URLEncode(self, text, space_char='', prefix=''):
+        """
+        URL encode a string.
+
+        Args:
+            text: Text to encode
+            space_char: Character for spaces (default: '+')
+            prefix: URL prefix
+
+        Returns:
+            URL encoded string
+        """
+        return urllib.parse.quote_plus(text)
+
+    @pure()
+    def WrapLongURL(self, url, max_length=80, wrap_char='\n'):
+        """
+        Wrap long URL with line breaks.
+        
+        Args:
+            url: URL to wrap
+            max_length: Maximum line length
+            wrap_char: Character to use for wrapping
+            
+        Returns:
+            Wrapped URL
+        """
+        if len(url) <= max_length:
+            return url
+        
+        result = []
+        while len(url) > max_length:
+            result.append(url[:max_length])
+            url = url[max_length:]
+        if url:
+            result.append(url)
+        return wrap_char.join(result)
@@ -0,0 +1,425 @@
+# =============================================================================
+# ampfunctions/httpclient.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Pooled HTTP client with a response cache for the HTTP functions.
+# =============================================================================
+"""HTTP client behind HTTPGet, HTTPPost and HTTPPost2.
+
+Connections are kept alive and pooled per host (scheme, host and port),
+with a limit on concurrent connections to each host so that rendering many
+subscribers does not flood an internal API. GET responses are cached for
+the lifetime given by Cache-Control max-age; stale entries carrying an
+ETag or Last-Modified header are revalidated with a conditional request
+and reused on 304 Not Modified. The cache is shared by all renders, so
+entries are keyed on the URL together with the request headers that can
+change the response, and private responses are never stored.
+
+Only the standard library is used (http.client).
+"""
+
+import http.client
+import logging
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Defaults, see configure()
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_PER_HOST = 8
+DEFAULT_CACHE_ENTRIES = 1024
+
+# Request headers that may select a different response for the same URL;
+# they are part of the cache key
+VARYING_HEADERS = ('accept', 'accept-language', 'authorization', 'cookie')
+
+# Errors of a pooled connection the server closed while it sat idle
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError,
+)
+
+
+class Response:
+    """A complete HTTP response."""
+
+    def __init__(self, status, headers, body):
+        """
+        Initialize the response.
+
+        Args:
+            status: Status code
+            headers: Dictionary of lowercased header names to values
+            body: Decoded response body
+        """
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class ConnectionPool:
+    """Keep-alive connections to one host, at most max_size at a time."""
+
+    def __init__(self, scheme, host, port, max_size, timeout):
+        """
+        Initialize the pool.
+
+        Args:
+            scheme: 'http' or 'https'
+            host: Host name
+            port: Port, or None for the scheme default
+            max_size: Maximum concurrent connections to the host
+            timeout: Connect and read timeout in seconds
+        """
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.created = 0
+
+    def connect(self):
+        """Open a new connection."""
+        self.created += 1
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, target, body=None, headers=None):
+        """
+        Send a request on a pooled connection.
+
+        A reused connection the server has closed in the meantime is
+        replaced and the request retried once.
+
+        Args:
+            method: HTTP method
+            target: Path and query string
+            body: Request body bytes (optional)
+            headers: Request headers (optional)
+
+        Returns:
+            Response
+
+        Raises:
+            RuntimeError: If no connection slot frees up within the timeout
+            OSError, http.client.HTTPException: On network errors
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"No free connection to {self.host} within {self.timeout}s")
+        try:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            reused = conn is not None
+            if conn is None:
+                conn = self.connect()
+            try:
+                response, will_close = self.send(conn, method, target, body, headers)
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                conn = self.connect()
+                try:
+                    response, will_close = self.send(conn, method, target, body, headers)
+                except BaseException:
+                    conn.close()
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+            if will_close:
+                conn.close()
+            else:
+                with self.lock:
+                    self.idle.append(conn)
+            return response
+        finally:
+            self.slots.release()
+
+    def send(self, conn, method, target, body, headers):
+        """
+        Send one request and read the complete response.
+
+        Returns:
+            Tuple of (Response, will_close); will_close is True if the
+            server does not keep the connection alive
+        """
+        conn.request(method, target, body=body, headers=headers or {})
+        raw = conn.getresponse()
+        data = raw.read()
+        charset = raw.headers.get_content_charset() or 'utf-8'
+        response = Response(
+            raw.status,
+            {name.lower(): value for name, value in raw.getheaders()},
+            data.decode(charset, errors='replace'),
+        )
+        return response, raw.will_close
+
+    def close(self):
+        """Close all idle connections."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+class ResponseCache:
+    """LRU cache of GET responses honoring Cache-Control and validators."""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum cached responses; 0 disables caching
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # cache_key() -> (expires, response)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key: Cache key of the request, see cache_key()
+
+        Returns:
+            Tuple of (response, fresh); (None, False) if not cached
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None, False
+            self.entries.move_to_end(key)
+        expires, response = entry
+        return response, time.monotonic() < expires
+
+    def store(self, key, response):
+        """
+        Cache a response if its headers allow it.
+
+        Private responses are skipped, as are responses varying on request
+        headers the cache key does not include.
+
+        Args:
+            key: Cache key of the request, see cache_key()
+            response: Response to a GET request
+        """
+        if not self.max_entries or response.status != 200:
+            return
+        directives = cache_directives(response.headers.get('cache-control', ''))
+        if 'no-store' in directives or 'private' in directives:
+            return
+        vary = response.headers.get('vary', '')
+        if any(name.strip().lower() not in VARYING_HEADERS
+               for name in vary.split(',') if name.strip()):
+            return
+        max_age = 0
+        if 'no-cache' not in directives:
+            try:
+                max_age = int(directives.get('max-age', 0))
+            except (TypeError, ValueError):
+                max_age = 0
+        if max_age <= 0 and not validators(response):
+            # Neither fresh nor revalidatable: nothing to gain
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + max_age, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def refresh(self, key, response, headers):
+        """
+        Extend a cached response after a 304 Not Modified.
+
+        The cached response may be in use by other threads, so it is
+        replaced by a copy carrying the updated headers.
+
+        Args:
+            key: Cache key of the request, see cache_key()
+            response: Cached response
+            headers: Headers of the 304 response
+
+        Returns:
+            The refreshed Response
+        """
+        refreshed = Response(response.status, {**response.headers, **headers}, response.body)
+        self.store(key, refreshed)
+        return refreshed
+
+    def clear(self):
+        """Forget all cached responses."""
+        with self.lock:
+            self.entries.clear()
+
+
+def cache_key(url, headers):
+    """
+    Build the cache key of a GET request.
+
+    Args:
+        url: Request URL
+        headers: Request headers (optional)
+
+    Returns:
+        Tuple of the URL and the sorted (name, value) pairs of the request
+        headers listed in VARYING_HEADERS
+    """
+    selected = sorted(
+        (name.lower(), value) for name, value in (headers or {}).items()
+        if name.lower() in VARYING_HEADERS
+    )
+    return (url, tuple(selected))
+
+
+def cache_directives(value):
+    """
+    Parse a Cache-Control header.
+
+    Args:
+        value: Header value
+
+    Returns:
+        Dictionary of lowercased directive -> argument (None if absent)
+    """
+    directives = {}
+    for part in value.split(','):
+        name, _, argument = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def validators(response):
+    """Return conditional request headers revalidating a cached response."""
+    headers = {}
+    if 'etag' in response.headers:
+        headers['If-None-Match'] = response.headers['etag']
+    if 'last-modified' in response.headers:
+        headers['If-Modified-Since'] = response.headers['last-modified']
+    return headers
+
+
+class Client:
+    """HTTP client with per-host connection pools and a GET cache."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_per_host=DEFAULT_MAX_PER_HOST,
+                 cache_entries=DEFAULT_CACHE_ENTRIES):
+        """
+        Initialize the client.
+
+        Args:
+            timeout: Connect, read and pool wait timeout in seconds
+            max_per_host: Maximum concurrent connections per host
+            cache_entries: Maximum cached GET responses; 0 disables caching
+        """
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.cache = ResponseCache(cache_entries)
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def pool(self, scheme, host, port):
+        """Get the connection pool of a host, creating it on first use."""
+        key = (scheme, host, port)
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                pool = self.pools[key] = ConnectionPool(
+                    scheme, host, port, self.max_per_host, self.timeout
+                )
+        return pool
+
+    def request(self, method, url, body=None, headers=None):
+        """
+        Perform a request; GET requests go through the cache.
+
+        Args:
+            method: HTTP method
+            url: Absolute http or https URL
+            body: Request body (str or bytes, optional)
+            headers: Request headers (optional)
+
+        Returns:
+            Response
+
+        Raises:
+            RuntimeError: If the URL is not http(s) or the request fails
+        """
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise RuntimeError(f"Unsupported URL: {url}")
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        pool = self.pool(parts.scheme, parts.hostname, parts.port)
+
+        cached = None
+        if method == 'GET':
+            key = cache_key(url, headers)
+            cached, fresh = self.cache.get(key)
+            if fresh:
+                return cached
+            if cached is not None:
+                headers = {**(headers or {}), **validators(cached)}
+
+        try:
+            response = pool.request(method, target, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            raise RuntimeError(f"{method} {url} failed: {e}") from e
+
+        if method == 'GET':
+            if response.status == 304 and cached is not None:
+                return self.cache.refresh(key, cached, response.headers)
+            self.cache.store(key, response)
+        return response
+
+    def close(self):
+        """Close idle connections and clear the cache."""
+        with self.lock:
+            pools, self.pools = list(self.pools.values()), {}
+        for pool in pools:
+            pool.close()
+        self.cache.clear()
+
+
+# Client shared by all library instances
+_client = Client()
+
+
+def client():
+    """Return the shared client."""
+    return _client
+
+
+def configure(timeout=DEFAULT_TIMEOUT, max_per_host=DEFAULT_MAX_PER_HOST,
+              cache_entries=DEFAULT_CACHE_ENTRIES):
+    """
+    Replace the shared client, closing the previous one.
+
+    Args:
+        timeout: Connect, read and pool wait timeout in seconds
+        max_per_host: Maximum concurrent connections per host
+        cache_entries: Maximum cached GET responses; 0 disables caching
+
+    Returns:
+        The new client
+    """
+    global _client
+    previous = _client
+    _client = Client(timeout, max_per_host, cache_entries)
+    previous.close()
+    return _client
@@ -0,0 +1,114 @@
+# =============================================================================
+# ampfunctions/maths.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript math function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Math functions."""
+
+import json
+import random
+
+from .annotations import pure, MODERATE
+
+
+class MathFunctions:
+    """Math functions of the AmpScript library."""
+
+    @pure()
+    def Add(self, a, b):
+        """Add two numbers."""
+        return a + b
+
+    @pure()
+    def Divide(self, a, b):
+        """Divide two numbers."""
+        return a / b
+
+    @pure(MODERATE)
+    def FormatCurrency(self, num, iso='en_US', decimals=2, symbol=''):
+        """
+        Format number as currency.
+
+        Args:
+            num: Number to format
+            iso: ISO locale code
+            decimals: Number of decimal places
+            symbol: Currency symbol
+
+        Returns:
+            Formatted currency string
+        """
+        country_code = iso.split('_')[1] if '_' in iso else 'US'
+
+        try:
+            with open('../lib/locale.json', encoding='utf-8') as f:
+                currencies = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            currencies = []
+
+        format_str = f"{{:,.{decimals}f}}" if decimals else "{:,.0f}"
+
+        if symbol:
+            format_str = symbol + format_str
+        else:
+            for currency in currencies:
+                if currency.get('country') == country_code:
+                    format_str = currency.get('symbol', '') + format_str
+                    break
+
+        return format_str.format(num)
+
+    @pure(MODERATE)
+    def FormatNumber(self, num, decimals=0, decimal_sep='.', thousands_sep=','):
+        """
+        Format number with thousands separator and decimals.
+        
+        Args:
+            num: Number to format
+            decimals: Number of decimal places
+            decimal_sep: Decimal separator
+            thousands_sep: Thousands separator
+            
+        Returns:
+            Formatted number string
+        """
+        format_str = f"{{:,.{decimals}f}}"
+        result = format_str.format(float(num))
+        if decimal_sep != '.' or thousands_sep != ',':
+            result = result.replace(',', '|TEMP|')
+            result = result.replace('.', decimal_sep)
+            result = result.replace('|TEMP|', thousands_sep)
+        return result
+
+    @pure()
+    def Mod(self, a, b):
+        """Modulo operation."""
+        return a % b
+
+    @pure()
+    def Multiply(self, a, b):
+        """Multiply two numbers."""
+        return a * b
+
+    def Random(self, min_val, max_val):
+        """
+        Generate random integer.
+
+        Args:
+            min_val: Minimum value (inclusive)
+            max_val: Maximum value (inclusive)
+
+        Returns:
+            Random integer
+        """
+        return random.randint(min_val, max_val)
+
+    @pure()
+    def Subtract(self, a, b):
+        """Subtract two numbers."""
+        return a - b
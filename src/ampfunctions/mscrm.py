@@ -0,0 +1,52 @@
+# =============================================================================
+# ampfunctions/mscrm.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript Microsoft CRM function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Microsoft Dynamics CRM functions."""
+
+
+class MscrmFunctions:
+    """Microsoft Dynamics CRM functions of the AmpScript library."""
+
+    def AddMscrmListMember(self, name, num, attrname, attrvalue,
+                          addattrname, addattrvalue):
+        """Add member to MSCRM list."""
+        pass
+
+    def CreateMscrmRecord(self):
+        """Create MSCRM record."""
+        pass
+
+    def DescribeMscrmEntities(self):
+        """Describe MSCRM entities."""
+        pass
+
+    def DescribeMscrmEntityAttributes(self):
+        """Describe MSCRM entity attributes."""
+        pass
+
+    def RetrieveMscrmRecords(self):
+        """Retrieve MSCRM records."""
+        pass
+
+    def RetrieveMscrmRecordsFetchXML(self):
+        """Retrieve MSCRM records with FetchXML."""
+        pass
+
+    def SetStateMscrmRecord(self):
+        """Set state of MSCRM record."""
+        pass
+
+    def UpdateMscrmRecords(self):
+        """Update MSCRM records."""
+        pass
+
+    def UpsertMscrmRecord(self):
+        """Upsert MSCRM record."""
+        pass
@@ -0,0 +1,90 @@
+# =============================================================================
+# ampfunctions/objects.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript object and invoke function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Object and API invoke functions."""
+
+
+class ObjectFunctions:
+    """Object and API invoke functions of the AmpScript library."""
+
+    def AddObjectArrayItem(self, obj, array_name, item):
+        """
+        Add item to object array property.
+        
+        Args:
+            obj: Object dictionary
+            array_name: Array property name
+            item: Item to add
+        """
+        if isinstance(obj, dict):
+            if array_name not in obj:
+                obj[array_name] = []
+            if isinstance(obj[array_name], list):
+                obj[array_name].append(item)
+
+    def CreateObject(self, object_type):
+        """
+        Create a new API object.
+        
+        Args:
+            object_type: Type of object to create (e.g., 'Email', 'Subscriber')
+            
+        Returns:
+            Empty dictionary representing the object
+        """
+        return {'ObjectType': object_type}
+
+    def InvokeCreate(self):
+        """Invoke create operation."""
+        pass
+
+    def InvokeDelete(self):
+        """Invoke delete operation."""
+        pass
+
+    def InvokeExecute(self):
+        """Invoke execute operation."""
+        pass
+
+    def InvokePerform(self):
+        """Invoke perform operation."""
+        pass
+
+    def InvokeRetrieve(self):
+        """Invoke retrieve operation."""
+        pass
+
+    def InvokeUpdate(self):
+        """Invoke update operation."""
+        pass
+
+    def RaiseError(self, error_msg):
+        """
+        Raise an error with a message.
+
+        Args:
+            error_msg: Error message string
+
+        Raises:
+            RuntimeError: Always raises with provided message
+        """
+        raise RuntimeError(error_msg)
+
+    def SetObjectProperty(self, obj, property_name, property_value):
+        """
+        Set object property.
+        
+        Args:
+            obj: Object dictionary
+            property_name: Property name
+            property_value: Property value
+        """
+        if isinstance(obj, dict):
+            obj[property_name] = property_value
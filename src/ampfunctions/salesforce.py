@@ -0,0 +1,48 @@
+# =============================================================================
+# ampfunctions/salesforce.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript Salesforce function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Salesforce functions."""
+
+
+from lib import utils
+from .annotations import pure, MODERATE
+
+
+class SalesforceFunctions:
+    """Salesforce functions of the AmpScript library."""
+
+    def CreateSalesforceObject(self):
+        """Create Salesforce object."""
+        pass
+
+    @pure(MODERATE)
+    def LongSFID(self, salesforce_id):
+        """
+        Convert Salesforce 15-character ID to 18-character ID.
+
+        Args:
+            salesforce_id: 15-character Salesforce ID
+
+        Returns:
+            18-character Salesforce ID
+        """
+        return utils.convert_salesforce_15_to_18(salesforce_id)
+
+    def RetrieveSalesforceJobSources(self):
+        """Retrieve Salesforce job sources."""
+        pass
+
+    def RetrieveSalesforceObjects(self):
+        """Retrieve Salesforce objects."""
+        pass
+
+    def UpdateSingleSalesforceObject(self):
+        """Update single Salesforce object."""
+        pass
@@ -0,0 +1,161 @@
+# =============================================================================
+# ampfunctions/sites.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript user/personalization function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""User, personalization and CloudPages functions."""
+
+import urllib.parse
+import logging
+
+from .. import ampcontext
+
+logger = logging.getLogger(__name__)
+
+
+class SiteFunctions:
+    """User, personalization and CloudPages functions of the AmpScript library."""
+
+    def AuthenticatedEmployeeID(self):
+        """Get authenticated employee ID."""
+        pass
+
+    def AuthenticatedEmployeeNotificationAddress(self):
+        """Get authenticated employee notification address."""
+        pass
+
+    def AuthenticatedEmployeeUserName(self):
+        """Get authenticated employee username."""
+        pass
+
+    def AuthenticatedEnterpriseID(self):
+        """Get authenticated enterprise ID."""
+        pass
+
+    def AuthenticatedMemberID(self):
+        """Get authenticated member ID."""
+        pass
+
+    def AuthenticatedMemberName(self):
+        """Get authenticated member name."""
+        pass
+
+    def CloudPagesURL(self, page_id, *query_params):
+        """
+        Get Cloud Pages URL.
+        
+        Args:
+            page_id: Page ID or key
+            *query_params: Query string parameters (key, value pairs)
+            
+        Returns:
+            Cloud Pages URL
+        """
+        url = f"https://example.cloudpagesurl.com/page/{page_id}"
+        if query_params:
+            params = []
+            for i in range(0, len(query_params), 2):
+                if i + 1 < len(query_params):
+                    params.append(f"{query_params[i]}={urllib.parse.quote_plus(str(query_params[i+1]))}")
+            if params:
+                url += '?' + '&'.join(params)
+        return url
+
+    def IIf(self, condition, true_value, false_value):
+        """
+        Inline if (ternary operator).
+        
+        Args:
+            condition: Condition to evaluate
+            true_value: Value if true
+            false_value: Value if false
+            
+        Returns:
+            true_value if condition else false_value
+        """
+        return true_value if condition else false_value
+
+    def IsNullDefault(self, value, default_value):
+        """
+        Return default if value is null.
+        
+        Args:
+            value: Value to check
+            default_value: Default value if null
+            
+        Returns:
+            value if not None, else default_value
+        """
+        return default_value if value is None else value
+
+    def LiveContentMicrositeURL(self):
+        """Get live content microsite URL."""
+        pass
+
+    def MicrositeURL(self, page_name):
+        """
+        Get microsite URL.
+        
+        Args:
+            page_name: Page name
+            
+        Returns:
+            Microsite URL
+        """
+        return f"https://example.microsite.com/{page_name}"
+
+    def QueryParameter(self, param_name, default=''):
+        """
+        Get query string parameter.
+        
+        Args:
+            param_name: Parameter name
+            default: Default value if not found
+            
+        Returns:
+            Parameter value or default
+        """
+        request = ampcontext.current_request()
+        if request is None:
+            logger.warning(f"QueryParameter '{param_name}' called outside a request")
+            return default
+        return request.query_parameter(param_name, default)
+
+    def Redirect(self, url, use_301=False):
+        """
+        Redirect to URL.
+        
+        The page server answers with the redirect instead of the page.
+
+        Args:
+            url: URL to redirect to
+            use_301: Use 301 permanent redirect if True
+        """
+        request = ampcontext.current_request()
+        if request is None:
+            logger.warning(f"Redirect to '{url}' called outside a request")
+            return
+        permanent = use_301 and str(use_301).lower() != 'false'
+        request.redirect = (str(url), 301 if permanent else 302)
+
+    def RequestParameter(self, param_name, default=''):
+        """
+        Get request parameter (POST or GET).
+        
+        Args:
+            param_name: Parameter name
+            default: Default value if not found
+            
+        Returns:
+            Parameter value or default
+        """
+        request = ampcontext.current_request()
+        if request is None:
+            logger.warning(f"RequestParameter '{param_name}' called outside a request")
+            return default
+        return request.parameter(param_name, default)
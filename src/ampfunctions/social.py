@@ -0,0 +1,31 @@
+# =============================================================================
+# ampfunctions/social.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript social function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Social functions."""
+
+
+class SocialFunctions:
+    """Social functions of the AmpScript library."""
+
+    def Social(self):
+        """Social functionality."""
+        pass
+
+    def GetPublishedSocialContent(self):
+        """Get published social content."""
+        pass
+
+    def GetSocialPublishURL(self):
+        """Get social publish URL."""
+        pass
+
+    def GetSocialPublishURLByName(self):
+        """Get social publish URL by name."""
+        pass
@@ -0,0 +1,263 @@
+# =============================================================================
+# ampfunctions/strings.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript string function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""String functions."""
+
+import re
+from datetime import datetime
+
+from lib import utils
+from .annotations import pure, MODERATE
+
+
+class StringFunctions:
+    """String functions of the AmpScript library."""
+
+    @pure()
+    def String(self, value):
+        """
+        Convert value to string.
+
+        Args:
+            value: Value to convert
+
+        Returns:
+            String representation
+        """
+        return str(value)
+
+    @pure()
+    def Char(self, char_code, count=1):
+        """
+        Get character(s) from character code.
+
+        Args:
+            char_code: Character code
+            count: Number of repetitions
+
+        Returns:
+            Character string repeated count times
+        """
+        return chr(char_code) * count
+
+    @pure()
+    def Concat(self, *args):
+        """
+        Concatenate strings.
+
+        Args:
+            *args: Variable number of strings
+
+        Returns:
+            Concatenated string
+        """
+        return ''.join(str(arg) for arg in args)
+
+    @pure(MODERATE, literal=(1,))
+    def Format(self, text, format_str, identifier='Date', iso=''):
+        """
+        Format string.
+
+        Args:
+            text: Text to format
+            format_str: Format string
+            identifier: Format type ('Date' or other)
+            iso: ISO code
+
+        Returns:
+            Formatted string
+        """
+        if identifier == 'Date':
+            return datetime.strptime(
+                text,
+                utils.convert_csharp_date_format(format_str)
+            )
+        else:
+            return text.format(format_str)
+
+    @pure()
+    def IndexOf(self, text, search_str):
+        """
+        Find index of substring.
+
+        Args:
+            text: Text to search
+            search_str: Substring to find
+
+        Returns:
+            Index of substring (-1 if not found)
+        """
+        return text.find(search_str)
+
+    @pure()
+    def Length(self, text):
+        """
+        Get string length.
+
+        Args:
+            text: String
+
+        Returns:
+            Length of string
+        """
+        return len(text)
+
+    @pure()
+    def Lowercase(self, text):
+        """
+        Convert to lowercase.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            Lowercase text
+        """
+        return text.lower()
+
+    @pure()
+    def ProperCase(self, text):
+        """
+        Convert to title case.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            Title case text
+        """
+        return text.title()
+
+    @pure(MODERATE)
+    def RegExMatch(self, text, regex):
+        """
+        Match text against regex.
+
+        Args:
+            text: Text to match
+            regex: Regular expression
+
+        Returns:
+            Match object or None
+        """
+        return re.search(regex, text)
+
+    @pure()
+    def Replace(self, text, target, replacement):
+        """
+        Replace substring.
+
+        Args:
+            text: Original text
+            target: Substring to replace
+            replacement: Replacement text
+
+        Returns:
+            Text with replacement made
+        """
+        return text.replace(target, replacement)
+
+    @pure()
+    def ReplaceList(self, text, replacement, *targets):
+        """
+        Replace multiple substrings.
+
+        Args:
+            text: Original text
+            replacement: Replacement text
+            *targets: Substrings to replace
+
+        Returns:
+            Text with replacements made
+        """
+        result = text
+        for target in targets:
+            result = result.replace(target, replacement)
+        return result
+
+    @pure(MODERATE)
+    def StringToDate(self, date_str, format_str='M/d/yyyy'):
+        """
+        Convert string to datetime.
+        
+        Args:
+            date_str: Date string
+            format_str: Format string (C# style)
+            
+        Returns:
+            Datetime object
+        """
+        # Convert C# format to Python format
+        py_format = format_str.replace('yyyy', '%Y').replace('yy', '%y')
+        py_format = py_format.replace('MM', '%m').replace('M', '%-m')
+        py_format = py_format.replace('dd', '%d').replace('d', '%-d')
+        py_format = py_format.replace('HH', '%H').replace('H', '%-H')
+        py_format = py_format.replace('mm', '%M').replace('m', '%-M')
+        py_format = py_format.replace('ss', '%S').replace('s', '%-S')
+        try:
+            return datetime.strptime(date_str, py_format)
+        except ValueError:
+            return self.DateParse(date_str)
+
+    @pure()
+    def StringToHex(self, value):
+        """
+        Convert string to hex.
+
+        Args:
+            value: Value to convert
+
+        Returns:
+            Tuple of (hex_string, int_value)
+        """
+        convert_string = int(value, base=16)
+        convert_hex = hex(convert_string)
+        return convert_hex, convert_string
+
+    @pure()
+    def Substring(self, text, pos, length):
+        """
+        Extract substring.
+
+        Args:
+            text: Original text
+            pos: Starting position
+            length: Length of substring
+
+        Returns:
+            Substring
+        """
+        return text[pos:pos + length]
+
+    @pure()
+    def Trim(self, text):
+        """
+        Trim whitespace.
+
+        Args:
+            text: Text to trim
+
+        Returns:
+            Text with leading/trailing whitespace removed
+        """
+        return text.strip()
+
+    @pure()
+    def Uppercase(self, text):
+        """
+        Convert to uppercase.
+
+        Args:
+            text: Text to convert
+
+        Returns:
+            Uppercase text
+        """
+        return text.upper()
@@ -0,0 +1,144 @@
+# =============================================================================
+# ampfunctions/validation.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AmpScript validation function implementations.
+# Reference: https://ampscript.guide/
+# =============================================================================
+"""Validation and output functions."""
+
+import re
+import logging
+
+from .. import ampbudget, ampcontext
+from .annotations import pure, MODERATE
+
+logger = logging.getLogger(__name__)
+
+
+class ValidationFunctions:
+    """Validation and output functions of the AmpScript library."""
+
+    def AttributeValue(self, attribute_name):
+        """
+        Get attribute value from subscriber.
+        
+        Args:
+            attribute_name: Attribute name (case-insensitive)
+            
+        Returns:
+            Attribute value from the render context, or None
+        """
+        if ampcontext.current() is None:
+            logger.warning(f"AttributeValue '{attribute_name}' called without a subscriber context")
+            return None
+        return ampcontext.attribute(attribute_name)
+
+    @pure()
+    def Domain(self, email_address):
+        """
+        Extract domain from email address.
+        
+        Args:
+            email_address: Email address
+            
+        Returns:
+            Domain portion of email
+        """
+        if '@' in email_address:
+            return email_address.split('@')[1]
+        return ''
+
+    @pure()
+    def Empty(self, text):
+        """
+        Check if string is empty.
+
+        Args:
+            text: Text to check
+
+        Returns:
+            True if empty, False otherwise
+        """
+        return len(text) == 0
+
+    @pure(MODERATE)
+    def IsEmailAddress(self, text):
+        """
+        Validate email address.
+
+        Args:
+            text: Email address to validate
+
+        Returns:
+            True if valid email, False otherwise
+        """
+        pattern = r'^[\w\-\.]+@([\w\-]+\.)+[\w\-]{2,4}$'
+        return bool(re.search(pattern, text))
+
+    @pure()
+    def IsNull(self, value):
+        """
+        Check if value is null.
+
+        Args:
+            value: Value to check
+
+        Returns:
+            True if None, False otherwise
+        """
+        return value is None
+
+    @pure(MODERATE)
+    def IsPhoneNumber(self, text):
+        """
+        Validate phone number.
+
+        Args:
+            text: Phone number to validate
+
+        Returns:
+            True if valid phone, False otherwise
+        """
+        pattern = r'^[\+]?[(]?[0-9]{3}[)]?[-\s\.]?[0-9]{3}[-\s\.]?[0-9]{4,6}$'
+        return bool(re.search(pattern, text))
+
+    def Output(self, text):
+        """
+        Output text (print).
+
+        Args:
+            text: Text to output
+        """
+        ampbudget.write(text)
+
+    def OutputLine(self, text):
+        """
+        Output text with newline.
+
+        Args:
+            text: Text to output
+        """
+        ampbudget.write(text)
+
+    def V(self, text):
+        """
+        Output value (print).
+
+        Args:
+            text: Value to output
+        """
+        ampbudget.write(text)
+
+    def Write(self, text):
+        """
+        Write text to output (JavaScript Write function).
+        Converts any type to string for output, matching JavaScript behavior.
+
+        Args:
+            text: Value to write (will be converted to string)
+        """
+        ampbudget.write(str(text), end='')
@@ -10,24 +10,50 @@
 """Interpreter for executing AmpScript AST."""
 
 import logging
-from . import ampfunctions, ampyacc
+import operator
+from . import ampbudget, ampfunctions, ampyacc
+from .ampast import is_sequence, statements, transform
 
 
 logger = logging.getLogger(__name__)
 
+# Arithmetic operators; AND/OR are handled separately to short-circuit
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': lambda lhs, rhs: float(lhs) / rhs,
+}
+
+RELATIONAL_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
 
 class AmpInterpreter:
     """Interpreter for executing AmpScript AST."""
 
-    def __init__(self, prog):
+    def __init__(self, prog, budget=None, profiler=None, functions=None):
         """
         Initialize the interpreter with a program dictionary.
 
         Args:
-            prog: Dictionary containing (line, statement) mappings
+            prog: Dictionary containing (line, statement) mappings, appended
+                to the statement log in line order
+            budget: ampbudget.Budget limiting each interpret() call (optional)
+            profiler: ampprofiler.Profiler recording statement and function
+                times (optional)
+            functions: ampfunctions.func instance to call, e.g. one shared by
+                a batch so memoized results are reused (optional)
         """
-        self.prog = prog
-        self.functions = ampfunctions.func()
+        self.functions = ampfunctions.func() if functions is None else functions
+        self.budget = budget
+        self.profiler = profiler
 
         self.vars = {}          # All variables
         self.lists = {}         # List variables
@@ -35,7 +61,41 @@ class AmpInterpreter:
         self.loops = []         # Currently active loop stack
         self.loopend = {}       # Loop end conditions
         self.error = 0          # Error flag
-        self.pc = 0             # Program counter
+        self.pc = 0             # Index of the next statement to execute
+        self.prog = []          # Append-only statement log
+        for line in sorted(prog):
+            self.add_statements(prog[line])
+
+    def bind(self, tree):
+        """
+        Resolve every function call site in a tree to a bound callable.
+
+        FUNC nodes are rewritten to ('CALL', name, callable, args) so that
+        executing a call is a single direct invocation. Names are matched
+        case-insensitively and the argument count is checked once here.
+
+        Args:
+            tree: AST node
+
+        Returns:
+            Tree with FUNC nodes replaced by CALL nodes
+
+        Raises:
+            RuntimeError: If a function is undefined or called with a wrong
+                number of arguments
+        """
+        def visit(node):
+            if node and node[0] == 'FUNC':
+                args = node[2][1:]
+                try:
+                    func = self.functions.resolve(node[1], len(args))
+                except RuntimeError as err:
+                    logger.error("INVALID CALL TO %s AT LINE %s: %s", node[1], self.pc, err)
+                    raise
+                return ('CALL', ampfunctions.canonical_name(node[1]), func, args)
+            return node
+
+        return transform(tree, visit)
 
     def eval(self, expr):
         """
@@ -52,43 +112,40 @@ class AmpInterpreter:
 
         etype = expr[0]
 
-        if etype == 'GROUP':
+        if etype == 'CALL':
+            args = [self.eval(arg) for arg in expr[3]]
+            if self.profiler is None:
+                return expr[2](*args)
+            self.profiler.enter(('func', expr[1]))
+            try:
+                return expr[2](*args)
+            finally:
+                self.profiler.exit()
+        elif etype == 'GROUP':
             return self.eval(expr[1])
         elif etype == 'UNARY':
             if expr[1] == '-':
                 return -self.eval(expr[2])
         elif etype == 'RELOP':
-            return str(eval(f'{self.eval(expr[2])} {expr[1]} {self.eval(expr[3])}'))
+            return self.releval(expr)
         elif etype == 'BINOP':
-            if expr[1] == '+':
-                return self.eval(expr[2]) + self.eval(expr[3])
-            elif expr[1] == '-':
-                return self.eval(expr[2]) - self.eval(expr[3])
-            elif expr[1] == '*':
-                return self.eval(expr[2]) * self.eval(expr[3])
-            elif expr[1] == '/':
-                return float(self.eval(expr[2])) / self.eval(expr[3])
+            op = expr[1]
+            if op == 'AND':
+                return self.eval(expr[2]) and self.eval(expr[3])
+            elif op == 'OR':
+                return self.eval(expr[2]) or self.eval(expr[3])
+            return BINARY_OPERATORS[op](self.eval(expr[2]), self.eval(expr[3]))
         elif etype == 'FUNC':
-            var = expr[1]
-            if hasattr(self.functions, var):
-                func = getattr(self.functions, var)
-                return func(self.eval(expr[2]))
-            else:
-                logger.error("UNDEFINED FUNCTION %s AT LINE %s", var, self.pc)
-                raise RuntimeError(f"Undefined function: {var}")
+            return self.eval(self.bind(expr))
         elif etype == 'INT':
             return int(expr[1])
         elif etype == 'STR':
             return str(expr[1])
+        elif etype == 'BOOL':
+            return bool(expr[1])
         elif etype == '@':
             if expr[1] in self.vars:
-                value = self.vars[expr[1]]
-                if isinstance(value, int):
-                    return int(value)
-                elif isinstance(value, str):
-                    return str(value)
-                elif isinstance(value, float):
-                    return float(value)
+                return self.vars[expr[1]]
             else:
                 logger.error("UNDEFINED VARIABLE @%s AT LINE %s", expr[1], self.pc)
                 raise RuntimeError(f"Undefined variable: @{expr[1]}")
@@ -105,7 +162,7 @@ class AmpInterpreter:
         """
         lhs = self.eval(expr[2])
         rhs = self.eval(expr[3])
-        return eval(f"{lhs} {expr[1]} {rhs}")
+        return RELATIONAL_OPERATORS[expr[1]](lhs, rhs)
 
     def assign(self, target, value):
         """
@@ -145,18 +202,55 @@ class AmpInterpreter:
         return result
 
     def interpret(self):
-        """Execute the program statements in order."""
-        self.stat = list(self.prog)  # Ordered list of all line numbers
-        self.stat.sort()
+        """
+        Execute the statements added since the last call.
 
+        Statements already executed are never revisited, so each call costs
+        only the new statements regardless of how long the session is.
+        """
         if self.error:
             raise RuntimeError("Previous error detected")
 
-        line = self.stat[self.pc]
-        instr = self.prog[line]
+        with ampbudget.running(self.budget):
+            while self.pc < len(self.prog):
+                instr = self.prog[self.pc]
+                self.pc += 1
+                self.execute(instr)
+
+    def execute(self, instr):
+        """
+        Execute a statement or a sequence of statements.
+
+        Args:
+            instr: Statement tuple or nested statement sequence
+        """
+        if instr is None:
+            return
+        if is_sequence(instr):
+            for statement in statements(instr):
+                self.execute(statement)
+            return
+
+        lineno = getattr(instr, 'lineno', None)
+        if self.profiler is None or lineno is None:
+            self.execute_statement(instr)
+            return
+        self.profiler.enter(('line', lineno))
+        try:
+            self.execute_statement(instr)
+        finally:
+            self.profiler.exit()
+
+    def execute_statement(self, instr):
+        """
+        Execute a single statement.
 
+        Args:
+            instr: Statement tuple
+        """
         op = instr[0]
-        self.pc += 1
+        if self.budget is not None:
+            self.budget.instruction()
 
         if op == 'VAR':
             if isinstance(instr[1], tuple):
@@ -177,88 +271,79 @@ class AmpInterpreter:
                 raise RuntimeError(f"Undefined variable: @{instr[1]}")
         elif op == '@':
             if instr[1] in self.vars:
-                print(self.vars[instr[1]])
+                ampbudget.write(self.vars[instr[1]])
             else:
                 logger.error("UNRECOGNISED VARIABLE @%s AT LINE %s", instr[1], self.pc)
                 raise RuntimeError(f"Unrecognised variable: @{instr[1]}")
         elif op == 'IF':
-            relop = instr[1]
-            newline = instr[2]
-            output = ''
-            output += f"if {self.releval(relop)}: \n"
-            output += self.loop(newline)
-            exec(output)
-        elif op == 'IFELSEIF':
-            output = ''
-            output += f"if {self.releval(instr[1])}: \n"
-            output += f"{self.loop(instr[2])} \n"
-            output += f"{self.loop(instr[3])} \n"
-            output += f"else: \n"
-            output += f"{self.loop(instr[4])} \n"
-            exec(output)
+            if self.eval(instr[1]):
+                self.execute(instr[2])
         elif op == 'IFELSE':
-            output = ''
-            output += f"if {self.releval(instr[1])}: \n"
-            output += f"{self.loop(instr[2])}"
-            output += f"else: \n"
-            output += f"{self.loop(instr[3])}"
-            exec(output)
+            if self.eval(instr[1]):
+                self.execute(instr[2])
+            elif isinstance(instr[3], tuple) and instr[3][0] == 'ELSEIFCHAIN':
+                if not self.execute_elseif(instr[3][1]):
+                    self.execute(instr[3][2])
+            else:
+                self.execute(instr[3])
         elif op == 'FOR':
             loopvar = instr[1]
             initval = instr[2]
             finval = instr[4]
-            stepval = instr[5]
+            body = instr[5]
             nextval = instr[6]
             direction = instr[3]
 
+            if loopvar != nextval:
+                logger.error("UNRECOGNISED NEXT VARIABLE @%s AT LINE %s", nextval, self.pc)
+                raise RuntimeError(f"Unrecognised next variable: @{nextval}")
+
             if loopvar not in self.vars:
                 self.assign(loopvar, None)
 
-            if loopvar != nextval:
-                logger.error("UNRECOGNISED NEXT VARIABLE @%s AT LINE %s", finval, self.pc)
-                raise RuntimeError(f"Unrecognised next variable: @{finval}")
-
             self.assign(loopvar, initval)
-            if not stepval:
-                stepval = ('INT', 1)
+            final = self.eval(finval)
 
+            budget = self.budget
             if direction == 'TO':
-                while self.vars[loopvar] < self.eval(finval):
-                    self.eval(stepval)
+                while self.vars[loopvar] < final:
+                    self.execute(body)
                     self.vars[loopvar] += 1
+                    if budget is not None:
+                        budget.iteration()
             elif direction == 'DOWNTO':
-                while self.vars[loopvar] > self.eval(finval):
-                    self.eval(stepval)
+                while self.vars[loopvar] > final:
+                    self.execute(body)
                     self.vars[loopvar] -= 1
+                    if budget is not None:
+                        budget.iteration()
             del self.vars[loopvar]
         else:
             result = self.eval(instr)
             if result:
-                print(result)
+                ampbudget.write(result)
 
-    def loop(self, element, output_str=""):
+    def execute_elseif(self, chain):
         """
-        Process loop body statements.
+        Execute the first ELSEIF branch whose condition holds.
 
         Args:
-            element: Loop body element from AST
-            output_str: Accumulated output string
+            chain: ('ELSEIF', cond, body) or ('ELSEIF', chain, cond, body)
 
         Returns:
-            Generated Python code string
+            True if a branch was taken, False otherwise
         """
-        if isinstance(element[0], tuple):
-            output_str += self.loop(element[0], output_str)
-            output_str += self.loop(element[1], output_str)
+        if len(chain) == 4:
+            if self.execute_elseif(chain[1]):
+                return True
+            cond, body = chain[2], chain[3]
         else:
-            op = element[0]
+            cond, body = chain[1], chain[2]
 
-            if op == 'ELSEIF':
-                output_str += f"elif {self.releval(element[1])}: \n"
-                output_str += f"\t{self.eval(element[2])} \n"
-            elif op == 'FUNC':
-                output_str = f"\tgetattr(ampfunctions,'{element[1]}')({self.var_str(element[2])})\n"
-        return output_str
+        if self.eval(cond):
+            self.execute(body)
+            return True
+        return False
 
     def expr_str(self, expr):
         """
@@ -299,13 +384,16 @@ class AmpInterpreter:
 
     def new(self):
         """Clear the program."""
-        self.prog = {}
+        self.prog = []
+        self.pc = 0
 
-    def add_statements(self, prog):
+    def add_statements(self, prog, bound=False):
         """
-        Add statements to the program.
+        Append statements to the program.
 
         Args:
             prog: Statement tuple to add
+            bound: prog is already the result of bind() by an interpreter
+                sharing this one's library instance
         """
-        self.prog[len(self.prog)] = prog
\ No newline at end of file
+        self.prog.append(prog if bound else self.bind(prog))
\ No newline at end of file
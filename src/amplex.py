@@ -7,7 +7,18 @@
 #
 # Lexical analyzer for AmpScript language using PLY.
 # =============================================================================
-"""Tokenizer for AmpScript language using PLY lexer."""
+"""Tokenizer for AmpScript language.
+
+Two lexers produce the same tokens: the PLY lexer built from the t_ rules
+below, and Scanner, which matches all rules with one compiled alternation
+and dispatches on the name of the matching group instead of calling a
+Python function per token. select() chooses the lexer the parser uses:
+
+    amplex.select('scanner')
+"""
+
+import functools
+import re
 
 import ply.lex as lex
 
@@ -46,6 +57,8 @@ def t_NUMBER(token):
 
 def t_STRING(token):
     r'"[^"]*"'
+    # Strings may span lines
+    token.lexer.lineno += token.value.count("\n")
     # Remove quotes and store the content
     token.value = str(token.value[1:-1])
     return token
@@ -62,13 +75,23 @@ def t_newline(token):
 
 def t_error(token):
     """Handle illegal characters."""
-    print("Illegal character '%s'" % token.value[0])
+    report_illegal(token.lexer, token.value[0], token.lexpos)
     token.lexer.skip(1)
 
 
+def report_illegal(lexer, character, lexpos):
+    """Report a skipped illegal character of either lexer."""
+    print("Illegal character '%s'" % character)
+    # Collected for ampyacc.errors() when the parser set up the list
+    illegal = getattr(lexer, 'illegal', None)
+    if illegal is not None:
+        illegal.append((character, lexer.lineno, lexpos))
+
+
 def t_COMMENT(token):
-    r'\/\*.*?\*\/'
-    pass
+    r'\/\*[\s\S]*?\*\/'
+    # Comments may span lines
+    token.lexer.lineno += token.value.count("\n")
 
 
 # Comparison and assignment operators
@@ -89,3 +112,180 @@ t_SCLOSE = r'\=\%\%'
 lexer = lex.lex()
 
 
+def master_pattern():
+    """
+    Build the Scanner's alternation from the rules of the PLY lexer.
+
+    The alternatives keep PLY's order: function rules in definition order,
+    string rules by decreasing regex length, then literals and a
+    catch-all for illegal characters, so every match is the text PLY
+    would match at that position. Ignored characters before a token are
+    captured separately.
+
+    Returns:
+        Compiled pattern with two groups: ignored characters, token text
+    """
+    functions = [t_NAME, t_NUMBER, t_STRING, t_newline, t_COMMENT]
+    rules = ([function.__doc__ for function in functions]
+             + [regex for _, regex in string_rules()]
+             + ['[' + re.escape(''.join(literals)) + ']', '[^' + re.escape(t_ignore) + ']'])
+    return re.compile('([' + re.escape(t_ignore) + ']*)('
+                      + '|'.join(f'(?:{regex})' for regex in rules) + ')')
+
+
+def string_rules():
+    """Get the (token type, regex) string rules in PLY's order."""
+    rules = [(name[2:], value) for name, value in globals().items()
+             if name.startswith('t_') and name != 't_ignore' and isinstance(value, str)]
+    return sorted(rules, key=lambda rule: len(rule[1]), reverse=True)
+
+
+MASTER = master_pattern()
+
+# Token text -> type of the tokens with fixed text: keywords, operators,
+# delimiters and literals
+FIXED_TYPES = dict(
+    [(word, word) for word in AMPSCRIPT_KEYWORDS]
+    + [(re.sub(r'\\(.)', r'\1', regex), name) for name, regex in string_rules()]
+    + [(character, character) for character in literals]
+)
+
+NAME_START = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_')
+
+
+class Scanner:
+    """Lexer producing the PLY lexer's tokens from one regex scan."""
+
+    def __init__(self):
+        """Initialize the scanner without input."""
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+
+    def clone(self):
+        """Get a new scanner at the same line, for another thread."""
+        scanner = Scanner()
+        scanner.lineno = self.lineno
+        return scanner
+
+    def input(self, data):
+        """
+        Start scanning a string.
+
+        Line numbers continue from self.lineno, as with PLY.
+
+        Args:
+            data: Source text
+        """
+        self.lexdata = data
+        self.lexpos = 0
+        # A C-level callable: each token() call resumes the scan without
+        # a Python frame of its own
+        self.token = functools.partial(next, self.scan(data), None)
+
+    def token(self):
+        """Get the next token, or None at the end of the input."""
+        return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = self.token()
+        if token is None:
+            raise StopIteration
+        return token
+
+    def scan(self, data):
+        """
+        Yield the tokens of a string.
+
+        The regex finds all token texts at once; each is typed from its
+        text, which is cheaper than dispatching on match groups.
+
+        Args:
+            data: Source text
+
+        Yields:
+            ply.lex.LexToken per token; self.lineno and self.lexpos follow
+            the scan like the PLY lexer's
+        """
+        LexToken = lex.LexToken
+        fixed_types = FIXED_TYPES
+        name_start = NAME_START
+        lineno = self.lineno
+        end = 0
+        for ignored, text in MASTER.findall(data):
+            start = end + len(ignored)
+            end = start + len(text)
+            first = text[0]
+            kind = fixed_types.get(text)
+            if kind is not None:
+                token = LexToken()
+                token.type = kind
+                token.value = text
+            elif first in name_start:
+                token = LexToken()
+                token.type = 'NAME'
+                token.value = text
+            elif first == '\n':
+                lineno = self.lineno = lineno + len(text)
+                continue
+            elif first == '"' and len(text) > 1:
+                token = LexToken()
+                token.type = 'STRING'
+                token.value = text[1:-1]
+                token.lineno = lineno
+                token.lexpos = start
+                # Strings may span lines
+                lineno = self.lineno = lineno + text.count('\n')
+                self.lexpos = end
+                yield token
+                continue
+            elif first.isdecimal():
+                token = LexToken()
+                token.type = 'NUMBER'
+                token.value = int(text)
+            elif first == '/' and len(text) > 1:
+                # Comments may span lines
+                lineno = self.lineno = lineno + text.count('\n')
+                continue
+            else:
+                self.lexpos = end
+                report_illegal(self, text, start)
+                continue
+            token.lineno = lineno
+            token.lexpos = start
+            self.lexpos = end
+            yield token
+        self.lexpos = len(data)
+
+scanner = Scanner()
+
+# Lexers select() accepts -> module lexer the parser clones
+LEXERS = ('ply', 'scanner')
+
+_selected = 'ply'
+
+
+def select(kind):
+    """
+    Choose the lexer new parses use.
+
+    Args:
+        kind: 'ply' or 'scanner'
+
+    Raises:
+        ValueError: If kind is not a known lexer
+    """
+    global _selected
+    if kind not in LEXERS:
+        raise ValueError(f"Unknown lexer {kind!r}; expected one of {', '.join(LEXERS)}")
+    _selected = kind
+
+
+def selected():
+    """Get the module lexer new parses clone."""
+    return scanner if _selected == 'scanner' else lexer
+
+
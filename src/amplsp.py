@@ -0,0 +1,504 @@
+# =============================================================================
+# amplsp.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Language server for AmpScript over stdio.
+# =============================================================================
+"""AmpScript language server (Language Server Protocol over stdio).
+
+    python3 amp.py lsp
+
+Provides diagnostics (syntax errors, illegal characters, unknown functions,
+wrong argument counts, undeclared variables), hover with the signatures of
+library functions and go-to-definition of @variables.
+
+A document is kept as a list of segments: literal text, %%[ ... ]%% code
+blocks and %%= ... =%% inline expressions. Parsed blocks are cached by
+their text, with positions relative to the block, so after an edit only
+the blocks whose text changed are parsed again; every other block reuses
+its cached tree and diagnostics wherever it moved in the document.
+Positions count characters, not UTF-16 code units.
+"""
+
+import argparse
+import bisect
+import contextlib
+import inspect
+import io
+import json
+import logging
+import re
+import sys
+
+from . import ampfunctions, ampyacc
+from .ampast import walk
+from .ampcontentstore import SEGMENT
+
+logger = logging.getLogger(__name__)
+
+# LSP constants
+SYNC_INCREMENTAL = 2
+SEVERITY_ERROR = 1
+SEVERITY_WARNING = 2
+METHOD_NOT_FOUND = -32601
+PARSE_ERROR = -32700
+
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+def line_starts(text):
+    """Get the offset of the first character of every line."""
+    return [0] + [match.end() for match in re.finditer('\n', text)]
+
+
+class Block:
+    """A parsed code block or inline expression, positioned relative to its
+    own text."""
+
+    def __init__(self, text):
+        """
+        Parse a block and collect what the document needs from it.
+
+        Args:
+            text: Block text including its delimiters
+        """
+        self.text = text
+        self.starts = line_starts(text)
+        self.problems = []        # (offset, length, severity, message)
+        self.declarations = []    # (lowercased variable, offset), in order
+        self.uses = []            # (lowercased variable, offset, length)
+        body = text[3:-3]
+        if not body.strip() or not re.sub(r'/\*[\s\S]*?\*/', '', body).strip():
+            self.tree = None
+            return
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.tree = ampyacc.parse(text)
+            errors = ampyacc.errors()
+        for message, _, lexpos in errors:
+            self.problems.append((min(lexpos, len(text) - 1), 1, SEVERITY_ERROR, message))
+        if self.tree is not None:
+            self.collect(self.tree)
+
+    def offset(self, node):
+        """Get the offset of a positioned node in the block text."""
+        return self.starts[node.lineno - 1] + node.col - 1
+
+    def collect(self, tree):
+        """Record calls, declarations and variable uses of the tree."""
+        for node in walk(tree):
+            if not node or getattr(node, 'lineno', None) is None:
+                continue
+            kind = node[0]
+            if kind == 'FUNC':
+                try:
+                    ampfunctions.check_call(node[1], len(node[2]) - 1)
+                except RuntimeError as e:
+                    self.problems.append((self.offset(node), len(node[1]),
+                                          SEVERITY_ERROR, str(e)))
+            elif kind == '@':
+                self.uses.append((node[1].lower(), self.offset(node), len(node[1]) + 1))
+            elif kind == 'VAR':
+                start = self.offset(node)
+                for name in declared_names(node[1]):
+                    self.declarations.append((name.lower(), self.find(name, start)))
+            elif kind == 'FOR':
+                start = self.offset(node)
+                self.declarations.append((node[1].lower(), self.find(node[1], start)))
+            elif kind == 'SET':
+                start = self.offset(node)
+                self.uses.append((node[1].lower(), self.find(node[1], start),
+                                  len(node[1]) + 1))
+
+    def find(self, name, start):
+        """Find @name in the block text from an offset."""
+        match = re.compile('@' + re.escape(name) + r'\b', re.IGNORECASE).search(self.text, start)
+        return match.start() if match else start
+
+
+def declared_names(names):
+    """Flatten the name list of a VAR statement."""
+    found = []
+    stack = [names]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            stack.extend(reversed(item))
+        elif item != '@':
+            found.append(item)
+    return found
+
+
+class Document:
+    """An open document: text, segments and the cache of parsed blocks."""
+
+    def __init__(self, uri, text, version=None):
+        """
+        Initialize the document.
+
+        Args:
+            uri: Document URI
+            text: Full text
+            version: Client version number
+        """
+        self.uri = uri
+        self.version = version
+        self.text = text
+        self.blocks = {}          # block text -> Block
+        self.segments = []        # (start offset, Block) per code segment
+        self.parses = 0           # blocks parsed since opening
+        self.update()
+
+    def apply(self, change):
+        """
+        Apply one content change of a didChange notification.
+
+        Args:
+            change: {"range": ..., "text": ...} or {"text": ...} for the
+                full text
+        """
+        if 'range' not in change:
+            self.text = change['text']
+            self.starts = line_starts(self.text)
+            return
+        start = self.offset(change['range']['start'])
+        end = self.offset(change['range']['end'])
+        self.text = self.text[:start] + change['text'] + self.text[end:]
+        self.starts = line_starts(self.text)
+
+    def update(self):
+        """Re-segment the text, parsing only blocks not seen before."""
+        self.starts = line_starts(self.text)
+        blocks = {}
+        segments = []
+        for match in SEGMENT.finditer(self.text):
+            text = match.group(0)
+            block = blocks.get(text) or self.blocks.get(text)
+            if block is None:
+                block = Block(text)
+                self.parses += 1
+            blocks[text] = block
+            segments.append((match.start(), block))
+        # Blocks no longer in the document are dropped
+        self.blocks = blocks
+        self.segments = segments
+
+    def offset(self, position):
+        """Convert an LSP position to an offset in the text."""
+        line = min(position['line'], len(self.starts) - 1)
+        return min(self.starts[line] + position['character'], len(self.text))
+
+    def position(self, offset):
+        """Convert an offset in the text to an LSP position."""
+        line = bisect.bisect_right(self.starts, offset) - 1
+        return {'line': line, 'character': offset - self.starts[line]}
+
+    def range(self, offset, length):
+        """Build an LSP range."""
+        return {'start': self.position(offset), 'end': self.position(offset + length)}
+
+    def diagnostics(self):
+        """
+        Collect the diagnostics of the document.
+
+        Returns:
+            List of LSP Diagnostic objects
+        """
+        result = []
+        declared = set()
+        for _, block in self.segments:
+            declared.update(name for name, _ in block.declarations)
+        for start, block in self.segments:
+            for offset, length, severity, message in block.problems:
+                result.append({
+                    'range': self.range(start + offset, length),
+                    'severity': severity,
+                    'source': 'amp',
+                    'message': message,
+                })
+            for name, offset, length in block.uses:
+                if name not in declared:
+                    result.append({
+                        'range': self.range(start + offset, length),
+                        'severity': SEVERITY_WARNING,
+                        'source': 'amp',
+                        'message': f"Variable @{name} is not declared with VAR",
+                    })
+        return result
+
+    def segment_at(self, offset):
+        """Get the (start, Block) code segment containing an offset, or None."""
+        index = bisect.bisect_right(self.segments, offset, key=lambda segment: segment[0]) - 1
+        if index >= 0:
+            start, block = self.segments[index]
+            if offset <= start + len(block.text):
+                return start, block
+        return None
+
+    def word_at(self, offset):
+        """
+        Get the identifier at an offset inside a code segment.
+
+        Returns:
+            Tuple of (identifier, start offset, is variable), or None
+        """
+        if self.segment_at(offset) is None:
+            return None
+        line = bisect.bisect_right(self.starts, offset) - 1
+        line_start = self.starts[line]
+        line_text = self.text[line_start:self.starts[line + 1] if line + 1 < len(self.starts)
+                              else len(self.text)]
+        for match in IDENTIFIER.finditer(line_text):
+            if match.start() <= offset - line_start <= match.end():
+                start = line_start + match.start()
+                variable = match.start() > 0 and line_text[match.start() - 1] == '@'
+                return match.group(0), start, variable
+        return None
+
+    def definition(self, name):
+        """
+        Find where a variable is defined: its VAR or FOR declaration.
+
+        Returns:
+            Offset of @name at the definition, or None
+        """
+        lowered = name.lower()
+        for start, block in self.segments:
+            for declared, offset in block.declarations:
+                if declared == lowered:
+                    return start + offset
+        return None
+
+
+def signature(name):
+    """
+    Describe a library function for hover.
+
+    Args:
+        name: Canonical function name
+
+    Returns:
+        Markdown with the signature and the docstring summary
+    """
+    impl = getattr(ampfunctions.load_category(ampfunctions.FUNCTION_INDEX[name]), name)
+    parameters = list(inspect.signature(impl).parameters.values())[1:]
+    text = f"```\n{name}({', '.join(str(parameter) for parameter in parameters)})\n```"
+    doc = inspect.getdoc(impl)
+    if doc:
+        text += "\n\n" + doc
+    return text
+
+
+def read_message(stream):
+    """
+    Read one JSON-RPC message with its Content-Length header.
+
+    Args:
+        stream: Binary input stream
+
+    Returns:
+        Decoded message, or None at the end of the stream
+
+    Raises:
+        ValueError: If the message is malformed
+    """
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode('ascii').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    if length is None:
+        raise ValueError("Message without Content-Length")
+    return json.loads(stream.read(length).decode('utf-8'))
+
+
+def write_message(stream, message):
+    """Write one JSON-RPC message with its Content-Length header."""
+    body = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body)
+    stream.flush()
+
+
+class LanguageServer:
+    """Dispatches LSP messages to the open documents."""
+
+    def __init__(self, reader, writer):
+        """
+        Initialize the server.
+
+        Args:
+            reader: Binary stream of client messages
+            writer: Binary stream for server messages
+        """
+        self.reader = reader
+        self.writer = writer
+        self.documents = {}
+        self.running = True
+        self.shutdown_requested = False
+
+    def serve(self):
+        """
+        Handle messages until the client sends exit or closes the stream.
+
+        Returns:
+            Exit status: 0 after shutdown, 1 otherwise
+        """
+        while self.running:
+            try:
+                message = read_message(self.reader)
+            except ValueError as e:
+                self.send({'jsonrpc': '2.0', 'id': None,
+                           'error': {'code': PARSE_ERROR, 'message': str(e)}})
+                continue
+            if message is None:
+                break
+            self.handle(message)
+        return 0 if self.shutdown_requested else 1
+
+    def send(self, message):
+        """Send a message to the client."""
+        write_message(self.writer, message)
+
+    def notify(self, method, params):
+        """Send a notification to the client."""
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+    def handle(self, message):
+        """
+        Handle one request or notification.
+
+        Args:
+            message: Decoded JSON-RPC message
+        """
+        method = message.get('method')
+        handler = getattr(self, 'on_' + re.sub(r'\W', '_', method or ''), None)
+        if 'id' not in message:
+            if handler is not None:
+                handler(message.get('params') or {})
+            return
+        if handler is None:
+            self.send({'jsonrpc': '2.0', 'id': message['id'],
+                       'error': {'code': METHOD_NOT_FOUND, 'message': f"Unknown method {method}"}})
+            return
+        try:
+            result = handler(message.get('params') or {})
+        except Exception as e:
+            logger.exception("Request %s failed", method)
+            self.send({'jsonrpc': '2.0', 'id': message['id'],
+                       'error': {'code': -32603, 'message': str(e)}})
+            return
+        self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+    def publish(self, document):
+        """Send the diagnostics of a document."""
+        self.notify('textDocument/publishDiagnostics', {
+            'uri': document.uri,
+            'version': document.version,
+            'diagnostics': document.diagnostics(),
+        })
+
+    def on_initialize(self, params):
+        """Announce the server capabilities."""
+        return {
+            'capabilities': {
+                'textDocumentSync': {'openClose': True, 'change': SYNC_INCREMENTAL},
+                'hoverProvider': True,
+                'definitionProvider': True,
+            },
+            'serverInfo': {'name': 'amp'},
+        }
+
+    def on_initialized(self, params):
+        """Nothing to do once the client is ready."""
+
+    def on_shutdown(self, params):
+        """Prepare to exit."""
+        self.shutdown_requested = True
+        return None
+
+    def on_exit(self, params):
+        """Stop serving."""
+        self.running = False
+
+    def on_textDocument_didOpen(self, params):
+        """Parse a newly opened document."""
+        item = params['textDocument']
+        document = Document(item['uri'], item['text'], item.get('version'))
+        self.documents[item['uri']] = document
+        self.publish(document)
+
+    def on_textDocument_didChange(self, params):
+        """Apply edits and reparse the blocks they touched."""
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return
+        for change in params['contentChanges']:
+            document.apply(change)
+        document.version = params['textDocument'].get('version')
+        document.update()
+        self.publish(document)
+
+    def on_textDocument_didClose(self, params):
+        """Forget a document and clear its diagnostics."""
+        uri = params['textDocument']['uri']
+        if self.documents.pop(uri, None) is not None:
+            self.notify('textDocument/publishDiagnostics', {'uri': uri, 'diagnostics': []})
+
+    def on_textDocument_hover(self, params):
+        """Show the signature of the library function under the cursor."""
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return None
+        word = document.word_at(document.offset(params['position']))
+        if word is None or word[2]:
+            return None
+        name = ampfunctions.canonical_name(word[0])
+        if name is None:
+            return None
+        return {
+            'contents': {'kind': 'markdown', 'value': signature(name)},
+            'range': document.range(word[1], len(word[0])),
+        }
+
+    def on_textDocument_definition(self, params):
+        """Locate the declaration of the @variable under the cursor."""
+        uri = params['textDocument']['uri']
+        document = self.documents.get(uri)
+        if document is None:
+            return None
+        word = document.word_at(document.offset(params['position']))
+        if word is None or not word[2]:
+            return None
+        offset = document.definition(word[0])
+        if offset is None:
+            return None
+        return {'uri': uri, 'range': document.range(offset, len(word[0]) + 1)}
+
+
+def main(argv=None):
+    """
+    Run the language server on stdin and stdout.
+
+    Args:
+        argv: Command line arguments after "lsp" (default sys.argv[2:])
+
+    Returns:
+        Exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog="amp.py lsp", description="AmpScript language server over stdio"
+    )
+    parser.add_argument("--log", metavar="FILE", help="Write server logs to a file")
+    args = parser.parse_args(sys.argv[2:] if argv is None else argv)
+    if args.log:
+        logging.basicConfig(filename=args.log, level=logging.INFO)
+    server = LanguageServer(sys.stdin.buffer, sys.stdout.buffer)
+    return server.serve()
@@ -0,0 +1,336 @@
+# =============================================================================
+# ampmetrics.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Counters, timers and histograms of the compiler and runtime hot paths.
+# =============================================================================
+"""Metrics of lexing, parsing, compiling, rendering and library calls.
+
+Metrics are off by default and cost one flag test per instrumented call
+when off. Once enabled, the hot paths record into the module registry:
+
+    stage_seconds{stage}            histogram: lex, parse, compile_py,
+                                    compile_js, transpile_js, render
+    lex_tokens_total                counter of tokens read by the parser
+    parse_errors_total              counter of parses with syntax errors
+    renders_total{mode}             counter: interpreted or compiled
+    render_errors_total{mode}       counter of renders that raised
+    function_calls_total{category}  counter per ampfunctions category
+    function_seconds{category}      histogram of library call times
+    batch_renders_total             counter of render_batch() renders
+
+    ampmetrics.enable()
+    Template(source).render()
+    print(ampmetrics.registry().to_prometheus())
+
+Library functions are counted when they are resolved while metrics are
+enabled, so enable metrics before creating templates. The CLI writes the
+registry with --metrics FILE, and the page server answers GET /_metrics
+in Prometheus text format (JSON with ?format=json).
+"""
+
+import bisect
+import threading
+import time
+
+# Prefix of exported metric names
+PREFIX = 'amp_'
+
+# Upper bounds in seconds of the histogram buckets, Prometheus style
+DEFAULT_BUCKETS = (0.00001, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Whether the hot paths record metrics; test it before calling in
+enabled = False
+
+
+class Histogram:
+    """Counts of observed values per bucket, with their sum."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets: Sorted bucket upper bounds; values above the last bound
+                count in the implicit +Inf bucket only
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record a value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """List of (upper bound, values at or below it), ending with +Inf."""
+        bounds = list(self.buckets) + [float('inf')]
+        total = 0
+        result = []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_json(self):
+        """Dictionary of count, sum and cumulative bucket counts."""
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': {format_bound(bound): count for bound, count in self.cumulative()},
+        }
+
+
+class Timer:
+    """Context manager recording its elapsed seconds in a histogram."""
+
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class NullTimer:
+    """Timer doing nothing, returned while metrics are off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Registry:
+    """Named counters and histograms, each with optional labels."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self.lock = threading.Lock()
+        self.counters = {}        # (name, labels) -> value
+        self.histograms = {}      # (name, labels) -> Histogram
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add to a counter.
+
+        Args:
+            name: Metric name without PREFIX
+            value: Amount to add
+            **labels: Label values of the series
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """
+        Record a value in a histogram.
+
+        Args:
+            name: Metric name without PREFIX
+            value: Observed value, e.g. seconds
+            **labels: Label values of the series
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """Context manager timing a block into a histogram."""
+        return Timer(self, name, labels)
+
+    def counter(self, name, **labels):
+        """Get the value of a counter; 0 if never incremented."""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name, **labels):
+        """Get a histogram, or None if nothing was observed."""
+        return self.histograms.get((name, tuple(sorted(labels.items()))))
+
+    def reset(self):
+        """Forget all values."""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def to_json(self):
+        """
+        Get all metrics as a JSON-serializable dictionary.
+
+        Returns:
+            {'counters': {series: value}, 'histograms': {series: {...}}},
+            where a series is the name followed by its labels, e.g.
+            'stage_seconds{stage="parse"}'
+        """
+        with self.lock:
+            return {
+                'counters': {series(name, labels): value
+                             for (name, labels), value in sorted(self.counters.items())},
+                'histograms': {series(name, labels): histogram.to_json()
+                               for (name, labels), histogram in sorted(
+                                   self.histograms.items(), key=lambda item: item[0])},
+            }
+
+    def dumps(self):
+        """Get all metrics as JSON text."""
+        # Imported here: generated scripts import this module via ampfunctions
+        import json
+
+        return json.dumps(self.to_json(), indent=1)
+
+    def to_prometheus(self):
+        """
+        Get all metrics in the Prometheus text exposition format.
+
+        Returns:
+            Text with a TYPE line per metric and one line per series
+        """
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines.append(f"{PREFIX}{series(name, labels)} {format_value(value)}")
+            for (name, labels), histogram in sorted(self.histograms.items(),
+                                                    key=lambda item: item[0]):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for bound, count in histogram.cumulative():
+                    bucket = labels + (('le', format_bound(bound)),)
+                    lines.append(f"{PREFIX}{series(name + '_bucket', bucket)} {count}")
+                lines.append(f"{PREFIX}{series(name + '_sum', labels)} "
+                             f"{format_value(histogram.sum)}")
+                lines.append(f"{PREFIX}{series(name + '_count', labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+def series(name, labels):
+    """Format a series name with its labels, e.g. 'a{b="c"}'."""
+    if not labels:
+        return name
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in labels)
+    return name + '{' + ','.join(f'{key}="{value}"'
+                                 for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def format_bound(bound):
+    """Format a bucket bound as Prometheus does: +Inf or the shortest float."""
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def format_value(value):
+    """Format a sample value."""
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+# Registry the hot paths record into
+_registry = Registry()
+
+
+def registry():
+    """Return the module registry."""
+    return _registry
+
+
+def enable(on=True):
+    """
+    Turn recording on or off.
+
+    Args:
+        on: Record metrics from now on
+
+    Returns:
+        The module registry
+    """
+    global enabled
+    enabled = bool(on)
+    return _registry
+
+
+def inc(name, value=1, **labels):
+    """Add to a counter of the module registry if metrics are on."""
+    if enabled:
+        _registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Record a value in a histogram of the module registry if metrics are on."""
+    if enabled:
+        _registry.observe(name, value, **labels)
+
+
+def timer(name, **labels):
+    """Context manager timing a block if metrics are on, else a no-op."""
+    if enabled:
+        return Timer(_registry, name, labels)
+    return NULL_TIMER
+
+
+def timed(name, method, **labels):
+    """
+    Wrap a function to count its calls and time them.
+
+    Args:
+        name: Metric name prefix: calls go to <name>_calls_total, times to
+            <name>_seconds
+        method: Function to wrap
+        **labels: Label values of both series
+
+    Returns:
+        Wrapper calling method
+    """
+    calls = name + '_calls_total'
+    seconds = name + '_seconds'
+
+    def call(*args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            _registry.observe(seconds, time.perf_counter() - start, **labels)
+            _registry.inc(calls, **labels)
+
+    call.__name__ = getattr(method, '__name__', name)
+    call.__doc__ = method.__doc__
+    return call
+
+
+def write(path):
+    """
+    Write the module registry to a file.
+
+    Args:
+        path: Output file; .json writes JSON, anything else Prometheus text
+    """
+    text = _registry.dumps() if path.lower().endswith('.json') else _registry.to_prometheus()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
@@ -0,0 +1,522 @@
+# =============================================================================
+# ampoptimizer.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# AST optimizer run between parsing and interpretation/compilation.
+# =============================================================================
+"""AST optimizer for AmpScript: constant folding, dead-branch elimination
+and loop-invariant hoisting of pure function calls.
+
+The optimizer takes the tuple AST produced by ampyacc.parse() and returns an
+equivalent, usually smaller tree that both compilers and the interpreter
+accept. Folded comparisons produce ('BOOL', value) nodes.
+"""
+
+import operator
+
+from . import ampfunctions
+from .ampast import copy_position, statements, sequence, transform, walk
+
+# Arithmetic folded on two INT literals. Division is left alone because the
+# targets disagree on integer division results.
+INT_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+}
+
+RELATIONAL_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+# Nodes that never need parentheses around them
+ATOMS = ('INT', 'STR', 'BOOL', '@', 'FUNC', 'GROUP')
+
+# Expression nodes whose children are searched for hoistable calls
+COMPOUND = ('FUNC', 'ARGS', 'GROUP', 'UNARY', 'BINOP', 'RELOP')
+
+# Prefix of variables holding hoisted call results
+HOIST_PREFIX = '_pure'
+
+
+def is_constant(node):
+    """Return True if node is a literal value."""
+    return isinstance(node, tuple) and bool(node) and node[0] in ('INT', 'STR', 'BOOL')
+
+
+def fold_node(node):
+    """
+    Fold a single expression node whose children are already folded.
+
+    Args:
+        node: Expression tuple
+
+    Returns:
+        Replacement node (the node itself if nothing could be folded)
+    """
+    if not node or not isinstance(node[0], str):
+        return node
+
+    op = node[0]
+
+    if op == 'GROUP':
+        if node[1][0] in ATOMS:
+            return node[1]
+    elif op == 'UNARY':
+        if node[1] == '-' and node[2][0] == 'INT':
+            return ('INT', -node[2][1])
+    elif op == 'BINOP':
+        lhs, rhs = node[2], node[3]
+        if node[1] in ('AND', 'OR'):
+            if is_constant(lhs):
+                # Same operand selection as Python's and/or and JS's &&/||
+                if node[1] == 'AND':
+                    return rhs if lhs[1] else lhs
+                return lhs if lhs[1] else rhs
+        elif lhs[0] == 'INT' and rhs[0] == 'INT' and node[1] in INT_OPERATORS:
+            return ('INT', INT_OPERATORS[node[1]](lhs[1], rhs[1]))
+        elif lhs[0] == 'STR' and rhs[0] == 'STR' and node[1] == '+':
+            return ('STR', lhs[1] + rhs[1])
+    elif op == 'RELOP':
+        lhs, rhs = node[2], node[3]
+        # Mixed types compare differently in Python and JavaScript
+        if lhs[0] == rhs[0] and lhs[0] in ('INT', 'STR'):
+            return ('BOOL', RELATIONAL_OPERATORS[node[1]](lhs[1], rhs[1]))
+    return node
+
+
+def fold(expr):
+    """
+    Constant-fold an expression tree.
+
+    Args:
+        expr: Expression tuple
+
+    Returns:
+        Folded expression
+    """
+    folded = transform(expr, fold_node)
+    # Parentheses around a whole condition or value are never needed
+    while isinstance(folded, tuple) and folded and folded[0] == 'GROUP':
+        folded = folded[1]
+    return folded
+
+
+def fold_condition(expr):
+    """
+    Constant-fold an expression used only for its truth value.
+
+    Besides fold(), a constant right operand of AND/OR can be dropped or
+    decides the result, since only truthiness matters in conditions.
+
+    Args:
+        expr: Condition expression tuple
+
+    Returns:
+        Folded condition
+    """
+    expr = fold(expr)
+    if expr[0] == 'BINOP' and expr[1] in ('AND', 'OR') and is_constant(expr[3]):
+        lhs = fold_condition(expr[2])
+        decides = bool(expr[3][1]) == (expr[1] == 'OR')
+        if not decides:
+            return lhs
+        # lhs is still evaluated unless it cannot have side effects
+        if not any(node[0] == 'FUNC' for node in walk(lhs)):
+            return ('BOOL', bool(expr[3][1]))
+        return ('BINOP', expr[1], lhs, expr[3])
+    return expr
+
+
+def assigned_names(tree):
+    """
+    Collect the names of variables a statement tree may assign.
+
+    Args:
+        tree: Statement or statement sequence
+
+    Returns:
+        Set of variable names set, declared or used as loop counters
+    """
+    names = set()
+    for node in walk(tree):
+        if not node or not isinstance(node[0], str):
+            continue
+        if node[0] in ('SET', 'FOR'):
+            names.add(node[1])
+        elif node[0] == 'VAR':
+            names.update(flatten_declaration(node[1]))
+    return names
+
+
+def is_invariant_call(expr, assigned):
+    """
+    Check whether a call can be evaluated once instead of per iteration.
+
+    Args:
+        expr: ('FUNC', name, args) node
+        assigned: Names of variables assigned inside the loop
+
+    Returns:
+        True if every call in expr is pure and no argument reads an
+        assigned variable
+    """
+    for node in walk(expr):
+        if node[0] == 'FUNC' and not ampfunctions.is_pure_call(node[1], node[2][1:]):
+            return False
+        if node[0] == '@' and node[1] in assigned:
+            return False
+    return True
+
+
+def elseif_branches(chain):
+    """
+    Flatten an ELSEIF chain into (condition, body) pairs.
+
+    Args:
+        chain: ('ELSEIF', cond, body) or ('ELSEIF', chain, cond, body)
+
+    Returns:
+        List of (condition, body) pairs in source order
+    """
+    if len(chain) == 4:
+        return elseif_branches(chain[1]) + [(chain[2], chain[3])]
+    return [(chain[1], chain[2])]
+
+
+def build_if(branches, else_body):
+    """
+    Build an IF statement from (condition, body) pairs and an else body.
+
+    Args:
+        branches: List of (condition, body) pairs
+        else_body: Statements for the ELSE part or None
+
+    Returns:
+        IF/IFELSE statement, the else body if no branch remains, or None
+    """
+    if not branches:
+        return else_body
+    cond, body = branches[0]
+    if len(branches) == 1:
+        if else_body is None:
+            return ('IF', cond, body)
+        return ('IFELSE', cond, body, else_body)
+    if else_body is None:
+        return ('IFELSE', cond, body, build_if(branches[1:], None))
+    return ('IFELSE', cond, body, build_chain(branches[1:], else_body))
+
+
+def build_chain(branches, else_body):
+    """
+    Build an ELSEIFCHAIN node from (condition, body) pairs.
+
+    Args:
+        branches: Non-empty list of ELSEIF (condition, body) pairs
+        else_body: Statements for the final ELSE part
+
+    Returns:
+        ('ELSEIFCHAIN', chain, else_body) node
+    """
+    chain = None
+    for cond, body in branches:
+        if chain is None:
+            chain = ('ELSEIF', cond, body)
+        else:
+            chain = ('ELSEIF', chain, cond, body)
+    return ('ELSEIFCHAIN', chain, else_body)
+
+
+class AmpOptimizer:
+    """Optimizer applying folding and dead-code passes to an AST."""
+
+    def __init__(self, drop_unused_vars=True):
+        """
+        Initialize the optimizer.
+
+        Args:
+            drop_unused_vars: Remove VAR declarations of variables that are
+                never referenced. Disable for incremental (REPL) programs
+                where later input may use them.
+        """
+        self.drop_unused_vars = drop_unused_vars
+
+    def optimize(self, tree):
+        """
+        Optimize a parsed program.
+
+        Args:
+            tree: AST from ampyacc.parse()
+
+        Returns:
+            Optimized AST, or None if no statement remains
+        """
+        self.names = {
+            node[1] for node in walk(tree)
+            if node and node[0] in ('@', 'SET', 'FOR')
+        }
+        self.hoisted = 0
+        tree = self.optimize_statements(tree)
+        if self.drop_unused_vars and tree is not None:
+            tree = self.drop_unreferenced(tree)
+        return tree
+
+    def optimize_statements(self, tree):
+        """Optimize a statement sequence, dropping removed statements."""
+        result = []
+        for stmt in statements(tree):
+            new = copy_position(self.optimize_statement(stmt), stmt)
+            if new is not None:
+                result.extend(statements(new))
+        return sequence(result)
+
+    def optimize_statement(self, stmt):
+        """
+        Optimize a single statement.
+
+        Args:
+            stmt: Statement tuple
+
+        Returns:
+            Replacement statement or sequence, or None to remove it
+        """
+        op = stmt[0]
+
+        if op == 'SET':
+            return ('SET', stmt[1], fold(stmt[2]))
+        elif op in ('IF', 'IFELSE'):
+            branches = [(stmt[1], stmt[2])]
+            else_body = None
+            if op == 'IFELSE':
+                if isinstance(stmt[3], tuple) and stmt[3][0] == 'ELSEIFCHAIN':
+                    branches += elseif_branches(stmt[3][1])
+                    else_body = stmt[3][2]
+                else:
+                    else_body = stmt[3]
+            return self.optimize_if(branches, else_body)
+        elif op == 'FOR':
+            loop = ('FOR', stmt[1], fold(stmt[2]), stmt[3], fold(stmt[4]),
+                    self.optimize_statements(stmt[5]), stmt[6])
+            return self.hoist_invariants(copy_position(loop, stmt))
+        elif op in ('VAR', '@'):
+            return stmt
+        return fold(stmt)
+
+    def optimize_if(self, branches, else_body):
+        """
+        Remove branches with constant conditions from an IF chain.
+
+        Args:
+            branches: List of (condition, body) pairs
+            else_body: ELSE statements or None
+
+        Returns:
+            Simplified statement, or None if nothing can execute
+        """
+        live = []
+        for cond, body in branches:
+            cond = fold_condition(cond)
+            if is_constant(cond):
+                if not cond[1]:
+                    continue  # never taken
+                # Always taken: it becomes the else of the live branches
+                else_body = body
+                break
+            live.append((cond, body))
+
+        live = [(cond, self.optimize_statements(body)) for cond, body in live]
+        if else_body is not None:
+            else_body = self.optimize_statements(else_body)
+        return build_if(live, else_body)
+
+    def hoist_invariants(self, loop):
+        """
+        Move pure calls with loop-invariant arguments in front of a FOR loop.
+
+        Only calls evaluated on every iteration are hoisted: those in the
+        top-level statements of the body, outside IF branches and the right
+        operand of AND/OR. The hoisted assignments are guarded by the loop
+        condition, so a loop that never runs still calls nothing, and their
+        temporaries are declared first, as the interpreter requires.
+
+        Args:
+            loop: Optimized FOR statement
+
+        Returns:
+            The FOR statement, or a sequence of the temporaries' declaration,
+            the hoisted assignments and the rewritten FOR statement
+        """
+        _, loopvar, init, direction, final, body, nextvar = loop
+        if body is None or init[0] not in ('INT', '@') or final[0] not in ('INT', '@'):
+            return loop
+
+        relop = '<' if direction == 'TO' else '>'
+        guard = ('RELOP', relop, init, final)
+        if is_constant(fold(guard)) and not fold(guard)[1]:
+            return loop
+
+        assigned = assigned_names(body) | {loopvar}
+        hoisted = {}
+
+        def hoist(expr):
+            if not isinstance(expr, tuple) or not expr or expr[0] not in COMPOUND:
+                return expr
+            if expr[0] == 'FUNC' and is_invariant_call(expr, assigned):
+                if expr not in hoisted:
+                    hoisted[expr] = self.temp_name()
+                return ('@', hoisted[expr])
+            if expr[0] == 'BINOP' and expr[1] in ('AND', 'OR'):
+                # The right operand only runs if the left does not decide
+                return ('BINOP', expr[1], hoist(expr[2]), expr[3])
+            return tuple(hoist(child) for child in expr)
+
+        rewritten = []
+        for original in statements(body):
+            stmt = original
+            op = stmt[0]
+            if op == 'SET':
+                stmt = ('SET', stmt[1], hoist(stmt[2]))
+            elif op in ('IF', 'IFELSE'):
+                stmt = (op, hoist(stmt[1])) + stmt[2:]
+            elif op == 'FOR':
+                stmt = ('FOR', stmt[1], hoist(stmt[2]), stmt[3], hoist(stmt[4])) + stmt[5:]
+            elif op == 'FUNC':
+                # Keep the statement call itself, it is what produces output
+                stmt = ('FUNC', stmt[1], hoist(stmt[2]))
+            elif op not in ('VAR', '@'):
+                stmt = hoist(stmt)
+            rewritten.append(copy_position(stmt, original))
+
+        if not hoisted:
+            return loop
+
+        setup = sequence([
+            copy_position(('SET', name, call), loop) for call, name in hoisted.items()
+        ])
+        if not is_constant(fold(guard)):
+            setup = copy_position(('IF', guard, setup), loop)
+        declaration = copy_position(build_declaration(list(hoisted.values())), loop)
+        rewritten_loop = ('FOR', loopvar, init, direction, final, sequence(rewritten), nextvar)
+        return sequence([declaration, setup, copy_position(rewritten_loop, loop)])
+
+    def temp_name(self):
+        """Create a variable name for a hoisted call not used by the program."""
+        while True:
+            self.hoisted += 1
+            name = f"{HOIST_PREFIX}{self.hoisted}"
+            if name not in self.names:
+                self.names.add(name)
+                return name
+
+    def drop_unreferenced(self, tree):
+        """
+        Remove VAR declarations of variables never used elsewhere.
+
+        Args:
+            tree: Optimized statement tree
+
+        Returns:
+            Tree without unreferenced declarations
+        """
+        used = set()
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, tuple) or not node:
+                continue
+            if node[0] == 'VAR':
+                continue
+            if node[0] in ('@', 'SET'):
+                used.add(node[1])
+            elif node[0] == 'FOR':
+                used.add(node[1])
+            stack.extend(node)
+
+        def visit(node):
+            if node and node[0] == 'VAR':
+                names = [name for name in flatten_declaration(node[1]) if name in used]
+                return build_declaration(names)
+            return node
+
+        return self.rewrite_statements(tree, visit)
+
+    def rewrite_statements(self, tree, visit):
+        """Apply visit to every statement, recursing into bodies."""
+        result = []
+        for original in statements(tree):
+            stmt = original
+            op = stmt[0]
+            if op == 'IF':
+                stmt = ('IF', stmt[1], self.rewrite_statements(stmt[2], visit))
+            elif op == 'IFELSE':
+                alt = stmt[3]
+                if isinstance(alt, tuple) and alt[0] == 'ELSEIFCHAIN':
+                    branches = [
+                        (cond, self.rewrite_statements(body, visit))
+                        for cond, body in elseif_branches(alt[1])
+                    ]
+                    alt = build_chain(branches, self.rewrite_statements(alt[2], visit))
+                else:
+                    alt = self.rewrite_statements(alt, visit)
+                stmt = ('IFELSE', stmt[1], self.rewrite_statements(stmt[2], visit), alt)
+            elif op == 'FOR':
+                stmt = stmt[:5] + (self.rewrite_statements(stmt[5], visit), stmt[6])
+            stmt = copy_position(visit(stmt), original)
+            if stmt is not None:
+                result.append(stmt)
+        return sequence(result)
+
+
+def flatten_declaration(var_list):
+    """
+    Get the variable names of a VAR declaration list.
+
+    Args:
+        var_list: ('@', name) or nested (list, '@', name) tuples
+
+    Returns:
+        List of variable names
+    """
+    names = []
+    for node in walk(var_list):
+        if len(node) >= 2 and node[-2] == '@':
+            names.append(node[-1])
+    return list(reversed(names))
+
+
+def build_declaration(names):
+    """
+    Build a VAR statement declaring the given names.
+
+    Args:
+        names: List of variable names
+
+    Returns:
+        VAR statement, or None if names is empty
+    """
+    var_list = None
+    for name in names:
+        var_list = ('@', name) if var_list is None else (var_list, '@', name)
+    return None if var_list is None else ('VAR', var_list)
+
+
+def optimize(tree, drop_unused_vars=True):
+    """
+    Optimize a parsed AmpScript program.
+
+    Args:
+        tree: AST from ampyacc.parse()
+        drop_unused_vars: Remove declarations of unreferenced variables
+
+    Returns:
+        Optimized AST, or None if no statement remains
+    """
+    return AmpOptimizer(drop_unused_vars).optimize(tree)
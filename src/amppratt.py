@@ -0,0 +1,432 @@
+# =============================================================================
+# amppratt.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Hand-written recursive-descent parser for AmpScript language.
+# =============================================================================
+"""Recursive-descent parser for AmpScript, without PLY's parse tables.
+
+Builds the same AST as ampyacc from the same tokens. Statements are parsed
+by recursive descent and expressions by precedence climbing (Pratt
+parsing) over BINDING, which mirrors ampyacc.precedence: comparisons do
+not chain, unary minus and NOT bind tighter than any binary operator.
+
+ampyacc stops at the first syntax error. This parser reports it, skips to
+the next statement keyword or to the end of the enclosing block and goes
+on, so one pass finds every error of a template:
+
+    tree = amppratt.parse(source)
+    for message, lineno, lexpos in amppratt.errors():
+        ...
+
+The first error is the one ampyacc reports. ampyacc.select('pratt') makes
+ampyacc.parse() use this parser.
+"""
+
+import threading
+import time
+
+from . import amplex, ampmetrics
+from .ampast import located
+
+# Binary operator token -> binding power; higher binds tighter
+BINDING = {
+    'OR': 1,
+    'AND': 2,
+    'EQ': 3, 'NE': 3, 'LT': 3, 'GT': 3, 'LE': 3, 'GE': 3,
+    '+': 4, '-': 4,
+    '*': 5, '/': 5,
+}
+
+# Binding power of the comparisons, which are non-associative
+COMPARISON = 3
+
+# Tokens starting a statement other than an expression; error recovery
+# resumes at them
+STATEMENT_KEYWORDS = frozenset(('SET', 'VAR', 'IF', 'FOR'))
+
+# Tokens starting an expression
+EXPRESSION_START = frozenset(('NAME', 'NUMBER', 'STRING', '@', '(', '-', 'NOT'))
+
+STATEMENT_START = STATEMENT_KEYWORDS | EXPRESSION_START
+
+# Tokens ending the statements of each kind of block
+IF_BODY_END = frozenset(('ELSEIF', 'ELSE', 'ENDIF'))
+ELSE_BODY_END = frozenset(('ENDIF',))
+FOR_BODY_END = frozenset(('NEXT',))
+PROGRAM_END = frozenset(('CLOSE',))
+
+# Token type past the last token
+END = '$end'
+
+
+class ParseError(Exception):
+    """Raised inside a statement at a token the grammar does not allow."""
+
+    def __init__(self, index):
+        """
+        Initialize the exception.
+
+        Args:
+            index: Index of the offending token; the token count at the end
+                of the input
+        """
+        super().__init__(index)
+        self.index = index
+
+
+class Parser:
+    """Parser of one token list."""
+
+    def __init__(self, tokens, data, lineno=1):
+        """
+        Initialize the parser.
+
+        Args:
+            tokens: LexTokens of the source
+            data: Source text, for columns and the end of input position
+            lineno: Line number at the end of the input
+        """
+        self.tokens = tokens
+        self.types = [token.type for token in tokens] + [END]
+        self.data = data
+        self.lineno = lineno
+        self.pos = 0
+        # Terminators of the blocks being parsed
+        self.follow = frozenset()
+        self.problems = []
+        self.reported = -1
+
+    def parse(self):
+        """
+        Parse the whole token list.
+
+        Returns:
+            AST, or None if there was a syntax error
+        """
+        kind = self.types[0]
+        if kind == 'OPEN':
+            self.pos = 1
+            tree = self.block(PROGRAM_END)
+            self.close('CLOSE')
+        elif kind == 'SOPEN':
+            self.pos = 1
+            try:
+                tree = self.expression()
+            except ParseError as e:
+                self.report(e.index)
+                while self.types[self.pos] not in ('SCLOSE', END):
+                    self.pos += 1
+            self.close('SCLOSE')
+        else:
+            tree = self.block(frozenset())
+        if self.types[self.pos] != END:
+            self.report(self.pos)
+        return None if self.problems else tree
+
+    def report(self, index):
+        """Record a syntax error at a token, once per token."""
+        if index <= self.reported:
+            return
+        self.reported = index
+        if index < len(self.tokens):
+            token = self.tokens[index]
+            print("Syntax error at '%s' on line '%s'" % (token.value, token.lineno))
+            self.problems.append((f"Syntax error at '{token.value}'", token.lineno,
+                                  token.lexpos))
+        else:
+            print("Syntax error at EOF")
+            self.problems.append(("Syntax error at end of input", self.lineno,
+                                  len(self.data)))
+
+    def recover(self):
+        """Skip to the next statement keyword or enclosing block terminator."""
+        types = self.types
+        follow = self.follow
+        while types[self.pos] != END and types[self.pos] not in STATEMENT_KEYWORDS \
+                and types[self.pos] not in follow:
+            self.pos += 1
+
+    def close(self, kind):
+        """Consume the closing delimiter of the program, or report its absence."""
+        if self.types[self.pos] == kind:
+            self.pos += 1
+        else:
+            self.report(self.pos)
+
+    def expect(self, kind):
+        """
+        Consume a token of the given type.
+
+        Returns:
+            The token
+
+        Raises:
+            ParseError: If the next token has another type
+        """
+        if self.types[self.pos] != kind:
+            raise ParseError(self.pos)
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def locate(self, node, token):
+        """Position a node at a token, as ampyacc.position() does."""
+        lexpos = token.lexpos
+        return located(node, token.lineno, lexpos - self.data.rfind('\n', 0, lexpos))
+
+    def block(self, end):
+        """
+        Parse one or more statements up to a block terminator.
+
+        Errors inside a statement are reported and parsing resumes after
+        them, so the block always returns at a terminator of this or an
+        enclosing block, or at the end of the input.
+
+        Args:
+            end: Token types ending this block
+
+        Returns:
+            Statement, or left-nested (statements, statement) pairs
+        """
+        enclosing = self.follow
+        self.follow = enclosing | end
+        types = self.types
+        start = self.pos
+        tree = None
+        empty = True
+        try:
+            while True:
+                kind = types[self.pos]
+                if kind in STATEMENT_START:
+                    try:
+                        node = self.statement(kind)
+                    except ParseError as e:
+                        self.report(e.index)
+                        self.recover()
+                        continue
+                    tree = node if empty else (tree, node)
+                    empty = False
+                elif kind == END or kind in self.follow:
+                    break
+                else:
+                    self.report(self.pos)
+                    self.pos += 1
+                    self.recover()
+            if self.pos == start:
+                self.report(start)
+        finally:
+            self.follow = enclosing
+        return tree
+
+    def statement(self, kind):
+        """Parse the statement starting with a token of the given type."""
+        token = self.tokens[self.pos]
+        if kind == 'SET':
+            self.pos += 1
+            self.expect('@')
+            name = self.expect('NAME').value
+            self.expect('=')
+            return self.locate(('SET', name, self.expression()), token)
+        if kind == 'VAR':
+            self.pos += 1
+            self.expect('@')
+            names = ('@', self.expect('NAME').value)
+            while self.types[self.pos] == ',':
+                self.pos += 1
+                self.expect('@')
+                names = (names, '@', self.expect('NAME').value)
+            return self.locate(('VAR', names), token)
+        if kind == 'IF':
+            return self.if_statement(token)
+        if kind == 'FOR':
+            return self.for_statement(token)
+        return self.expression()
+
+    def if_statement(self, token):
+        """Parse IF ... [ELSEIF ... ELSE ...] ENDIF."""
+        self.pos += 1
+        condition = self.expression()
+        self.expect('THEN')
+        body = self.block(IF_BODY_END)
+        kind = self.types[self.pos]
+        if kind == 'ENDIF':
+            self.pos += 1
+            return self.locate(('IF', condition, body), token)
+        chain = None
+        while self.types[self.pos] == 'ELSEIF':
+            self.pos += 1
+            test = self.expression()
+            self.expect('THEN')
+            branch = self.block(IF_BODY_END)
+            chain = ('ELSEIF', test, branch) if chain is None else ('ELSEIF', chain, test, branch)
+        # ELSEIF branches need a final ELSE, as in the PLY grammar
+        self.expect('ELSE')
+        other = self.block(ELSE_BODY_END)
+        self.expect('ENDIF')
+        if chain is not None:
+            other = ('ELSEIFCHAIN', chain, other)
+        elif other is None:
+            # An ELSE body without statements (e.g. only NOT @a), as in PLY
+            return self.locate(('IF', condition, body), token)
+        return self.locate(('IFELSE', condition, body, other), token)
+
+    def for_statement(self, token):
+        """Parse FOR @i = a TO|DOWNTO b DO ... NEXT @i."""
+        self.pos += 1
+        self.expect('@')
+        name = self.expect('NAME').value
+        self.expect('=')
+        start = self.expression()
+        if self.types[self.pos] not in ('TO', 'DOWNTO'):
+            raise ParseError(self.pos)
+        direction = self.tokens[self.pos].value
+        self.pos += 1
+        stop = self.expression()
+        self.expect('DO')
+        body = self.block(FOR_BODY_END)
+        self.expect('NEXT')
+        self.expect('@')
+        counter = self.expect('NAME').value
+        return self.locate(('FOR', name, start, direction, stop, body, counter), token)
+
+    def expression(self, power=0):
+        """
+        Parse an expression whose operators bind tighter than power.
+
+        Args:
+            power: Binding power of the operator on the left, 0 for none
+
+        Returns:
+            Expression node
+        """
+        left = self.unary()
+        types = self.types
+        compared = False
+        while True:
+            kind = types[self.pos]
+            binding = BINDING.get(kind)
+            if binding is None or binding <= power:
+                return left
+            if binding == COMPARISON and compared:
+                # a < b < c: comparisons are non-associative
+                raise ParseError(self.pos)
+            operator = self.tokens[self.pos].value
+            self.pos += 1
+            right = self.expression(binding)
+            if binding == COMPARISON:
+                left = ('RELOP', operator, left, right)
+            else:
+                left = ('BINOP', operator, left, right)
+            compared = binding == COMPARISON
+
+    def unary(self):
+        """Parse a prefix operator application or an operand."""
+        kind = self.types[self.pos]
+        token = self.tokens[self.pos] if kind != END else None
+        if kind == 'NUMBER':
+            self.pos += 1
+            return ('INT', token.value)
+        if kind == 'STRING':
+            self.pos += 1
+            return ('STR', token.value)
+        if kind == '@':
+            self.pos += 1
+            return self.locate(('@', self.expect('NAME').value), token)
+        if kind == 'NAME':
+            self.pos += 1
+            self.expect('(')
+            return self.locate(('FUNC', token.value, self.arguments()), token)
+        if kind == '(':
+            self.pos += 1
+            inner = self.expression()
+            self.expect(')')
+            return ('GROUP', inner)
+        if kind == '-':
+            self.pos += 1
+            return ('UNARY', '-', self.unary())
+        if kind == 'NOT':
+            # The PLY grammar parses NOT but builds no node for it
+            self.pos += 1
+            self.unary()
+            return None
+        raise ParseError(self.pos)
+
+    def arguments(self):
+        """Parse the arguments of a call after its '(' up to its ')'."""
+        if self.types[self.pos] == ')':
+            self.pos += 1
+            return ('ARGS',)
+        args = [self.expression()]
+        while self.types[self.pos] == ',':
+            self.pos += 1
+            args.append(self.expression())
+        self.expect(')')
+        return ('ARGS',) + tuple(args)
+
+
+# Lexer of each thread
+_local = threading.local()
+
+
+def lexer():
+    """
+    Get the current thread's clone of the lexer chosen with amplex.select().
+
+    Returns:
+        Lexer object
+    """
+    source = amplex.selected()
+    if getattr(_local, 'source', None) is not source:
+        _local.lexer = source.clone()
+        _local.source = source
+    return _local.lexer
+
+
+def parse(data):
+    """
+    Parse AmpScript code.
+
+    Safe to call from several threads at once.
+
+    Args:
+        data: AmpScript source code string
+
+    Returns:
+        Parsed AST, the same as ampyacc.parse() returns, or None if
+        parsing failed
+    """
+    lex = lexer()
+    lex.lineno = 1
+    lex.illegal = []
+    start = time.perf_counter() if ampmetrics.enabled else None
+    lex.input(data)
+    tokens = list(iter(lex.token, None))
+    if start is not None:
+        lexed = time.perf_counter()
+    parser = Parser(tokens, data, lex.lineno)
+    tree = parser.parse()
+    problems = _local.errors = [(f"Illegal character '{character}'", lineno, lexpos)
+                                for character, lineno, lexpos in lex.illegal]
+    problems.extend(parser.problems)
+    if start is not None:
+        ampmetrics.observe('stage_seconds', lexed - start, stage='lex')
+        ampmetrics.observe('stage_seconds', time.perf_counter() - lexed, stage='parse')
+        ampmetrics.inc('lex_tokens_total', len(tokens))
+    if problems:
+        ampmetrics.inc('parse_errors_total')
+    return tree
+
+
+def errors():
+    """
+    Get the problems found by the last parse() on this thread.
+
+    Returns:
+        List of (message, lineno, lexpos) tuples: illegal characters the
+        lexer skipped, then every syntax error in source order
+    """
+    return list(getattr(_local, 'errors', []))
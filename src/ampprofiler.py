@@ -0,0 +1,342 @@
+# =============================================================================
+# ampprofiler.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Deterministic profiler for AmpScript renders.
+# =============================================================================
+"""Deterministic profiler attributing render time to template lines and
+library functions.
+
+The interpreter calls enter()/exit() around every positioned statement and
+function call. Compiled Python marks the start of each statement with
+line(lineno, depth) and calls library functions through wrap(); a line
+frame stays open until a statement at the same or a shallower depth
+starts, so IF and FOR lines include the time of their bodies.
+
+HookProfiler instead profiles uninstrumented compiled Python with
+sys.setprofile and charges the events back to template lines through the
+compiler's source map (ampsourcemap).
+
+Results are reported as a text table sorted by cumulative time and as
+collapsed stacks ("line 3;line 4;Lookup 1250", self time in microseconds)
+for flamegraph tools.
+"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from . import ampfunctions
+
+# Active profiler per thread, used by compiled renders
+_state = threading.local()
+
+# Code of the import system, run by the imports of compiled templates
+IMPORT_FILES = frozenset((
+    '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>',
+))
+
+
+class Profiler:
+    """Call counts and cumulative/self times of statements and functions."""
+
+    def __init__(self, source=None):
+        """
+        Initialize the profiler.
+
+        Args:
+            source: Template source, used to show statement text in reports
+        """
+        self.lines = source.splitlines() if source else []
+        self.stats = {}      # (kind, name) -> [calls, cumulative, self]
+        self.stacks = {}     # tuple of frame labels -> self time
+        self.frames = []     # [key, path, start, child_time, depth]
+        self.active = {}     # key -> number of open frames
+
+    def enter(self, key, depth=None):
+        """
+        Open a frame.
+
+        Args:
+            key: ('line', lineno) or ('func', name)
+            depth: Statement nesting depth of line frames from compiled code
+        """
+        path = (self.frames[-1][1] if self.frames else ()) + (label(key),)
+        self.frames.append([key, path, time.perf_counter(), 0.0, depth])
+        self.active[key] = self.active.get(key, 0) + 1
+
+    def exit(self):
+        """Close the innermost frame and record its times."""
+        key, path, start, child, _ = self.frames.pop()
+        elapsed = time.perf_counter() - start
+        self.active[key] -= 1
+
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = self.stats[key] = [0, 0.0, 0.0]
+        stat[0] += 1
+        # Recursive frames only count once towards cumulative time
+        if not self.active[key]:
+            stat[1] += elapsed
+        stat[2] += elapsed - child
+        self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - child
+
+        if self.frames:
+            self.frames[-1][3] += elapsed
+
+    def mark(self, lineno, depth):
+        """
+        Start a statement of compiled code.
+
+        Line frames at the same or a deeper nesting level have finished.
+
+        Args:
+            lineno: Template line of the statement
+            depth: Statement nesting depth
+        """
+        frames = self.frames
+        while frames and frames[-1][4] is not None and frames[-1][4] >= depth:
+            self.exit()
+        self.enter(('line', lineno), depth)
+
+    def finish(self):
+        """Close all open frames at the end of a render."""
+        while self.frames:
+            self.exit()
+
+    def report(self, limit=None):
+        """
+        Format the statistics as text tables sorted by cumulative time.
+
+        Args:
+            limit: Maximum rows per table (optional)
+
+        Returns:
+            Report string
+        """
+        out = []
+        for kind, title, heading in (
+            ('line', 'Statements', f"{'line':>6} {'calls':>9} {'cum ms':>10} {'self ms':>10}  source"),
+            ('func', 'Functions', f"{'function':<28} {'calls':>9} {'cum ms':>10} {'self ms':>10}"),
+        ):
+            rows = sorted(
+                ((name, stat) for (k, name), stat in self.stats.items() if k == kind),
+                key=lambda row: row[1][1], reverse=True
+            )[:limit]
+            out.append(f"{title} (by cumulative time)")
+            out.append(heading)
+            for name, (calls, cumulative, own) in rows:
+                times = f"{calls:>9} {cumulative * 1000:>10.3f} {own * 1000:>10.3f}"
+                if kind == 'line':
+                    out.append(f"{name:>6} {times}  {self.source_line(name)}")
+                else:
+                    out.append(f"{name:<28} {times}")
+            out.append("")
+        return "\n".join(out)
+
+    def source_line(self, lineno):
+        """Return the stripped template text of a line, if known."""
+        if 0 < lineno <= len(self.lines):
+            return self.lines[lineno - 1].strip()
+        return ""
+
+    def collapsed(self):
+        """
+        Format self times as collapsed stacks for flamegraph tools.
+
+        Returns:
+            One "frame;frame;frame microseconds" line per stack
+        """
+        lines = []
+        for path, seconds in sorted(self.stacks.items()):
+            micros = int(round(seconds * 1e6))
+            if micros > 0:
+                lines.append(f"{';'.join(path)} {micros}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+class HookProfiler(Profiler):
+    """Profiler of uninstrumented compiled Python driven by sys.setprofile.
+
+    Calls made by the template code are timed as functions and charged to
+    the calling template line and its enclosing blocks. Time spent between
+    profile events in the template itself is charged to the line of the
+    later event, so straight-line code without calls is attributed to the
+    next statement that makes one.
+    """
+
+    def __init__(self, source_map, filename, source=None):
+        """
+        Initialize the profiler.
+
+        Args:
+            source_map: ampsourcemap.SourceMap of the compiled code
+            filename: File name the compiled code object was compiled with
+            source: Template source, used to show statement text in reports
+        """
+        super().__init__(source)
+        self.source_map = source_map
+        self.filename = filename
+        self.last = 0.0      # time of the previous template event
+        self.depth = 0       # calls open below the template frame
+        self.call = None     # (name, blocks, start) of the open call
+
+    def run(self, code, namespace):
+        """
+        Execute compiled code with the profile hook installed.
+
+        Args:
+            code: Code object compiled from source-mapped Python
+            namespace: Globals for the execution
+        """
+        previous = sys.getprofile()
+        self.depth = 0
+        self.last = time.perf_counter()
+        sys.setprofile(self.hook)
+        try:
+            exec(code, namespace)
+        finally:
+            sys.setprofile(previous)
+
+    def hook(self, frame, event, arg):
+        """Handle a sys.setprofile event."""
+        now = time.perf_counter()
+        if self.depth:
+            if event == 'call' or event == 'c_call':
+                self.depth += 1
+            elif event != 'exception':
+                self.depth -= 1
+                if not self.depth:
+                    self.end_call(now)
+            return
+
+        code = frame.f_code
+        if event == 'call':
+            caller = frame.f_back
+            if caller is None or caller.f_code.co_filename != self.filename:
+                return
+            if code is ampfunctions.__getattr__.__code__ or code.co_filename in IMPORT_FILES:
+                # Library lookups and imports of the prologue, not calls
+                return
+            name = code.co_name
+            if code.co_filename == ampfunctions.__file__ and 'name' in code.co_freevars:
+                # Memoizing wrapper: report the wrapped library function
+                name = frame.f_locals.get('name', name)
+            self.start_call(name, caller.f_lineno, now)
+        elif code.co_filename != self.filename:
+            return
+        elif event == 'c_call':
+            self.start_call(getattr(arg, '__name__', str(arg)), frame.f_lineno, now)
+        elif event == 'return':
+            self.charge(self.source_map.blocks(frame.f_lineno), now - self.last)
+            self.last = now
+
+    def start_call(self, name, generated_line, now):
+        """Charge the template time before a call and open the call."""
+        blocks = self.source_map.blocks(generated_line)
+        self.charge(blocks, now - self.last)
+        self.call = (name, blocks, now)
+        self.depth = 1
+
+    def end_call(self, now):
+        """Record the call that just returned to the template."""
+        name, blocks, start = self.call
+        elapsed = now - start
+        stat = self.stats.setdefault(('func', name), [0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += elapsed
+        stat[2] += elapsed
+        for lineno in blocks:
+            self.stats.setdefault(('line', lineno), [0, 0.0, 0.0])[1] += elapsed
+        path = tuple(label(('line', lineno)) for lineno in blocks) + (name,)
+        self.stacks[path] = self.stacks.get(path, 0.0) + elapsed
+        self.call = None
+        self.last = now
+
+    def charge(self, blocks, elapsed):
+        """
+        Charge template time to a line and its enclosing blocks.
+
+        Args:
+            blocks: Template lines from ampsourcemap.SourceMap.blocks();
+                unmapped code (the import header) is not charged
+            elapsed: Seconds to charge
+        """
+        if not blocks:
+            return
+        for lineno in blocks:
+            self.stats.setdefault(('line', lineno), [0, 0.0, 0.0])[1] += elapsed
+        stat = self.stats[('line', blocks[-1])]
+        stat[0] += 1
+        stat[2] += elapsed
+        path = tuple(label(('line', lineno)) for lineno in blocks)
+        self.stacks[path] = self.stacks.get(path, 0.0) + elapsed
+
+
+def label(key):
+    """Return the flamegraph frame name of a profiler key."""
+    kind, name = key
+    return f"line {name}" if kind == 'line' else str(name)
+
+
+def current():
+    """Return the profiler active on this thread, or None."""
+    return getattr(_state, 'profiler', None)
+
+
+@contextmanager
+def profiling(profiler):
+    """
+    Activate a profiler for compiled code run in the with block.
+
+    Args:
+        profiler: Profiler to activate
+
+    Yields:
+        The profiler
+    """
+    previous = current()
+    _state.profiler = profiler
+    try:
+        yield profiler
+    finally:
+        profiler.finish()
+        _state.profiler = previous
+
+
+def line(lineno, depth):
+    """Mark the start of a compiled statement on the active profiler."""
+    profiler = getattr(_state, 'profiler', None)
+    if profiler is not None:
+        profiler.mark(lineno, depth)
+
+
+def wrap(name, function):
+    """
+    Wrap a library function so its calls are profiled.
+
+    Args:
+        name: Canonical function name
+        function: Callable to wrap
+
+    Returns:
+        Callable recording a frame on the active profiler
+    """
+    key = ('func', name)
+
+    def call(*args):
+        profiler = getattr(_state, 'profiler', None)
+        if profiler is None:
+            return function(*args)
+        profiler.enter(key)
+        try:
+            return function(*args)
+        finally:
+            profiler.exit()
+
+    call.__name__ = name
+    return call
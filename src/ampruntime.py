@@ -0,0 +1,520 @@
+# =============================================================================
+# ampruntime.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Tree-shaken runtimes for standalone compiled templates.
+# =============================================================================
+"""Runtimes holding only the library functions a template calls.
+
+Compiled Python normally imports the src.ampfunctions package and compiled
+JavaScript calls a global ampfunctions object. With standalone=True the
+compilers prepend a runtime built here instead, so the generated file runs
+on its own.
+
+python_runtime() copies the implementations of the called functions from
+their category modules into one Runtime class, with everything they use,
+transitively: other library functions, module-level helpers and the
+definitions of the package modules they reach (lib.utils, src.ampbudget,
+src.ampcontext, ...), hoisted into the runtime as _<module>_<name>.
+Standard library imports are kept. SERVICES hold state the host process
+configures (content blocks, data extensions, HTTP pools) and stay imported
+from the package. Docstrings and the annotation decorators are dropped, and
+pure functions are not memoized.
+
+js_runtime() bundles the JS_FUNCTIONS implementations of the called
+functions; a function without one calls Platform.Function of the same
+name, as Marketing Cloud server-side JavaScript provides.
+"""
+
+import ast
+import copy
+import importlib
+import importlib.util
+import inspect
+import os
+
+from . import ampfunctions
+
+# Directory holding the src and lib packages; modules below it are part of
+# this project and may be copied into runtimes
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Package modules whose state the host process configures: runtimes import
+# them instead of copying them
+SERVICES = frozenset((
+    f"{__package__}.ampcontentstore",
+    f"{__package__}.ampdatastore",
+    f"{ampfunctions.__name__}.httpclient",
+))
+
+# Library class whose __init__ sets the attributes functions read
+LIBRARY_CLASS = 'func'
+
+
+def hoisted_name(module, name):
+    """
+    Get the name a module-level definition has in a Python runtime.
+
+    Args:
+        module: Full module name, e.g. 'src.ampbudget'
+        name: Top-level name in that module
+
+    Returns:
+        Runtime name, e.g. '_ampbudget_write'
+    """
+    return f"_{module.rsplit('.', 1)[-1]}_{name}"
+
+
+def is_project(module):
+    """Return True if a module is part of this project rather than installed."""
+    spec = importlib.util.find_spec(module)
+    if spec is None or not spec.has_location:
+        return False
+    return os.path.abspath(spec.origin).startswith(ROOT + os.sep)
+
+
+def is_module(name):
+    """Return True if a dotted name is an importable module."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class SourceModule:
+    """Top-level definitions and imports of a module's source."""
+
+    def __init__(self, name):
+        """
+        Parse a module.
+
+        Args:
+            name: Full module name
+        """
+        module = importlib.import_module(name)
+        self.name = name
+        self.tree = ast.parse(inspect.getsource(module))
+        # Top-level name -> def, class or assignment statement
+        self.definitions = {}
+        # Local name -> ('module', module, statement) or ('from', module, attribute)
+        self.imports = {}
+        package = module.__package__
+        for node in self.tree.body:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.asname:
+                        self.imports[alias.asname] = ('module', alias.name,
+                                                      f"import {alias.name} as {alias.asname}")
+                    else:
+                        local = alias.name.split('.')[0]
+                        self.imports[local] = ('module', local, f"import {alias.name}")
+            elif isinstance(node, ast.ImportFrom):
+                base = importlib.util.resolve_name('.' * node.level + (node.module or ''),
+                                                   package) if node.level else node.module
+                for alias in node.names:
+                    local = alias.asname or alias.name
+                    full = f"{base}.{alias.name}"
+                    if is_module(full):
+                        self.imports[local] = ('module', full, f"import {full} as {local}")
+                    else:
+                        self.imports[local] = ('from', base, alias.name)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.definitions[node.name] = node
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    for child in ast.walk(target):
+                        if isinstance(child, ast.Name):
+                            self.definitions[child.id] = node
+
+    def method(self, class_name, name):
+        """Get the def node of a method of a top-level class, or None."""
+        for node in self.definitions[class_name].body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name:
+                return node
+        return None
+
+
+def bound_names(node):
+    """
+    Get the names a function binds locally.
+
+    Args:
+        node: FunctionDef, AsyncFunctionDef or Lambda node
+
+    Returns:
+        Set of parameter and assigned names, without those declared global
+    """
+    args = node.args
+    names = {arg.arg for arg in args.posonlyargs + args.args + args.kwonlyargs}
+    names.update(arg.arg for arg in (args.vararg, args.kwarg) if arg is not None)
+    declared = set()
+    stack = list(node.body) if isinstance(node.body, list) else [node.body]
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(child.name)
+            continue
+        if isinstance(child, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp,
+                              ast.GeneratorExp)):
+            continue
+        if isinstance(child, (ast.Global, ast.Nonlocal)):
+            declared.update(child.names)
+        elif isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+            names.add(child.id)
+        elif isinstance(child, ast.ExceptHandler) and child.name:
+            names.add(child.name)
+        elif isinstance(child, ast.alias):
+            names.add(child.asname or child.name.split('.')[0])
+        stack.extend(ast.iter_child_nodes(child))
+    return names - declared
+
+
+def strip_docstring(body):
+    """Drop the docstring of a def or class body, keeping it non-empty."""
+    if (body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+            and isinstance(body[0].value.value, str)):
+        body = body[1:] or [ast.Pass()]
+    return body
+
+
+class Hoister(ast.NodeTransformer):
+    """Rewrite one definition's global references to runtime names."""
+
+    def __init__(self, bundle, module):
+        """
+        Initialize the rewriter.
+
+        Args:
+            bundle: PythonRuntime collecting the referenced definitions
+            module: SourceModule the definition comes from
+        """
+        self.bundle = bundle
+        self.module = module
+        # (is_class_body, names) per enclosing scope, innermost last
+        self.scopes = []
+
+    def is_local(self, name):
+        """Return True if a name resolves to a local of an enclosing scope."""
+        for depth, (is_class, names) in enumerate(reversed(self.scopes)):
+            # Class bodies are not visible to the functions inside them
+            if is_class and depth > 0:
+                continue
+            if name in names:
+                return True
+        return False
+
+    def visit_FunctionDef(self, node):
+        node.decorator_list = [self.visit(decorator) for decorator in node.decorator_list]
+        node.args.defaults = [self.visit(default) for default in node.args.defaults]
+        node.args.kw_defaults = [default and self.visit(default)
+                                 for default in node.args.kw_defaults]
+        self.scopes.append((False, bound_names(node)))
+        node.body = [self.visit(statement) for statement in strip_docstring(node.body)]
+        self.scopes.pop()
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        node.args.defaults = [self.visit(default) for default in node.args.defaults]
+        self.scopes.append((False, bound_names(node)))
+        node.body = self.visit(node.body)
+        self.scopes.pop()
+        return node
+
+    def visit_ClassDef(self, node):
+        node.bases = [self.visit(base) for base in node.bases]
+        node.decorator_list = [self.visit(decorator) for decorator in node.decorator_list]
+        names = set()
+        for statement in node.body:
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(statement.name)
+            elif isinstance(statement, (ast.Assign, ast.AnnAssign)):
+                names.update(child.id for child in ast.walk(statement)
+                             if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store))
+        self.scopes.append((True, names))
+        node.body = [self.visit(statement) for statement in strip_docstring(node.body)]
+        self.scopes.pop()
+        return node
+
+    def visit_comprehension_scope(self, node):
+        names = {child.id for generator in node.generators for child in ast.walk(generator.target)
+                 if isinstance(child, ast.Name)}
+        self.scopes.append((False, names))
+        self.generic_visit(node)
+        self.scopes.pop()
+        return node
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = \
+        visit_comprehension_scope
+
+    def visit_Global(self, node):
+        node.names = [self.bundle.resolve(self.module, name) or name for name in node.names]
+        return node
+
+    def visit_Attribute(self, node):
+        value = node.value
+        if isinstance(value, ast.Name) and not self.is_local(value.id):
+            imported = self.module.imports.get(value.id)
+            if imported and imported[0] == 'module' and self.bundle.inlines(imported[1]):
+                name = self.bundle.hoist(imported[1], node.attr)
+                return ast.copy_location(ast.Name(id=name, ctx=node.ctx), node)
+        return self.generic_visit(node)
+
+    def visit_Name(self, node):
+        if self.is_local(node.id):
+            return node
+        name = self.bundle.resolve(self.module, node.id)
+        if name is None:
+            return node
+        return ast.copy_location(ast.Name(id=name, ctx=node.ctx), node)
+
+
+class MethodHoister(Hoister):
+    """Rewrite a library method, collecting the self.<Function> calls it makes."""
+
+    def visit_Attribute(self, node):
+        if (isinstance(node.value, ast.Name) and node.value.id == 'self'
+                and self.is_local('self') and node.attr in ampfunctions.FUNCTION_INDEX):
+            self.bundle.add_function(node.attr)
+        return super().visit_Attribute(node)
+
+
+class PythonRuntime:
+    """Collects the definitions a set of library functions needs."""
+
+    def __init__(self):
+        """Initialize an empty runtime."""
+        self.modules = {}
+        # Local name -> import statement
+        self.imports = {}
+        # Hoisted top-level statements, dependencies first
+        self.statements = []
+        self.methods = []
+        self.seen = set()
+
+    def source_module(self, name):
+        """Get the parsed source of a module, parsing it once."""
+        if name not in self.modules:
+            self.modules[name] = SourceModule(name)
+        return self.modules[name]
+
+    def inlines(self, module):
+        """Return True if a module's definitions are copied into the runtime."""
+        return module not in SERVICES and is_project(module)
+
+    def add_import(self, local, statement):
+        """
+        Keep an import statement.
+
+        Raises:
+            RuntimeError: If two modules bind the name to different imports
+        """
+        previous = self.imports.setdefault(local, statement)
+        if previous != statement:
+            raise RuntimeError(f"Conflicting imports of {local}: {previous!r}, {statement!r}")
+
+    def resolve(self, module, name):
+        """
+        Resolve a global name used by a definition of a module.
+
+        Args:
+            module: SourceModule of the definition
+            name: Global name
+
+        Returns:
+            The runtime name to use instead, or None to keep the name
+
+        Raises:
+            RuntimeError: If a copied package module is used other than
+                through its attributes
+        """
+        if name in module.definitions:
+            return self.hoist(module.name, name)
+        imported = module.imports.get(name)
+        if imported is None:
+            return None
+        kind, source, detail = imported
+        if kind == 'from':
+            if self.inlines(source):
+                return self.hoist(source, detail)
+            self.add_import(name, f"from {source} import {detail}" if name == detail
+                            else f"from {source} import {detail} as {name}")
+            return None
+        if self.inlines(source):
+            raise RuntimeError(f"{module.name} uses module {source} as a value")
+        self.add_import(name, detail)
+        return None
+
+    def hoist(self, module, name):
+        """
+        Copy a module-level definition into the runtime.
+
+        Args:
+            module: Full module name
+            name: Top-level name
+
+        Returns:
+            The definition's runtime name
+        """
+        key = ('global', module, name)
+        if key not in self.seen:
+            self.seen.add(key)
+            source = self.source_module(module)
+            node = source.definitions.get(name)
+            if node is None:
+                raise RuntimeError(f"{module} has no definition of {name}")
+            statement = Hoister(self, source).visit(copy.deepcopy(node))
+            if not isinstance(statement, (ast.Assign, ast.AnnAssign)):
+                statement.name = hoisted_name(module, name)
+            self.statements.append(ast.unparse(statement))
+        return hoisted_name(module, name)
+
+    def add_function(self, name):
+        """
+        Copy a library function and everything it uses.
+
+        Args:
+            name: Canonical library function name
+        """
+        self.add_method(f"{ampfunctions.__name__}.{ampfunctions.FUNCTION_INDEX[name]}",
+                        ampfunctions.CATEGORIES[ampfunctions.FUNCTION_INDEX[name]][0], name)
+
+    def add_method(self, module, class_name, name):
+        """Copy a method of a library class into the Runtime class."""
+        key = ('method', name)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        source = self.source_module(module)
+        node = copy.deepcopy(source.method(class_name, name))
+        # @pure/@cost only annotate functions for the optimizer
+        node.decorator_list = []
+        self.methods.append(ast.unparse(MethodHoister(self, source).visit(node)))
+
+    def source(self):
+        """
+        Get the runtime as Python source.
+
+        Returns:
+            Imports, hoisted definitions, the Runtime class and its instance
+            bound to ampfunctions, so a compiled script can use
+            ampfunctions.<Function> as with the package
+        """
+        lines = [f"# AmpScript runtime: {', '.join(self.functions())}"]
+        lines.extend(sorted(self.imports.values()))
+        lines.extend(self.statements)
+        lines.append("class Runtime:")
+        for method in self.methods:
+            lines.extend("    " + line for line in method.splitlines())
+        lines.append("ampfunctions = Runtime()")
+        return '\n'.join(lines) + '\n'
+
+    def functions(self):
+        """Get the names of the library functions in the runtime."""
+        return sorted(name for kind, name, *_ in self.seen
+                      if kind == 'method' and name in ampfunctions.FUNCTION_INDEX)
+
+
+def python_runtime(functions, names=()):
+    """
+    Build a Python runtime holding only the given library functions.
+
+    Args:
+        functions: Canonical library function names
+        names: (module, name) pairs of further package definitions to
+            include, referenced by hoisted_name() in the compiled script
+
+    Returns:
+        Python source defining ampfunctions
+
+    Raises:
+        RuntimeError: If a definition cannot be copied
+    """
+    runtime = PythonRuntime()
+    runtime.add_method(ampfunctions.__name__, LIBRARY_CLASS, '__init__')
+    for name in functions:
+        runtime.add_function(name)
+    for module, name in names:
+        runtime.hoist(module, name)
+    return runtime.source()
+
+
+# Server-side JavaScript implementations of library functions, matching the
+# Python library; each is called with the library object first
+JS_FUNCTIONS = {
+    'Output': "function (self, text) { amp_write(text + '\\n'); }",
+    'OutputLine': "function (self, text) { amp_write(text + '\\n'); }",
+    'V': "function (self, text) { amp_write(text + '\\n'); }",
+    'Write': "function (self, text) { amp_write(String(text)); }",
+    'Empty': "function (self, text) { return text.length === 0; }",
+    'IsNull': "function (self, value) { return value === null || value === undefined; }",
+    'Domain': ("function (self, email) { "
+               "return email.indexOf('@') >= 0 ? email.split('@')[1] : ''; }"),
+    'AttributeValue': ("function (self, name) { return typeof Platform !== 'undefined' "
+                       "? Platform.Recipient.GetAttributeValue(name) : null; }"),
+    'String': "function (self, value) { return String(value); }",
+    'Char': ("function (self, code, count) { var text = String.fromCharCode(code), result = ''; "
+             "for (var i = 0; i < (count === undefined ? 1 : count); i++) { result += text; } "
+             "return result; }"),
+    'Concat': ("function (self) { var result = ''; "
+               "for (var i = 1; i < arguments.length; i++) { result += String(arguments[i]); } "
+               "return result; }"),
+    'IndexOf': "function (self, text, search) { return text.indexOf(search); }",
+    'Length': "function (self, text) { return text.length; }",
+    'Lowercase': "function (self, text) { return text.toLowerCase(); }",
+    'Uppercase': "function (self, text) { return text.toUpperCase(); }",
+    'ProperCase': ("function (self, text) { return text.replace(/[A-Za-z]+/g, function (word) { "
+                   "return word.charAt(0).toUpperCase() + word.substring(1).toLowerCase(); }); }"),
+    'Replace': "function (self, text, target, replacement) { return text.split(target).join(replacement); }",
+    'Substring': "function (self, text, pos, length) { return text.substring(pos, pos + length); }",
+    'Trim': "function (self, text) { return text.replace(/^\\s+|\\s+$/g, ''); }",
+    'Add': "function (self, a, b) { return a + b; }",
+    'Subtract': "function (self, a, b) { return a - b; }",
+    'Multiply': "function (self, a, b) { return a * b; }",
+    'Divide': "function (self, a, b) { return a / b; }",
+    'Mod': ("function (self, a, b) { var r = a % b; "
+            "return r !== 0 && (r < 0) !== (b < 0) ? r + b : r; }"),
+    'Random': ("function (self, min, max) { "
+               "return min + Math.floor(Math.random() * (max - min + 1)); }"),
+    'IIf': "function (self, condition, whenTrue, whenFalse) { return condition ? whenTrue : whenFalse; }",
+    'IsNullDefault': ("function (self, value, fallback) { "
+                      "return value === null || value === undefined ? fallback : value; }"),
+    'Now': "function (self) { return new Date(); }",
+}
+
+# Helpers JS_FUNCTIONS use, defined before the library object
+JS_PRELUDE = {
+    'amp_write': ("var amp_write = typeof Write === 'function' ? Write : "
+                  "function (text) { process.stdout.write(String(text)); };"),
+}
+
+
+def js_platform_function(name):
+    """Get a JS function delegating a library function to Platform.Function."""
+    return (f"function (self) {{ return Platform.Function.{name}.apply(Platform.Function, "
+            f"Array.prototype.slice.call(arguments, 1)); }}")
+
+
+def js_runtime(functions):
+    """
+    Build a JavaScript runtime holding only the given library functions.
+
+    Args:
+        functions: Canonical library function names
+
+    Returns:
+        JavaScript source declaring ampfunctions
+    """
+    names = sorted(set(functions))
+    bodies = {name: JS_FUNCTIONS.get(name) or js_platform_function(name) for name in names}
+    lines = [JS_PRELUDE[helper] for helper in sorted(JS_PRELUDE)
+             if any(helper in body for body in bodies.values())]
+    lines.append("var ampfunctions = {")
+    lines.append(",\n".join(f"\t'{name}': {bodies[name]}" for name in names))
+    lines.append("};")
+    return '\n'.join(lines) + '\n'
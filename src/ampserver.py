@@ -0,0 +1,449 @@
+# =============================================================================
+# ampserver.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Local CloudPages render server for testing landing pages.
+# =============================================================================
+"""HTTP server rendering AmpScript pages from a directory.
+
+    python3 amp.py serve pages/ --port 8080
+
+A request for /offer renders pages/offer.ampscript (or offer.html, or
+offer.amp; / renders index.*). Pages are HTML with embedded AmpScript like
+content blocks, and QueryParameter, RequestParameter and Redirect read and
+answer the request being served. Compiled pages stay in memory and are
+recompiled only when their file changes; --warm compiles all of them at
+startup.
+
+Requests are answered by a fixed pool of worker threads. Connections are
+kept alive (HTTP/1.1) until idle for KEEP_ALIVE_TIMEOUT seconds, and each
+holds a worker meanwhile, so the pool size caps concurrent connections.
+Responses are gzip-compressed for clients that accept it. GET /_stats
+returns request rate, latency percentiles, status counts and cache hit
+rates as JSON. With --metrics, GET /_metrics exports the stage timers and
+library call counts of ampmetrics in Prometheus text format, or as JSON
+with ?format=json.
+"""
+
+import argparse
+import collections
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from . import ampbudget, ampcontentstore, ampcontext, ampdatastore, ampmetrics
+from .amptemplate import Template
+
+logger = logging.getLogger(__name__)
+
+PAGE_EXTENSIONS = ('.ampscript', '.html', '.amp')
+STATS_PATH = '/_stats'
+METRICS_PATH = '/_metrics'
+
+# Smaller bodies are sent uncompressed: gzip would not pay for itself
+GZIP_MIN_BYTES = 512
+
+# Seconds an idle keep-alive connection may hold a worker
+KEEP_ALIVE_TIMEOUT = 5
+
+# Latest request latencies kept for percentiles
+LATENCY_SAMPLES = 10000
+
+# Seconds over which the current request rate is measured
+RATE_WINDOW = 10.0
+
+
+class PageCache:
+    """Compiled pages of a directory, recompiled when their file changes."""
+
+    def __init__(self, root, compiled=True):
+        """
+        Initialize the cache.
+
+        Args:
+            root: Directory holding the pages
+            compiled: Render pages as compiled Python instead of with the
+                interpreter
+        """
+        self.root = os.path.abspath(root)
+        self.compiled = compiled
+        self.pages = {}           # file path -> ((mtime, size), Template)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compilations = 0
+
+    def resolve(self, path):
+        """
+        Find the page file of a request path.
+
+        Args:
+            path: Request path without the query string
+
+        Returns:
+            File path, or None if there is no page (or the path leaves the
+            root directory)
+        """
+        relative = path.strip('/') or 'index'
+        base = os.path.abspath(os.path.join(self.root, relative))
+        if os.path.commonpath([self.root, base]) != self.root:
+            return None
+        if os.path.splitext(base)[1] in PAGE_EXTENSIONS and os.path.isfile(base):
+            return base
+        for extension in PAGE_EXTENSIONS:
+            if os.path.isfile(base + extension):
+                return base + extension
+        return None
+
+    def template(self, path):
+        """
+        Get the compiled template of a request path.
+
+        Args:
+            path: Request path without the query string
+
+        Returns:
+            Template, or None if there is no page
+
+        Raises:
+            RuntimeError: If the page cannot be parsed
+        """
+        filename = self.resolve(path)
+        if filename is None:
+            return None
+        stat = os.stat(filename)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        entry = self.pages.get(filename)
+        if entry is not None and entry[0] == stamp:
+            with self.lock:
+                self.hits += 1
+            return entry[1]
+        template = self.load(filename)
+        with self.lock:
+            self.misses += 1
+            self.pages[filename] = (stamp, template)
+        return template
+
+    def load(self, filename):
+        """Parse and compile a page file."""
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        template = Template(text, name=filename, compiled=self.compiled,
+                            tree=ampcontentstore.parse_content(text, filename))
+        if self.compiled:
+            template.python_code()
+        with self.lock:
+            self.compilations += 1
+        return template
+
+    def warm(self):
+        """
+        Compile every page of the directory ahead of the first request.
+
+        Returns:
+            Number of pages compiled
+        """
+        count = 0
+        for filename in sorted(os.listdir(self.root)):
+            extension = os.path.splitext(filename)[1]
+            if extension in PAGE_EXTENSIONS:
+                self.template('/' + filename)
+                count += 1
+        # Warming is not a request
+        with self.lock:
+            self.misses = 0
+        return count
+
+    def stats(self):
+        """Return hit and compilation counters as a dictionary."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'pages': len(self.pages),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'compilations': self.compilations,
+            }
+
+
+class Stats:
+    """Request counters and recent latencies of a server."""
+
+    def __init__(self):
+        """Initialize empty statistics."""
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.requests = 0
+        self.statuses = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.finished = collections.deque()   # completion times in RATE_WINDOW
+
+    def record(self, status, seconds):
+        """
+        Record a completed request.
+
+        Args:
+            status: Response status code
+            seconds: Time taken to answer
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            self.statuses[status] += 1
+            self.latencies.append(seconds)
+            self.finished.append(now)
+            while self.finished[0] < now - RATE_WINDOW:
+                self.finished.popleft()
+
+    def snapshot(self):
+        """Return the statistics as a JSON-serializable dictionary."""
+        now = time.monotonic()
+        with self.lock:
+            while self.finished and self.finished[0] < now - RATE_WINDOW:
+                self.finished.popleft()
+            latencies = sorted(self.latencies)
+            uptime = now - self.started
+            return {
+                'uptime_s': round(uptime, 3),
+                'requests': self.requests,
+                'requests_per_s': round(len(self.finished) / min(uptime, RATE_WINDOW), 2)
+                if uptime else 0.0,
+                'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+                'latency_ms': {
+                    name: round(percentile(latencies, q) * 1000, 3) if latencies else None
+                    for name, q in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))
+                },
+            }
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values."""
+    index = max(0, min(len(values) - 1, -(-len(values) * q // 100) - 1))
+    return values[int(index)]
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Request handler rendering pages of the server's cache."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    timeout = KEEP_ALIVE_TIMEOUT
+    server_version = 'amp-serve'
+
+    def do_GET(self):
+        """Answer a GET request."""
+        self.answer('')
+
+    def do_POST(self):
+        """Answer a POST request; form fields feed RequestParameter."""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8', errors='replace')
+        form = body if 'x-www-form-urlencoded' in self.headers.get('Content-Type', '') else ''
+        self.answer(form)
+
+    def answer(self, form):
+        """Render the requested page, or the statistics, and record timing."""
+        start = time.perf_counter()
+        path, _, query = self.path.partition('?')
+        if path == STATS_PATH:
+            status = self.send_body(200, json.dumps(self.server.stats_dict()),
+                                    'application/json')
+        elif path == METRICS_PATH:
+            status = self.send_metrics(query)
+        else:
+            status = self.render(path, query, form)
+        seconds = time.perf_counter() - start
+        self.server.stats.record(status, seconds)
+        ampmetrics.observe('request_seconds', seconds)
+        ampmetrics.inc('requests_total', status=status)
+
+    def send_metrics(self, query):
+        """
+        Send the metrics registry.
+
+        Returns:
+            Response status code
+        """
+        registry = ampmetrics.registry()
+        if 'format=json' in query.split('&'):
+            return self.send_body(200, registry.dumps(), 'application/json')
+        return self.send_body(200, registry.to_prometheus(), 'text/plain; version=0.0.4')
+
+    def render(self, path, query, form):
+        """
+        Render a page for the request.
+
+        Returns:
+            Response status code
+        """
+        server = self.server
+        try:
+            template = server.cache.template(path)
+            if template is None:
+                return self.send_body(404, f"No page for {path}\n", 'text/plain')
+            request = ampcontext.Request(self.command, path, query, form, dict(self.headers))
+            budget = server.budget.copy() if server.budget is not None else None
+            with ampcontext.handling(request):
+                output = template.render(budget=budget)
+        except RuntimeError as e:
+            logger.error(f"{self.command} {self.path} failed: {e}")
+            return self.send_body(500, f"Error: {e}\n", 'text/plain')
+        except Exception:
+            # A bug in a template or library function: keep serving
+            logger.exception(f"{self.command} {self.path} failed")
+            return self.send_body(500, "Internal error\n", 'text/plain')
+        if request.redirect is not None:
+            url, status = request.redirect
+            return self.send_body(status, '', 'text/plain', {'Location': url})
+        return self.send_body(200, output, 'text/html')
+
+    def send_body(self, status, text, content_type, headers=None):
+        """
+        Send a complete response, gzip-compressed if the client accepts it.
+
+        Returns:
+            The status code
+        """
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        if len(body) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def log_message(self, format, *args):
+        """Log requests at debug level instead of printing them."""
+        logger.debug(format, *args)
+
+
+class PageServer(HTTPServer):
+    """HTTP server handing connections to a fixed pool of worker threads."""
+
+    def __init__(self, address, cache, workers=16, budget=None):
+        """
+        Initialize the server.
+
+        Args:
+            address: (host, port) to listen on; port 0 picks a free port
+            cache: PageCache of the pages served
+            workers: Worker threads, i.e. connections served at once
+            budget: ampbudget.Budget whose limits apply to each render
+                (optional)
+        """
+        super().__init__(address, PageHandler)
+        self.cache = cache
+        self.budget = budget
+        self.stats = Stats()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='amp-serve')
+
+    def process_request(self, request, client_address):
+        """Serve a connection on a worker thread."""
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        """Serve a connection until the client or the idle timeout closes it."""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def handle_error(self, request, client_address):
+        """Ignore clients that disconnect mid-response."""
+        if not isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+    def stats_dict(self):
+        """Return request, page cache and content store statistics."""
+        stats = self.stats.snapshot()
+        stats['page_cache'] = self.cache.stats()
+        store = ampcontentstore.store()
+        if store is not None:
+            stats['content_blocks'] = {
+                'cached': len(store.cache),
+                'compilations': store.compilations,
+            }
+        return stats
+
+    def server_close(self):
+        """Close the socket and stop the workers."""
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+    def url(self, path='/'):
+        """Get the absolute URL of a path on the server."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+
+def main(argv=None):
+    """
+    Run the page server until interrupted.
+
+    Args:
+        argv: Command line arguments after "serve" (default sys.argv[2:])
+
+    Returns:
+        Exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog="amp.py serve", description="Serve AmpScript pages over HTTP"
+    )
+    parser.add_argument("root", nargs="?", default=".", help="Directory of pages")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=16,
+                        help="Worker threads, i.e. connections served at once")
+    parser.add_argument("--interpreted", action="store_true",
+                        help="Render with the interpreter instead of compiled Python")
+    parser.add_argument("--warm", action="store_true",
+                        help="Compile all pages before accepting requests")
+    parser.add_argument("--content", metavar="PATH",
+                        help="Directory or SQLite file of content blocks")
+    parser.add_argument("--data", metavar="PATH",
+                        help="SQLite file of data extensions for the Lookup functions")
+    parser.add_argument("--timeout", type=float,
+                        help="Wall-clock seconds allowed per render")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"Record stage timers and call counts, exported at {METRICS_PATH}")
+    args = parser.parse_args(sys.argv[2:] if argv is None else argv)
+
+    if not os.path.isdir(args.root):
+        parser.error(f"not a directory: {args.root}")
+    if args.metrics:
+        ampmetrics.enable()
+    if args.content:
+        ampcontentstore.configure(ampcontentstore.open_store(args.content))
+    if args.data:
+        ampdatastore.configure(ampdatastore.DataExtensionStore(args.data))
+    cache = PageCache(args.root, compiled=not args.interpreted)
+    if args.warm:
+        print(f"Compiled {cache.warm()} page(s)", file=sys.stderr)
+    budget = ampbudget.Budget(timeout=args.timeout) if args.timeout else None
+    server = PageServer((args.host, args.port), cache, args.workers, budget)
+    print(f"Serving {cache.root} on {server.url()} (stats at {STATS_PATH})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,136 @@
+# =============================================================================
+# ampsourcemap.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Source maps from compiled Python back to AmpScript template lines.
+# =============================================================================
+"""Source maps from generated Python lines to template lines and columns.
+
+With source_map=True, AmpCompilerToPy writes a "# line L:C" comment before
+the code of every positioned statement. The comments cost nothing at run
+time; SourceMap.from_code() reads them back. A generated line belongs to
+the innermost mark whose indentation does not exceed its own, so an ELSE
+maps to its IF; the increment of a FOR loop is marked again with the FOR's
+position.
+"""
+
+import json
+import re
+
+MARKER = re.compile(r'^( *)# line (\d+):(\d*)$')
+
+
+def marker(lineno, col=None):
+    """
+    Format the source map comment of a statement.
+
+    Args:
+        lineno: Template line
+        col: Template column (optional)
+
+    Returns:
+        Comment text without indentation
+    """
+    return f"# line {lineno}:{col if col is not None else ''}"
+
+
+class SourceMap:
+    """Generated line -> template position and enclosing template blocks."""
+
+    def __init__(self, entries=None):
+        """
+        Initialize the map.
+
+        Args:
+            entries: Dictionary of generated line (1-based) ->
+                (lineno, col, blocks); blocks lists the template lines of
+                the enclosing statements, outermost first, ending with lineno
+        """
+        self.entries = entries or {}
+
+    @classmethod
+    def from_code(cls, code):
+        """
+        Build the map of generated Python from its "# line" comments.
+
+        Args:
+            code: Generated Python source
+
+        Returns:
+            SourceMap instance
+        """
+        entries = {}
+        stack = []  # (indent, lineno, col, blocks) of the open marks
+        for number, text in enumerate(code.split('\n'), 1):
+            if not text.strip():
+                continue
+            indent = len(text) - len(text.lstrip(' '))
+            match = MARKER.match(text)
+            if match:
+                # A mark ends the marks at the same or a deeper level
+                while stack and stack[-1][0] >= indent:
+                    stack.pop()
+                lineno = int(match.group(2))
+                col = int(match.group(3)) if match.group(3) else None
+                blocks = stack[-1][3] if stack else ()
+                if blocks[-1:] != (lineno,):
+                    blocks += (lineno,)
+                stack.append((indent, lineno, col, blocks))
+                continue
+            while stack and stack[-1][0] > indent:
+                stack.pop()
+            if stack:
+                entries[number] = stack[-1][1:]
+        return cls(entries)
+
+    def lookup(self, generated_line):
+        """
+        Get the template position of a generated line.
+
+        Args:
+            generated_line: 1-based line of the generated Python
+
+        Returns:
+            Tuple of (lineno, col), or None for unmapped lines such as the
+            import header
+        """
+        entry = self.entries.get(generated_line)
+        return entry[:2] if entry else None
+
+    def blocks(self, generated_line):
+        """
+        Get the template lines of the statements enclosing a generated line.
+
+        Args:
+            generated_line: 1-based line of the generated Python
+
+        Returns:
+            Tuple of template lines, outermost first; empty if unmapped
+        """
+        entry = self.entries.get(generated_line)
+        return entry[2] if entry else ()
+
+    def to_dict(self):
+        """Return the map as a JSON-serializable dictionary."""
+        return {
+            'version': 1,
+            'mappings': {
+                str(number): [lineno, col, list(blocks)]
+                for number, (lineno, col, blocks) in sorted(self.entries.items())
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Load a map written by to_dict()."""
+        return cls({
+            int(number): (lineno, col, tuple(blocks))
+            for number, (lineno, col, blocks) in data['mappings'].items()
+        })
+
+    def dumps(self):
+        """Return the map as a JSON string."""
+        return json.dumps(self.to_dict())
@@ -0,0 +1,181 @@
+# =============================================================================
+# ampstubserver.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Local stub HTTP server for offline tests and load tests.
+# =============================================================================
+"""Local keep-alive HTTP server standing in for the APIs templates call.
+
+Routes map a path to a canned response; POST requests to unknown paths
+echo their body. The server counts requests and accepted connections, so
+tests can check that connections are reused and that cached responses do
+not reach the server.
+
+    with StubServer({'/price': Route('42', max_age=60)}) as server:
+        Template('%%[ Output(HTTPGet("' + server.url('/price') + '")) ]%%').render()
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Route:
+    """Canned response of a stub endpoint."""
+
+    def __init__(self, body='', status=200, content_type='text/plain; charset=utf-8',
+                 max_age=None, etag=None, delay=0.0, headers=None):
+        """
+        Initialize the route.
+
+        Args:
+            body: Response body
+            status: Status code
+            content_type: Content-Type header
+            max_age: Cache-Control max-age in seconds (optional)
+            etag: ETag header; a matching If-None-Match gets a 304
+            delay: Seconds to wait before responding, to simulate latency
+            headers: Extra response headers (optional)
+        """
+        self.body = body
+        self.status = status
+        self.content_type = content_type
+        self.max_age = max_age
+        self.etag = etag
+        self.delay = delay
+        self.headers = headers or {}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler answering from the server's routes."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes; avoid delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Answer a GET request."""
+        self.respond(None)
+
+    def do_POST(self):
+        """Answer a POST request, echoing the body on unknown paths."""
+        length = int(self.headers.get('Content-Length', 0))
+        self.respond(self.rfile.read(length).decode('utf-8'))
+
+    def respond(self, payload):
+        """Send the response of the requested route."""
+        stub = self.server.stub
+        route = stub.routes.get(self.path.split('?', 1)[0])
+        stub.record(self.command, self.path, payload)
+        if route is None:
+            route = Route(payload) if payload is not None else Route('Not Found', status=404)
+        if route.delay:
+            time.sleep(route.delay)
+
+        if route.etag is not None and self.headers.get('If-None-Match') == route.etag:
+            self.send_response(304)
+            self.send_header('ETag', route.etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = route.body.encode('utf-8')
+        self.send_response(route.status)
+        self.send_header('Content-Type', route.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if route.max_age is not None:
+            self.send_header('Cache-Control', f'max-age={route.max_age}')
+        if route.etag is not None:
+            self.send_header('ETag', route.etag)
+        for name, value in route.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep request logs off stderr."""
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """Threading HTTP server quiet about clients hanging up."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Ignore clients that disconnect, e.g. after a client timeout."""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Stub HTTP server running on a background thread."""
+
+    def __init__(self, routes=None, host='127.0.0.1', port=0):
+        """
+        Initialize the server.
+
+        Args:
+            routes: Dictionary of path -> Route (optional, may be changed
+                while the server runs)
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free port
+        """
+        self.routes = dict(routes or {})
+        self.requests = []        # (method, path, payload) in arrival order
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.httpd = StubHTTPServer((host, port), StubHandler)
+        self.httpd.stub = self
+        self.thread = None
+
+        # Count accepted connections to observe keep-alive reuse
+        accept = self.httpd.get_request
+
+        def get_request():
+            connection = accept()
+            with self.lock:
+                self.connections += 1
+            return connection
+
+        self.httpd.get_request = get_request
+
+    @property
+    def port(self):
+        """Port the server listens on."""
+        return self.httpd.server_address[1]
+
+    def url(self, path='/'):
+        """Get the absolute URL of a path on the server."""
+        return f"http://{self.httpd.server_address[0]}:{self.port}{path}"
+
+    def record(self, method, path, payload):
+        """Record a received request."""
+        with self.lock:
+            self.requests.append((method, path, payload))
+
+    def start(self):
+        """Start serving on a background thread."""
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and close its socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        """Start the server for a with block."""
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        """Stop the server at the end of a with block."""
+        self.stop()
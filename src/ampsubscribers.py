@@ -0,0 +1,402 @@
+# =============================================================================
+# ampsubscribers.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Memory-mapped subscriber sources for batch renders.
+# =============================================================================
+"""Subscriber rows from CSV, NDJSON and SQLite files for batch renders.
+
+Rows are attribute views (ampcontext.AttributeView): names are
+case-insensitive and values are decoded only when AttributeValue reads
+them, which matters for wide subscriber files of which a template uses a
+few columns.
+
+CSV and NDJSON files are read through mmap and split into rows without
+decoding. A CSV row is split into raw fields on its first attribute read,
+and only the fields read are decoded; an NDJSON row is parsed on its first
+read, since JSON gives no field offsets. SQLite databases are memory-mapped
+by SQLite itself (PRAGMA mmap_size) and only the columns a template
+references are selected, when they are known statically:
+
+    source = open_source('subscribers.csv')
+    fields = referenced_attributes(template.tree)
+    outputs = await render_batch(template, source.rows(fields))
+"""
+
+import csv
+import json
+import mmap
+import os
+import sqlite3
+
+from .ampanalysis import analyze
+from .ampcontext import AttributeView
+
+# Bytes of SQLite database file mapped into memory
+SQLITE_MMAP_SIZE = 1 << 30
+
+def referenced_attributes(tree):
+    """
+    Collect the attributes a template reads with AttributeValue.
+
+    Args:
+        tree: Template AST
+
+    Returns:
+        Set of lowercased attribute names, or None if the template reads
+        attributes whose names are only known at render time (a computed
+        name, or a content block that may read any attribute)
+    """
+    return analyze(tree).attribute_names()
+
+
+def index_names(columns):
+    """Map lowercased column names to positions; the first duplicate wins."""
+    names = {}
+    for position, column in enumerate(columns):
+        names.setdefault(column.lower(), position)
+    return names
+
+
+def mapped_lines(path, start=0):
+    """
+    Yield the lines of a file through mmap, without decoding.
+
+    Args:
+        path: File path
+        start: Byte offset to start at
+
+    Yields:
+        Tuple of (line bytes without line ending, offset after the line)
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        pos = start
+        while pos < size:
+            end = mm.find(b'\n', pos)
+            if end == -1:
+                end = size
+            line = mm[pos:end].rstrip(b'\r')
+            pos = end + 1
+            yield line, pos
+
+
+class CSVRow(AttributeView):
+    """A CSV row split and decoded on demand."""
+
+    __slots__ = ('source', 'raw', 'fields', 'values')
+
+    def __init__(self, source, raw):
+        """
+        Initialize the row.
+
+        Args:
+            source: CSVSource the row belongs to
+            raw: Undecoded row bytes
+        """
+        self.source = source
+        self.raw = raw
+        self.fields = None        # raw fields, split on first read
+        self.values = {}          # position -> decoded value
+
+    @property
+    def columns(self):
+        """Column names of the source."""
+        return self.source.columns
+
+    @property
+    def names(self):
+        """Lowercased column name -> position."""
+        return self.source.names
+
+    def decode(self, position):
+        """Decode one field; fields missing from a short row are empty."""
+        try:
+            return self.values[position]
+        except KeyError:
+            pass
+        if self.fields is None:
+            self.fields = self.source.split(self.raw)
+        value = self.fields[position] if position < len(self.fields) else ''
+        if isinstance(value, bytes):
+            value = value.decode(self.source.encoding)
+        self.values[position] = value
+        return value
+
+
+class CSVSource:
+    """Subscribers in a CSV file with a header row."""
+
+    def __init__(self, path, delimiter=',', encoding='utf-8'):
+        """
+        Open the source and read its header.
+
+        Args:
+            path: CSV file
+            delimiter: Field delimiter
+            encoding: Text encoding; a UTF-8 byte order mark is skipped
+
+        Raises:
+            RuntimeError: If the file has no header row
+        """
+        self.path = path
+        self.delimiter = delimiter
+        self.separator = delimiter.encode(encoding)
+        self.encoding = encoding
+        header = next(self.records(), None)
+        if header is None:
+            raise RuntimeError(f"No header row in {path}")
+        raw, self.data_start = header
+        if raw.startswith(b'\xef\xbb\xbf'):
+            raw = raw[3:]
+        self.columns = [str(column).strip() for column in self.split(raw, decode=True)]
+        self.names = index_names(self.columns)
+
+    def records(self, start=0):
+        """
+        Yield raw records, joining lines broken inside quoted fields.
+
+        Yields:
+            Tuple of (record bytes, offset after the record)
+        """
+        pending = None
+        end = start
+        for line, end in mapped_lines(self.path, start):
+            if pending is None and not line:
+                continue
+            record = line if pending is None else pending + b'\n' + line
+            # An odd number of quotes leaves a quoted field open
+            if record.count(b'"') % 2:
+                pending = record
+                continue
+            pending = None
+            yield record, end
+        if pending is not None:
+            yield pending, end
+
+    def split(self, raw, decode=False):
+        """
+        Split a record into fields.
+
+        Records without quotes are split as bytes and decoded per field
+        later; quoted records are parsed with the csv module.
+
+        Args:
+            raw: Record bytes
+            decode: Decode the fields of unquoted records too
+
+        Returns:
+            List of bytes or str fields
+        """
+        if b'"' not in raw:
+            fields = raw.split(self.separator)
+            return [field.decode(self.encoding) for field in fields] if decode else fields
+        return next(csv.reader([raw.decode(self.encoding)], delimiter=self.delimiter))
+
+    def rows(self, fields=None):
+        """
+        Iterate over the subscribers.
+
+        Args:
+            fields: Attributes the template reads (ignored: CSV fields are
+                decoded on demand anyway)
+
+        Yields:
+            CSVRow per data row
+        """
+        for raw, _ in self.records(self.data_start):
+            yield CSVRow(self, raw)
+
+
+class NDJSONRow(AttributeView):
+    """A JSON object line parsed on first read."""
+
+    __slots__ = ('raw', 'columns', 'names', 'values')
+
+    def __init__(self, raw):
+        """
+        Initialize the row.
+
+        Args:
+            raw: Undecoded JSON object bytes
+        """
+        self.raw = raw
+        self.columns = None
+
+    def parse(self):
+        """Parse the line into columns and values."""
+        data = json.loads(self.raw)
+        if not isinstance(data, dict):
+            raise RuntimeError(f"Subscriber line is not a JSON object: {self.raw[:60]!r}")
+        self.columns = list(data)
+        self.values = list(data.values())
+        self.names = index_names(self.columns)
+
+    def decode(self, position):
+        """Get a parsed value; null becomes an empty string."""
+        value = self.values[position]
+        return '' if value is None else value
+
+    def __getitem__(self, name):
+        """Get an attribute value, parsing the line first."""
+        if self.columns is None:
+            self.parse()
+        return super().__getitem__(name)
+
+    def __iter__(self):
+        """Iterate over the attribute names, parsing the line first."""
+        if self.columns is None:
+            self.parse()
+        return super().__iter__()
+
+    def __len__(self):
+        """Get the number of attributes, parsing the line first."""
+        if self.columns is None:
+            self.parse()
+        return super().__len__()
+
+
+class NDJSONSource:
+    """Subscribers as one JSON object per line."""
+
+    def __init__(self, path):
+        """
+        Initialize the source.
+
+        Args:
+            path: NDJSON file
+        """
+        self.path = path
+
+    def rows(self, fields=None):
+        """
+        Iterate over the subscribers.
+
+        Args:
+            fields: Attributes the template reads (ignored: lines are
+                parsed on demand anyway)
+
+        Yields:
+            NDJSONRow per non-empty line
+        """
+        for raw, _ in mapped_lines(self.path):
+            if raw.strip():
+                yield NDJSONRow(raw)
+
+
+class SQLiteRow(AttributeView):
+    """A row of selected SQLite columns."""
+
+    __slots__ = ('columns', 'names', 'values')
+
+    def __init__(self, columns, names, values):
+        """
+        Initialize the row.
+
+        Args:
+            columns: Selected column names, shared by all rows
+            names: Lowercased column name -> position, shared by all rows
+            values: Column values of the row
+        """
+        self.columns = columns
+        self.names = names
+        self.values = values
+
+    def decode(self, position):
+        """Get a column value; NULL becomes an empty string."""
+        value = self.values[position]
+        return '' if value is None else value
+
+
+class SQLiteSource:
+    """Subscribers in an SQLite table."""
+
+    def __init__(self, path, table='subscribers'):
+        """
+        Open the database read-only.
+
+        Args:
+            path: SQLite database file
+            table: Table holding one row per subscriber
+
+        Raises:
+            RuntimeError: If the table does not exist
+        """
+        self.path = path
+        self.table = table
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True,
+                                          check_same_thread=False)
+        self.connection.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        info = self.connection.execute(
+            "SELECT name FROM pragma_table_info(?)", (table,)
+        ).fetchall()
+        if not info:
+            raise RuntimeError(f"No table {table} in {path}")
+        self.columns = [row[0] for row in info]
+        self.names = index_names(self.columns)
+
+    def rows(self, fields=None):
+        """
+        Iterate over the subscribers.
+
+        Args:
+            fields: Lowercased attributes the template reads (e.g. from
+                referenced_attributes()); only these columns are selected.
+                None selects all columns.
+
+        Yields:
+            SQLiteRow per table row
+        """
+        if fields is None:
+            columns = self.columns
+        else:
+            columns = [self.columns[self.names[name]] for name in sorted(fields)
+                       if name in self.names]
+        names = index_names(columns)
+        selected = ', '.join(quote_identifier(column) for column in columns) or 'NULL'
+        cursor = self.connection.execute(
+            f"SELECT {selected} FROM {quote_identifier(self.table)}"
+        )
+        for values in cursor:
+            yield SQLiteRow(columns, names, values)
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+
+def quote_identifier(name):
+    """Quote an SQLite table or column name."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def open_source(path, table='subscribers'):
+    """
+    Open a subscriber source by file extension.
+
+    Args:
+        path: .csv, .tsv, .ndjson, .jsonl, or an SQLite file (.db, .sqlite,
+            .sqlite3)
+        table: SQLite table of subscribers
+
+    Returns:
+        CSVSource, NDJSONSource or SQLiteSource
+
+    Raises:
+        RuntimeError: If the file type is not supported
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return CSVSource(path)
+    if extension == '.tsv':
+        return CSVSource(path, delimiter='\t')
+    if extension in ('.ndjson', '.jsonl'):
+        return NDJSONSource(path)
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteSource(path, table)
+    raise RuntimeError(f"Unsupported subscriber file: {path}")
@@ -0,0 +1,275 @@
+# =============================================================================
+# amptemplate.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Parse-once, render-many API for AmpScript templates.
+# =============================================================================
+"""Template objects that parse and optimize AmpScript once and render it
+many times, interpreted or as compiled Python.
+
+Renders are synchronous; render_async() and render_batch() run them on
+worker threads so that renders waiting on HTTP or data extension calls
+overlap while an asyncio event loop schedules them.
+"""
+
+import functools
+import io
+
+from . import ampbudget, ampcompiler, ampcontext, ampfunctions, ampinterpreter
+from . import ampmetrics, ampoptimizer, ampprofiler, ampyacc
+
+# Renders in flight at once in render_batch()
+DEFAULT_CONCURRENCY = 32
+
+
+class Template:
+    """A parsed AmpScript template."""
+
+    def __init__(self, source, name='<template>', compiled=False, optimize=True,
+                 tree=None):
+        """
+        Parse a template.
+
+        Args:
+            source: AmpScript source code
+            name: Name used in compiled code and error messages
+            compiled: Render through generated Python instead of the
+                interpreter
+            optimize: Run the AST optimizer after parsing
+            tree: Already parsed tree of source, e.g. of a content block
+                (optional)
+
+        Raises:
+            RuntimeError: If the source cannot be parsed
+        """
+        if tree is None:
+            tree = ampyacc.parse(source)
+        if not tree:
+            raise RuntimeError(f"Parsing failed: {name}")
+        self.source = source
+        self.name = name
+        self.compiled = compiled
+        self.tree = ampoptimizer.optimize(tree) if optimize else tree
+        # Shared by all renders, so memoized pure calls are reused
+        self.functions = ampfunctions.func()
+        self.profiler = None
+        self.code = {}
+        self.source_map = None
+
+    @classmethod
+    def from_file(cls, path, **options):
+        """
+        Load a template from a file.
+
+        Args:
+            path: Path to the AmpScript file
+            **options: Template constructor options
+
+        Returns:
+            Template instance
+        """
+        with open(path, encoding='utf-8') as f:
+            return cls(f.read(), name=path, **options)
+
+    def python_code(self, profile=False):
+        """
+        Get the compiled Python code object of the template.
+
+        Args:
+            profile: Return the profiler-instrumented variant
+
+        Returns:
+            Code object, compiled on first use. The uninstrumented variant
+            carries source map comments; its map is kept in self.source_map.
+        """
+        if profile not in self.code:
+            compiler = ampcompiler.AmpCompilerToPy(
+                self.tree, profile=profile, source_map=not profile
+            )
+            self.code[profile] = compile(compiler.generate(), self.name, 'exec')
+            if not profile:
+                self.source_map = compiler.source_map
+        return self.code[profile]
+
+    def render(self, context=None, budget=None, profile=False):
+        """
+        Render the template.
+
+        Takes its arguments in the order render_async() does.
+
+        Args:
+            context: Mapping of subscriber attributes read by
+                AttributeValue (optional)
+            budget: ampbudget.Budget limiting the render (optional)
+            profile: Record statement and function times in self.profiler;
+                True instruments the render, 'hook' profiles the plain
+                compiled code with sys.setprofile (compiled templates only)
+
+        Returns:
+            Rendered output
+
+        Raises:
+            ampbudget.BudgetExceeded: If the render exceeds its budget
+            RuntimeError: On AmpScript runtime errors
+        """
+        profiler = None
+        if profile == 'hook':
+            if not self.compiled:
+                raise RuntimeError("Hook profiling needs a compiled template")
+            if not isinstance(self.profiler, ampprofiler.HookProfiler):
+                self.python_code()
+                self.profiler = ampprofiler.HookProfiler(
+                    self.source_map, self.name, self.source
+                )
+            profiler = self.profiler
+        elif profile:
+            if type(self.profiler) is not ampprofiler.Profiler:
+                self.profiler = ampprofiler.Profiler(self.source)
+            profiler = self.profiler
+
+        output = io.StringIO()
+        mode = 'compiled' if self.compiled else 'interpreted'
+        try:
+            with ampbudget.capturing(output), ampcontext.rendering(context), \
+                    ampmetrics.timer('stage_seconds', stage='render'):
+                if self.compiled:
+                    self.run_compiled(budget, profiler)
+                else:
+                    self.run_interpreted(budget, profiler)
+        except Exception:
+            ampmetrics.inc('render_errors_total', mode=mode)
+            raise
+        finally:
+            ampmetrics.inc('renders_total', mode=mode)
+        return output.getvalue()
+
+    async def render_async(self, context=None, budget=None, executor=None):
+        """
+        Render the template on a worker thread without blocking the loop.
+
+        Library calls block only the worker thread, so renders waiting on
+        HTTP or data extension calls overlap with each other.
+
+        Args:
+            context: Mapping of subscriber attributes (optional)
+            budget: ampbudget.Budget limiting the render (optional); not
+                to be shared by renders running at the same time
+            executor: concurrent.futures executor to run on (optional,
+                defaults to the event loop's default executor)
+
+        Returns:
+            Rendered output
+
+        Raises:
+            ampbudget.BudgetExceeded: If the render exceeds its budget
+            RuntimeError: On AmpScript runtime errors
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        render = functools.partial(self.render, budget=budget, context=context)
+        return await loop.run_in_executor(executor, render)
+
+    def clear_memo(self):
+        """
+        Forget the library results memoized by this template's renders.
+
+        Interpreted renders memoize in the template's library, compiled ones
+        in the module-level library generated code calls.
+        """
+        self.functions.clear_memo()
+        if self.compiled:
+            ampfunctions.clear_memo()
+
+    def run_interpreted(self, budget, profiler):
+        """Execute the template with the interpreter."""
+        interpreter = ampinterpreter.AmpInterpreter(
+            {}, budget=budget, profiler=profiler, functions=self.functions
+        )
+        if self.tree is not None:
+            interpreter.add_statements(self.tree)
+            interpreter.interpret()
+
+    def run_compiled(self, budget, profiler):
+        """Execute the template's generated Python."""
+        hooked = isinstance(profiler, ampprofiler.HookProfiler)
+        code = self.python_code(profile=profiler is not None and not hooked)
+        namespace = {'__name__': '__amp__'}
+        with ampbudget.running(budget):
+            if profiler is None:
+                exec(code, namespace)
+            elif hooked:
+                profiler.run(code, namespace)
+            else:
+                with ampprofiler.profiling(profiler):
+                    exec(code, namespace)
+
+
+async def render_batch(template, contexts, concurrency=DEFAULT_CONCURRENCY,
+                       budget=None, return_exceptions=True):
+    """
+    Render a template for many subscribers with bounded concurrency.
+
+    At most concurrency renders run at once, each on its own worker
+    thread. Contexts are consumed lazily, so a generator over a large
+    subscriber list is not materialized up front. HTTP functions share a
+    connection pool limited per host (see httpclient.configure()), which
+    may hold renders back further.
+
+    Args:
+        template: Template to render
+        contexts: Iterable of subscriber attribute mappings
+        concurrency: Maximum renders in flight
+        budget: ampbudget.Budget whose limits apply to each render; every
+            render gets its own copy (optional)
+        return_exceptions: Return a failed render's exception in its place
+            instead of raising it
+
+    Memoized library results are shared by the batch's renders and
+    forgotten when the batch ends.
+
+    Returns:
+        List of outputs in the order of contexts
+
+    Raises:
+        ValueError: If concurrency is less than 1
+        Exception: The first render error, if return_exceptions is False;
+            renders not yet started are skipped
+    """
+    # Imported here: asyncio alone would double the startup time of amp.py
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    results = {}
+    failures = []
+    pending = enumerate(contexts)
+
+    async def worker(executor):
+        # The iterator is shared; next() runs on the loop thread only
+        for index, context in pending:
+            if failures:
+                return
+            limits = budget.copy() if budget is not None else None
+            try:
+                results[index] = await template.render_async(context, limits, executor)
+            except Exception as e:
+                if not return_exceptions:
+                    failures.append(e)
+                    return
+                results[index] = e
+            finally:
+                ampmetrics.inc('batch_renders_total')
+
+    try:
+        with ThreadPoolExecutor(concurrency, thread_name_prefix='amp-render') as executor:
+            await asyncio.gather(*(worker(executor) for _ in range(concurrency)))
+    finally:
+        template.clear_memo()
+    if failures:
+        raise failures[0]
+    return [results[index] for index in range(len(results))]
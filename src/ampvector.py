@@ -0,0 +1,517 @@
+# =============================================================================
+# ampvector.py
+#
+# Copyright (C) 2023 B. Wang
+# All rights reserved.
+# Licensed under the BSD open source license agreement
+#
+# Column-wise evaluation of subscriber-wide statements for batch renders.
+# =============================================================================
+"""Vectorized batch renders.
+
+Templates typically start by deriving variables from subscriber attributes:
+
+    VAR @first, @name, @tier
+    SET @first = ProperCase(AttributeValue("FirstName"))
+    SET @name = Concat(@first, " ", Uppercase(AttributeValue("LastName")))
+    IF AttributeValue("Points") > 1000 THEN SET @tier = "gold" ENDIF
+
+A VectorTemplate evaluates such leading statements once per chunk of
+subscribers, column by column: each expression yields a list of values, one
+per subscriber. String and other pure library functions run as list
+comprehensions over whole columns, and integer and float arithmetic and
+comparisons run on NumPy arrays when NumPy is installed and the result is
+the same as Python's. IF statements whose branches only SET variables are
+evaluated with row masks, each branch for the subscribers taking it.
+
+The statements from the first one that cannot be evaluated this way (output,
+loops, impure calls, ...) run per subscriber in the interpreter, starting
+with the computed variables. If the column-wise part raises for any
+subscriber of a chunk, the whole chunk is rendered per subscriber instead,
+so errors surface exactly as in Template.render(). Statements evaluated
+column-wise are not charged to render budgets.
+
+    vector = VectorTemplate(template)
+    outputs = vector.render_batch(subscribers)
+"""
+
+import io
+import itertools
+import logging
+import operator
+
+from . import ampbudget, ampcontext, ampfunctions, ampinterpreter
+from .ampast import sequence, statements
+from .ampoptimizer import elseif_branches
+
+try:
+    import numpy
+except ImportError:  # optional: columns stay lists
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# Subscribers evaluated together
+DEFAULT_CHUNK_SIZE = 1024
+
+BINARY_OPERATORS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': lambda lhs, rhs: float(lhs) / rhs,
+}
+
+RELATIONAL_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+}
+
+# Largest integer magnitudes for which int64 arithmetic cannot overflow
+ADD_LIMIT = 1 << 62
+MULTIPLY_LIMIT = 1 << 31
+# Largest integer magnitude a float64 holds exactly
+EXACT_FLOAT_LIMIT = 1 << 53
+
+# Column kernels of common string functions; each mirrors the library
+# function applied to every row
+KERNELS = {
+    'Concat': lambda *columns: [''.join(str(arg) for arg in args) for args in zip(*columns)],
+    'Length': lambda text: [len(value) for value in text],
+    'Lowercase': lambda text: [value.lower() for value in text],
+    'Uppercase': lambda text: [value.upper() for value in text],
+    'Trim': lambda text: [value.strip() for value in text],
+    'Substring': lambda text, pos, length: [
+        value[start:start + count] for value, start, count in zip(text, pos, length)
+    ],
+}
+
+
+def as_list(column):
+    """Get a column as a list of Python values."""
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column.tolist()
+    return column
+
+
+def as_array(column):
+    """
+    Get a numeric column as a NumPy array.
+
+    Returns:
+        int64 or float64 array, or None if NumPy is missing or the column
+        holds anything but ints, or anything but floats
+    """
+    if numpy is None:
+        return None
+    if isinstance(column, numpy.ndarray):
+        return column
+    if not column:
+        return None
+    kind = type(column[0])
+    if kind not in (int, float) or any(type(value) is not kind for value in column):
+        return None
+    try:
+        return numpy.array(column, dtype=numpy.int64 if kind is int else numpy.float64)
+    except OverflowError:
+        return None
+
+
+def within(array, limit):
+    """Whether an int array's magnitudes stay below a limit; floats pass."""
+    if array.dtype.kind == 'f':
+        return True
+    return array.size == 0 or int(numpy.abs(array).max()) < limit
+
+
+def array_binary(op, lhs, rhs):
+    """
+    Apply an arithmetic operator to two columns with NumPy.
+
+    Returns:
+        Result array, or None if the result could differ from Python's
+    """
+    lhs, rhs = as_array(lhs), as_array(rhs)
+    if lhs is None or rhs is None:
+        return None
+    if op in ('+', '-'):
+        if within(lhs, ADD_LIMIT) and within(rhs, ADD_LIMIT):
+            return lhs + rhs if op == '+' else lhs - rhs
+    elif op == '*':
+        if within(lhs, MULTIPLY_LIMIT) and within(rhs, MULTIPLY_LIMIT):
+            return lhs * rhs
+    elif op == '/':
+        # Python raises on division by zero where NumPy returns inf
+        if numpy.all(rhs != 0):
+            return lhs.astype(numpy.float64) / rhs
+    return None
+
+
+def array_relational(op, lhs, rhs):
+    """Compare two columns with NumPy, or return None."""
+    lhs, rhs = as_array(lhs), as_array(rhs)
+    if lhs is None or rhs is None:
+        return None
+    # Python compares ints with floats exactly, NumPy through float64
+    if lhs.dtype != rhs.dtype and not (within(lhs, EXACT_FLOAT_LIMIT)
+                                       and within(rhs, EXACT_FLOAT_LIMIT)):
+        return None
+    return RELATIONAL_OPERATORS[op](lhs, rhs)
+
+
+def declared_names(stmt):
+    """Get the variables a VAR statement declares."""
+    names = []
+    stack = [stmt[1]]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, tuple):
+            stack.extend(reversed(item))
+        elif item != '@':
+            names.append(item)
+    return names
+
+
+def if_branches(stmt):
+    """
+    Get the branches of an IF or IFELSE statement.
+
+    Returns:
+        Tuple of (list of (condition, body) pairs, else body or None)
+    """
+    if stmt[0] == 'IF':
+        return [(stmt[1], stmt[2])], None
+    rest = stmt[3]
+    if isinstance(rest, tuple) and rest and rest[0] == 'ELSEIFCHAIN':
+        return [(stmt[1], stmt[2])] + elseif_branches(rest[1]), rest[2]
+    return [(stmt[1], stmt[2])], rest
+
+
+class VectorTemplate:
+    """Renders a template for chunks of subscribers, evaluating its leading
+    subscriber-wide statements column-wise."""
+
+    def __init__(self, template, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Split the template into column-wise and per-row statements.
+
+        Args:
+            template: amptemplate.Template to render
+            chunk_size: Subscribers evaluated together
+
+        Raises:
+            ValueError: If chunk_size is less than 1
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        self.template = template
+        self.chunk_size = chunk_size
+        self.functions = template.functions
+        self.declared = set()
+        self.vector = []          # statements evaluated column-wise
+        items = statements(template.tree) if template.tree is not None else []
+        for position, stmt in enumerate(items):
+            if not self.eligible(stmt, top=True):
+                items = items[position:]
+                break
+        else:
+            items = []
+        # Bound once: every row's interpreter shares the template's library
+        binder = ampinterpreter.AmpInterpreter({}, functions=self.functions)
+        self.rest = binder.bind(sequence(items)) if items else None
+        self.fallbacks = 0
+
+    def eligible(self, stmt, top=False):
+        """
+        Check whether a statement can be evaluated column-wise, and record
+        it if it is a top-level one.
+
+        Args:
+            stmt: Statement node
+            top: The statement is at the top level of the template, where
+                VAR declarations may appear
+
+        Returns:
+            True if the statement was accepted
+        """
+        kind = stmt[0]
+        if kind == 'VAR' and top:
+            self.declared.update(declared_names(stmt))
+            self.vector.append(stmt)
+            return True
+        if kind == 'SET':
+            ok = stmt[1] in self.declared and self.expression(stmt[2])
+        elif kind in ('IF', 'IFELSE'):
+            branches, else_body = if_branches(stmt)
+            bodies = [body for _, body in branches] + ([else_body] if else_body else [])
+            ok = (all(self.expression(cond) for cond, _ in branches)
+                  and all(self.eligible(inner) for body in bodies
+                          for inner in statements(body)))
+        else:
+            ok = False
+        if ok and top:
+            self.vector.append(stmt)
+        return ok
+
+    def expression(self, expr):
+        """Check whether an expression can be evaluated column-wise."""
+        kind = expr[0]
+        if kind in ('STR', 'INT', 'BOOL'):
+            return True
+        if kind == '@':
+            return expr[1] in self.declared
+        if kind == 'GROUP':
+            return self.expression(expr[1])
+        if kind == 'UNARY':
+            return expr[1] == '-' and self.expression(expr[2])
+        if kind in ('BINOP', 'RELOP'):
+            return self.expression(expr[2]) and self.expression(expr[3])
+        if kind == 'FUNC':
+            name = ampfunctions.canonical_name(expr[1])
+            args = expr[2][1:]
+            if name == 'AttributeValue':
+                return len(args) == 1 and args[0][0] == 'STR'
+            if name is None or not ampfunctions.is_pure_call(name, args):
+                return False
+            try:
+                self.functions.resolve(name, len(args))
+            except RuntimeError:
+                return False
+            return all(self.expression(arg) for arg in args)
+        return False
+
+    def evaluate_chunk(self, contexts):
+        """
+        Evaluate the column-wise statements for a chunk of subscribers.
+
+        Args:
+            contexts: List of subscriber attribute mappings
+
+        Returns:
+            Dictionary of variable -> list of values, one per subscriber
+        """
+        chunk = Chunk(self, contexts)
+        for stmt in self.vector:
+            chunk.execute(stmt, None)
+        return {name: as_list(column) for name, column in chunk.columns.items()}
+
+    def render_row(self, variables, context, budget=None):
+        """
+        Render the per-row statements for one subscriber.
+
+        Args:
+            variables: Variables computed column-wise for the subscriber
+            context: Subscriber attribute mapping
+            budget: ampbudget.Budget limiting the render (optional)
+
+        Returns:
+            Rendered output
+        """
+        output = io.StringIO()
+        with ampbudget.capturing(output), ampcontext.rendering(context):
+            interpreter = ampinterpreter.AmpInterpreter({}, budget=budget,
+                                                        functions=self.functions)
+            interpreter.vars.update(variables)
+            if self.rest is not None:
+                interpreter.add_statements(self.rest, bound=True)
+            interpreter.interpret()
+        return output.getvalue()
+
+    def render_chunk(self, contexts, budget=None):
+        """
+        Render a chunk of subscribers.
+
+        Args:
+            contexts: List of subscriber attribute mappings
+            budget: ampbudget.Budget whose limits apply to each render; every
+                render gets its own copy (optional)
+
+        Returns:
+            List of outputs in the order of contexts
+
+        Raises:
+            ampbudget.BudgetExceeded: If a render exceeds its budget
+            RuntimeError: On AmpScript runtime errors
+        """
+        def limits():
+            return budget.copy() if budget is not None else None
+
+        try:
+            columns = self.evaluate_chunk(contexts)
+        except Exception as e:
+            logger.debug(f"Rendering chunk per row: {e!r}")
+            self.fallbacks += 1
+            return [self.template.render(budget=limits(), context=context)
+                    for context in contexts]
+        names = list(columns)
+        rows = zip(*columns.values()) if names else itertools.repeat(())
+        return [self.render_row(dict(zip(names, values)), context, limits())
+                for context, values in zip(contexts, rows)]
+
+    def render_batch(self, contexts, budget=None):
+        """
+        Render many subscribers, chunk by chunk.
+
+        Memoized library results are shared by the batch's renders and
+        forgotten when the batch ends.
+
+        Args:
+            contexts: Iterable of subscriber attribute mappings, consumed
+                lazily
+            budget: ampbudget.Budget whose limits apply to each render
+                (optional)
+
+        Returns:
+            List of outputs in the order of contexts
+        """
+        outputs = []
+        iterator = iter(contexts)
+        try:
+            while True:
+                chunk = list(itertools.islice(iterator, self.chunk_size))
+                if not chunk:
+                    return outputs
+                outputs.extend(self.render_chunk(chunk, budget))
+        finally:
+            self.template.clear_memo()
+
+
+class Chunk:
+    """Columns of one chunk of subscribers during column-wise evaluation."""
+
+    def __init__(self, vector, contexts):
+        """
+        Initialize the chunk.
+
+        Args:
+            vector: VectorTemplate being rendered
+            contexts: List of subscriber attribute mappings
+        """
+        self.vector = vector
+        self.contexts = contexts
+        self.size = len(contexts)
+        self.columns = {}         # variable -> column
+        self.attributes = {}      # lowercased attribute name -> column
+
+    def execute(self, stmt, rows):
+        """
+        Execute a statement for some subscribers of the chunk.
+
+        Args:
+            stmt: VAR, SET, IF or IFELSE statement
+            rows: Sorted list of the subscriber positions to execute for, or
+                None for all
+        """
+        kind = stmt[0]
+        if kind == 'VAR':
+            for name in declared_names(stmt):
+                self.columns[name] = [None] * self.size
+        elif kind == 'SET':
+            values = self.evaluate(stmt[2], rows)
+            if rows is None:
+                self.columns[stmt[1]] = values
+            else:
+                # Copied: another variable may hold the same column
+                column = list(as_list(self.columns[stmt[1]]))
+                for row, value in zip(rows, as_list(values)):
+                    column[row] = value
+                self.columns[stmt[1]] = column
+        else:
+            branches, else_body = if_branches(stmt)
+            remaining = list(range(self.size)) if rows is None else rows
+            for cond, body in branches:
+                if not remaining:
+                    return
+                taken, left = [], []
+                for row, value in zip(remaining, as_list(self.evaluate(cond, remaining))):
+                    (taken if value else left).append(row)
+                remaining = left
+                if taken:
+                    for inner in statements(body):
+                        self.execute(inner, taken)
+            if else_body is not None and remaining:
+                for inner in statements(else_body):
+                    self.execute(inner, remaining)
+
+    def evaluate(self, expr, rows):
+        """
+        Evaluate an expression for some subscribers.
+
+        Args:
+            expr: Expression accepted by VectorTemplate.expression()
+            rows: Sorted list of subscriber positions, or None for all
+
+        Returns:
+            Column (list or NumPy array) with one value per row
+        """
+        size = self.size if rows is None else len(rows)
+        kind = expr[0]
+        if kind == 'STR':
+            return [str(expr[1])] * size
+        if kind == 'INT':
+            return [int(expr[1])] * size
+        if kind == 'BOOL':
+            return [bool(expr[1])] * size
+        if kind == 'GROUP':
+            return self.evaluate(expr[1], rows)
+        if kind == '@':
+            column = self.columns[expr[1]]
+            if rows is None:
+                return column
+            if numpy is not None and isinstance(column, numpy.ndarray):
+                return column[rows]
+            return [column[row] for row in rows]
+        if kind == 'UNARY':
+            values = self.evaluate(expr[2], rows)
+            array = as_array(values)
+            if array is not None and within(array, ADD_LIMIT):
+                return -array
+            return [-value for value in values]
+        if kind == 'BINOP':
+            op = expr[1]
+            lhs = self.evaluate(expr[2], rows)
+            rhs = self.evaluate(expr[3], rows)
+            if op == 'AND':
+                return [a and b for a, b in zip(as_list(lhs), as_list(rhs))]
+            if op == 'OR':
+                return [a or b for a, b in zip(as_list(lhs), as_list(rhs))]
+            result = array_binary(op, lhs, rhs)
+            if result is not None:
+                return result
+            function = BINARY_OPERATORS[op]
+            return [function(a, b) for a, b in zip(as_list(lhs), as_list(rhs))]
+        if kind == 'RELOP':
+            lhs = self.evaluate(expr[2], rows)
+            rhs = self.evaluate(expr[3], rows)
+            result = array_relational(expr[1], lhs, rhs)
+            if result is not None:
+                return result
+            function = RELATIONAL_OPERATORS[expr[1]]
+            return [function(a, b) for a, b in zip(as_list(lhs), as_list(rhs))]
+        # FUNC
+        name = ampfunctions.canonical_name(expr[1])
+        args = expr[2][1:]
+        if name == 'AttributeValue':
+            column = self.attribute(args[0][1])
+            return column if rows is None else [column[row] for row in rows]
+        columns = [as_list(self.evaluate(arg, rows)) for arg in args]
+        kernel = KERNELS.get(name)
+        if kernel is not None:
+            return kernel(*columns)
+        function = self.vector.functions.resolve(name, len(args))
+        if not columns:
+            return [function() for _ in range(size)]
+        return [function(*values) for values in zip(*columns)]
+
+    def attribute(self, name):
+        """Get the column of a subscriber attribute; missing ones are None."""
+        key = name.lower()
+        column = self.attributes.get(key)
+        if column is None:
+            column = self.attributes[key] = [
+                ampcontext.lookup(context, name) for context in self.contexts
+            ]
+        return column
@@ -9,8 +9,13 @@
 # =============================================================================
 """Parser for AmpScript language using PLY yacc."""
 
+import copy
+import threading
+import time
+
 import ply.yacc as yacc
-from . import amplex
+from . import amplex, ampmetrics, amppratt
+from .ampast import located
 
 tokens = amplex.tokens
 
@@ -27,6 +32,23 @@ precedence = (
 )
 
 
+def position(p, n, node):
+    """
+    Attach the position of the n-th symbol of a production to a node.
+
+    Args:
+        p: PLY production
+        n: Index of a terminal symbol in the production
+        node: AST tuple
+
+    Returns:
+        Positioned node
+    """
+    lexpos = p.lexpos(n)
+    col = lexpos - p.lexer.lexdata.rfind('\n', 0, lexpos)
+    return located(node, p.lineno(n), col)
+
+
 def p_program(p):
     """program : OPEN statements CLOSE
                 | SOPEN expression SCLOSE
@@ -56,17 +78,17 @@ def p_statements(p):
 def p_statement_fordo(p):
     """statement : FOR '@' NAME '=' expression TO expression DO statements NEXT '@' NAME
                  | FOR '@' NAME '=' expression DOWNTO expression DO statements NEXT '@' NAME"""
-    p[0] = ('FOR', p[3], p[5], p[6], p[7], p[9], p[12])
+    p[0] = position(p, 1, ('FOR', p[3], p[5], p[6], p[7], p[9], p[12]))
 
 
 def p_statement_if(p):
     """statement : IF expression THEN statements endif_else"""
     if p[5] is None:
-        p[0] = ('IF', p[2], p[4])
+        p[0] = position(p, 1, ('IF', p[2], p[4]))
     elif isinstance(p[5], tuple) and p[5][0] == 'ELSEIFCHAIN':
-        p[0] = ('IFELSE', p[2], p[4], p[5])
+        p[0] = position(p, 1, ('IFELSE', p[2], p[4], p[5]))
     else:
-        p[0] = ('IFELSE', p[2], p[4], p[5])
+        p[0] = position(p, 1, ('IFELSE', p[2], p[4], p[5]))
 
 
 def p_endif_else(p):
@@ -110,12 +132,12 @@ def p_condition_logic(p):
 
 def p_statement_declare(p):
     """statement : VAR list"""
-    p[0] = ('VAR', p[2])
+    p[0] = position(p, 1, ('VAR', p[2]))
 
 
 def p_statement_assign(p):
     """statement : SET "@" NAME "=" expression"""
-    p[0] = ('SET', p[3], p[5])
+    p[0] = position(p, 1, ('SET', p[3], p[5]))
 
 
 def p_statement_expr(p):
@@ -135,7 +157,7 @@ def p_expression_calcop(p):
 
 def p_expression_uminus(p):
     """expression : '-' expression %prec UMINUS"""
-    p[0] = -p[2]
+    p[0] = ('UNARY', '-', p[2])
 
 
 def p_expression_not(p):
@@ -144,15 +166,21 @@ def p_expression_not(p):
 
 
 def p_expression_func(p):
-    """expression : NAME '(' expression ',' expression ')'
-                  | NAME '(' expression ')'
+    """expression : NAME '(' arguments ')'
                   | NAME '(' ')'"""
     if len(p) == 4:
-        p[0] = ('FUNC', p[1])
-    elif len(p) == 5:
-        p[0] = ('FUNC', p[1], p[3])
+        p[0] = position(p, 1, ('FUNC', p[1], ('ARGS',)))
     else:
-        p[0] = ('FUNC', p[1], p[3], p[5])
+        p[0] = position(p, 1, ('FUNC', p[1], p[3]))
+
+
+def p_arguments(p):
+    """arguments : arguments ',' expression
+                 | expression"""
+    if len(p) == 4:
+        p[0] = p[1] + (p[3],)
+    else:
+        p[0] = ('ARGS', p[1])
 
 
 def p_expression_number(p):
@@ -163,7 +191,7 @@ def p_expression_number(p):
 
 def p_expression_name(p):
     """expression : '@' NAME"""
-    p[0] = ('@', p[2])
+    p[0] = position(p, 1, ('@', p[2]))
 
 
 def p_expression_name_error(p):
@@ -186,32 +214,172 @@ def p_expression_commaname_error(p):
     pass
 
 
+class ParseAborted(Exception):
+    """Raised by p_error to stop parsing at the first syntax error."""
+
+    def __init__(self, token=None):
+        """
+        Initialize the exception.
+
+        Args:
+            token: Offending token, or None at the end of the input
+        """
+        super().__init__(token)
+        self.token = token
+
+
 def p_error(p):
-    """Handle syntax errors."""
+    """
+    Handle syntax errors.
+
+    Parsing stops at the first error: PLY's recovery through the
+    "program : error" rule never discards the offending token and would
+    loop forever.
+    """
     if p:
         print("Syntax error at '%s' on line '%s'" % (p.value, p.lexer.lineno))
     else:
         print("Syntax error at EOF")
+    raise ParseAborted(p)
 
 
 # Build the parser
 ampparser = yacc.yacc()
 
+# Parser and lexer of each thread; PLY keeps parse state on both objects
+_local = threading.local()
+
+
+def instances():
+    """
+    Get the parser and lexer of the current thread.
+
+    The first call on a thread copies the module parser, sharing its
+    read-only tables, and clones the lexer chosen with amplex.select(), so
+    concurrent parses never see each other's stacks, input or line numbers.
+    The lexer is cloned again when another one is selected.
+
+    Returns:
+        Tuple of (parser, lexer)
+    """
+    source = amplex.selected()
+    pair = getattr(_local, 'pair', None)
+    if pair is None:
+        pair = _local.pair = (copy.copy(ampparser), source.clone())
+        _local.source = source
+    elif _local.source is not source:
+        pair = _local.pair = (pair[0], source.clone())
+        _local.source = source
+    return pair
+
+
+# Parsers select() accepts: PLY's LALR tables, or the hand-written
+# recursive-descent parser of amppratt
+PARSERS = ('ply', 'pratt')
+
+_selected = 'ply'
+
+
+def select(kind):
+    """
+    Choose the parser parse() uses.
+
+    Args:
+        kind: 'ply' or 'pratt'
+
+    Raises:
+        ValueError: If kind is not a known parser
+    """
+    global _selected
+    if kind not in PARSERS:
+        raise ValueError(f"Unknown parser {kind!r}; expected one of {', '.join(PARSERS)}")
+    _selected = kind
+
 
 def parse(data, debug=0):
     """
     Parse AmpScript code.
 
+    Safe to call from several threads at once.
+
     Args:
         data: AmpScript source code string
-        debug: Debug logging object (optional)
+        debug: Debug logging object (optional; PLY parser only)
 
     Returns:
         Parsed AST or None if parsing failed
     """
-    ampparser.error = 0
-    parsed = ampparser.parse(data, debug=debug)
-
-    if ampparser.error:
+    if _selected == 'pratt':
+        parsed = amppratt.parse(data)
+        _local.errors = amppratt.errors()
+        return parsed
+    parser, lexer = instances()
+    parser.error = 0
+    # Positions are per template, not cumulative over parse() calls
+    lexer.lineno = 1
+    lexer.illegal = []
+    problems = _local.errors = []
+    lexing = tokenfunc = None
+    if ampmetrics.enabled:
+        lexing, tokenfunc = timed_tokens(lexer)
+        start = time.perf_counter()
+    try:
+        parsed = parser.parse(data, lexer=lexer, debug=debug, tokenfunc=tokenfunc)
+    except ParseAborted as e:
+        if e.token is None:
+            problems.append(("Syntax error at end of input", lexer.lineno, len(data)))
+        else:
+            problems.append((f"Syntax error at '{e.token.value}'", e.token.lineno,
+                             e.token.lexpos))
+        parsed = None
+    finally:
+        problems[:0] = [(f"Illegal character '{character}'", lineno, lexpos)
+                        for character, lineno, lexpos in lexer.illegal]
+        if lexing is not None:
+            seconds, count = lexing
+            ampmetrics.observe('stage_seconds', seconds, stage='lex')
+            ampmetrics.observe('stage_seconds', time.perf_counter() - start - seconds,
+                               stage='parse')
+            ampmetrics.inc('lex_tokens_total', count)
+
+    if problems:
+        ampmetrics.inc('parse_errors_total')
+    if parser.error:
         return None
     return parsed
+
+
+def timed_tokens(lexer):
+    """
+    Wrap a lexer's token() to time and count the tokens it reads.
+
+    Args:
+        lexer: Lexer of the current thread
+
+    Returns:
+        Tuple of ([seconds, tokens], token function for the parser); the
+        list is updated as the parser reads tokens
+    """
+    lexing = [0.0, 0]
+
+    def token():
+        start = time.perf_counter()
+        tok = lexer.token()
+        lexing[0] += time.perf_counter() - start
+        if tok is not None:
+            lexing[1] += 1
+        return tok
+
+    return lexing, token
+
+
+def errors():
+    """
+    Get the problems found by the last parse() on this thread.
+
+    Returns:
+        List of (message, lineno, lexpos) tuples: illegal characters the
+        lexer skipped, then the syntax error that stopped parsing, if any
+        (every syntax error with the pratt parser)
+    """
+    return list(getattr(_local, 'errors', []))
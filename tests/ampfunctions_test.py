@@ -65,6 +65,77 @@ class TestAmpFunctions(unittest.TestCase):
         decoded = self.func.Base64Decode(encoded)
         self.assertEqual(decoded, text)
 
+    def test_category_index_matches_modules(self):
+        """Test that the lazy index covers exactly the category classes."""
+        for category, (_, names) in ampfunctions.CATEGORIES.items():
+            impl = ampfunctions.load_category(category)
+            defined = {name for name in vars(impl) if not name.startswith('__')}
+            self.assertEqual(defined, set(names), category)
+
+    def test_case_insensitive_registry(self):
+        """Test canonical name lookup and arity metadata."""
+        self.assertEqual(ampfunctions.canonical_name('uppercase'), 'Uppercase')
+        self.assertIsNone(ampfunctions.canonical_name('NoSuchFunction'))
+        self.assertEqual(ampfunctions.arity('V'), (1, 1))
+        self.assertEqual(ampfunctions.arity('Format'), (2, 4))
+        self.assertEqual(ampfunctions.arity('concat'), (0, None))
+        self.assertEqual(self.func.resolve('LOWERCASE', 1)('AB'), 'ab')
+        with self.assertRaises(RuntimeError):
+            self.func.resolve('Lowercase', 3)
+
+    def test_module_delegation(self):
+        """Test module-level access used by generated scripts."""
+        self.assertEqual(ampfunctions.Uppercase('abc'), 'ABC')
+        self.assertIn('Lookup', dir(self.func))
+        with self.assertRaises(AttributeError):
+            getattr(self.func, 'NoSuchFunction')
+
+    def test_purity_annotations(self):
+        """Test purity and cost metadata of library functions."""
+        self.assertTrue(ampfunctions.is_pure('md5'))
+        self.assertTrue(ampfunctions.is_pure('Uppercase'))
+        self.assertFalse(ampfunctions.is_pure('Now'))
+        self.assertFalse(ampfunctions.is_pure('Output'))
+        self.assertFalse(ampfunctions.is_pure('NoSuchFunction'))
+        self.assertEqual(ampfunctions.traits('SHA256'), (True, ampfunctions.MODERATE))
+        self.assertEqual(ampfunctions.traits('Lookup')[0], False)
+
+    def test_literal_purity(self):
+        """Test that Format is pure only with a literal format string."""
+        value = ('@', 'x')
+
+        self.assertFalse(ampfunctions.is_pure('Format'))
+        self.assertTrue(ampfunctions.is_pure_call('Format', (value, ('STR', 'N2'))))
+        self.assertFalse(ampfunctions.is_pure_call('Format', (value, ('@', 'f'))))
+        self.assertTrue(ampfunctions.is_pure_call('Uppercase', (value,)))
+        self.assertFalse(ampfunctions.is_pure_call('Now', ()))
+        self.func.Format('x', '{}', 'Text')
+        self.assertEqual(self.func._memo, {})
+
+    def test_pure_calls_memoized(self):
+        """Test that costly pure calls are computed once per instance."""
+        first = self.func.SHA256('abc')
+        self.assertEqual(self.func.SHA256('abc'), first)
+        self.assertEqual(self.func._memo, {('SHA256', ('abc',)): first})
+
+        self.func.clear_memo()
+        self.assertEqual(self.func._memo, {})
+
+    def test_cheap_and_impure_calls_not_memoized(self):
+        """Test that cheap pure and impure functions bypass the cache."""
+        self.func.Uppercase('abc')
+        self.func.GUID()
+        self.assertNotEqual(self.func.GUID(), self.func.GUID())
+        self.assertEqual(self.func._memo, {})
+
+    def test_memoized_unhashable_arguments(self):
+        """Test that calls with unhashable arguments still work."""
+        length = self.func.memoized('Length', len)
+
+        self.assertEqual(length(['a', 'b']), 2)
+        self.assertEqual(length('abc'), 3)
+        self.assertEqual(self.func._memo, {('Length', ('abc',)): 3})
+
 
 if __name__ == '__main__':
     unittest.main()
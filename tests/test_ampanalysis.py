@@ -0,0 +1,78 @@
+"""Unit tests for ampanalysis.py."""
+
+import unittest
+from src import ampyacc
+from src.ampanalysis import analyze
+
+
+def parse(source):
+    """Parse a template."""
+    return ampyacc.parse(source)
+
+
+class TestAnalysis(unittest.TestCase):
+    """Test collecting what a template reads."""
+
+    def test_collects_everything(self):
+        """Test attributes, lookups, content blocks and functions."""
+        analysis = analyze(parse('''%%[
+            VAR @key, @rows, @name
+            SET @key = AttributeValue("SubscriberKey")
+            SET @name = Lookup("Profiles", "Name", "Id", @key)
+            SET @rows = LookupRows("Orders", "Customer", @key, "Status", "open")
+            Output(ContentBlockbyKey("footer"))
+            Output(Concat(AttributeValue("FirstName"), @name))
+        ]%%'''))
+
+        self.assertEqual(analysis.attributes, {'subscriberkey', 'firstname'})
+        self.assertEqual(analysis.data_extensions(), {
+            'profiles': {('id',)},
+            'orders': {('customer', 'status')},
+        })
+        self.assertEqual(analysis.content_blocks, {('key', 'footer')})
+        self.assertTrue({'AttributeValue', 'Lookup', 'LookupRows', 'ContentBlockbyKey',
+                         'Output', 'Concat'} <= analysis.functions)
+        # A content block may read any attribute
+        self.assertIsNone(analysis.attribute_names())
+
+    def test_match_value_sources(self):
+        """Test resolving match values through variables set once."""
+        analysis = analyze(parse('''%%[
+            VAR @key, @i, @x
+            SET @key = AttributeValue("Email")
+            SET @x = Lookup("A", "V", "Email", @key)
+            SET @x = Lookup("B", "V", "Id", 42)
+            FOR @i = 1 TO 3 DO
+                SET @x = Lookup("C", "V", "Id", @i)
+            NEXT @i
+            SET @x = Lookup("D", "V", "Id", @x)
+        ]%%'''))
+        calls = {call.data_extension: call for call in analysis.lookups}
+
+        self.assertEqual(calls['A'].values, (('attribute', 'email'),))
+        self.assertEqual(calls['B'].values, (('constant', 42),))
+        self.assertIsNone(calls['C'].values[0])
+        self.assertIsNone(calls['D'].values[0])
+        self.assertTrue(calls['A'].prefetchable())
+        self.assertFalse(calls['C'].prefetchable())
+        self.assertEqual(analysis.attribute_names(), {'email'})
+
+    def test_dynamic_names(self):
+        """Test computed attribute, data extension and block names."""
+        analysis = analyze(parse('''%%[
+            VAR @n, @x
+            SET @n = "Email"
+            SET @x = AttributeValue(@n)
+            SET @x = LookupRows(@n, "Id", 1)
+            SET @x = ContentBlockbyName(@n)
+        ]%%'''))
+
+        self.assertTrue(analysis.dynamic_attributes)
+        self.assertTrue(analysis.dynamic_content)
+        self.assertIsNone(analysis.lookups[0].data_extension)
+        self.assertFalse(analysis.lookups[0].prefetchable())
+        self.assertEqual(analysis.data_extensions(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
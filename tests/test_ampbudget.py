@@ -0,0 +1,144 @@
+"""Unit tests for ampbudget.py."""
+
+import io
+import time
+import unittest
+from contextlib import redirect_stdout
+from src import ampbudget, ampcompiler, ampinterpreter
+
+
+def endless_loop():
+    """Build a program running a FOR loop with a huge iteration count."""
+    body = ('SET', 'n', ('@', 'n'))
+    return (('SET', 'n', ('INT', 0)),
+            ('FOR', 'i', ('INT', 0), 'TO', ('INT', 10 ** 9), body, 'i'))
+
+
+class TestBudget(unittest.TestCase):
+    """Test budget accounting."""
+
+    def test_iteration_limit(self):
+        """Test that exceeding the iteration limit raises."""
+        budget = ampbudget.Budget(max_iterations=2)
+        budget.iteration()
+        budget.iteration()
+
+        with self.assertRaises(ampbudget.BudgetExceeded) as ctx:
+            budget.iteration()
+        self.assertEqual(ctx.exception.to_dict(), {
+            'error': 'budget_exceeded', 'kind': 'iterations', 'limit': 2, 'used': 3,
+        })
+
+    def test_deadline(self):
+        """Test that the deadline is checked at iterations."""
+        budget = ampbudget.Budget(timeout=0.01)
+        time.sleep(0.02)
+
+        with self.assertRaises(ampbudget.BudgetExceeded) as ctx:
+            budget.iteration()
+        self.assertEqual(ctx.exception.kind, 'time')
+
+    def test_start_resets_counters(self):
+        """Test that a budget can be reused for the next render."""
+        budget = ampbudget.Budget(max_instructions=1)
+        budget.instruction()
+        budget.start()
+        budget.instruction()
+
+        self.assertEqual(budget.instructions, 1)
+
+    def test_running_restores_previous(self):
+        """Test that the active budget is scoped to the with block."""
+        budget = ampbudget.Budget()
+        with ampbudget.running(budget):
+            self.assertIs(ampbudget.current(), budget)
+        self.assertIsNone(ampbudget.current())
+
+    def test_write_charges_output(self):
+        """Test that output is charged to the active budget."""
+        output = io.StringIO()
+        with redirect_stdout(output), ampbudget.running(ampbudget.Budget(max_output_bytes=4)):
+            ampbudget.write('abc')
+            with self.assertRaises(ampbudget.BudgetExceeded):
+                ampbudget.write('d')
+
+        self.assertEqual(output.getvalue(), 'abc\n')
+
+    def test_tick_without_budget(self):
+        """Test that loops run unlimited when no budget is active."""
+        for _ in range(1000):
+            ampbudget.tick()
+
+
+class TestInterpreterBudget(unittest.TestCase):
+    """Test budgets enforced by the interpreter."""
+
+    def run_program(self, prog, budget):
+        """Interpret a program under a budget."""
+        interpreter = ampinterpreter.AmpInterpreter({}, budget=budget)
+        interpreter.vars['n'] = None
+        interpreter.add_statements(prog)
+        with redirect_stdout(io.StringIO()):
+            interpreter.interpret()
+
+    def test_iteration_limit(self):
+        """Test that a huge FOR range is stopped."""
+        with self.assertRaises(ampbudget.BudgetExceeded) as ctx:
+            self.run_program(endless_loop(), ampbudget.Budget(max_iterations=100))
+        self.assertEqual(ctx.exception.kind, 'iterations')
+
+    def test_instruction_limit(self):
+        """Test that executed statements are counted."""
+        with self.assertRaises(ampbudget.BudgetExceeded) as ctx:
+            self.run_program(endless_loop(), ampbudget.Budget(max_instructions=50))
+        self.assertEqual(ctx.exception.kind, 'instructions')
+
+    def test_output_limit(self):
+        """Test that library output counts towards the output budget."""
+        call = ('FUNC', 'Output', ('ARGS', ('STR', 'x' * 10)))
+        prog = ('FOR', 'i', ('INT', 0), 'TO', ('INT', 100), call, 'i')
+
+        with self.assertRaises(ampbudget.BudgetExceeded) as ctx:
+            self.run_program(prog, ampbudget.Budget(max_output_bytes=50))
+        self.assertEqual(ctx.exception.kind, 'output_bytes')
+
+
+class TestCompiledBudget(unittest.TestCase):
+    """Test budgets enforced by generated Python."""
+
+    def compile(self, prog, budget=None):
+        """Compile a program to Python source."""
+        compiler = ampcompiler.AmpCompilerToPy(prog, budget=budget)
+        with redirect_stdout(io.StringIO()):
+            compiler.compile()
+        return compiler.output
+
+    def test_loop_checks_active_budget(self):
+        """Test that compiled loops tick the budget at back-edges."""
+        code = self.compile(endless_loop())
+
+        self.assertIn("amp_tick()", code)
+        with ampbudget.running(ampbudget.Budget(timeout=0.05)):
+            with self.assertRaises(ampbudget.BudgetExceeded) as ctx:
+                exec(code, {})
+        self.assertEqual(ctx.exception.kind, 'time')
+
+    def test_embedded_budget(self):
+        """Test that a compile-time budget is activated by the script."""
+        code = self.compile(endless_loop(), ampbudget.Budget(max_iterations=10))
+
+        try:
+            with self.assertRaises(ampbudget.BudgetExceeded):
+                exec(code, {})
+        finally:
+            ampbudget.activate(None)
+
+    def test_no_budget_code_without_loops(self):
+        """Test that loop-free scripts do not import the budget module."""
+        code = self.compile(('SET', 'a', ('INT', 1)))
+
+        self.assertNotIn("ampbudget", code)
+
+
+if __name__ == '__main__':
+    unittest.main()
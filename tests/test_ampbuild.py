@@ -0,0 +1,176 @@
+"""Unit tests for ampbuild.py."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from src import ampbuild
+from src.ampbuild import MANIFEST_FILE, Build
+
+
+class TestBuild(unittest.TestCase):
+    """Test incremental builds of a template directory."""
+
+    def setUp(self):
+        """Create templates including a shared header and a nested logo."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.source = os.path.join(self.root, 'templates')
+        self.content = os.path.join(self.root, 'content')
+        self.output = os.path.join(self.root, 'build')
+        os.makedirs(self.source)
+        os.makedirs(self.content)
+        self.write(self.content, 'header.html', '<h1>%%=ContentBlockbyKey("logo")=%%</h1>')
+        self.write(self.content, 'logo.html', '<img src="logo.png">')
+        self.write(self.content, 'footer.html', '<p>footer</p>')
+        self.write(self.source, 'welcome.ampscript',
+                   '%%[ Output(ContentBlockbyKey("header")) ]%%Welcome')
+        self.write(self.source, 'receipt.ampscript',
+                   '%%[ Output(ContentBlockbyName("footer")) ]%%Receipt')
+        self.write(self.source, 'plain.ampscript', '%%[ VAR @x SET @x = 1 ]%%')
+
+    def write(self, directory, name, text):
+        """Write a file."""
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def template(self, name):
+        """Path of a template as the build reports it."""
+        return os.path.normpath(os.path.join(self.source, name))
+
+    def block(self, name):
+        """Path of a content block as the build records it."""
+        return os.path.normpath(os.path.join(self.content, name))
+
+    def build(self, **options):
+        """Run a build of the test directories."""
+        return Build(self.source, self.output, content=self.content, **options).run()
+
+    def test_first_build(self):
+        """Test that the first build compiles every template."""
+        report = self.build()
+
+        self.assertEqual(len(report.built), 3)
+        self.assertTrue(report.ok)
+        self.assertTrue(os.path.exists(os.path.join(self.output, 'welcome.py')))
+
+    def test_graph(self):
+        """Test the recorded template -> block -> nested block edges."""
+        build = Build(self.source, self.output, content=self.content)
+        build.run()
+
+        self.assertEqual(build.graph[self.template('welcome.ampscript')].depends,
+                         [self.block('header.html')])
+        self.assertEqual(build.graph[self.block('header.html')].depends,
+                         [self.block('logo.html')])
+        self.assertEqual(build.graph[self.template('plain.ampscript')].depends, [])
+        with open(os.path.join(self.output, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['files'][self.block('header.html')]['refs'],
+                         [['key', 'logo']])
+
+    def test_nothing_changed(self):
+        """Test that an unchanged tree builds nothing."""
+        self.build()
+        report = self.build()
+
+        self.assertEqual(report.built, [])
+        self.assertEqual(len(report.skipped), 3)
+
+    def test_nested_change(self):
+        """Test that a nested block change rebuilds only its transitive dependents."""
+        self.build()
+        self.write(self.content, 'logo.html', '<img src="new.png">')
+        report = self.build()
+
+        self.assertEqual(report.built, [self.template('welcome.ampscript')])
+        self.assertEqual(report.changed, [self.block('logo.html')])
+
+    def test_static_blocks_inlined(self):
+        """Test that static block text, nested includes too, lands in the output."""
+        self.write(self.content, 'greeting.html', 'Hi %%=AttributeValue("name")=%%')
+        self.write(self.source, 'greet.ampscript', '%%=ContentBlockbyKey("greeting")=%%')
+        self.build()
+        self.write(self.content, 'logo.html', '<img src="new.png">')
+        report = self.build()
+
+        self.assertEqual(report.built, [self.template('welcome.ampscript')])
+        with open(os.path.join(self.output, 'welcome.py'), encoding='utf-8') as f:
+            code = f.read()
+        self.assertIn('<h1><img src="new.png"></h1>', code)
+        self.assertNotIn('ContentBlockbyKey', code)
+        with open(os.path.join(self.output, 'greet.py'), encoding='utf-8') as f:
+            self.assertIn('ContentBlockbyKey', f.read())
+
+    def test_template_change(self):
+        """Test that a changed template is rebuilt alone."""
+        self.build()
+        self.write(self.source, 'plain.ampscript', '%%[ VAR @x SET @x = 2 ]%%')
+
+        self.assertEqual(self.build().built, [self.template('plain.ampscript')])
+
+    def test_new_block_resolves(self):
+        """Test that a reference resolving to a new block rebuilds its includers."""
+        self.write(self.source, 'promo.ampscript', '%%=ContentBlockbyKey("promo")=%%')
+        self.build()
+        self.write(self.content, 'promo.html', 'Sale')
+        report = self.build()
+
+        self.assertEqual(report.built, [self.template('promo.ampscript')])
+
+    def test_computed_reference(self):
+        """Test that a computed block reference depends on every block."""
+        self.write(self.source, 'dynamic.ampscript',
+                   '%%[ VAR @k SET @k = "footer" Output(ContentBlockbyKey(@k)) ]%%')
+        self.build()
+        self.write(self.content, 'logo.html', 'changed')
+
+        self.assertEqual(self.build().built, [self.template('dynamic.ampscript'),
+                                              self.template('welcome.ampscript')])
+
+    def test_removed_template(self):
+        """Test that the output of a deleted template is removed."""
+        self.build()
+        os.remove(os.path.join(self.source, 'plain.ampscript'))
+        report = self.build()
+
+        self.assertEqual(report.removed, [os.path.join(self.output, 'plain.py')])
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'plain.py')))
+
+    def test_options_change(self):
+        """Test that changing the target language rebuilds everything."""
+        self.build()
+        report = self.build(language='js')
+
+        self.assertEqual(len(report.built), 3)
+        self.assertTrue(os.path.exists(os.path.join(self.output, 'receipt.js')))
+
+    def test_parse_error(self):
+        """Test that a broken template fails and is retried on the next build."""
+        self.write(self.source, 'broken.ampscript', '%%[ SET = ]%%')
+        with redirect_stdout(io.StringIO()):
+            first = self.build()
+            second = self.build()
+
+        self.assertEqual([path for path, _ in first.failed], [self.template('broken.ampscript')])
+        self.assertEqual([path for path, _ in second.failed], [self.template('broken.ampscript')])
+        self.assertEqual(len(first.built), 3)
+        self.assertEqual(second.built, [])
+
+    def test_main(self):
+        """Test the build command line."""
+        with redirect_stdout(io.StringIO()) as out:
+            status = ampbuild.main([self.source, '-o', self.output, '--content', self.content,
+                                    '--graph'])
+
+        self.assertEqual(status, 0)
+        self.assertIn('3 built, 0 up to date, 0 failed, 0 removed', out.getvalue())
+        self.assertIn(f"{self.block('header.html')} -> {self.block('logo.html')}",
+                      out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
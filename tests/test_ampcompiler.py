@@ -2,8 +2,11 @@
 
 import unittest
 import io
+import shutil
+import subprocess
 from contextlib import redirect_stdout
 from src import ampyacc, ampcompiler
+from src.amptemplate import Template
 
 
 class TestAmpCompilerToPy(unittest.TestCase):
@@ -91,7 +94,33 @@ class TestAmpCompilerToPy(unittest.TestCase):
         result = self.compile_and_capture(code)
         
         self.assertIsNotNone(result)
-        self.assertIn("getattr(ampfunctions,'Output')", result)
+        self.assertIn("amp_Output = ampfunctions.Output", result)
+        self.assertIn("amp_Output('Hello')", result)
+
+    def test_compile_variadic_call(self):
+        """Test compiling calls with more than two arguments."""
+        code = '%%[ VAR @a SET @a = concat("a", "b", @a) ]%%'
+        result = self.compile_and_capture(code)
+
+        self.assertIn("amp_Concat = ampfunctions.Concat", result)
+        self.assertIn("amp_Concat('a', 'b', a_amp)", result)
+
+    def test_compile_aliases_hoisted_once(self):
+        """Test that repeated calls share a single alias."""
+        code = '%%[ V("a") V("b") ]%%'
+        result = self.compile_and_capture(code)
+
+        self.assertEqual(result.count("amp_V = ampfunctions.V"), 1)
+        self.assertEqual(result.count("amp_V("), 2)
+
+    def test_compile_arity_error(self):
+        """Test that wrong argument counts fail at compile time."""
+        prog = ampyacc.parse('%%[ V("a", "b") ]%%')
+        compiler = ampcompiler.AmpCompilerToPy(prog)
+
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaises(RuntimeError):
+                compiler.compile()
 
 
 class TestAmpCompilerToJs(unittest.TestCase):
@@ -144,9 +173,141 @@ class TestAmpCompilerToJs(unittest.TestCase):
         result = self.compile_and_capture(code)
         
         self.assertIsNotNone(result)
-        self.assertIn("i = 0", result)
-        self.assertIn("while (", result)
-        self.assertIn("i += 1", result)
+        self.assertIn("for (i = 0; i < 10; i++) {", result)
+
+    def test_compile_downto_loop_js(self):
+        """Test that a DOWNTO loop evaluates its bound once."""
+        code = "%%[ FOR @i = @n DOWNTO Length(@s) DO SET @a = @i NEXT @i ]%%"
+        result = self.compile_and_capture(code)
+
+        self.assertIn("for (i = n, amp_end1 = amp_Length(ampfunctions, s); i > amp_end1; i--) {",
+                      result)
+
+    def test_compile_single_declaration_js(self):
+        """Test that variables and function aliases share one var statement."""
+        code = "%%[ VAR @a SET @b = Concat(@a, 1) FOR @i = 1 TO 3 DO SET @c = Concat(@i) NEXT @i ]%%"
+        result = self.compile_and_capture(code)
+
+        self.assertEqual(result.count("var "), 1)
+        self.assertIn("var amp_Concat = ampfunctions.Concat, a, b, i, c;", result)
+        self.assertEqual(result.count("ampfunctions.Concat"), 1)
+        self.assertIn("c = amp_Concat(ampfunctions, i);", result)
+
+    def test_compile_buffered_output_js(self):
+        """Test that output statements are written with one Write call."""
+        code = "%%[ Output(\"a\") FOR @i = 1 TO 3 DO Write(@i) OutputLine(@i + 1) NEXT @i ]%%"
+        result = self.compile_and_capture(code)
+
+        self.assertIn("amp_out.push('a\\n');", result)
+        self.assertIn("amp_out.push(String(i));", result)
+        self.assertIn("amp_out.push((i + 1) + '\\n');", result)
+        self.assertEqual(result.count("amp_Write("), 1)
+        self.assertNotIn("amp_Output", result)
+
+    def test_compile_direct_output_js(self):
+        """Test that output is not buffered when an output call's value is used."""
+        code = "%%[ Output(\"a\") SET @a = V(\"b\") ]%%"
+        result = self.compile_and_capture(code)
+
+        self.assertNotIn("amp_out", result)
+        self.assertIn("amp_Output(ampfunctions, 'a');", result)
+
+    @unittest.skipUnless(shutil.which('node'), "node is not installed")
+    def test_run_js(self):
+        """Test that compiled JavaScript prints what the interpreter prints."""
+        code = """%%[
+VAR @n, @i, @s
+SET @n = 5
+FOR @i = @n DOWNTO 1 DO
+  SET @n = Add(@n, 1)
+  IF Mod(@i, 3) == 0 THEN Write("fizz")
+  ELSEIF Mod(@i, 2) == 0 THEN Write(@i)
+  ELSE Write("-")
+  ENDIF
+NEXT @i
+OutputLine(Concat(" ", @n))
+]%%"""
+        js = ampcompiler.AmpCompilerToJs(ampyacc.parse(code), standalone=True).generate()
+        result = subprocess.run(['node'], input=js, capture_output=True, text=True, timeout=60)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, Template(code).render())
+
+
+class TestJsMinify(unittest.TestCase):
+    """Test size-optimized JavaScript."""
+
+    CODE = """%%[
+VAR @greeting, @counter
+SET @greeting = "Hello there"
+FOR @counter = 3 DOWNTO 0 DO
+  IF @counter == 2 THEN Write("Hello there") ELSE Write(@counter - -1) ENDIF
+  Write("Hello there")
+NEXT @counter
+OutputLine(Concat(@greeting, "Hello there"))
+]%%"""
+
+    def generate(self, **options):
+        """Compile CODE to JavaScript."""
+        return ampcompiler.AmpCompilerToJs(ampyacc.parse(self.CODE), **options).generate()
+
+    def test_js_names(self):
+        """Test that short names come shortest first and skip reserved words."""
+        names = ampcompiler.js_names()
+        first = [next(names) for _ in range(200)]
+
+        self.assertEqual(first[:3], ['a', 'b', 'c'])
+        self.assertEqual(first[52], 'aa')
+        self.assertNotIn('do', first)
+        self.assertNotIn('if', first)
+        self.assertEqual(len(set(first)), 200)
+
+    def test_js_strip(self):
+        """Test that only needed whitespace is kept."""
+        code = "var a = 'x  y', b = \"p q\";\nif (a - -b) {\n\treturn typeof a;\n}\n"
+
+        self.assertEqual(ampcompiler.js_strip(code),
+                         "var a='x  y',b=\"p q\";if(a- -b){return typeof a;}")
+
+    def test_short_names(self):
+        """Test that variables, aliases and ampfunctions get short names."""
+        result = self.generate(minify=True)
+
+        self.assertNotIn("greeting", result)
+        self.assertNotIn("counter", result)
+        self.assertNotIn("amp_", result)
+        self.assertEqual(result.count("ampfunctions"), 1)
+        self.assertNotIn("\n", result)
+
+    def test_shared_strings(self):
+        """Test that a repeated string constant is declared once."""
+        result = self.generate(minify=True)
+
+        self.assertEqual(result.count("'Hello there'"), 1)
+        self.assertLess(len(result), len(self.generate()) / 2)
+
+    @unittest.skipUnless(shutil.which('node'), "node is not installed")
+    def test_run_minified(self):
+        """Test that minified JavaScript prints what the interpreter prints."""
+        result = subprocess.run(['node'], input=self.generate(minify=True, standalone=True),
+                                capture_output=True, text=True, timeout=60)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, Template(self.CODE).render())
+
+
+class TestJsReport(unittest.TestCase):
+    """Test measuring generated JavaScript."""
+
+    def test_js_report(self):
+        """Test the counts, which ignore string literals."""
+        report = ampcompiler.js_report("var a = f.g('h(i.j)');\nfor (;;) { x[1](); }\n")
+
+        self.assertEqual(report, {'bytes': 44, 'lines': 2, 'declarations': 1, 'calls': 2,
+                                  'lookups': 2, 'loops': 1})
+        self.assertEqual(ampcompiler.format_js_report(report),
+                         "JavaScript: 44 bytes, 2 lines, 1 var statements, 2 calls, "
+                         "2 property lookups, 1 loops\n")
 
 
 class TestCompilerHelpers(unittest.TestCase):
@@ -0,0 +1,166 @@
+"""Unit tests for ampcontentstore.py."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from src import ampbudget, ampcontentstore
+from src.ampcontentstore import DirectoryStore, SQLiteStore, parse_content
+from src.amptemplate import Template
+
+HEADER = '<h1>%%=Concat("Hi ", AttributeValue("name"))=%%</h1>\n'
+FOOTER = '%%[ VAR @year SET @year = 2023 ]%%<p>(c) %%=v(@year)=%% \'amp\'</p>'
+
+
+class TestParseContent(unittest.TestCase):
+    """Test splitting content blocks into AmpScript."""
+
+    def test_literal_text(self):
+        """Test that text without AmpScript is written verbatim."""
+        self.assertEqual(
+            parse_content('<b>"x"</b>'), ('FUNC', 'Write', ('ARGS', ('STR', '<b>"x"</b>')))
+        )
+
+    def test_line_numbers(self):
+        """Test that statements keep their line in the block."""
+        tree = parse_content('a\nb\n%%[\nVAR @x\n]%%')
+
+        self.assertEqual(tree[1].lineno, 4)
+
+    def test_parse_error(self):
+        """Test that a broken code block raises."""
+        with self.assertRaises(RuntimeError):
+            parse_content('x %%[ SET = ]%%')
+
+
+class StoreTests:
+    """Tests shared by the directory and SQLite stores."""
+
+    def add(self, key, content, name=None, id=None):
+        """Add a block to the store under test."""
+        raise NotImplementedError
+
+    def setUp(self):
+        """Configure the store with a header and a footer block."""
+        self.store = self.make_store()
+        self.add('header', HEADER, name='Page Header', id=101)
+        self.add('footer', FOOTER)
+        ampcontentstore.configure(self.store)
+
+    def tearDown(self):
+        """Remove the store."""
+        ampcontentstore.configure(None)
+
+    def render(self, source, **options):
+        """Render a template using the store."""
+        return Template(source, **options).render(context={'name': 'Ann'})
+
+    def test_lookup_kinds(self):
+        """Test lookup by key, name and id, ignoring letter case."""
+        for call in ('ContentBlockbyKey("HEADER")', 'ContentBlockbyName("page header")',
+                     'ContentBlockbyId(101)'):
+            self.assertEqual(self.render(f'%%[ Output({call}) ]%%'), '<h1>Hi Ann</h1>\n\n')
+
+    def test_compiled_render(self):
+        """Test that compiled blocks render like interpreted ones."""
+        self.store.compiled = True
+        self.assertEqual(
+            self.render('%%[ Output(ContentBlockbyKey("footer")) ]%%', compiled=True),
+            "<p>(c) 2023 'amp'</p>\n",
+        )
+
+    def test_compiled_once(self):
+        """Test that unchanged blocks are compiled once."""
+        for _ in range(3):
+            self.render('%%[ Output(ContentBlockbyKey("header")) ]%%')
+
+        self.assertEqual(self.store.compilations, 1)
+
+    def test_invalidation(self):
+        """Test that a changed block is recompiled."""
+        self.render('%%[ Output(ContentBlockbyKey("footer")) ]%%')
+        self.add('footer', 'new footer')
+
+        self.assertEqual(self.render('%%[ Output(ContentBlockbyKey("footer")) ]%%'), 'new footer\n')
+        self.assertEqual(self.store.compilations, 2)
+
+    def test_nested(self):
+        """Test that blocks include other blocks inline."""
+        self.add('page', '%%=ContentBlockbyKey("header")=%%body%%=ContentBlockbyKey("footer")=%%')
+
+        self.assertEqual(
+            self.render('%%[ Output(ContentBlockbyKey("page")) ]%%'),
+            "<h1>Hi Ann</h1>\nbody<p>(c) 2023 'amp'</p>\n",
+        )
+
+    def test_cycle(self):
+        """Test that a block including itself raises."""
+        self.add('a', 'A%%=ContentBlockbyKey("b")=%%')
+        self.add('b', 'B%%=ContentBlockbyKey("a")=%%')
+
+        with self.assertRaisesRegex(RuntimeError, 'cycle'):
+            self.render('%%[ Output(ContentBlockbyKey("a")) ]%%')
+
+    def test_missing(self):
+        """Test missing blocks with and without error_on_missing."""
+        with self.assertRaises(RuntimeError):
+            self.render('%%[ Output(ContentBlockbyKey("nope")) ]%%')
+        self.assertEqual(
+            self.render('%%[ Output(ContentBlockbyKey("nope", "", "false", "none")) ]%%'),
+            'none\n',
+        )
+
+    def test_budget_shared(self):
+        """Test that nested blocks are charged to the caller's budget."""
+        self.add('loop', '%%[ VAR @i, @x FOR @i = 1 TO 4 DO SET @x = @i NEXT @i ]%%')
+        template = Template(
+            '%%[ VAR @i, @x FOR @i = 1 TO 3 DO SET @x = ContentBlockbyKey("loop") NEXT @i ]%%'
+        )
+
+        with self.assertRaises(ampbudget.BudgetExceeded):
+            template.render(budget=ampbudget.Budget(max_iterations=5))
+
+
+class TestDirectoryStore(StoreTests, unittest.TestCase):
+    """Test the directory-backed store."""
+
+    def make_store(self):
+        """Create a store over a temporary directory."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.index = {}
+        return DirectoryStore(self.root)
+
+    def add(self, key, content, name=None, id=None):
+        """Write a block file and its index entry."""
+        filename = f"{key}.html"
+        path = os.path.join(self.root, filename)
+        stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        # Make the change visible on filesystems with coarse timestamps
+        os.utime(path, ns=(stamp + 10 ** 9, stamp + 10 ** 9))
+        if name is not None or id is not None:
+            self.index[filename] = {'key': key, 'name': name or key, 'id': id}
+            with open(os.path.join(self.root, 'index.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+
+
+class TestSQLiteStore(StoreTests, unittest.TestCase):
+    """Test the SQLite-backed store."""
+
+    def make_store(self):
+        """Create a store in memory."""
+        store = SQLiteStore(':memory:')
+        self.addCleanup(store.close)
+        return store
+
+    def add(self, key, content, name=None, id=None):
+        """Insert a block row."""
+        row = self.store.find('key', key)
+        self.store.add(key, content, name=name, id=id if id is not None else row)
+
+
+if __name__ == '__main__':
+    unittest.main()
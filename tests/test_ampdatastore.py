@@ -0,0 +1,131 @@
+"""Unit tests for ampdatastore.py."""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from src import ampdatastore
+from src.ampdatastore import DataExtensionStore, Prefetcher
+from src.amptemplate import Template, render_batch
+
+ORDERS = [
+    {'Customer': 'c1', 'Item': 'Lamp', 'Total': '30'},
+    {'Customer': 'C1', 'Item': 'Desk', 'Total': '250'},
+    {'Customer': 'c2', 'Item': 'Chair', 'Total': '90'},
+]
+
+TEMPLATE = '''%%[
+    VAR @key, @rows, @name
+    SET @key = AttributeValue("Key")
+    SET @name = Lookup("Profiles", "Name", "Id", @key)
+    SET @rows = LookupRows("Orders", "Customer", @key)
+    Output(Concat(@name, ":", RowCount(@rows)))
+]%%'''
+
+
+class TestDataExtensionStore(unittest.TestCase):
+    """Test lookups against an SQLite data extension store."""
+
+    def setUp(self):
+        """Create a store and make it the configured one."""
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.store = DataExtensionStore(os.path.join(root, 'data.db'))
+        self.addCleanup(self.store.close)
+        self.store.insert('Orders', ORDERS)
+        self.store.insert('Profiles', [{'Id': f"c{n}", 'Name': f"Name {n}"} for n in range(100)])
+        ampdatastore.configure(self.store)
+        self.addCleanup(ampdatastore.configure, None)
+
+    def render(self, source):
+        """Render a template with the interpreter."""
+        return Template(source).render().strip()
+
+    def test_lookup_functions(self):
+        """Test Lookup, LookupRows, the CS variants and ordered rows."""
+        self.assertEqual(self.render('%%[ Output(Lookup("profiles", "NAME", "id", "C7")) ]%%'),
+                         'Name 7')
+        self.assertEqual(self.render(
+            '%%[ Output(RowCount(LookupRows("Orders", "Customer", "c1"))) ]%%'), '2')
+        self.assertEqual(self.render(
+            '%%[ Output(RowCount(LookupRowsCS("Orders", "Customer", "c1"))) ]%%'), '1')
+        self.assertEqual(self.render(
+            '%%[ Output(Field(Row(LookupOrderedRows("Orders", 1, "Total desc", '
+            '"Customer", "c1"), 1), "item")) ]%%'), 'Desk')
+
+    def test_missing_data_extension(self):
+        """Test that an unknown data extension raises."""
+        with self.assertRaises(RuntimeError):
+            self.store.lookup('Nope', ['Id'], ['1'])
+
+    def test_prefetch_batches_queries(self):
+        """Test one query per lookup per chunk instead of per subscriber."""
+        template = Template(TEMPLATE)
+        subscribers = [{'Key': f"c{n % 4}"} for n in range(100)]
+
+        self.store.queries = 0
+        expected = [template.render(context=s) for s in subscribers]
+        self.assertEqual(self.store.queries, 200)
+
+        self.store.queries = 0
+        prefetcher = Prefetcher(template.tree, chunk_size=50)
+        outputs = asyncio.run(render_batch(template, prefetcher.rows(subscribers), concurrency=8))
+
+        self.assertEqual(outputs, expected)
+        self.assertEqual([output.strip() for output in expected[:3]],
+                         ['Name 0:0', 'Name 1:2', 'Name 2:1'])
+        # Renders still in flight when the subscribers run out query, at
+        # most concurrency - 1 of them with two lookups each
+        self.assertGreaterEqual(self.store.queries, 4)
+        self.assertLessEqual(self.store.queries, 4 + 2 * 7)
+        self.assertEqual(self.store.queries - 4 + self.store.hits, 200)
+
+    def test_prefetch_evicts_old_chunks(self):
+        """Test that rows of chunks two behind are dropped, and all rows at the end."""
+        prefetcher = Prefetcher(Template(TEMPLATE).tree, chunk_size=1)
+        subscribers = [{'Key': f"c{n}"} for n in range(5)]
+        rows = prefetcher.rows(subscribers)
+
+        self.assertEqual(len([next(rows) for _ in range(5)]), 5)
+        # Two lookups of the last two subscribers
+        self.assertEqual(len(self.store.prefetched), 4)
+        self.assertEqual(list(rows), [])
+        self.assertEqual(self.store.prefetched, {})
+
+    def test_prefetch_numeric_fields(self):
+        """Test that prefetched lookups match numeric columns as queries do."""
+        self.store.connection.execute('CREATE TABLE Codes (K INTEGER, Name TEXT)')
+        self.store.connection.executemany('INSERT INTO Codes VALUES (?, ?)',
+                                          [(7, 'seven'), (8, 'eight')])
+        queried = [self.store.lookup('codes', ['k'], [value]) for value in ('007', '7', '9')]
+
+        self.store.prefetch('codes', ['k'], [('007',), ('7',), ('9',)])
+        self.store.queries = 0
+        prefetched = [self.store.lookup('codes', ['k'], [value]) for value in ('007', '7', '9')]
+
+        self.assertEqual(prefetched, queried)
+        self.assertEqual(prefetched[0], [{'K': 7, 'Name': 'seven'}])
+        self.assertEqual(self.store.queries, 0)
+
+    def test_prefetch_several_fields(self):
+        """Test prefetching lookups matching more than one field."""
+        self.store.prefetch('orders', ['customer', 'total'], [('c1', '250'), ('c2', '30')])
+        self.store.queries = 0
+
+        self.assertEqual(self.store.lookup('orders', ['customer', 'total'], ['c1', '250']),
+                         [ORDERS[1]])
+        self.assertEqual(self.store.lookup('orders', ['customer', 'total'], ['c2', '30']), [])
+        self.assertEqual(self.store.queries, 0)
+
+    def test_insert_drops_prefetched_rows(self):
+        """Test that rows added after a prefetch are found."""
+        self.store.prefetch('Profiles', ['Id'], [('c999',)])
+        self.store.insert('Profiles', [{'Id': 'c999', 'Name': 'Late'}])
+
+        self.assertEqual(self.store.lookup('Profiles', ['Id'], ['c999']),
+                         [{'Id': 'c999', 'Name': 'Late'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 
 import unittest
 import io
+import time
 from contextlib import redirect_stdout
 from src import ampinterpreter
 
@@ -121,6 +122,58 @@ class TestAmpInterpreter(unittest.TestCase):
         
         self.assertTrue(result)
 
+    def test_call_is_bound_once(self):
+        """Test that call sites are resolved to bound callables."""
+        stmt = ('FUNC', 'uppercase', ('ARGS', ('STR', 'abc')))
+        bound = self.interpreter.bind(stmt)
+
+        self.assertEqual(bound[0], 'CALL')
+        self.assertEqual(bound[2], self.interpreter.functions.Uppercase)
+        self.assertEqual(self.interpreter.eval(bound), 'ABC')
+
+    def test_call_passes_all_arguments(self):
+        """Test that every argument is evaluated and passed."""
+        self.interpreter.vars['a'] = 'c'
+        expr = ('FUNC', 'Concat', ('ARGS', ('STR', 'a'), ('STR', 'b'), ('@', 'a')))
+
+        self.assertEqual(self.interpreter.eval(expr), 'abc')
+
+    def test_call_arity_checked(self):
+        """Test that a wrong argument count is rejected when binding."""
+        with self.assertRaises(RuntimeError):
+            self.interpreter.add_statements(
+                ('FUNC', 'Uppercase', ('ARGS', ('STR', 'a'), ('STR', 'b')))
+            )
+
+    def test_call_undefined_function(self):
+        """Test that unknown functions are rejected when binding."""
+        with self.assertRaises(RuntimeError):
+            self.interpreter.bind(('FUNC', 'NoSuchFunction', ('ARGS',)))
+
+    def test_execute_if_elseif_chain(self):
+        """Test that ELSEIF chains run the first matching branch."""
+        self.interpreter.vars['a'] = 2
+        stmt = ('IFELSE', ('RELOP', '==', ('@', 'a'), ('INT', 1)),
+                ('SET', 'a', ('INT', 10)),
+                ('ELSEIFCHAIN',
+                 ('ELSEIF', ('RELOP', '==', ('@', 'a'), ('INT', 2)),
+                  ('SET', 'a', ('INT', 20))),
+                 ('SET', 'a', ('INT', 30))))
+        self.interpreter.execute(stmt)
+
+        self.assertEqual(self.interpreter.vars['a'], 20)
+
+    def test_execute_for_loop_body(self):
+        """Test that FOR loops execute statement bodies."""
+        self.interpreter.vars['total'] = 0
+        body = ('SET', 'total', ('BINOP', '+', ('@', 'total'), ('@', 'i')))
+        self.interpreter.execute(
+            ('FOR', 'i', ('INT', 0), 'TO', ('INT', 4), body, 'i')
+        )
+
+        self.assertEqual(self.interpreter.vars['total'], 6)
+        self.assertNotIn('i', self.interpreter.vars)
+
     def test_flatten_list(self):
         """Test flattening nested lists."""
         nested = (('a', '@'), ('b', '@'), 'c')
@@ -154,15 +207,45 @@ class TestAmpInterpreter(unittest.TestCase):
         prog_statement = ('VAR', ('@', 'a'))
         self.interpreter.add_statements(prog_statement)
         
-        self.assertIn(0, self.interpreter.prog)
-        self.assertEqual(self.interpreter.prog[0], prog_statement)
+        self.assertEqual(self.interpreter.prog, [prog_statement])
 
     def test_new_program(self):
         """Test clearing the program."""
-        self.interpreter.prog = {0: ('VAR', ('@', 'a'))}
+        self.interpreter.add_statements(('VAR', ('@', 'a')))
+        self.interpreter.interpret()
         self.interpreter.new()
         
         self.assertEqual(len(self.interpreter.prog), 0)
+        self.assertEqual(self.interpreter.pc, 0)
+
+    def test_interpret_runs_new_statements_only(self):
+        """Test that each interpret() call executes only pending statements."""
+        self.interpreter.add_statements(('VAR', ('@', 'a')))
+        self.interpreter.add_statements(('SET', 'a', ('INT', 1)))
+        self.interpreter.interpret()
+        self.interpreter.add_statements(('SET', 'a', ('BINOP', '+', ('@', 'a'), ('INT', 1))))
+        self.interpreter.interpret()
+
+        self.assertEqual(self.interpreter.vars['a'], 2)
+        self.assertEqual(self.interpreter.pc, 3)
+
+    def test_interpret_time_stays_flat(self):
+        """Test that a statement costs the same late in a long session."""
+        self.interpreter.add_statements(('VAR', ('@', 'a')))
+        statement = ('SET', 'a', ('INT', 1))
+
+        def run(count):
+            start = time.perf_counter()
+            for _ in range(count):
+                self.interpreter.add_statements(statement)
+                self.interpreter.interpret()
+            return time.perf_counter() - start
+
+        early = min(run(500) for _ in range(3))
+        run(5000)
+        late = min(run(500) for _ in range(3))
+
+        self.assertLess(late, early * 3)
 
 
 if __name__ == '__main__':
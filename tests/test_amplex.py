@@ -1,7 +1,10 @@
 """Unit tests for amplex.py lexer."""
 
+import io
 import unittest
-from src import amplex
+from contextlib import redirect_stdout
+from benchmarks import workloads
+from src import amplex, ampyacc
 
 
 class TestAmpLexer(unittest.TestCase):
@@ -113,5 +116,84 @@ class TestAmpLexer(unittest.TestCase):
         self.assertEqual(token.type, 'VAR')
 
 
+
+def scan(lexer, source):
+    """Tokenize a source, returning the tokens and the final line number."""
+    lexer.lineno = 1
+    lexer.illegal = []
+    with redirect_stdout(io.StringIO()) as out:
+        lexer.input(source)
+        tokens = [(token.type, token.value, token.lineno, token.lexpos) for token in lexer]
+    return tokens, lexer.lineno, lexer.illegal, out.getvalue()
+
+
+class TestScanner(unittest.TestCase):
+    """Test that the regex scanner matches the PLY lexer token for token."""
+
+    SOURCES = [
+        '%%[ VAR @a, @b SET @a = 1 IF @a <= 2 THEN Output(Concat("x", @a)) ENDIF ]%%',
+        '%%=v(@name)=%% ==%% %%= =%%%%[]%%',
+        'a != b >= c > d < e == f = g',
+        'SET set Set OPEN _x9 x_1 12abc',
+        '"multi\nline\nstring" @x\n\n\n@y',
+        '/* one */ /* two\nlines */ VAR /* unclosed',
+        '"unterminated\n@x',
+        'ä \u00a0 ² \u0663\u0664 # $ ; \r\n !',
+        '\t  \t\nFOR @i = 10 DOWNTO 1 DO NEXT @i',
+        '',
+        '   ',
+    ]
+
+    def assert_same(self, source):
+        """Assert that both lexers agree on tokens, lines and errors."""
+        self.assertEqual(scan(amplex.Scanner(), source), scan(amplex.lexer.clone(), source))
+
+    def test_sources(self):
+        """Test tricky inputs."""
+        for source in self.SOURCES:
+            with self.subTest(source=source):
+                self.assert_same(source)
+
+    def test_workloads(self):
+        """Test the benchmark workloads."""
+        for name in workloads.WORKLOADS:
+            with self.subTest(workload=name):
+                self.assert_same(workloads.generate(name, 1))
+
+    def test_lineno_during_scan(self):
+        """Test that the scanner's line number follows the tokens read."""
+        scanner = amplex.Scanner()
+        scanner.input('VAR\n\n@a')
+        scanner.token()
+
+        self.assertEqual(scanner.lineno, 1)
+        self.assertEqual(scanner.token().value, '@')
+        self.assertEqual(scanner.lineno, 3)
+        self.assertEqual(scanner.token().value, 'a')
+        self.assertIsNone(scanner.token())
+        self.assertIsNone(scanner.token())
+
+    def test_select(self):
+        """Test that parses with the selected scanner build the same tree."""
+        source = workloads.generate('nested_if', 1)
+        expected = ampyacc.parse(source)
+        amplex.select('scanner')
+        self.addCleanup(amplex.select, 'ply')
+
+        self.assertIs(amplex.selected(), amplex.scanner)
+        tree = ampyacc.parse(source)
+        self.assertEqual(tree, expected)
+        self.assertEqual(tree[1].lineno, expected[1].lineno)
+        self.assertIsInstance(ampyacc.instances()[1], amplex.Scanner)
+        with redirect_stdout(io.StringIO()):
+            self.assertIsNone(ampyacc.parse('%%[ SET @x = \n ]%%'))
+        self.assertEqual(ampyacc.errors(), [("Syntax error at ']%%'", 2, 15)])
+
+    def test_select_unknown(self):
+        """Test that an unknown lexer is rejected."""
+        with self.assertRaises(ValueError):
+            amplex.select('fast')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,135 @@
+"""Unit tests for amplsp.py."""
+
+import io
+import time
+import unittest
+from src.amplsp import Document, LanguageServer, read_message, write_message
+
+URI = 'file:///email.amp'
+
+
+def big_template(blocks=650):
+    """Generate a template of about ten lines per block."""
+    parts = ['<html>', '%%[ VAR @name, @total, @i ]%%']
+    for n in range(blocks):
+        parts.append(f'<p>Section {n}</p>\n%%[\n  SET @name = Concat("s", {n})\n'
+                     f'  IF @total > {n} THEN\n    SET @total = @total + 1\n  ENDIF\n'
+                     f']%%\n<b>%%=v(@name)=%%</b>')
+    parts.append('</html>')
+    return '\n'.join(parts)
+
+
+def frame(message):
+    """Encode a message as the client would send it."""
+    stream = io.BytesIO()
+    write_message(stream, message)
+    return stream.getvalue()
+
+
+class TestDocument(unittest.TestCase):
+    """Test segments, diagnostics and incremental reparsing."""
+
+    def test_diagnostics(self):
+        """Test syntax, call and variable diagnostics with positions."""
+        document = Document(URI, 'Hi\n%%[ VAR @a\nSET @a = Lenght("x")\nSET @b = 1 ]%%\n'
+                                 '%%[ SET @a = ]%%')
+        diagnostics = {d['message']: d for d in document.diagnostics()}
+
+        self.assertEqual(diagnostics['Undefined function: Lenght']['range']['start'],
+                         {'line': 2, 'character': 9})
+        self.assertEqual(diagnostics['Variable @b is not declared with VAR']['range'],
+                         {'start': {'line': 3, 'character': 4},
+                          'end': {'line': 3, 'character': 6}})
+        self.assertEqual(diagnostics["Syntax error at ']%%'"]['range']['start'],
+                         {'line': 4, 'character': 13})
+        self.assertEqual(len(diagnostics), 3)
+
+    def test_incremental_reparse(self):
+        """Test that an edit reparses only the block it touches."""
+        text = big_template()
+        document = Document(URI, text)
+        self.assertGreater(text.count('\n'), 5000)
+        parsed = document.parses
+        line = text[:text.index('Concat("s", 250)')].count('\n')
+
+        start = time.perf_counter()
+        document.apply({'range': {'start': {'line': line, 'character': 14},
+                                  'end': {'line': line, 'character': 20}},
+                        'text': 'Lenght'})
+        document.update()
+        diagnostics = document.diagnostics()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(document.parses, parsed + 1)
+        self.assertEqual([d['range']['start'] for d in diagnostics],
+                         [{'line': line, 'character': 14}])
+        # 50 ms in practice; generous for slow test machines
+        self.assertLess(elapsed, 0.5)
+
+    def test_definition_and_words(self):
+        """Test finding identifiers and variable declarations."""
+        document = Document(URI, 'x %%[ VAR @first\nSET @first = Uppercase("a") ]%%')
+
+        self.assertEqual(document.word_at(document.offset({'line': 1, 'character': 15})),
+                         ('Uppercase', 30, False))
+        self.assertEqual(document.word_at(document.offset({'line': 1, 'character': 6})),
+                         ('first', 22, True))
+        self.assertEqual(document.definition('FIRST'), 10)
+        self.assertIsNone(document.word_at(0))
+
+
+class TestLanguageServer(unittest.TestCase):
+    """Test the JSON-RPC protocol."""
+
+    def run_session(self, messages):
+        """Serve a list of client messages and return the server's replies."""
+        reader = io.BytesIO(b''.join(frame(message) for message in messages))
+        writer = io.BytesIO()
+        status = LanguageServer(reader, writer).serve()
+        writer.seek(0)
+        replies = []
+        while True:
+            message = read_message(writer)
+            if message is None:
+                return status, replies
+            replies.append(message)
+
+    def test_session(self):
+        """Test initialize, diagnostics, hover, definition and shutdown."""
+        text = '%%[ VAR @n\nSET @n = Length("abc") ]%%'
+        status, replies = self.run_session([
+            {'jsonrpc': '2.0', 'id': 1, 'method': 'initialize', 'params': {}},
+            {'jsonrpc': '2.0', 'method': 'initialized', 'params': {}},
+            {'jsonrpc': '2.0', 'method': 'textDocument/didOpen', 'params': {
+                'textDocument': {'uri': URI, 'version': 1, 'text': text}}},
+            {'jsonrpc': '2.0', 'method': 'textDocument/didChange', 'params': {
+                'textDocument': {'uri': URI, 'version': 2},
+                'contentChanges': [{'range': {'start': {'line': 1, 'character': 4},
+                                              'end': {'line': 1, 'character': 6}},
+                                    'text': '@m'}]}},
+            {'jsonrpc': '2.0', 'id': 2, 'method': 'textDocument/hover', 'params': {
+                'textDocument': {'uri': URI}, 'position': {'line': 1, 'character': 11}}},
+            {'jsonrpc': '2.0', 'id': 3, 'method': 'textDocument/definition', 'params': {
+                'textDocument': {'uri': URI}, 'position': {'line': 0, 'character': 9}}},
+            {'jsonrpc': '2.0', 'id': 4, 'method': 'textDocument/rename', 'params': {}},
+            {'jsonrpc': '2.0', 'id': 5, 'method': 'shutdown'},
+            {'jsonrpc': '2.0', 'method': 'exit'},
+        ])
+        results = {reply['id']: reply for reply in replies if 'id' in reply}
+        published = [reply['params'] for reply in replies
+                     if reply.get('method') == 'textDocument/publishDiagnostics']
+
+        self.assertEqual(status, 0)
+        self.assertEqual(results[1]['result']['capabilities']['textDocumentSync']['change'], 2)
+        self.assertEqual(published[0]['diagnostics'], [])
+        self.assertEqual(published[1]['version'], 2)
+        self.assertEqual([d['message'] for d in published[1]['diagnostics']],
+                         ['Variable @m is not declared with VAR'])
+        self.assertIn('Length(text)', results[2]['result']['contents']['value'])
+        self.assertEqual(results[3]['result']['range']['start'], {'line': 0, 'character': 8})
+        self.assertEqual(results[4]['error']['code'], -32601)
+        self.assertIsNone(results[5]['result'])
+
+
+if __name__ == '__main__':
+    unittest.main()
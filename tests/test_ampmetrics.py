@@ -0,0 +1,173 @@
+"""Unit tests for ampmetrics.py."""
+
+import json
+import os
+import tempfile
+import unittest
+from src import ampcompiler, ampfunctions, ampmetrics, ampyacc
+from src.ampmetrics import Histogram, Registry
+from src.amptemplate import Template
+
+
+class TestRegistry(unittest.TestCase):
+    """Test counters, histograms and their export."""
+
+    def test_counters(self):
+        """Test counters with and without labels."""
+        registry = Registry()
+        registry.inc('calls_total')
+        registry.inc('calls_total', 2)
+        registry.inc('calls_total', category='strings')
+
+        self.assertEqual(registry.counter('calls_total'), 3)
+        self.assertEqual(registry.counter('calls_total', category='strings'), 1)
+        self.assertEqual(registry.counter('calls_total', category='dates'), 0)
+
+    def test_histogram_buckets(self):
+        """Test that bucket counts are cumulative and end with +Inf."""
+        histogram = Histogram((1, 2))
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(1, 2), (2, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.sum, 6.0)
+
+    def test_timer(self):
+        """Test that a timer observes the elapsed time."""
+        registry = Registry()
+        with registry.timer('stage_seconds', stage='parse'):
+            pass
+
+        self.assertEqual(registry.histogram('stage_seconds', stage='parse').count, 1)
+
+    def test_prometheus(self):
+        """Test the Prometheus text format."""
+        registry = Registry()
+        registry.inc('renders_total', mode='compiled')
+        registry.observe('stage_seconds', 0.002, stage='lex')
+        text = registry.to_prometheus()
+
+        self.assertIn('# TYPE amp_renders_total counter\n'
+                      'amp_renders_total{mode="compiled"} 1\n', text)
+        self.assertIn('# TYPE amp_stage_seconds histogram\n', text)
+        self.assertIn('amp_stage_seconds_bucket{stage="lex",le="0.001"} 0\n', text)
+        self.assertIn('amp_stage_seconds_bucket{stage="lex",le="0.0025"} 1\n', text)
+        self.assertIn('amp_stage_seconds_bucket{stage="lex",le="+Inf"} 1\n', text)
+        self.assertIn('amp_stage_seconds_count{stage="lex"} 1\n', text)
+
+    def test_label_escaping(self):
+        """Test that quotes and backslashes in label values are escaped."""
+        registry = Registry()
+        registry.inc('x', page='a"b\\c')
+
+        self.assertIn('amp_x{page="a\\"b\\\\c"} 1', registry.to_prometheus())
+
+    def test_json(self):
+        """Test the JSON export."""
+        registry = Registry()
+        registry.inc('renders_total', mode='interpreted')
+        registry.observe('stage_seconds', 0.5, stage='render')
+        data = json.loads(registry.dumps())
+
+        self.assertEqual(data['counters'], {'renders_total{mode="interpreted"}': 1})
+        histogram = data['histograms']['stage_seconds{stage="render"}']
+        self.assertEqual(histogram['count'], 1)
+        self.assertEqual(histogram['buckets']['0.5'], 1)
+        self.assertEqual(histogram['buckets']['0.25'], 0)
+
+
+class TestHotPaths(unittest.TestCase):
+    """Test the metrics recorded by the compiler and runtime."""
+
+    def setUp(self):
+        """Turn metrics on with an empty registry."""
+        self.registry = ampmetrics.enable()
+        self.registry.reset()
+
+    def tearDown(self):
+        """Turn metrics off again."""
+        ampmetrics.enable(False)
+        self.registry.reset()
+
+    def test_disabled(self):
+        """Test that nothing is recorded while metrics are off."""
+        ampmetrics.enable(False)
+        ampyacc.parse('%%[ VAR @x ]%%')
+        Template('%%[ Output(Concat("a", "b")) ]%%').render()
+
+        self.assertEqual(self.registry.to_json(), {'counters': {}, 'histograms': {}})
+        self.assertIs(ampmetrics.timer('stage_seconds'), ampmetrics.NULL_TIMER)
+
+    def test_parse(self):
+        """Test lexing and parsing times and the token count."""
+        ampyacc.parse('%%[ VAR @x SET @x = 1 ]%%')
+
+        self.assertEqual(self.registry.counter('lex_tokens_total'), 10)
+        self.assertEqual(self.registry.histogram('stage_seconds', stage='lex').count, 1)
+        self.assertEqual(self.registry.histogram('stage_seconds', stage='parse').count, 1)
+        self.assertEqual(self.registry.counter('parse_errors_total'), 0)
+
+    def test_parse_error(self):
+        """Test that failed parses are counted."""
+        ampyacc.parse('%%[ SET = ]%%')
+
+        self.assertEqual(self.registry.counter('parse_errors_total'), 1)
+
+    def test_compile(self):
+        """Test the compiler stage timers."""
+        tree = ampyacc.parse('%%[ VAR @x SET @x = 1 ]%%')
+        ampcompiler.AmpCompilerToPy(tree).generate()
+        ampcompiler.AmpCompilerToJs(tree).generate()
+
+        self.assertEqual(self.registry.histogram('stage_seconds', stage='compile_py').count, 1)
+        self.assertEqual(self.registry.histogram('stage_seconds', stage='compile_js').count, 1)
+
+    def test_render_and_functions(self):
+        """Test render counts and library calls per category."""
+        template = Template('%%[ Output(Concat(Uppercase("a"), Now())) ]%%')
+        template.render()
+        template.render()
+
+        self.assertEqual(self.registry.counter('renders_total', mode='interpreted'), 2)
+        self.assertEqual(self.registry.histogram('stage_seconds', stage='render').count, 2)
+        self.assertEqual(self.registry.counter('function_calls_total', category='strings'), 4)
+        self.assertEqual(self.registry.counter('function_calls_total', category='dates'), 2)
+        self.assertEqual(
+            self.registry.histogram('function_seconds', category='strings').count, 4
+        )
+
+    def test_render_error(self):
+        """Test that failed renders are counted."""
+        template = Template('%%[ RaiseError("stop") ]%%', compiled=True)
+        with self.assertRaises(Exception):
+            template.render()
+
+        self.assertEqual(self.registry.counter('render_errors_total', mode='compiled'), 1)
+        self.assertEqual(self.registry.counter('renders_total', mode='compiled'), 1)
+
+    def test_timed_keeps_results(self):
+        """Test that instrumented functions return the same results."""
+        functions = ampfunctions.func()
+
+        self.assertEqual(functions.Concat('a', 'b'), 'ab')
+        self.assertEqual(self.registry.counter('function_calls_total', category='strings'), 1)
+
+    def test_write(self):
+        """Test writing JSON and Prometheus files."""
+        self.registry.inc('renders_total', mode='compiled')
+        directory = tempfile.mkdtemp()
+        json_path = os.path.join(directory, 'metrics.json')
+        prom_path = os.path.join(directory, 'metrics.prom')
+        ampmetrics.write(json_path)
+        ampmetrics.write(prom_path)
+        with open(json_path, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['counters'], {'renders_total{mode="compiled"}': 1})
+        with open(prom_path, encoding='utf-8') as f:
+            self.assertIn('amp_renders_total{mode="compiled"} 1', f.read())
+        for path in (json_path, prom_path):
+            os.remove(path)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+"""Unit tests for ampoptimizer.py."""
+
+import io
+import unittest
+from contextlib import redirect_stdout
+from src import ampoptimizer, ampcompiler, ampinterpreter, ampyacc
+from src.ampast import statements
+
+
+class TestAmpOptimizer(unittest.TestCase):
+    """Test AmpScript AST optimizer."""
+
+    def test_fold_arithmetic(self):
+        """Test folding integer arithmetic."""
+        expr = ('BINOP', '*', ('GROUP', ('BINOP', '+', ('INT', 1), ('INT', 2))), ('INT', 4))
+        result = ampoptimizer.fold(expr)
+
+        self.assertEqual(result, ('INT', 12))
+
+    def test_fold_keeps_division(self):
+        """Test that division is left to the target language."""
+        expr = ('BINOP', '/', ('INT', 7), ('INT', 2))
+        result = ampoptimizer.fold(expr)
+
+        self.assertEqual(result, expr)
+
+    def test_fold_string_concatenation(self):
+        """Test folding string concatenation."""
+        expr = ('BINOP', '+', ('STR', 'a'), ('STR', 'b'))
+        result = ampoptimizer.fold(expr)
+
+        self.assertEqual(result, ('STR', 'ab'))
+
+    def test_fold_unary_minus(self):
+        """Test folding negative integer literals."""
+        result = ampoptimizer.fold(('UNARY', '-', ('INT', 5)))
+
+        self.assertEqual(result, ('INT', -5))
+
+    def test_fold_comparison(self):
+        """Test folding comparisons to boolean constants."""
+        result = ampoptimizer.fold(('RELOP', '<', ('INT', 1), ('INT', 2)))
+
+        self.assertEqual(result, ('BOOL', True))
+
+    def test_fold_mixed_comparison_untouched(self):
+        """Test that comparisons of mixed literal types are not folded."""
+        expr = ('RELOP', '==', ('INT', 1), ('STR', '1'))
+        result = ampoptimizer.fold(expr)
+
+        self.assertEqual(result, expr)
+
+    def test_fold_leaves_variables(self):
+        """Test that expressions using variables are only partially folded."""
+        expr = ('BINOP', '+', ('@', 'a'), ('BINOP', '+', ('INT', 1), ('INT', 2)))
+        result = ampoptimizer.fold(expr)
+
+        self.assertEqual(result, ('BINOP', '+', ('@', 'a'), ('INT', 3)))
+
+    def test_fold_condition_drops_constant_operand(self):
+        """Test that a neutral constant operand of AND is dropped."""
+        cond = ('BINOP', 'AND', ('RELOP', '==', ('@', 'a'), ('INT', 1)),
+                ('RELOP', '<', ('INT', 1), ('INT', 2)))
+        result = ampoptimizer.fold_condition(cond)
+
+        self.assertEqual(result, ('RELOP', '==', ('@', 'a'), ('INT', 1)))
+
+    def test_fold_condition_keeps_calls(self):
+        """Test that a function call in a decided condition is kept."""
+        call = ('FUNC', 'Now', ('ARGS',))
+        cond = ('BINOP', 'OR', call, ('INT', 1))
+        result = ampoptimizer.fold_condition(cond)
+
+        self.assertEqual(result, cond)
+
+    def test_dead_if_removed(self):
+        """Test that an IF with a false condition is removed."""
+        prog = (('SET', 'a', ('INT', 1)),
+                ('IF', ('RELOP', '>', ('INT', 1), ('INT', 2)), ('@', 'a')))
+        result = ampoptimizer.optimize(prog)
+
+        self.assertEqual(result, ('SET', 'a', ('INT', 1)))
+
+    def test_true_if_inlined(self):
+        """Test that an IF with a true condition is replaced by its body."""
+        prog = ('IFELSE', ('RELOP', '==', ('STR', 'x'), ('STR', 'x')),
+                ('@', 'a'), ('@', 'b'))
+        result = ampoptimizer.optimize(prog)
+
+        self.assertEqual(result, ('@', 'a'))
+
+    def test_elseif_chain_pruned(self):
+        """Test that dead ELSEIF branches are removed from a chain."""
+        chain = ('ELSEIF', ('ELSEIF', ('RELOP', '==', ('INT', 1), ('INT', 2)), ('@', 'b')),
+                 ('RELOP', '==', ('@', 'a'), ('INT', 3)), ('@', 'c'))
+        prog = ('IFELSE', ('RELOP', '==', ('@', 'a'), ('INT', 1)), ('@', 'a'),
+                ('ELSEIFCHAIN', chain, ('@', 'd')))
+        result = ampoptimizer.optimize(prog)
+
+        expected = ('IFELSE', ('RELOP', '==', ('@', 'a'), ('INT', 1)), ('@', 'a'),
+                    ('ELSEIFCHAIN', ('ELSEIF', ('RELOP', '==', ('@', 'a'), ('INT', 3)), ('@', 'c')),
+                     ('@', 'd')))
+        self.assertEqual(result, expected)
+
+    def test_elseif_true_becomes_else(self):
+        """Test that a true ELSEIF becomes the ELSE of the chain."""
+        chain = ('ELSEIF', ('RELOP', '==', ('INT', 1), ('INT', 1)), ('@', 'b'))
+        prog = ('IFELSE', ('@', 'a'), ('@', 'a'), ('ELSEIFCHAIN', chain, ('@', 'c')))
+        result = ampoptimizer.optimize(prog)
+
+        self.assertEqual(result, ('IFELSE', ('@', 'a'), ('@', 'a'), ('@', 'b')))
+
+    def test_unused_declarations_dropped(self):
+        """Test that declarations of unreferenced variables are removed."""
+        prog = (('VAR', ((('@', 'a'), '@', 'b'), '@', 'c')), ('@', 'b'))
+        result = ampoptimizer.optimize(prog)
+
+        self.assertEqual(statements(result), [('VAR', ('@', 'b')), ('@', 'b')])
+
+    def test_keep_declarations(self):
+        """Test that drop_unused_vars=False keeps all declarations."""
+        prog = ('VAR', ('@', 'a'))
+        result = ampoptimizer.optimize(prog, drop_unused_vars=False)
+
+        self.assertEqual(result, prog)
+
+    def test_optimized_program_compiles(self):
+        """Test that compiled optimized output runs."""
+        body = ('SET', 'total', ('BINOP', '+', ('@', 'total'), ('BINOP', '*', ('INT', 2), ('INT', 3))))
+        prog = (
+            (('VAR', (('@', 'total'), '@', 'unused')), ('SET', 'total', ('INT', 0))),
+            (('FOR', 'i', ('INT', 0), 'TO', ('INT', 3), body, 'i'),
+             ('IF', ('RELOP', '>', ('INT', 2), ('INT', 1)),
+              ('SET', 'total', ('BINOP', '-', ('@', 'total'), ('INT', 1))))),
+        )
+        compiler = ampcompiler.AmpCompilerToPy(ampoptimizer.optimize(prog))
+        with redirect_stdout(io.StringIO()):
+            compiler.compile()
+        code = compiler.output
+        namespace = {}
+        exec(code, namespace)
+
+        self.assertNotIn('unused', code)
+        self.assertNotIn('if ', code)
+        self.assertEqual(namespace['total_amp'], 17)
+
+    def test_invariant_pure_call_hoisted(self):
+        """Test that pure calls with invariant arguments leave the loop."""
+        call = ('FUNC', 'MD5', ('ARGS', ('@', 's')))
+        body = ('SET', 'h', ('FUNC', 'Concat', ('ARGS', ('@', 'h'), call, ('@', 'i'))))
+        prog = ('FOR', 'i', ('INT', 0), 'TO', ('@', 'n'), body, 'i')
+        result = ampoptimizer.optimize(prog)
+
+        guard = ('IF', ('RELOP', '<', ('INT', 0), ('@', 'n')), ('SET', '_pure1', call))
+        hoisted_body = ('SET', 'h', ('FUNC', 'Concat', ('ARGS', ('@', 'h'), ('@', '_pure1'), ('@', 'i'))))
+        self.assertEqual(statements(result), [
+            ('VAR', ('@', '_pure1')), guard,
+            ('FOR', 'i', ('INT', 0), 'TO', ('@', 'n'), hoisted_body, 'i')
+        ])
+
+    def test_constant_bounds_skip_guard(self):
+        """Test that loops known to run are not guarded."""
+        call = ('FUNC', 'Uppercase', ('ARGS', ('STR', 'a')))
+        prog = ('FOR', 'i', ('INT', 0), 'TO', ('INT', 3), ('SET', 'u', call), 'i')
+        result = ampoptimizer.optimize(prog)
+
+        self.assertEqual(statements(result), [
+            ('VAR', ('@', '_pure1')),
+            ('SET', '_pure1', call),
+            ('FOR', 'i', ('INT', 0), 'TO', ('INT', 3), ('SET', 'u', ('@', '_pure1')), 'i'),
+        ])
+
+    def test_hoisted_program_interprets(self):
+        """Test that the interpreter runs a loop with hoisted calls."""
+        prog = ampyacc.parse('%%[ VAR @i, @x, @s SET @s = "abc" '
+                             'FOR @i = 1 TO 3 DO SET @x = Uppercase(@s) Output(@x) NEXT @i ]%%')
+        interpreter = ampinterpreter.AmpInterpreter({})
+        interpreter.add_statements(ampoptimizer.optimize(prog))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            interpreter.interpret()
+
+        self.assertEqual(output.getvalue(), "ABC\nABC\n")
+
+    def test_variant_call_not_hoisted(self):
+        """Test that calls reading loop-assigned variables stay put."""
+        body = (('SET', 's', ('@', 'i')),
+                ('SET', 'h', ('FUNC', 'MD5', ('ARGS', ('@', 's')))))
+        prog = ('FOR', 'i', ('INT', 0), 'TO', ('INT', 3), body, 'i')
+
+        self.assertEqual(ampoptimizer.optimize(prog), prog)
+
+    def test_impure_call_not_hoisted(self):
+        """Test that impure calls are evaluated every iteration."""
+        body = ('SET', 'h', ('FUNC', 'Now', ('ARGS',)))
+        prog = ('FOR', 'i', ('INT', 0), 'TO', ('INT', 3), body, 'i')
+
+        self.assertEqual(ampoptimizer.optimize(prog), prog)
+
+    def test_conditional_call_not_hoisted(self):
+        """Test that calls inside IF branches are not hoisted."""
+        body = ('IF', ('@', 'b'), ('SET', 'h', ('FUNC', 'Divide', ('ARGS', ('@', 'a'), ('@', 'b')))))
+        prog = ('FOR', 'i', ('INT', 0), 'TO', ('INT', 3), body, 'i')
+
+        self.assertEqual(ampoptimizer.optimize(prog), prog)
+
+
+if __name__ == '__main__':
+    unittest.main()
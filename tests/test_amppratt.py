@@ -0,0 +1,220 @@
+"""Unit tests for amppratt.py parser."""
+
+import io
+import os
+import random
+import unittest
+from contextlib import redirect_stdout
+
+import amp
+from benchmarks import workloads
+from src import amplex, amppratt, ampyacc
+from src.ampast import walk
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Programs exercising every production, and some broken ones
+SNIPPETS = [
+    "%%[ VAR @a, @b, @c SET @a = 1 SET @b = \"two\" ]%%",
+    "%%[ SET @a = -1 * 2 + 3 / 4 - 5 ]%%",
+    "%%[ SET @a = 1 < 2 AND 3 >= 4 OR 5 != 6 AND (7 == 8) ]%%",
+    "%%[ SET @a = NOT @b AND @c ]%%",
+    "%%[ SET @a = - - 1 SET @b = -(2 + 3) * -4 ]%%",
+    "%%[ Output(Concat(\"a\", Format(@x, \"N2\"), Now())) ]%%",
+    "%%[ FOR @i = 1 TO 10 DO Output(@i) NEXT @i ]%%",
+    "%%[ FOR @i = Add(@n, 1) DOWNTO 1 DO IF @i > 2 THEN Output(@i) ENDIF NEXT @i ]%%",
+    "%%[ IF @a THEN SET @b = 1 ENDIF ]%%",
+    "%%[ IF @a THEN SET @b = 1 ELSE SET @b = 2 ENDIF ]%%",
+    "%%[ IF @a THEN SET @b = 1 ELSE NOT @c ENDIF ]%%",
+    "%%[ IF @a THEN NOT @c ELSE SET @b = 2 ENDIF ]%%",
+    "%%[ IF @a THEN SET @b = 1 ELSEIF @c THEN SET @b = 2 ELSE NOT @c ENDIF ]%%",
+    "%%[ IF @a == 1 THEN SET @b = 1 ELSEIF @a == 2 THEN SET @b = 2 "
+    "ELSEIF @a == 3 THEN SET @b = 3 ELSE SET @b = 4 ENDIF ]%%",
+    "%%[\n  /* comment\n  */ SET @a = \"multi\nline\"\n  SET @b = @a\n]%%",
+    "%%= Lowercase(AttributeValue(\"Name\")) =%%",
+    "SET @a = 1 SET @b = @a (2)",
+    "NOT @a",
+    "",
+    "%%[ ]%%",
+    "%%[ SET @a = 1 == 2 == 3 ]%%",
+    "%%[ IF 1 THEN SET @a = 1 ELSEIF 2 THEN SET @a = 2 ENDIF ]%%",
+    "%%[ SET @a = Output ]%%",
+    "%%[ SET @a = 1 ]%% trailing",
+    "%%[ SET @a = 1",
+    "%%= 1 + =%%",
+    "%%[ FOR @i = 1 TO DO NEXT @i ]%%",
+    "%%[ SET @a = (1 ]%%",
+    "%%[ VAR @a, ]%%",
+    "%%[ SET @a = 1 # 2 ]%%",
+]
+
+
+def corpus():
+    """Snippets, sample templates and the benchmark workloads."""
+    sources = list(SNIPPETS)
+    for name in sorted(os.listdir(ROOT)):
+        if name.endswith('.ampscript'):
+            with open(os.path.join(ROOT, name), encoding='utf-8') as f:
+                sources.append(amp.ampscript_source(f.read()))
+    for name in workloads.WORKLOADS:
+        sources.append(amp.ampscript_source(workloads.generate(name, 0.02)))
+    return sources
+
+
+def mutations(sources, count, seed=7):
+    """Yield sources with one token deleted, doubled or replaced by another."""
+    rng = random.Random(seed)
+    spans = []
+    for source in sources:
+        lexer = amplex.Scanner()
+        lexer.input(source)
+        spans.append([(token.lexpos, lexer.lexpos) for token in iter(lexer.token, None)])
+    for _ in range(count):
+        index = rng.randrange(len(sources))
+        source, tokens = sources[index][:800], [span for span in spans[index] if span[1] <= 800]
+        if not tokens:
+            continue
+        start, end = rng.choice(tokens)
+        other_start, other_end = rng.choice(tokens)
+        yield rng.choice([
+            source[:start] + source[end:],
+            source[:end] + ' ' + source[start:end] + source[end:],
+            source[:start] + source[other_start:other_end] + source[end:],
+        ])
+
+
+def both(source):
+    """Parse a source with both parsers and collect their results and errors."""
+    with redirect_stdout(io.StringIO()):
+        expected = ampyacc.parse(source)
+        expected_errors = ampyacc.errors()
+        actual = amppratt.parse(source)
+        actual_errors = amppratt.errors()
+    return expected, expected_errors, actual, actual_errors
+
+
+def syntax_errors(problems):
+    """Drop illegal character reports from a problem list."""
+    return [problem for problem in problems if problem[0].startswith('Syntax error')]
+
+
+def positions(tree):
+    """Positions of the nodes of a tree, in walk order."""
+    return [(getattr(node, 'lineno', None), getattr(node, 'col', None)) for node in walk(tree)]
+
+
+class TestDifferential(unittest.TestCase):
+    """Test that the Pratt parser agrees with ampyacc."""
+
+    def assertSameParse(self, source):
+        """Assert equal trees and node positions, and the same first syntax error."""
+        expected, expected_errors, actual, actual_errors = both(source)
+
+        self.assertEqual(actual, expected)
+        self.assertEqual(positions(actual), positions(expected))
+        self.assertEqual(syntax_errors(actual_errors)[:1], syntax_errors(expected_errors))
+
+    def test_corpus(self):
+        """Test the snippets, sample templates and workloads."""
+        for source in corpus():
+            with self.subTest(source=source[:60]):
+                self.assertSameParse(source)
+
+    def test_mutations(self):
+        """Test single-token mutations of the corpus, mostly syntax errors."""
+        for source in mutations(corpus(), 400):
+            with self.subTest(source=source[:60]):
+                self.assertSameParse(source)
+
+    def test_scanner(self):
+        """Test that the parser gives the same tree over the regex scanner."""
+        source = amp.ampscript_source(workloads.generate('nested_if', 0.05))
+        expected = amppratt.parse(source)
+        amplex.select('scanner')
+        self.addCleanup(amplex.select, 'ply')
+
+        self.assertEqual(amppratt.parse(source), expected)
+
+
+class TestRecovery(unittest.TestCase):
+    """Test reporting several syntax errors in one pass."""
+
+    def parse(self, source):
+        """Parse quietly and return the tree and problems."""
+        with redirect_stdout(io.StringIO()):
+            tree = amppratt.parse(source)
+        return tree, amppratt.errors()
+
+    def test_several_statements(self):
+        """Test that each broken statement is reported."""
+        tree, problems = self.parse("%%[\nSET @a = \nSET @b = 2\nSET = 3\nVAR @c, 4\n]%%")
+
+        self.assertIsNone(tree)
+        self.assertEqual(problems, [("Syntax error at 'SET'", 3, 14),
+                                    ("Syntax error at '='", 4, 29),
+                                    ("Syntax error at '4'", 5, 41)])
+
+    def test_nested_blocks(self):
+        """Test errors inside IF and FOR bodies and a missing ENDIF."""
+        source = ("%%[ FOR @i = 1 TO 3 DO\n"
+                  "  IF @i > THEN SET @a = ( ENDIF\n"
+                  "  IF @i THEN SET @b = 1\n"
+                  "NEXT @i\n"
+                  "SET @c = ]%%")
+        tree, problems = self.parse(source)
+
+        self.assertIsNone(tree)
+        self.assertEqual([(message, lineno) for message, lineno, _ in problems],
+                         [("Syntax error at 'THEN'", 2),
+                          ("Syntax error at 'ENDIF'", 2),
+                          ("Syntax error at 'NEXT'", 4),
+                          ("Syntax error at ']%%'", 5)])
+
+    def test_first_error_matches_ply(self):
+        """Test that the first reported error is ampyacc's only one."""
+        source = "%%[ SET @a = 1 +\nIF @a THEN Output(@a) ELSEIF ENDIF\nVAR ]%%"
+        _, expected_errors, _, actual_errors = both(source)
+
+        self.assertEqual(actual_errors[0], expected_errors[0])
+        self.assertEqual(len(actual_errors), 3)
+
+    def test_illegal_characters(self):
+        """Test that illegal characters come first and do not fail the parse."""
+        tree, problems = self.parse("%%[ SET @a = 1 # SET @b = 2 ]%%")
+
+        self.assertIsNotNone(tree)
+        self.assertEqual(problems, [("Illegal character '#'", 1, 15)])
+
+    def test_end_of_input(self):
+        """Test an error at the end of the input."""
+        tree, problems = self.parse("%%[ IF @a THEN\nSET @b = 1")
+
+        self.assertIsNone(tree)
+        self.assertEqual(problems, [("Syntax error at end of input", 2, 25)])
+
+
+class TestSelect(unittest.TestCase):
+    """Test choosing the parser behind ampyacc.parse()."""
+
+    def tearDown(self):
+        """Restore the default parser."""
+        ampyacc.select('ply')
+
+    def test_select(self):
+        """Test that ampyacc.parse() and errors() use the selected parser."""
+        ampyacc.select('pratt')
+        with redirect_stdout(io.StringIO()):
+            tree = ampyacc.parse("%%[ SET @a = 1 SET @b = ]%%")
+
+        self.assertIsNone(tree)
+        self.assertEqual(ampyacc.errors(), [("Syntax error at ']%%'", 1, 24)])
+        self.assertEqual(ampyacc.parse("%%[ SET @a = 1 ]%%"), ('SET', 'a', ('INT', 1)))
+
+    def test_select_unknown(self):
+        """Test that an unknown parser is rejected."""
+        with self.assertRaises(ValueError):
+            ampyacc.select('earley')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+"""Unit tests for ampprofiler.py."""
+
+import unittest
+from src import ampprofiler
+from src.amptemplate import Template
+
+SOURCE = """%%[
+VAR @i, @s
+FOR @i = 0 TO 20 DO
+  SET @s = MD5(Concat("x", @i))
+NEXT @i
+Output(Length(@s))
+]%%"""
+
+
+class TestProfiler(unittest.TestCase):
+    """Test profiler bookkeeping."""
+
+    def setUp(self):
+        """Create a profiler for each test."""
+        self.profiler = ampprofiler.Profiler("%%[\nSET @a = 1\n]%%")
+
+    def test_nested_frames(self):
+        """Test call counts and self time of nested frames."""
+        self.profiler.enter(('line', 2))
+        self.profiler.enter(('func', 'MD5'))
+        self.profiler.exit()
+        self.profiler.enter(('func', 'MD5'))
+        self.profiler.exit()
+        self.profiler.exit()
+
+        line = self.profiler.stats[('line', 2)]
+        func = self.profiler.stats[('func', 'MD5')]
+        self.assertEqual(line[0], 1)
+        self.assertEqual(func[0], 2)
+        self.assertGreaterEqual(line[1], func[1])
+        self.assertAlmostEqual(line[2], line[1] - func[1])
+        self.assertEqual(set(self.profiler.stacks), {('line 2',), ('line 2', 'MD5')})
+
+    def test_recursive_frames_count_once(self):
+        """Test that re-entering an open key does not double cumulative time."""
+        self.profiler.enter(('line', 2))
+        self.profiler.enter(('line', 2))
+        self.profiler.exit()
+        self.profiler.exit()
+
+        calls, cumulative, own = self.profiler.stats[('line', 2)]
+        self.assertEqual(calls, 2)
+        self.assertAlmostEqual(cumulative, own)
+
+    def test_mark_closes_same_depth(self):
+        """Test that compiled line marks nest by statement depth."""
+        self.profiler.mark(3, 0)
+        self.profiler.mark(4, 1)
+        self.profiler.mark(4, 1)
+        self.profiler.mark(6, 0)
+        self.profiler.finish()
+
+        self.assertEqual(self.profiler.stats[('line', 3)][0], 1)
+        self.assertEqual(self.profiler.stats[('line', 4)][0], 2)
+        self.assertIn(('line 3', 'line 4'), self.profiler.stacks)
+        self.assertIn(('line 6',), self.profiler.stacks)
+
+    def test_report_and_collapsed(self):
+        """Test text and collapsed stack output."""
+        self.profiler.enter(('line', 2))
+        self.profiler.stacks[('line 2',)] = 0.0015
+        self.profiler.exit()
+        self.profiler.stacks[('line 2',)] = 0.0015
+
+        self.assertIn("SET @a = 1", self.profiler.report())
+        self.assertEqual(self.profiler.collapsed(), "line 2 1500\n")
+
+    def test_wrap_without_profiler(self):
+        """Test that wrapped functions work outside profiled renders."""
+        self.assertEqual(ampprofiler.wrap('Len', len)('abc'), 3)
+
+
+class TestTemplateProfile(unittest.TestCase):
+    """Test profiling of template renders."""
+
+    def check_profile(self, template):
+        """Render with profiling and check the recorded statistics."""
+        output = template.render(profile=True)
+        stats = template.profiler.stats
+
+        self.assertEqual(output, "32\n")
+        self.assertEqual(stats[('line', 4)][0], 20)
+        self.assertEqual(stats[('func', 'MD5')][0], 20)
+        self.assertEqual(stats[('func', 'Length')][0], 1)
+        self.assertGreaterEqual(stats[('line', 3)][1], stats[('line', 4)][1])
+        self.assertIn("line 3;line 4;MD5", template.profiler.collapsed())
+        # Library lookups and imports of the generated prologue are not calls
+        self.assertNotIn(('func', '__getattr__'), stats)
+        self.assertNotIn(('func', '_handle_fromlist'), stats)
+
+    def test_interpreted(self):
+        """Test profiling an interpreted render."""
+        self.check_profile(Template(SOURCE))
+
+    def test_compiled(self):
+        """Test profiling a compiled Python render."""
+        self.check_profile(Template(SOURCE, compiled=True))
+
+    def test_profile_accumulates(self):
+        """Test that profiles of several renders are aggregated."""
+        template = Template(SOURCE)
+        template.render(profile=True)
+        template.render()
+        template.render(profile=True)
+
+        self.assertEqual(template.profiler.stats[('line', 6)][0], 2)
+
+    def test_hook_profile(self):
+        """Test profiling plain compiled Python through its source map."""
+        template = Template(SOURCE, compiled=True)
+        output = template.render(profile='hook')
+        stats = template.profiler.stats
+
+        self.assertEqual(output, "32\n")
+        self.assertEqual(stats[('func', 'MD5')][0], 20)
+        self.assertGreaterEqual(stats[('line', 3)][1], stats[('line', 4)][1])
+        self.assertIn("line 3;line 4;MD5", template.profiler.collapsed())
+        # Library lookups and imports of the generated prologue are not calls
+        self.assertNotIn(('func', '__getattr__'), stats)
+        self.assertNotIn(('func', '_handle_fromlist'), stats)
+
+    def test_hook_profile_needs_compiled(self):
+        """Test that hook profiling rejects interpreted templates."""
+        with self.assertRaises(RuntimeError):
+            Template(SOURCE).render(profile='hook')
+
+
+if __name__ == '__main__':
+    unittest.main()
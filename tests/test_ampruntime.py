@@ -0,0 +1,122 @@
+"""Unit tests for ampruntime.py."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from src import ampbudget, ampcompiler, ampruntime, ampyacc
+from src.amptemplate import Template
+
+TEMPLATE = """%%[
+VAR @name, @i, @total
+SET @name = ProperCase("ann lee")
+SET @total = 0
+FOR @i = 1 TO 4 DO
+  SET @total = Add(@total, Mod(@i, 3))
+NEXT @i
+IF Length(@name) > 3 THEN
+  Output(Concat("Hello ", @name, " ", @total))
+ELSE
+  Output("short")
+ENDIF
+Output(Uppercase(Substring("abcdef", 1, 3)))
+]%%"""
+
+
+class TestPythonRuntime(unittest.TestCase):
+    """Test tree-shaken Python runtimes."""
+
+    def setUp(self):
+        """Create a directory outside the project to run scripts from."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def run_script(self, code):
+        """Run a script with a fresh interpreter outside the project."""
+        path = os.path.join(self.directory, 'script.py')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        env = {key: value for key, value in os.environ.items() if key != 'PYTHONPATH'}
+        return subprocess.run([sys.executable, path], cwd=self.directory, env=env,
+                              capture_output=True, text=True, timeout=60)
+
+    def test_only_called_functions(self):
+        """Test that the runtime holds the called functions and what they use."""
+        source = ampruntime.python_runtime(['Concat', 'MD5'])
+        namespace = {}
+        exec(compile(source, 'runtime', 'exec'), namespace)
+        functions = namespace['ampfunctions']
+
+        self.assertEqual(functions.Concat('a', 1), 'a1')
+        self.assertEqual(functions.MD5('x'), '9dd4e461268c8034f5c8564e155c67a6')
+        self.assertIn(ampruntime.hoisted_name('lib.utils', 'hash_string'), namespace)
+        self.assertFalse(hasattr(functions, 'Lowercase'))
+        self.assertNotIn('import src', source)
+        self.assertNotIn('"""', source)
+
+    def test_transitive_functions(self):
+        """Test that library functions called through self are included."""
+        source = ampruntime.python_runtime(['StringToDate'])
+
+        self.assertIn('def DateParse(self', source)
+
+    def test_services_stay_imported(self):
+        """Test that functions using a configured service import it."""
+        source = ampruntime.python_runtime(['Lookup'])
+
+        self.assertIn('import src.ampdatastore as ampdatastore', source)
+
+    def test_standalone_script(self):
+        """Test that compiled Python runs outside the project like a render."""
+        tree = ampyacc.parse(TEMPLATE)
+        code = ampcompiler.AmpCompilerToPy(tree, standalone=True).generate()
+        result = self.run_script(code)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, Template(TEMPLATE, compiled=True).render())
+        self.assertNotIn('from src', code)
+
+    def test_standalone_budget(self):
+        """Test that a standalone script enforces its budget."""
+        tree = ampyacc.parse(TEMPLATE)
+        budget = ampbudget.Budget(max_iterations=2)
+        result = self.run_script(
+            ampcompiler.AmpCompilerToPy(tree, budget=budget, standalone=True).generate())
+
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('iterations budget exceeded', result.stderr)
+
+    def test_standalone_profile(self):
+        """Test that profiled scripts cannot be standalone."""
+        with self.assertRaises(ValueError):
+            ampcompiler.AmpCompilerToPy(ampyacc.parse(TEMPLATE), profile=True, standalone=True)
+
+
+class TestJsRuntime(unittest.TestCase):
+    """Test inlined JavaScript runtimes."""
+
+    def test_only_called_functions(self):
+        """Test the bundle's functions and the Platform.Function fallback."""
+        source = ampruntime.js_runtime(['Concat', 'Lookup', 'Concat'])
+
+        self.assertEqual(source.count("'Concat':"), 1)
+        self.assertIn('Platform.Function.Lookup.apply', source)
+        self.assertNotIn("'Output':", source)
+        self.assertNotIn('amp_write', source)
+
+    @unittest.skipUnless(shutil.which('node'), "node is not installed")
+    def test_standalone_script(self):
+        """Test that compiled JavaScript prints what compiled Python prints."""
+        code = ampcompiler.AmpCompilerToJs(ampyacc.parse(TEMPLATE), standalone=True).generate()
+        result = subprocess.run(['node'], input=code, capture_output=True, text=True,
+                                timeout=60)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, Template(TEMPLATE, compiled=True).render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""Unit tests for ampserver.py."""
+
+import gzip
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from src import ampmetrics
+from src.ampserver import PageCache, PageServer
+
+LANDING = """<html><body>
+%%[ VAR @name SET @name = QueryParameter("Name") ]%%
+<h1>Hello %%=v(@name)=%%</h1>
+<p>%%=RequestParameter("topic")=%%</p>
+</body></html>
+"""
+
+GONE = '%%[ Redirect(Concat("/landing?name=", QueryParameter("name")), "true") ]%%'
+
+
+class TestPageServer(unittest.TestCase):
+    """Test serving pages over HTTP."""
+
+    def setUp(self):
+        """Serve a directory of pages on a background thread."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.write('landing.ampscript', LANDING)
+        self.write('gone.html', GONE)
+        self.write('big.html', 'x' * 2000)
+        self.cache = PageCache(self.root)
+        self.server = PageServer(('127.0.0.1', 0), self.cache, workers=4)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        )
+        self.thread.start()
+        self.conn = http.client.HTTPConnection(*self.server.server_address[:2], timeout=5)
+
+    def tearDown(self):
+        """Stop the server."""
+        self.conn.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def write(self, filename, text):
+        """Write a page file."""
+        with open(os.path.join(self.root, filename), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def request(self, method, path, body=None, headers=None):
+        """Send a request on the kept-alive connection."""
+        self.conn.request(method, path, body=body, headers=headers or {})
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def test_query_parameter(self):
+        """Test that pages read the query string, ignoring case."""
+        response, body = self.request('GET', '/landing?name=Ann&topic=News')
+
+        self.assertEqual(response.status, 200)
+        self.assertIn(b'<h1>Hello Ann</h1>', body)
+        self.assertIn(b'<p>News</p>', body)
+
+    def test_form_parameter(self):
+        """Test that RequestParameter reads POSTed form fields."""
+        response, body = self.request(
+            'POST', '/landing', body='topic=Deals',
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        )
+
+        self.assertIn(b'<p>Deals</p>', body)
+
+    def test_redirect(self):
+        """Test that Redirect answers with a redirect."""
+        response, _ = self.request('GET', '/gone?name=Bo')
+
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader('Location'), '/landing?name=Bo')
+
+    def test_not_found(self):
+        """Test missing pages and paths outside the root."""
+        self.assertEqual(self.request('GET', '/missing')[0].status, 404)
+        self.assertEqual(self.request('GET', '/../etc/passwd')[0].status, 404)
+
+    def test_render_errors(self):
+        """Test that any failing render answers 500 and the server goes on."""
+        self.write('broken.html', '%%[ Output(Add("a", 1)) ]%%')
+        with self.assertLogs('src.ampserver', 'ERROR'):
+            response, body = self.request('GET', '/broken')
+
+        self.assertEqual(response.status, 500)
+        self.assertEqual(body, b'Internal error\n')
+        self.assertEqual(self.request('GET', '/landing?name=Ann')[0].status, 200)
+
+    def test_gzip(self):
+        """Test that large responses are compressed when accepted."""
+        response, body = self.request('GET', '/big', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+        self.assertEqual(gzip.decompress(body), b'x' * 2000)
+
+    def test_warm_cache_and_stats(self):
+        """Test cache reuse, recompilation on change and the stats endpoint."""
+        self.assertEqual(self.cache.warm(), 3)
+        for _ in range(3):
+            self.request('GET', '/landing?name=A')
+        self.write('big.html', 'changed')
+        os.utime(os.path.join(self.root, 'big.html'), ns=(0, 0))
+        self.request('GET', '/big')
+
+        response, body = self.request('GET', '/_stats')
+        stats = json.loads(body)
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['statuses'], {'200': 4})
+        self.assertEqual(stats['page_cache']['hits'], 3)
+        self.assertEqual(stats['page_cache']['compilations'], 4)
+        self.assertIsNotNone(stats['latency_ms']['p99'])
+
+    def test_metrics(self):
+        """Test the Prometheus and JSON metrics endpoints."""
+        ampmetrics.enable()
+        self.addCleanup(ampmetrics.registry().reset)
+        self.addCleanup(ampmetrics.enable, False)
+        self.request('GET', '/landing?name=A')
+
+        response, body = self.request('GET', '/_metrics')
+        self.assertEqual(response.status, 200)
+        self.assertIn(b'amp_requests_total{status="200"} 1', body)
+        self.assertIn(b'amp_request_seconds_count 1', body)
+        response, body = self.request('GET', '/_metrics?format=json')
+        metrics = json.loads(body)
+        self.assertEqual(metrics['counters']['requests_total{status="200"}'], 2)
+
+    def test_keep_alive(self):
+        """Test that one connection serves several requests."""
+        for _ in range(3):
+            response, _ = self.request('GET', '/landing')
+            self.assertEqual(response.status, 200)
+        self.assertFalse(response.will_close)
+
+
+if __name__ == '__main__':
+    unittest.main()
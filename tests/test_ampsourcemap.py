@@ -0,0 +1,71 @@
+"""Unit tests for ampsourcemap.py."""
+
+import unittest
+from src import ampcompiler, ampyacc
+from src.ampsourcemap import SourceMap
+
+SOURCE = """%%[
+VAR @i, @s
+FOR @i = 0 TO 3 DO
+  SET @s = @i
+  IF @i > 1 THEN
+    SET @s = 0
+  ELSE
+    SET @s = 1
+  ENDIF
+NEXT @i
+]%%"""
+
+
+def generated_lines(code, text):
+    """Return the 1-based generated line numbers containing text."""
+    return [n for n, line in enumerate(code.split('\n'), 1) if text in line]
+
+
+class TestSourceMap(unittest.TestCase):
+    """Test source maps of compiled Python."""
+
+    def setUp(self):
+        """Compile the sample template with a source map."""
+        self.compiler = ampcompiler.AmpCompilerToPy(ampyacc.parse(SOURCE), source_map=True)
+        self.code = self.compiler.generate()
+        self.map = self.compiler.source_map
+
+    def test_statement_lines(self):
+        """Test that statements map to their template line and column."""
+        line = generated_lines(self.code, "s_amp = i_amp")[0]
+
+        self.assertEqual(self.map.lookup(line), (4, 3))
+        self.assertEqual(self.map.blocks(line), (3, 4))
+
+    def test_else_maps_to_if(self):
+        """Test that an else clause belongs to its IF."""
+        line = generated_lines(self.code, "else:")[0]
+
+        self.assertEqual(self.map.lookup(line), (5, 3))
+
+    def test_loop_increment_maps_to_for(self):
+        """Test that the FOR increment is not charged to the loop body."""
+        line = generated_lines(self.code, "i_amp += 1")[0]
+
+        self.assertEqual(self.map.lookup(line), (3, 1))
+
+    def test_header_unmapped(self):
+        """Test that the import header has no template position."""
+        self.assertIsNone(self.map.lookup(1))
+
+    def test_round_trip(self):
+        """Test that the JSON form loads back."""
+        loaded = SourceMap.from_dict(self.map.to_dict())
+
+        self.assertEqual(loaded.entries, self.map.entries)
+
+    def test_disabled_by_default(self):
+        """Test that plain compiles carry no source map comments."""
+        code = ampcompiler.AmpCompilerToPy(ampyacc.parse(SOURCE)).generate()
+
+        self.assertNotIn("# line", code)
+
+
+if __name__ == '__main__':
+    unittest.main()
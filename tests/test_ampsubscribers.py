@@ -0,0 +1,117 @@
+"""Unit tests for ampsubscribers.py."""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from src import ampcontext
+from src.ampsubscribers import (
+    CSVSource, NDJSONSource, SQLiteSource, open_source, referenced_attributes,
+)
+from src.amptemplate import Template, render_batch
+
+WIDE = [f"col{i}" for i in range(200)]
+
+
+class TestSubscriberSources(unittest.TestCase):
+    """Test reading subscribers lazily from files."""
+
+    def setUp(self):
+        """Create a scratch directory."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def path(self, filename, content=None):
+        """Get a scratch file path, writing content if given."""
+        path = os.path.join(self.root, filename)
+        if content is not None:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+        return path
+
+    def test_csv_lazy_fields(self):
+        """Test that only the fields read are decoded."""
+        lines = [','.join(['Email'] + WIDE)]
+        lines += [','.join([f"s{n}@example.com"] + [f"{n}-{i}" for i in range(200)])
+                  for n in range(3)]
+        rows = list(CSVSource(self.path('wide.csv', '\r\n'.join(lines) + '\r\n')).rows())
+
+        self.assertEqual(len(rows), 3)
+        self.assertIsNone(rows[0].fields)
+        self.assertEqual(rows[1]['EMAIL'], 's1@example.com')
+        self.assertEqual(rows[1]['Col150'], '1-150')
+        self.assertEqual(sorted(rows[1].values), [0, 151])
+        self.assertEqual(len(rows[1]), 201)
+
+    def test_csv_quoted(self):
+        """Test quoted fields with delimiters, quotes and line breaks."""
+        text = '\ufeffName,Note,City\nAnn,"a, ""b""\nc",Oslo\nBo,,\n'
+        rows = list(CSVSource(self.path('quoted.csv', text)).rows())
+
+        self.assertEqual(rows[0]['name'], 'Ann')
+        self.assertEqual(rows[0]['note'], 'a, "b"\nc')
+        self.assertEqual(rows[0]['city'], 'Oslo')
+        self.assertEqual(rows[1]['city'], '')
+
+    def test_ndjson(self):
+        """Test that lines are parsed on first read."""
+        text = '{"Name": "Ann", "Age": 30}\n\n{"Name": "Bo", "Age": null}\n'
+        rows = list(NDJSONSource(self.path('s.ndjson', text)).rows())
+
+        self.assertIsNone(rows[0].columns)
+        self.assertEqual(rows[0]['name'], 'Ann')
+        self.assertEqual(rows[1]['AGE'], '')
+        self.assertEqual(dict(rows[0]), {'Name': 'Ann', 'Age': 30})
+
+    def test_sqlite_projection(self):
+        """Test that only referenced columns are selected."""
+        path = self.path('s.db')
+        with sqlite3.connect(path) as connection:
+            connection.execute('CREATE TABLE subscribers (Email TEXT, FirstName TEXT, Age INT)')
+            connection.execute("INSERT INTO subscribers VALUES ('a@x.com', 'Ann', 30)")
+        connection.close()
+        source = open_source(path)
+        self.addCleanup(source.close)
+
+        row = next(source.rows({'firstname', 'missing'}))
+        self.assertEqual(row.columns, ['FirstName'])
+        self.assertEqual(row['FIRSTNAME'], 'Ann')
+        self.assertEqual(dict(next(source.rows())), {'Email': 'a@x.com', 'FirstName': 'Ann', 'Age': 30})
+        with self.assertRaises(RuntimeError):
+            SQLiteSource(path, table='nope')
+
+    def test_referenced_attributes(self):
+        """Test static collection of AttributeValue names."""
+        tree = Template('%%[ Output(Concat(attributevalue("First"), AttributeValue("LAST"))) ]%%').tree
+        self.assertEqual(referenced_attributes(tree), {'first', 'last'})
+
+        dynamic = Template('%%[ VAR @f SET @f = "x" Output(AttributeValue(@f)) ]%%').tree
+        self.assertIsNone(referenced_attributes(dynamic))
+
+    def test_batch_render(self):
+        """Test rendering a batch from a subscriber file."""
+        source = open_source(self.path('s.csv', 'FirstName,Other\nAnn,1\nBo,2\n'))
+        template = Template('%%[ Output(Concat("Hi ", AttributeValue("firstname"))) ]%%')
+        rows = source.rows(referenced_attributes(template.tree))
+
+        outputs = asyncio.run(render_batch(template, rows, concurrency=2))
+        self.assertEqual(outputs, ['Hi Ann\n', 'Hi Bo\n'])
+
+    def test_view_in_context(self):
+        """Test that attribute lookups on views do not decode other fields."""
+        row = next(CSVSource(self.path('s.csv', 'A,B\n1,2\n')).rows())
+        with ampcontext.rendering(row):
+            self.assertEqual(ampcontext.attribute('b'), '2')
+            self.assertIsNone(ampcontext.attribute('c'))
+        self.assertEqual(list(row.values), [1])
+
+    def test_unsupported(self):
+        """Test that unknown file types are rejected."""
+        with self.assertRaises(RuntimeError):
+            open_source('subscribers.xlsx')
+
+
+if __name__ == '__main__':
+    unittest.main()
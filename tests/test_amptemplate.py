@@ -0,0 +1,128 @@
+"""Unit tests for amptemplate.py."""
+
+import asyncio
+import time
+import unittest
+from src import ampbudget
+from src.ampfunctions import httpclient
+from src.ampstubserver import Route, StubServer
+from src.amptemplate import Template, render_batch
+
+SOURCE = """%%[
+VAR @a, @i
+SET @a = 0
+FOR @i = 0 TO 4 DO
+  SET @a = @a + @i
+NEXT @i
+Output(Concat("sum=", @a))
+]%%"""
+
+
+class TestTemplate(unittest.TestCase):
+    """Test parse-once, render-many templates."""
+
+    def test_render_interpreted(self):
+        """Test that output is captured instead of printed."""
+        self.assertEqual(Template(SOURCE).render(), "sum=6\n")
+
+    def test_render_compiled(self):
+        """Test that compiled renders match interpreted renders."""
+        template = Template(SOURCE, compiled=True)
+
+        self.assertEqual(template.render(), "sum=6\n")
+        self.assertIs(template.python_code(), template.python_code())
+
+    def test_render_repeatedly(self):
+        """Test that renders do not share variable state."""
+        template = Template(SOURCE)
+
+        self.assertEqual(template.render(), template.render())
+
+    def test_render_budget(self):
+        """Test that a budget stops a render."""
+        budget = ampbudget.Budget(max_iterations=2)
+        for compiled in (False, True):
+            with self.assertRaises(ampbudget.BudgetExceeded):
+                Template(SOURCE, compiled=compiled).render(budget=budget)
+
+    def test_parse_error(self):
+        """Test that unparsable templates raise."""
+        with self.assertRaises(RuntimeError):
+            Template("")
+
+    def test_render_context(self):
+        """Test that AttributeValue reads the render context."""
+        source = '%%[ Output(Concat("Hi ", AttributeValue("firstname"))) ]%%'
+        for compiled in (False, True):
+            template = Template(source, compiled=compiled)
+            self.assertEqual(template.render(context={'FirstName': 'Ann'}), "Hi Ann\n")
+            self.assertEqual(template.render({'FirstName': 'Bo'}), "Hi Bo\n")
+
+
+class TestAsyncRender(unittest.TestCase):
+    """Test the asyncio render path and the batch driver."""
+
+    GREETING = '%%[ Output(Concat(AttributeValue("name"), ":", HTTPGet(@url))) ]%%'
+
+    def setUp(self):
+        """Start a stub server answering slowly."""
+        self.server = StubServer({'/slow': Route('ok', delay=0.2)}).start()
+        httpclient.configure(max_per_host=20)
+        self.template = Template(
+            self.GREETING.replace('@url', f'"{self.server.url("/slow")}"')
+        )
+
+    def tearDown(self):
+        """Stop the server and restore the default client."""
+        httpclient.configure()
+        self.server.stop()
+
+    def test_render_async(self):
+        """Test that render_async matches render."""
+        output = asyncio.run(self.template.render_async({'name': 'a'}))
+
+        self.assertEqual(output, "a:ok\n")
+
+    def test_batch_overlaps_io(self):
+        """Test that batch renders wait on HTTP concurrently, in order."""
+        contexts = [{'name': str(i)} for i in range(20)]
+        start = time.perf_counter()
+        outputs = asyncio.run(render_batch(self.template, contexts, concurrency=20))
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(outputs, [f"{i}:ok\n" for i in range(20)])
+        # Sequential renders would take 20 * 0.2s
+        self.assertLess(elapsed, 2.0)
+
+    def test_batch_concurrency_bound(self):
+        """Test that no more than concurrency renders are in flight."""
+        contexts = ({'name': str(i)} for i in range(6))
+        asyncio.run(render_batch(self.template, contexts, concurrency=2))
+
+        self.assertLessEqual(self.server.connections, 2)
+        self.assertEqual(len(self.server.requests), 6)
+
+    def test_batch_clears_memo(self):
+        """Test that memoized results do not outlive a batch."""
+        template = Template('%%[ Output(SHA256(AttributeValue("name"))) ]%%')
+        asyncio.run(render_batch(template, [{'name': 'a'}, {'name': 'b'}]))
+
+        self.assertEqual(template.functions._memo, {})
+
+    def test_batch_errors(self):
+        """Test that failed renders are returned or raised."""
+        template = Template(
+            '%%[ VAR @i, @x FOR @i = 1 TO 10 DO SET @x = @i NEXT @i ]%%'
+        )
+        contexts = [{}, {}]
+        budget = ampbudget.Budget(max_iterations=3)
+
+        outputs = asyncio.run(render_batch(template, contexts, budget=budget))
+        self.assertTrue(all(isinstance(o, ampbudget.BudgetExceeded) for o in outputs))
+        with self.assertRaises(ampbudget.BudgetExceeded):
+            asyncio.run(render_batch(template, contexts, budget=budget,
+                                     return_exceptions=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Unit tests for ampvector.py."""
+
+import unittest
+from unittest import mock
+import pytest
+from benchmarks import workloads
+from src import ampbudget, ampvector
+from src.amptemplate import Template
+from src.ampvector import VectorTemplate
+
+
+class TestVectorTemplate(unittest.TestCase):
+    """Test column-wise batch renders against per-row renders."""
+
+    def assert_same_as_per_row(self, source, subscribers, chunk_size=7):
+        """Check that vectorized and per-row renders agree."""
+        template = Template(source)
+        vector = VectorTemplate(template, chunk_size=chunk_size)
+        expected = [template.render(context=subscriber) for subscriber in subscribers]
+
+        self.assertEqual(vector.render_batch(subscribers), expected)
+        return vector
+
+    def test_batch_clears_memo(self):
+        """Test that memoized results do not outlive a batch."""
+        template = Template('%%[ Output(SHA256(AttributeValue("Name"))) ]%%')
+        VectorTemplate(template).render_batch([{'Name': 'a'}, {'Name': 'b'}])
+
+        self.assertEqual(template.functions._memo, {})
+
+    def test_personalization(self):
+        """Test string kernels, arithmetic and masked IF branches."""
+        vector = self.assert_same_as_per_row(workloads.PERSONALIZATION,
+                                             workloads.subscribers(30))
+
+        # Everything up to the Output call is evaluated column-wise
+        self.assertEqual(len(vector.vector), 7)
+        self.assertEqual(vector.fallbacks, 0)
+
+    def test_without_numpy(self):
+        """Test that columns stay lists when NumPy is missing."""
+        with mock.patch.object(ampvector, 'numpy', None):
+            self.test_personalization()
+
+    def test_numeric_columns(self):
+        """Test integer and float arithmetic and comparisons."""
+        source = '''%%[
+            VAR @a, @b, @c, @big
+            SET @a = Length(AttributeValue("Name")) * 3 - 4
+            SET @b = @a / 2 + 0
+            SET @big = @a * 4000000000 * 4000000000
+            IF @b >= 2 AND @a != 5 THEN SET @c = -@a ELSE SET @c = @b ENDIF
+            Output(Concat(@a, ",", @b, ",", @c, ",", @big))
+        ]%%'''
+        subscribers = [{'name': 'x' * n} for n in range(12)]
+        self.assert_same_as_per_row(source, subscribers)
+
+    def test_stops_at_control_flow(self):
+        """Test that loops and output run per row with computed variables."""
+        source = '''%%[
+            VAR @n, @i, @out
+            SET @n = Length(AttributeValue("Name"))
+            SET @out = ""
+            FOR @i = 0 TO @n DO
+                SET @out = Concat(@out, @i)
+            NEXT @i
+            SET @n = Uppercase(@out)
+            Output(@n)
+        ]%%'''
+        vector = self.assert_same_as_per_row(source, [{'Name': 'abcd'}, {'Name': ''}])
+
+        self.assertEqual([stmt[0] for stmt in vector.vector], ['VAR', 'SET', 'SET'])
+
+    def test_error_falls_back_per_row(self):
+        """Test that a chunk whose columns fail renders row by row."""
+        template = Template('''%%[
+            VAR @q
+            SET @q = 10 / Length(AttributeValue("Name"))
+            Output(@q)
+        ]%%''')
+        vector = VectorTemplate(template)
+
+        with self.assertRaises(ZeroDivisionError):
+            vector.render_batch([{'Name': 'ab'}, {'Name': ''}])
+        self.assertEqual(vector.fallbacks, 1)
+        self.assertEqual(vector.render_batch([{'Name': 'ab'}]), ['5.0\n'])
+
+    def test_budget_applies_per_row(self):
+        """Test that each per-row render gets its own budget copy."""
+        template = Template('''%%[
+            VAR @n, @i
+            SET @n = Length(AttributeValue("Name"))
+            FOR @i = 0 TO @n DO Output(@i) NEXT @i
+        ]%%''')
+        vector = VectorTemplate(template)
+        budget = ampbudget.Budget(max_iterations=3)
+
+        self.assertEqual(len(vector.render_batch([{'Name': 'ab'}] * 3, budget)), 3)
+        with self.assertRaises(ampbudget.BudgetExceeded):
+            vector.render_batch([{'Name': 'abcdef'}], budget)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestNumpyColumns(unittest.TestCase):
+    """Test the NumPy column path; skipped unless NumPy is installed."""
+
+    def setUp(self):
+        """Require NumPy."""
+        self.numpy = pytest.importorskip('numpy')
+
+    def test_as_array(self):
+        """Test that only homogeneous int or float columns become arrays."""
+        self.assertEqual(ampvector.as_array([1, 2, 3]).dtype, self.numpy.int64)
+        self.assertEqual(ampvector.as_array([1.5, 2.0]).dtype, self.numpy.float64)
+        self.assertIsNone(ampvector.as_array([1, 2.0]))
+        self.assertIsNone(ampvector.as_array(['1', '2']))
+        self.assertIsNone(ampvector.as_array([1 << 70]))
+
+    def test_array_binary(self):
+        """Test NumPy arithmetic and the cases left to Python."""
+        self.assertEqual(ampvector.array_binary('+', [1, 2], [3, 4]).tolist(), [4, 6])
+        self.assertEqual(ampvector.array_binary('/', [1, 3], [2, 2]).tolist(), [0.5, 1.5])
+        # Division by zero must raise per row, int64 must not overflow
+        self.assertIsNone(ampvector.array_binary('/', [1, 2], [1, 0]))
+        self.assertIsNone(ampvector.array_binary('*', [1 << 40], [1 << 40]))
+
+    def test_array_relational(self):
+        """Test NumPy comparisons and inexact int/float mixes."""
+        self.assertEqual(ampvector.array_relational('<', [1, 5], [2, 2]).tolist(), [True, False])
+        self.assertIsNone(ampvector.array_relational('==', [(1 << 53) + 1], [float(1 << 53)]))
+
+    def test_numeric_columns(self):
+        """Test that arithmetic columns are arrays and renders match per row."""
+        TestVectorTemplate('test_numeric_columns').test_numeric_columns()
+        vector = VectorTemplate(Template('''%%[
+            VAR @a
+            SET @a = Length(AttributeValue("Name")) * 3 - 4
+            Output(@a)
+        ]%%'''))
+        chunk = ampvector.Chunk(vector, [{'Name': 'x' * n} for n in range(5)])
+        for stmt in vector.vector:
+            chunk.execute(stmt, None)
+
+        self.assertIsInstance(chunk.columns['a'], self.numpy.ndarray)
+        self.assertEqual(chunk.columns['a'].tolist(), [n * 3 - 4 for n in range(5)])
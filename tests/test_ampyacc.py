@@ -1,7 +1,12 @@
 """Unit tests for ampyacc.py parser."""
 
+import contextlib
+import io
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from src import ampyacc
+from src.ampast import walk
 
 
 class TestAmpParser(unittest.TestCase):
@@ -65,6 +70,16 @@ class TestAmpParser(unittest.TestCase):
         
         self.assertIsNotNone(result)
 
+    def test_parse_function_arguments(self):
+        """Test parsing calls into an N-ary argument node."""
+        result = ampyacc.parse('%%=Concat("a", @b, 1, Now())=%%')
+
+        self.assertEqual(result, (
+            'FUNC', 'Concat',
+            ('ARGS', ('STR', 'a'), ('@', 'b'), ('INT', 1),
+             ('FUNC', 'Now', ('ARGS',)))
+        ))
+
     def test_parse_arithmetic_expression(self):
         """Test parsing arithmetic expressions."""
         code = "%%=@a + @b=%%"
@@ -127,5 +142,60 @@ class TestAmpParser(unittest.TestCase):
         self.assertIsNone(result)
 
 
+def positions(tree):
+    """List the node kinds and line numbers of a tree."""
+    return [(node[0], getattr(node, 'lineno', None)) for node in walk(tree)]
+
+
+def template(n):
+    """Generate the n-th stress test template; every 50th has a syntax error."""
+    lines = ["%%[", f"VAR @a{n}, @b"] + ["" for _ in range(n % 7)]
+    lines.append(f'SET @a{n} = Concat("x{n}", {n} * 2)')
+    if n % 3:
+        lines.append(f"IF @a{n} == {n} THEN\n  SET @b = {n}\nENDIF")
+    lines.append("SET @b = )" if n % 50 == 0 else f"Output(@a{n})")
+    lines.append("]%%")
+    return "\n".join(lines)
+
+
+class TestConcurrentParsing(unittest.TestCase):
+    """Test parsing from many threads at once."""
+
+    def test_line_numbers_per_parse(self):
+        """Test that line numbers restart with every parse."""
+        first = positions(ampyacc.parse(template(4)))
+        ampyacc.parse(template(5))
+
+        self.assertEqual(positions(ampyacc.parse(template(4))), first)
+        self.assertIn(('VAR', 2), first)
+
+    def test_multiline_strings_and_comments(self):
+        """Test that newlines inside strings and comments are counted."""
+        tree = ampyacc.parse('%%[ VAR @a\n/* one\ntwo */\nSET @a = "x\ny"\nSET @a = 1 ]%%')
+
+        self.assertEqual([node.lineno for node in (tree[0][0], tree[0][1], tree[1])], [1, 4, 6])
+
+    def test_stress(self):
+        """Test thousands of concurrent parses against sequential results."""
+        sources = [template(n) for n in range(3000)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = [ampyacc.parse(source) for source in sources]
+
+            def parse(source):
+                tree = ampyacc.parse(source)
+                return tree, positions(tree) if tree else None, threading.get_ident()
+
+            with ThreadPoolExecutor(16) as executor:
+                results = list(executor.map(parse, sources, chunksize=10))
+
+        self.assertGreater(len({ident for _, _, ident in results}), 1)
+        for n, (tree, found, _) in enumerate(results):
+            self.assertEqual(tree, expected[n], sources[n])
+            if expected[n] is None:
+                self.assertEqual(n % 50, 0)
+            else:
+                self.assertEqual(found, positions(expected[n]), sources[n])
+
+
 if __name__ == '__main__':
     unittest.main()
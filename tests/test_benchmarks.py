@@ -0,0 +1,72 @@
+"""Unit tests for the benchmarks package."""
+
+import unittest
+from benchmarks import runner, workloads
+from src import ampyacc
+
+
+class TestWorkloads(unittest.TestCase):
+    """Test synthetic workload generators."""
+
+    def test_workloads_parse(self):
+        """Test that every generated workload is valid AmpScript."""
+        import amp
+
+        for name in workloads.WORKLOADS:
+            with self.subTest(workload=name):
+                source = amp.ampscript_source(workloads.generate(name, scale=0.02))
+                self.assertTrue(ampyacc.parse(source))
+
+    def test_scale(self):
+        """Test that the scale controls the workload size."""
+        small = workloads.generate('statements', scale=0.01)
+        large = workloads.generate('statements', scale=0.1)
+
+        self.assertGreater(len(large), len(small))
+
+
+class TestRunner(unittest.TestCase):
+    """Test measuring and comparing results."""
+
+    def test_run_selected(self):
+        """Test that selected benchmarks are measured."""
+        results = runner.run(scale=0.01, repeat=1, min_time=0,
+                             only=['compile_*.for_loop', 'function.Length'])
+
+        self.assertEqual(sorted(results['results']),
+                         ['compile_js.for_loop', 'compile_py.for_loop', 'function.Length'])
+        result = results['results']['function.Length']
+        self.assertGreater(result['throughput'], 0)
+        self.assertEqual(result['unit'], 'calls/s')
+
+    def test_batch_speedup(self):
+        """Test that batch renders are measured per row and vectorized."""
+        results = runner.run(scale=0.005, repeat=1, min_time=0, only=['batch.*'])
+
+        self.assertEqual(sorted(results['results']), ['batch.per_row', 'batch.vectorized'])
+        self.assertEqual(results['results']['batch.vectorized']['unit'], 'renders/s')
+        self.assertGreater(runner.batch_speedup(results), 0)
+
+    def test_stage_speedup(self):
+        """Test that the scanner and Pratt parser are measured against PLY."""
+        results = runner.run(scale=0.02, repeat=1, min_time=0, only=['*.nested_if'])
+
+        self.assertIn('scanner.nested_if', results['results'])
+        self.assertIn('pratt.nested_if', results['results'])
+        self.assertGreater(runner.stage_speedup(results, 'lexer', 'scanner'), 0)
+        self.assertGreater(runner.stage_speedup(results, 'parser', 'pratt'), 0)
+        self.assertIsNone(runner.stage_speedup(results, 'parser', 'missing'))
+
+    def test_compare(self):
+        """Test that slowdowns beyond the tolerance are regressions."""
+        baseline = {'results': {'a': {'best': 1.0}, 'b': {'best': 1.0}, 'c': {'best': 1.0}}}
+        current = {'results': {'a': {'best': 1.1}, 'b': {'best': 1.5},
+                               'c': {'best': 0.5}, 'd': {'best': 1.0}}}
+        rows = runner.compare(current, baseline, tolerance=0.15)
+
+        self.assertEqual({row[0]: row[4] for row in rows},
+                         {'a': 'ok', 'b': 'regression', 'c': 'faster', 'd': 'new'})
+
+
+if __name__ == '__main__':
+    unittest.main()
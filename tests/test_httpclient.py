@@ -0,0 +1,149 @@
+"""Unit tests for ampfunctions/httpclient.py against the stub server."""
+
+import http.client
+import threading
+import unittest
+from unittest import mock
+from src.ampfunctions import httpclient
+from src.ampstubserver import Route, StubServer
+from src.amptemplate import Template
+
+
+class TestHttpClient(unittest.TestCase):
+    """Test pooled, cached HTTP requests."""
+
+    def setUp(self):
+        """Start a stub server and a fresh shared client."""
+        self.server = StubServer({
+            '/plain': Route('plain'),
+            '/fresh': Route('fresh', max_age=60),
+            '/tagged': Route('tagged', etag='"v1"'),
+            '/nostore': Route('nostore', headers={'Cache-Control': 'no-store'}),
+            '/private': Route('private', headers={'Cache-Control': 'private, max-age=60'}),
+            '/agent': Route('agent', max_age=60, headers={'Vary': 'User-Agent'}),
+            '/slow': Route('slow', delay=0.5),
+        }).start()
+        self.client = httpclient.configure(timeout=2, max_per_host=2)
+
+    def tearDown(self):
+        """Stop the server and restore the default client."""
+        httpclient.configure()
+        self.server.stop()
+
+    def paths(self):
+        """Return the paths the server received, in order."""
+        return [path for _, path, _ in self.server.requests]
+
+    def test_keep_alive(self):
+        """Test that sequential requests share one connection."""
+        for _ in range(5):
+            self.assertEqual(self.client.request('GET', self.server.url('/plain')).body, 'plain')
+
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_max_age_cached(self):
+        """Test that fresh responses are served from the cache."""
+        for _ in range(3):
+            self.client.request('GET', self.server.url('/fresh'))
+
+        self.assertEqual(self.paths(), ['/fresh'])
+
+    def test_etag_revalidated(self):
+        """Test that a 304 Not Modified reuses the cached body."""
+        first = self.client.request('GET', self.server.url('/tagged'))
+        second = self.client.request('GET', self.server.url('/tagged'))
+
+        self.assertEqual(second.body, 'tagged')
+        self.assertIsNot(second, first)
+        self.assertEqual(first.headers['etag'], '"v1"')
+        self.assertEqual(self.paths(), ['/tagged', '/tagged'])
+
+    def test_no_store(self):
+        """Test that no-store responses are fetched every time."""
+        self.client.request('GET', self.server.url('/nostore'))
+        self.client.request('GET', self.server.url('/nostore'))
+
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_private(self):
+        """Test that private responses are not shared through the cache."""
+        self.client.request('GET', self.server.url('/private'))
+        self.client.request('GET', self.server.url('/private'))
+
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_keyed_on_request_headers(self):
+        """Test that requests with different credentials get their own entries."""
+        url = self.server.url('/fresh')
+        for token in ('alice', 'bob', 'alice'):
+            self.client.request('GET', url, headers={'Authorization': f'Bearer {token}'})
+        self.client.request('GET', url)
+
+        self.assertEqual(self.paths(), ['/fresh', '/fresh', '/fresh'])
+
+    def test_vary_unkeyed_header(self):
+        """Test that responses varying on headers outside the key are not cached."""
+        self.client.request('GET', self.server.url('/agent'))
+        self.client.request('GET', self.server.url('/agent'))
+
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_failed_retry_closes_connection(self):
+        """Test that the connection of a failed stale-connection retry is closed."""
+        pool = httpclient.ConnectionPool('http', 'localhost', self.server.port, 1, 2)
+        stale, fresh = mock.Mock(), mock.Mock()
+        pool.idle.append(stale)
+        errors = [http.client.RemoteDisconnected('closed'), ConnectionRefusedError('refused')]
+        with mock.patch.object(pool, 'connect', return_value=fresh), \
+                mock.patch.object(pool, 'send', side_effect=errors):
+            with self.assertRaises(ConnectionRefusedError):
+                pool.request('GET', '/plain')
+
+        stale.close.assert_called_once_with()
+        fresh.close.assert_called_once_with()
+        self.assertEqual(pool.idle, [])
+
+    def test_per_host_limit(self):
+        """Test that concurrent requests are limited per host."""
+        def fetch():
+            for _ in range(10):
+                self.client.request('GET', self.server.url('/plain'))
+
+        threads = [threading.Thread(target=fetch) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.server.requests), 60)
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_timeout(self):
+        """Test that a slow server raises a runtime error."""
+        client = httpclient.configure(timeout=0.1)
+
+        with self.assertRaises(RuntimeError):
+            client.request('GET', self.server.url('/slow'))
+
+    def test_unsupported_url(self):
+        """Test that non-HTTP URLs are rejected."""
+        with self.assertRaises(RuntimeError):
+            self.client.request('GET', 'ftp://example.com/file')
+
+    def test_template_functions(self):
+        """Test HTTPGet and HTTPPost from a template."""
+        source = (
+            '%%[\n'
+            f'Output(HTTPGet("{self.server.url("/fresh")}"))\n'
+            f'Output(HTTPPost("{self.server.url("/echo")}", "text/plain", "hello"))\n'
+            f'Output(HTTPPost2("{self.server.url("/echo")}", "text/plain", "again"))\n'
+            ']%%'
+        )
+
+        self.assertEqual(Template(source).render(), "fresh\nhello\nagain\n")
+        self.assertEqual(self.server.requests[1], ('POST', '/echo', 'hello'))
+
+
+if __name__ == '__main__':
+    unittest.main()
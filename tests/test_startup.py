@@ -0,0 +1,98 @@
+"""Startup cost tests based on ``python -X importtime``."""
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import budgets in microseconds. Generous enough for slow CI
+# machines, tight enough to catch an eager import of a heavy dependency.
+AMPFUNCTIONS_BUDGET_US = 60_000
+AMP_BUDGET_US = 400_000
+
+
+def import_times(statement):
+    """
+    Run a statement in a fresh interpreter with -X importtime.
+
+    Args:
+        statement: Python source to execute
+
+    Returns:
+        Dictionary of module name -> cumulative import time in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def loaded_modules(statement):
+    """
+    Run a statement in a fresh interpreter and list the imported modules.
+
+    Args:
+        statement: Python source to execute
+
+    Returns:
+        Set of names in sys.modules after the statement ran
+    """
+    result = subprocess.run(
+        [sys.executable, "-c",
+         statement + "\nimport sys; print('\\n'.join(sys.modules))"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.splitlines())
+
+
+class TestStartup(unittest.TestCase):
+    """Test that importing the tool and its runtime stays cheap."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Warm bytecode caches so timings exclude compilation."""
+        subprocess.run(
+            [sys.executable, "-c", "import amp, src.ampfunctions"],
+            cwd=ROOT, capture_output=True, check=True
+        )
+
+    def test_ampfunctions_import_is_light(self):
+        """Test that generated scripts do not pull in heavy dependencies."""
+        times = import_times("from src import ampfunctions")
+
+        self.assertNotIn("cryptography", times)
+        self.assertNotIn("json", times)
+        self.assertNotIn("uuid", times)
+        self.assertNotIn("random", times)
+        self.assertLess(times["src.ampfunctions"], AMPFUNCTIONS_BUDGET_US)
+
+    def test_category_loaded_on_first_use(self):
+        """Test that calling a function imports only its category."""
+        modules = loaded_modules(
+            "from src import ampfunctions; ampfunctions.Uppercase('a')"
+        )
+
+        self.assertIn("src.ampfunctions.strings", modules)
+        self.assertNotIn("src.ampfunctions.crypto", modules)
+        self.assertNotIn("src.ampfunctions.dataext", modules)
+
+    def test_amp_import_skips_prompt_toolkit(self):
+        """Test that compile runs do not import the REPL dependencies."""
+        times = import_times("import amp")
+
+        self.assertNotIn("prompt_toolkit", times)
+        self.assertNotIn("cryptography", times)
+        self.assertLess(times["amp"], AMP_BUDGET_US)
+
+
+if __name__ == '__main__':
+    unittest.main()